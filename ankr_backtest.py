@@ -8,6 +8,8 @@ from eth_typing.evm import Address, BlockNumber
 from dotenv import dotenv_values
 import asyncio
 
+from src.data_structures.rate_limiter import RateLimiter
+
 from typing import Dict, Any, List, Union
 from hexbytes import HexBytes
 
@@ -17,8 +19,12 @@ env: Dict[str, Any] = dotenv_values(".env")
 # Create a web3 object with a standard json rpc provider, such as Infura, Alchemy, or your own node.
 w3: Web3 = Web3(AsyncHTTPProvider(env.get("HTTP_PROVIDER_URL")), modules = {"eth": AsyncEth}, middlewares=[])
 
+# Keep the concurrent fetches under the provider's requests per second budget
+rate_limiter: RateLimiter = RateLimiter(requests_per_second = float(env.get("RPC_REQUESTS_PER_SECOND", 25)))
+
 async def get_transaction_for_hash(tx_hash: _Hash32, delay: int = 0) -> Dict[str, Any]:
     try:
+        await rate_limiter.acquire_async(endpoint_uri = env.get("HTTP_PROVIDER_URL"))
         transaction: Dict[str, Any] = dict(await w3.eth.get_transaction(tx_hash))
         await asyncio.sleep(delay = delay)
         for key in transaction:
@@ -46,6 +52,7 @@ def process_response(response: Union[HexBytes, Dict, AttributeDict, List]) -> Di
 
 async def get_transaction_receipt_for_hash(tx_hash: _Hash32, delay: int = 0) -> Dict[str, Any]:
     try:
+        await rate_limiter.acquire_async(endpoint_uri = env.get("HTTP_PROVIDER_URL"))
         transaction_receipt: Dict[str, Any] = dict(await w3.eth.get_transaction_receipt(tx_hash))
         await asyncio.sleep(delay = delay)
         
@@ -1,5 +1,6 @@
 from .services.flashbots_service import FlashbotsService
 from .services.contract_service import ContractService
+from .services.service_runtime import ServiceRuntime
 from .services.uniswap_arbitrage_service import UniswapArbitrageService
 
 from web3 import Web3, HTTPProvider
@@ -26,9 +27,9 @@ def main() -> None:
     )
 
     # Initialize contract service
-    contract_service: ContractService = ContractService(
+    contract_service: ContractService = ServiceRuntime.get_default(
         w3 = w3
-    )
+    ).contract_service
 
     uniswap_arbitrage_service: UniswapArbitrageService = UniswapArbitrageService(
         w3 = w3,
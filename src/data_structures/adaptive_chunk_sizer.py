@@ -0,0 +1,85 @@
+from eth_typing.evm import ChecksumAddress
+
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from typing_extensions import Self
+
+
+CallType = Tuple[ChecksumAddress, str]
+
+
+@dataclass
+class ChunkSizeStats():
+    chunk_size: float
+    latency: Optional[float] = None
+    successes: int = 0
+    failures: int = 0
+
+
+class AdaptiveChunkSizer():
+    '''
+    Per call type (contract address, function name) multicall chunk size.
+    Grows by a quarter (at least 1) while full chunks come back under
+    target_latency, shrinks proportionally when they are slow and drops to
+    half of a chunk size that failed.
+    '''
+    def __init__(
+        self: Self, initial_chunk_size: int = 10, min_chunk_size: int = 1,
+        max_chunk_size: int = 500, target_latency: float = 1.0,
+        latency_smoothing: float = 0.3
+    ) -> None:
+        self.initial_chunk_size: int = initial_chunk_size
+        self.min_chunk_size: int = min_chunk_size
+        self.max_chunk_size: int = max_chunk_size
+        self.target_latency: float = target_latency
+        self.latency_smoothing: float = latency_smoothing
+
+        self.stats: Dict[CallType, ChunkSizeStats] = dict()
+        self.lock: Lock = Lock()
+
+
+    def get_chunk_size(self: Self, call_type: CallType) -> int:
+        with self.lock:
+            return int(self.__get_stats(call_type).chunk_size)
+
+
+    def record_success(self: Self, call_type: CallType, chunk_size: int, latency: float) -> None:
+        with self.lock:
+            stats: ChunkSizeStats = self.__get_stats(call_type)
+            stats.successes += 1
+            stats.latency = latency if stats.latency is None else (
+                self.latency_smoothing * latency
+                + (1 - self.latency_smoothing) * stats.latency
+            )
+
+            if stats.latency > self.target_latency:
+                stats.chunk_size = max(
+                    self.min_chunk_size,
+                    stats.chunk_size * self.target_latency / stats.latency
+                )
+            elif chunk_size >= int(stats.chunk_size):
+                # Only full chunks say something about the current limit
+                stats.chunk_size = min(
+                    self.max_chunk_size,
+                    stats.chunk_size + max(1, stats.chunk_size / 4)
+                )
+
+
+    def record_failure(self: Self, call_type: CallType, chunk_size: int) -> None:
+        with self.lock:
+            stats: ChunkSizeStats = self.__get_stats(call_type)
+            stats.failures += 1
+            if chunk_size < int(stats.chunk_size):
+                # A chunk smaller than the current size failing says nothing about the limit
+                return
+            stats.chunk_size = max(
+                self.min_chunk_size,
+                min(stats.chunk_size, chunk_size / 2)
+            )
+
+
+    def __get_stats(self: Self, call_type: CallType) -> ChunkSizeStats:
+        if call_type not in self.stats:
+            self.stats[call_type] = ChunkSizeStats(chunk_size = self.initial_chunk_size)
+        return self.stats[call_type]
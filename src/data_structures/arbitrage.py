@@ -1,4 +1,4 @@
-from .exchange_graph import ExchangeEdge
+from .exchange_graph import ExchangeEdge, ExchangeEdgeId
 
 from eth_typing.evm import ChecksumAddress, BlockNumber
 
@@ -8,7 +8,9 @@ from typing import (
     Dict,
     List,
     Iterable,
-    SupportsIndex
+    Optional,
+    SupportsIndex,
+    Tuple
 )
 from typing_extensions import Self
 
@@ -96,6 +98,25 @@ class Arbitrage():
     
     def is_profitable(self) -> bool:
         return self.profit > 0
+
+    def at_block(self, path_meta: List[ExchangeEdge], block_number: BlockNumber) -> Self:
+        '''
+        The same amounts along path_meta, the same edges as built at block_number,
+        for a path whose pools did not change since
+        '''
+        return self.__class__(
+            path = Path([
+                Hop(
+                    exchange_edge = edge,
+                    amount_in = hop.amount_in,
+                    amount_out = hop.amount_out,
+                    block_number = block_number
+                )
+                for edge, hop in zip(path_meta, self.path)
+            ]),
+            block_number = block_number,
+            expected_gas = self.expected_gas
+        )
     
     def __hash__(self) -> int:
         return (
@@ -110,4 +131,8 @@ class Arbitrage():
         )
 
     def asdict(self) -> Dict[str, Any]:
-        return asdict(self)
\ No newline at end of file
+        return asdict(self)
+
+
+# Edge ids and amount in a cycle was last evaluated at, with its arbitrage if profitable
+CycleEvaluation = Tuple[Tuple[ExchangeEdgeId, ...], int, Optional[Arbitrage]]
@@ -0,0 +1,106 @@
+from eth_typing.evm import BlockNumber
+
+import numpy
+
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from typing_extensions import Self
+import os
+
+
+class BaseFeeHistory():
+    '''
+    Base fee per block number in fixed-size pages of a uint64 array, so that long
+    block ranges stay compact and far apart ranges do not allocate the gap between
+    them. Persisted to path (in the .npz format) on save().
+    '''
+    PAGE_SIZE: int = 4096
+    MISSING: int = numpy.iinfo(numpy.uint64).max
+    MAX_FEE_HISTORY_BLOCKS: int = 1024
+
+    def __init__(self: Self, path: Optional[str] = None) -> None:
+        self.path: Optional[str] = path
+        self.pages: Dict[int, numpy.ndarray] = dict()
+        self.lock: Lock = Lock()
+        self.dirty: bool = False
+
+        if path is not None and os.path.exists(path):
+            with numpy.load(path) as data:
+                for page_index, page in zip(data["page_indices"], data["pages"]):
+                    self.pages[int(page_index)] = page.copy()
+
+
+    def get(self: Self, block_number: BlockNumber) -> Optional[int]:
+        with self.lock:
+            page: Optional[numpy.ndarray] = self.pages.get(block_number // BaseFeeHistory.PAGE_SIZE)
+            if page is None:
+                return None
+            base_fee: int = int(page[block_number % BaseFeeHistory.PAGE_SIZE])
+        return None if base_fee == BaseFeeHistory.MISSING else base_fee
+
+
+    def __contains__(self: Self, block_number: BlockNumber) -> bool:
+        return self.get(block_number) is not None
+
+
+    def put_range(self: Self, oldest_block: BlockNumber, base_fees: List[int]) -> None:
+        '''
+        Store base fees of consecutive blocks starting at oldest_block
+        '''
+        base_fee_array: numpy.ndarray = numpy.asarray(base_fees, dtype = numpy.uint64)
+        with self.lock:
+            block_number: int = oldest_block
+            offset: int = 0
+            while offset < len(base_fee_array):
+                page_index, page_offset = divmod(block_number, BaseFeeHistory.PAGE_SIZE)
+                if page_index not in self.pages:
+                    self.pages[page_index] = numpy.full(
+                        BaseFeeHistory.PAGE_SIZE, BaseFeeHistory.MISSING, dtype = numpy.uint64
+                    )
+                length: int = min(BaseFeeHistory.PAGE_SIZE - page_offset, len(base_fee_array) - offset)
+                self.pages[page_index][page_offset: page_offset + length] = base_fee_array[offset: offset + length]
+                block_number += length
+                offset += length
+            self.dirty = True
+
+
+    def missing(self: Self, block_numbers: Iterable[BlockNumber]) -> List[BlockNumber]:
+        return sorted(set(
+            block_number for block_number in block_numbers
+            if block_number not in self
+        ))
+
+
+    @staticmethod
+    def plan_windows(block_numbers: List[BlockNumber], max_window: int = MAX_FEE_HISTORY_BLOCKS) -> List[Tuple[BlockNumber, int]]:
+        '''
+        Cover the sorted block numbers with as few (newest_block, block_count)
+        fee_history windows of at most max_window blocks as possible
+        '''
+        windows: List[Tuple[BlockNumber, int]] = []
+        i: int = 0
+        while i < len(block_numbers):
+            oldest_block: BlockNumber = block_numbers[i]
+            j: int = i
+            while j + 1 < len(block_numbers) and block_numbers[j + 1] < oldest_block + max_window:
+                j += 1
+            windows.append((block_numbers[j], block_numbers[j] - oldest_block + 1))
+            i = j + 1
+        return windows
+
+
+    def save(self: Self) -> None:
+        if self.path is None or not self.dirty:
+            return None
+
+        with self.lock:
+            page_indices: List[int] = sorted(self.pages)
+            with open(f"{self.path}.tmp", "wb") as f:
+                numpy.savez_compressed(
+                    f,
+                    page_indices = numpy.asarray(page_indices, dtype = numpy.int64),
+                    pages = numpy.stack([self.pages[page_index] for page_index in page_indices])
+                        if page_indices else numpy.empty((0, BaseFeeHistory.PAGE_SIZE), dtype = numpy.uint64)
+                )
+            os.replace(f"{self.path}.tmp", self.path)
+            self.dirty = False
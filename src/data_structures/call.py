@@ -10,6 +10,8 @@ class Call:
     args: List[Any]
     output_types: List[str]
     contract_abi: Optional[Any] = None
+    allow_failure: Optional[bool] = None # Defaults to not require_success of the multicall
+    value: int = 0
 
 
 @dataclass
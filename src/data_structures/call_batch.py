@@ -0,0 +1,61 @@
+from .call import Call, CallReturn
+from ..services.contract_service import ContractService
+
+from eth_typing.evm import BlockIdentifier
+
+from typing import Any, Callable, Dict, List, Optional, Union
+from typing_extensions import Self
+
+
+class CallBatch():
+    '''
+    Calls planned by several services to go into one multicall at block_identifier.
+    add() returns a function giving the results of the added calls (through their
+    callbacks) once the batch is executed. A call that may fail must set its
+    allow_failure, as the batch is multicalled with require_success.
+    '''
+    def __init__(self: Self, block_identifier: BlockIdentifier = "latest") -> None:
+        self.block_identifier: BlockIdentifier = block_identifier
+        self.calls: List[Union[Call, Dict[str, Any]]] = []
+        self.callbacks: List[Callable[[CallReturn], Any]] = []
+        self.results: Optional[List[Any]] = None
+
+
+    def add(
+        self: Self, calls: List[Union[Call, Dict[str, Any]]],
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None
+    ) -> Callable[[], List[Any]]:
+        assert self.results is None, "Cannot add calls to an executed batch."
+        if callbacks is not None:
+            assert len(calls) == len(callbacks), (
+                f"Length mismatch between calls ({len(calls)}) and callbacks ({len(callbacks)})."
+            )
+
+        begin: int = len(self.calls)
+        self.calls.extend(calls)
+        self.callbacks.extend(callbacks if callbacks is not None else [lambda result: result] * len(calls))
+        end: int = len(self.calls)
+
+        def get_results() -> List[Any]:
+            assert self.results is not None, "The batch has not been executed yet."
+            return self.results[begin: end]
+        return get_results
+
+
+    def execute(self: Self, contract_service: ContractService, hedge: bool = False) -> None:
+        '''
+        Multicall every added call through contract_service, skipping the RPC if
+        there are none
+        '''
+        assert self.results is None, "The batch has already been executed."
+        self.results = contract_service.multicall(
+            calls = self.calls,
+            require_success = True,
+            block_identifier = self.block_identifier,
+            callbacks = self.callbacks,
+            hedge = hedge
+        ) if self.calls else []
+
+
+    def __len__(self: Self) -> int:
+        return len(self.calls)
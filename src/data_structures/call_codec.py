@@ -0,0 +1,95 @@
+from .call import Call
+
+from web3.contract import Contract
+from web3._utils.abi import get_abi_input_types
+from web3._utils.contracts import function_abi_to_4byte_selector
+from eth_abi.abi import default_codec
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_abi.encoding import AddressEncoder, TupleEncoder
+from eth_abi.exceptions import EncodingError
+from eth_abi.registry import ABIRegistry, BaseEquals
+from eth_typing.evm import ChecksumAddress
+from eth_utils.address import is_address, to_canonical_address
+from hexbytes import HexBytes
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+from typing_extensions import Self
+
+
+class CachedAddressEncoder(AddressEncoder):
+    # Checksum validation hashes the address every time and dominates encoding time
+    encode_fn = staticmethod(lru_cache(maxsize = 65536)(to_canonical_address))
+
+    @classmethod
+    def validate_value(cls, value: Any) -> None:
+        if not CachedAddressEncoder.is_address(value):
+            cls.invalidate_value(value)
+
+    @staticmethod
+    @lru_cache(maxsize = 65536)
+    def is_address(value: Any) -> bool:
+        return is_address(value)
+
+
+CODEC_REGISTRY: ABIRegistry = default_codec._registry.copy()
+CODEC_REGISTRY.unregister_encoder("address")
+CODEC_REGISTRY.register_encoder(BaseEquals("address"), CachedAddressEncoder, label = "address")
+
+
+@dataclass(frozen = True)
+class CallCodec():
+    selector: bytes
+    encoder: TupleEncoder
+
+    def encode(self: Self, args: Iterable[Any]) -> bytes:
+        return self.selector + self.encoder(args)
+
+
+class CallCodecCache():
+    '''
+    Prebuilt selectors, argument encoders and output decoders so that encoding and
+    decoding a call skips the ABI lookup and type string parsing of web3/eth_abi.
+    '''
+    def __init__(self: Self) -> None:
+        self.codecs: Dict[Tuple[ChecksumAddress, str], CallCodec] = dict()
+        self.decoders: Dict[Tuple[str, ...], TupleDecoder] = dict()
+
+
+    def get_codec(self: Self, contract: Contract, function_name: str) -> CallCodec:
+        key: Tuple[ChecksumAddress, str] = (contract.address, function_name)
+        if key not in self.codecs:
+            function_abi: Dict[str, Any] = contract.get_function_by_name(function_name).abi
+            self.codecs[key] = CallCodec(
+                selector = function_abi_to_4byte_selector(function_abi),
+                encoder = TupleEncoder(encoders = [
+                    CODEC_REGISTRY.get_encoder(input_type)
+                    for input_type in get_abi_input_types(function_abi)
+                ])
+            )
+        return self.codecs[key]
+
+
+    def encode(self: Self, contract: Contract, call: Call) -> bytes:
+        try:
+            return self.get_codec(
+                contract = contract,
+                function_name = call.function_name
+            ).encode(call.args)
+        except EncodingError:
+            # Arguments that need web3's normalization (ENS names, hex strings for bytes, ...)
+            return HexBytes(contract.encodeABI(
+                fn_name = call.function_name,
+                args = call.args
+            ))
+
+
+    def decode(self: Self, output_types: List[str], data: bytes) -> Tuple[Any, ...]:
+        key: Tuple[str, ...] = tuple(output_types)
+        if key not in self.decoders:
+            self.decoders[key] = TupleDecoder(decoders = [
+                CODEC_REGISTRY.get_decoder(output_type)
+                for output_type in output_types
+            ])
+        return self.decoders[key](ContextFramesBytesIO(data))
@@ -0,0 +1,129 @@
+from eth_typing.evm import ChecksumAddress, BlockNumber
+
+import sqlite3
+from collections import OrderedDict
+from threading import Lock, local
+from typing import Dict, Iterable, List, Optional, Tuple
+from typing_extensions import Self
+
+
+CallResultKey = Tuple[BlockNumber, ChecksumAddress, bytes]
+CallResult = Tuple[bool, bytes]
+
+
+class CallResultCache():
+    '''
+    Results of eth_call at a fixed block never change. Keeps them in a bounded
+    in-memory LRU keyed by (block_number, to, calldata), optionally backed by
+    a sqlite file so reruns and parameter sweeps over the same blocks are served
+    without RPCs.
+    '''
+    # 3 variables per key, under sqlite's historical limit of 999 per statement
+    SQLITE_KEYS_PER_SELECT: int = 333
+
+    def __init__(self: Self, max_size: int = 65536, path: Optional[str] = None) -> None:
+        self.max_size: int = max_size
+        self.path: Optional[str] = path
+
+        self.results: OrderedDict[CallResultKey, CallResult] = OrderedDict()
+        self.lock: Lock = Lock()
+
+        # Writes go through one connection under the lock, reads through one
+        # connection per thread so that disk lookups neither hold the lock nor
+        # wait on each other
+        self.connection: Optional[sqlite3.Connection] = None
+        self.read_connections: local = local()
+        if path is not None:
+            self.connection = sqlite3.connect(path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS call_results (
+                    block_number INTEGER NOT NULL,
+                    address TEXT NOT NULL,
+                    calldata BLOB NOT NULL,
+                    success INTEGER NOT NULL,
+                    return_data BLOB NOT NULL,
+                    PRIMARY KEY (block_number, address, calldata)
+                ) WITHOUT ROWID
+                '''
+            )
+            self.connection.commit()
+
+
+    def get_many(self: Self, keys: Iterable[CallResultKey]) -> Dict[CallResultKey, CallResult]:
+        found: Dict[CallResultKey, CallResult] = dict()
+        missing: List[CallResultKey] = []
+        with self.lock:
+            for key in keys:
+                if key in self.results:
+                    self.results.move_to_end(key)
+                    found[key] = self.results[key]
+                else:
+                    missing.append(key)
+
+        if self.connection is not None and missing:
+            stored: Dict[CallResultKey, CallResult] = self.__get_stored(keys = missing)
+            with self.lock:
+                for key, result in stored.items():
+                    self.__put_memory(key, result)
+            found.update(stored)
+        return found
+
+
+    def put_many(self: Self, items: Dict[CallResultKey, CallResult]) -> None:
+        if not items:
+            return None
+
+        with self.lock:
+            for key, result in items.items():
+                self.__put_memory(key, result)
+
+            if self.connection is not None:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO call_results VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (*key, int(success), bytes(return_data))
+                        for key, (success, return_data) in items.items()
+                    )
+                )
+                self.connection.commit()
+
+
+    def clear(self: Self) -> None:
+        with self.lock:
+            self.results.clear()
+
+
+    def __len__(self: Self) -> int:
+        return len(self.results)
+
+
+    def __get_stored(self: Self, keys: List[CallResultKey]) -> Dict[CallResultKey, CallResult]:
+        '''
+        Looks keys up on disk with one SELECT per SQLITE_KEYS_PER_SELECT keys,
+        joining them against the primary key
+        '''
+        connection: Optional[sqlite3.Connection] = getattr(self.read_connections, "connection", None)
+        if connection is None:
+            connection = self.read_connections.connection = sqlite3.connect(self.path)
+
+        stored: Dict[CallResultKey, CallResult] = dict()
+        for i in range(0, len(keys), self.SQLITE_KEYS_PER_SELECT):
+            key_chunk: List[CallResultKey] = keys[i:i + self.SQLITE_KEYS_PER_SELECT]
+            rows: List[Tuple[int, str, bytes, int, bytes]] = connection.execute(
+                f"WITH keys (block_number, address, calldata) AS (VALUES {', '.join(['(?, ?, ?)'] * len(key_chunk))}) "
+                "SELECT block_number, address, calldata, success, return_data "
+                "FROM keys CROSS JOIN call_results USING (block_number, address, calldata)",
+                [value for key in key_chunk for value in key]
+            ).fetchall()
+            for block_number, address, calldata, success, return_data in rows:
+                stored[(block_number, address, bytes(calldata))] = (bool(success), bytes(return_data))
+        return stored
+
+
+    def __put_memory(self: Self, key: CallResultKey, result: CallResult) -> None:
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last = False)
@@ -0,0 +1,153 @@
+from .adaptive_chunk_sizer import AdaptiveChunkSizer, CallType
+from .multicall_backend import EncodedCall
+from .rate_limiter import RetriableError
+
+from typing import Dict, List, Optional, Set, Tuple, Union
+from typing_extensions import Self
+
+
+ChunkResult = Tuple[Union[List[Tuple[bool, bytes]], Exception], float]
+
+
+class ChunkBisector():
+    '''
+    Sans-IO plan of the multicall chunks of the calls at indices, shared by
+    ContractService and AsyncContractService. Calls are grouped by call type into
+    chunks of the fixed chunk_size, or of the size chunk_sizer learned for the call
+    type. The caller sends index_chunks and passes, per chunk, either the encoded
+    results or the exception that failed the whole chunk, with its latency, to
+    record. Chunks failed by their own content (out of gas, response too large,
+    reverted) are bisected into the next index_chunks until only the failing calls
+    are left, so send until index_chunks is empty. Any other failure, such as a
+    timeout or a RetriableError the transport gave up on, is raised as is.
+    '''
+    # Lowercase fragments of the errors a smaller chunk can get rid of
+    CHUNK_ERROR_MARKERS: Tuple[str, ...] = (
+        "out of gas",
+        "gas required exceeds",
+        "gas limit",
+        "execution reverted",
+        "response size",
+        "response too large",
+        "too large",
+        "size exceeded"
+    )
+
+    def __init__(
+        self: Self, encoded_calls: List[EncodedCall], call_types: List[CallType],
+        indices: List[int], chunk_sizer: AdaptiveChunkSizer,
+        chunk_size: Optional[int] = None
+    ) -> None:
+        self.encoded_calls: List[EncodedCall] = encoded_calls
+        self.call_types: List[CallType] = call_types
+        self.chunk_sizer: AdaptiveChunkSizer = chunk_sizer
+        self.chunk_size: Optional[int] = chunk_size
+
+        # Indices of calls that failed a chunk on their own, so have no result of
+        # their own to cache
+        self.unanswered_indices: Set[int] = set()
+        # Chunks sent and how many of them were retries of bisected chunks
+        self.chunks: int = 0
+        self.retries: int = 0
+
+        # Chunks hold indices into calls
+        self.index_chunks: List[List[int]] = self.__plan_chunks(indices = indices)
+        self.parent_chunk_ids: List[Optional[int]] = [None] * len(self.index_chunks)
+        self.parent_chunks: List[List[int]] = []
+
+
+    def record(
+        self: Self, chunk_results: List[ChunkResult],
+        encoded_results: List[Optional[Tuple[bool, bytes]]]
+    ) -> None:
+        '''
+        Write the results of index_chunks into encoded_results and plan the next
+        round. Raises the chunk's exception if it is not a chunk error, or if a
+        single required call fails.
+        '''
+        self.chunks += len(self.index_chunks)
+        self.retries += sum(parent_chunk_id is not None for parent_chunk_id in self.parent_chunk_ids)
+
+        failed_index_chunks: List[List[int]] = []
+        failed_parent_chunk_ids: List[int] = []
+        child_outcomes: Dict[int, List[bool]] = dict()
+        for index_chunk, parent_chunk_id, (chunk_result, latency) in zip(
+            self.index_chunks, self.parent_chunk_ids, chunk_results
+        ):
+            failed: bool = isinstance(chunk_result, Exception)
+            if parent_chunk_id is not None:
+                child_outcomes.setdefault(parent_chunk_id, []).append(failed)
+
+            if failed:
+                if not ChunkBisector.is_chunk_error(chunk_result):
+                    raise chunk_result
+                if len(index_chunk) == 1:
+                    if not self.encoded_calls[index_chunk[0]][2]:
+                        raise chunk_result
+                    encoded_results[index_chunk[0]] = (False, b"")
+                    self.unanswered_indices.add(index_chunk[0])
+                else:
+                    middle: int = len(index_chunk) // 2
+                    failed_index_chunks.append(index_chunk[:middle])
+                    failed_index_chunks.append(index_chunk[middle:])
+                    failed_parent_chunk_ids.extend([len(self.parent_chunks)] * 2)
+                    self.parent_chunks.append(index_chunk)
+                continue
+
+            if self.chunk_size is None:
+                self.chunk_sizer.record_success(
+                    call_type = self.call_types[index_chunk[0]],
+                    chunk_size = len(index_chunk),
+                    latency = latency
+                )
+
+            for i, encoded_result in zip(index_chunk, chunk_result):
+                encoded_results[i] = encoded_result
+
+        if self.chunk_size is None:
+            # A parent whose halves both failed or both succeeded was too large.
+            # If only one half failed, a single bad call is to blame instead.
+            for parent_chunk_id, outcomes in child_outcomes.items():
+                if len(set(outcomes)) == 1:
+                    self.chunk_sizer.record_failure(
+                        call_type = self.call_types[self.parent_chunks[parent_chunk_id][0]],
+                        chunk_size = len(self.parent_chunks[parent_chunk_id])
+                    )
+
+        self.index_chunks = failed_index_chunks
+        self.parent_chunk_ids = failed_parent_chunk_ids
+
+
+    @staticmethod
+    def is_chunk_error(error: Exception) -> bool:
+        '''
+        Whether the chunk itself failed the call, rather than the transport
+        '''
+        if isinstance(error, RetriableError):
+            return False
+        return any(marker in str(error).lower() for marker in ChunkBisector.CHUNK_ERROR_MARKERS)
+
+
+    def get_encoded_call_chunks(self: Self) -> List[List[EncodedCall]]:
+        return [
+            [self.encoded_calls[i] for i in index_chunk]
+            for index_chunk in self.index_chunks
+        ]
+
+
+    def __plan_chunks(self: Self, indices: List[int]) -> List[List[int]]:
+        indices_by_call_type: Dict[CallType, List[int]] = dict()
+        for i in indices:
+            indices_by_call_type.setdefault(self.call_types[i], []).append(i)
+
+        index_chunks: List[List[int]] = []
+        for call_type, call_type_indices in indices_by_call_type.items():
+            call_type_chunk_size: int = (
+                self.chunk_size if self.chunk_size is not None
+                else self.chunk_sizer.get_chunk_size(call_type = call_type)
+            )
+            index_chunks.extend(
+                call_type_indices[i: i + call_type_chunk_size]
+                for i in range(0, len(call_type_indices), call_type_chunk_size)
+            )
+        return index_chunks
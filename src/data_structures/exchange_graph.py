@@ -9,15 +9,18 @@ from typing import (
     Dict,
     List,
     Callable,
+    Optional,
     Protocol,
-    NewType
+    NewType,
+    Tuple,
+    Union
 )
 
 
 @dataclass(frozen = True)
 class QuoteFunctionMeta():
-    call: Call
-    callback: Callable[[CallReturn], int]
+    call: Optional[Call] # None for quotes computed locally, callback is then called with None
+    callback: Callable[[Optional[CallReturn]], int]
 
 
 class QuoteFunctionType(Protocol):
@@ -28,6 +31,14 @@ class QuoteFunctionType(Protocol):
         ...
 
 
+class QuoteBatchFunctionType(Protocol):
+    def __call__(
+        self: Self, tokens_in: List[ChecksumAddress], tokens_out: List[ChecksumAddress],
+        amounts_in: List[int], block_identifier: BlockIdentifier = "latest"
+    ) -> List[QuoteFunctionMeta]:
+        ...
+
+
 class SwapFuncionType(Protocol):
     def __call__(
         self: Self, token_in: ChecksumAddress, token_out, ChecksumAddress,
@@ -41,15 +52,44 @@ class SwapFuncionType(Protocol):
 class ExchangeFunction():
     quote_function: QuoteFunctionType
     swap_function: SwapFuncionType
+    # False for token pairs known to have no pool, edges are then left out of the graph
+    pool_exists_function: Optional[Callable[[ChecksumAddress, ChecksumAddress], bool]] = None
+    # Exchange (and fee tier) of the functions, the same for the functions built at every block
+    exchange_id: Optional[str] = None
+    # Address of the pool swapped through between two tokens
+    pool_address_function: Optional[Callable[[ChecksumAddress, ChecksumAddress], ChecksumAddress]] = None
+    # Quotes many edges of the exchange at once, e.g. from state loaded for all of them in one go
+    quote_batch_function: Optional[QuoteBatchFunctionType] = None
+
+
+ExchangeEdgeId = Tuple[ChecksumAddress, ChecksumAddress, Union[str, ExchangeFunction]]
 
 
 @dataclass(frozen = True)
 class ExchangeEdge():
-    # TODO add an id attribute
     token_in: ChecksumAddress
     token_out: ChecksumAddress
     exchange_function: ExchangeFunction
 
+    @property
+    def id(self: Self) -> ExchangeEdgeId:
+        '''
+        Same for the edges of a pool in the graphs of different blocks, whose
+        exchange functions are new objects, given their exchange_id
+        '''
+        return (
+            self.token_in,
+            self.token_out,
+            self.exchange_function.exchange_id if self.exchange_function.exchange_id is not None
+            else self.exchange_function
+        )
+
+    @property
+    def pool_address(self: Self) -> Optional[ChecksumAddress]:
+        if self.exchange_function.pool_address_function is None:
+            return None
+        return self.exchange_function.pool_address_function(self.token_in, self.token_out)
+
     def get_quote_function_meta(
         self: Self, amount_in: int, block_identifier: BlockIdentifier = "latest"
     ) -> QuoteFunctionMeta:
@@ -60,6 +100,36 @@ class ExchangeEdge():
             block_identifier = block_identifier
         )
     
+    @staticmethod
+    def get_quote_function_meta_list(
+        edge_amounts: List[Tuple["ExchangeEdge", int]], block_identifier: BlockIdentifier = "latest"
+    ) -> List[QuoteFunctionMeta]:
+        '''
+        Quote function metas of (edge, amount in) pairs, calling the quote batch
+        function of each exchange function that has one once for all its edges
+        '''
+        quote_function_meta_list: List[Optional[QuoteFunctionMeta]] = [None] * len(edge_amounts)
+        batch_indices: Dict[ExchangeFunction, List[int]] = dict()
+        for i, (edge, amount_in) in enumerate(edge_amounts):
+            if edge.exchange_function.quote_batch_function is None:
+                quote_function_meta_list[i] = edge.get_quote_function_meta(
+                    amount_in = amount_in,
+                    block_identifier = block_identifier
+                )
+            else:
+                batch_indices.setdefault(edge.exchange_function, []).append(i)
+
+        for exchange_function, indices in batch_indices.items():
+            for i, quote_function_meta in zip(indices, exchange_function.quote_batch_function(
+                tokens_in = [edge_amounts[i][0].token_in for i in indices],
+                tokens_out = [edge_amounts[i][0].token_out for i in indices],
+                amounts_in = [edge_amounts[i][1] for i in indices],
+                block_identifier = block_identifier
+            )):
+                quote_function_meta_list[i] = quote_function_meta
+
+        return quote_function_meta_list
+
     def create_transaction(
         self: Self, amount_in: int, wallet_address: ChecksumAddress,
         block_identifier: BlockIdentifier = "latest"
@@ -101,6 +171,8 @@ class ExchangeGraph():
                         exchange_function = exchange_function
                     )
                     for exchange_function in self.exchange_functions
+                    if exchange_function.pool_exists_function is None
+                    or exchange_function.pool_exists_function(token_in, token_out)
                 ]
                 for token_out in self.tokens
                 if token_in != token_out
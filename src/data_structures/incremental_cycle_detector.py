@@ -0,0 +1,223 @@
+from .exchange_graph import ExchangeEdge, ExchangeEdgeId
+from .quote_graph import Quote
+from .rate_matrix import RateMatrix
+
+from eth_typing.evm import ChecksumAddress
+import numpy
+
+from typing import Dict, Iterable, List, Set, Tuple
+from typing_extensions import Self
+from itertools import chain
+
+
+class IncrementalCycleDetector():
+    '''
+    Negative cycles of a RateMatrix kept current across blocks. Like those of
+    RateMatrix.find_negative_cycles, the cycles are disjoint and every negative
+    cycle shares a token with one of them. While there is no negative cycle,
+    the distances of the last pass (from a virtual source linked to all tokens)
+    are valid and update() only relaxes what the changed quotes affect:
+    - a worse edge that a token's best path used resets the token and every
+      token whose best path goes through it
+    - a better edge makes its token in a source of relaxation
+    so a block without arbitrage costs its changed edges rather than the graph.
+    Once there are negative cycles, those still negative are kept and only the
+    tokens on a cycle through a changed cell or a token of a vanished cycle are
+    searched again, leaving out the kept cycles' tokens. Once none is left, the
+    whole matrix is relaxed again to make the distances valid.
+
+    Edges are matched by id, so update() takes the quotes of the same edges
+    built at any later block, and only needs those whose pools changed.
+    Weight changes of at most tolerance are ignored, e.g. those from amounts in
+    moving slightly with u_eth between blocks.
+    '''
+    def __init__(self: Self, rate_matrix: RateMatrix, tolerance: float = 1e-6) -> None:
+        self.rate_matrix: RateMatrix = rate_matrix
+        self.rate_matrix.index_edges()
+        self.tolerance: float = tolerance
+
+        n: int = len(rate_matrix.tokens)
+        self.distances: numpy.ndarray = numpy.zeros(n)
+        self.predecessors: numpy.ndarray = numpy.full(n, -1, dtype = numpy.int64)
+        # Whether the distances are shortest paths, i.e. there is no negative cycle
+        self.converged: bool = False
+        self.cycles: Set[Tuple[int, ...]] = set()
+        # Cells whose weight the last update() changed
+        self.changed_cells: Set[Tuple[int, int]] = set()
+
+        self.__search()
+
+
+    def update(self: Self, quotes: Dict[ExchangeEdge, Quote]) -> Tuple[List[List[int]], List[List[int]]]:
+        '''
+        Take the new quotes of (some) edges. Returns the cycles that appeared
+        and those that vanished, as token indices.
+        '''
+        rows, columns, previous_weights = self.rate_matrix.update_quotes(
+            quotes = quotes,
+            tolerance = self.tolerance
+        )
+        self.changed_cells = set(zip(rows.tolist(), columns.tolist()))
+        if len(rows) == 0:
+            return [], []
+
+        previous_cycles: Set[Tuple[int, ...]] = self.cycles
+        if self.converged:
+            if self.__relax(rows = rows, columns = columns, previous_weights = previous_weights):
+                return [], []
+            self.converged = False
+            self.__search_region(seed_tokens = numpy.concatenate((rows, columns)), kept_cycles = set())
+        else:
+            # Only cycles through a changed cell can have become non-negative
+            kept_cycles: Set[Tuple[int, ...]] = {
+                cycle for cycle in previous_cycles
+                if self.rate_matrix.get_cycle_weight(cycle = list(cycle)) < 0
+            }
+            self.__search_region(
+                seed_tokens = numpy.array(
+                    rows.tolist() + columns.tolist() + list(chain.from_iterable(previous_cycles - kept_cycles)),
+                    dtype = numpy.int64
+                ),
+                kept_cycles = kept_cycles
+            )
+        if not self.cycles:
+            self.__search()
+
+        return (
+            [list(cycle) for cycle in self.cycles - previous_cycles],
+            [list(cycle) for cycle in previous_cycles - self.cycles]
+        )
+
+
+    def covers(self: Self, tokens: List[ChecksumAddress], edge_ids: Iterable[ExchangeEdgeId]) -> bool:
+        '''
+        Whether the matrix has these tokens and edges, so the quotes of the edges
+        can be passed to update()
+        '''
+        return self.rate_matrix.tokens == tokens and self.rate_matrix.edge_ids.keys() == set(edge_ids)
+
+
+    def get_cycles(self: Self) -> List[List[int]]:
+        return [list(cycle) for cycle in self.cycles]
+
+
+    def is_changed(self: Self, cycle: List[int]) -> bool:
+        '''
+        Whether the last update() changed the weight of a cell along the cycle
+        '''
+        return any(cell in self.changed_cells for cell in zip(cycle, cycle[1:] + cycle[:1]))
+
+
+    def __search(self: Self) -> None:
+        '''
+        Relax the whole matrix from the virtual source, then search the cycles
+        if it does not converge
+        '''
+        n: int = len(self.rate_matrix.tokens)
+        self.distances, self.predecessors, improved = self.rate_matrix.relax(
+            distances = numpy.zeros(n),
+            predecessors = numpy.full(n, -1, dtype = numpy.int64),
+            max_iterations = n + 1
+        )
+        self.converged = not improved.any()
+        self.cycles = set() if self.converged else set(map(tuple, self.rate_matrix.find_negative_cycles()))
+
+
+    def __search_region(self: Self, seed_tokens: numpy.ndarray, kept_cycles: Set[Tuple[int, ...]]) -> None:
+        '''
+        Keep kept_cycles and search the cycles among the tokens that both reach
+        and are reached from the seed tokens, which hold every cycle through
+        them, leaving out the tokens of kept_cycles
+        '''
+        weights: numpy.ndarray = self.rate_matrix.weights
+        edges: numpy.ndarray = numpy.isfinite(weights)
+        seeds: numpy.ndarray = numpy.zeros(len(weights), dtype = bool)
+        seeds[seed_tokens] = True
+
+        region: numpy.ndarray = self.__reach(edges = edges, seeds = seeds) & self.__reach(edges = edges.T, seeds = seeds)
+        region[list(chain.from_iterable(kept_cycles))] = False
+        region_tokens: numpy.ndarray = numpy.flatnonzero(region)
+        if len(region_tokens) == 0:
+            self.cycles = kept_cycles
+            return
+
+        # Region tokens are sorted, so cycles keep starting at their smallest token
+        self.cycles = kept_cycles | {
+            tuple(region_tokens[cycle].tolist())
+            for cycle in self.rate_matrix.find_negative_cycles(
+                weights = weights[numpy.ix_(region_tokens, region_tokens)]
+            )
+        }
+
+
+    @staticmethod
+    def __reach(edges: numpy.ndarray, seeds: numpy.ndarray) -> numpy.ndarray:
+        '''
+        Tokens reached from the seeds along the edges, seeds included
+        '''
+        reached: numpy.ndarray = seeds.copy()
+        frontier: numpy.ndarray = seeds
+        while frontier.any():
+            frontier = edges[frontier].any(axis = 0) & ~reached
+            reached |= frontier
+        return reached
+
+
+    def __relax(self: Self, rows: numpy.ndarray, columns: numpy.ndarray, previous_weights: numpy.ndarray) -> bool:
+        '''
+        Bring the distances up to date with the changed cells, resetting the
+        tokens whose best path used a worse one, then relaxing from the active
+        tokens only. Returns whether it converged, False if the changes made a
+        negative cycle.
+        '''
+        weights: numpy.ndarray = self.rate_matrix.weights
+        n: int = len(self.rate_matrix.tokens)
+
+        worse: numpy.ndarray = weights[rows, columns] > previous_weights
+        reset_tokens: numpy.ndarray = numpy.zeros(n, dtype = bool)
+        reset_tokens[columns[worse & (self.predecessors[columns] == rows)]] = True
+        active_tokens: numpy.ndarray = numpy.zeros(n, dtype = bool)
+        active_tokens[rows[~worse]] = True
+
+        # Descendants of the reset tokens in the predecessor forest
+        while True:
+            descendants: numpy.ndarray = reset_tokens | (
+                (self.predecessors >= 0) & reset_tokens[numpy.maximum(self.predecessors, 0)]
+            )
+            if (descendants == reset_tokens).all():
+                break
+            reset_tokens = descendants
+
+        reset_columns: numpy.ndarray = numpy.flatnonzero(reset_tokens)
+        if len(reset_columns) > 0:
+            self.distances[reset_columns] = 0.0
+            self.predecessors[reset_columns] = -1
+
+            # Reset tokens take their best edge in from the tokens left intact
+            candidates: numpy.ndarray = self.distances[:, None] + weights[:, reset_columns]
+            best_predecessors: numpy.ndarray = numpy.argmin(candidates, axis = 0)
+            best_distances: numpy.ndarray = candidates[best_predecessors, numpy.arange(len(reset_columns))]
+            improved: numpy.ndarray = best_distances < -RateMatrix.EPSILON
+            self.distances[reset_columns[improved]] = best_distances[improved]
+            self.predecessors[reset_columns[improved]] = best_predecessors[improved]
+            active_tokens[reset_columns] = True
+
+        # Without a negative cycle, this converges within n + 1 iterations
+        columns = numpy.arange(n)
+        for _ in range(n + 1):
+            active_rows: numpy.ndarray = numpy.flatnonzero(active_tokens)
+            if len(active_rows) == 0:
+                return True
+
+            candidates: numpy.ndarray = self.distances[active_rows, None] + weights[active_rows]
+            best_rows: numpy.ndarray = numpy.argmin(candidates, axis = 0)
+            best_distances: numpy.ndarray = candidates[best_rows, columns]
+
+            active_tokens = best_distances < self.distances - RateMatrix.EPSILON
+            self.distances = numpy.where(active_tokens, best_distances, self.distances)
+            self.predecessors = numpy.where(active_tokens, active_rows[best_rows], self.predecessors)
+
+            if (self.rate_matrix.walk_back(predecessors = self.predecessors) >= 0).any():
+                return False
+
+        return not active_tokens.any()
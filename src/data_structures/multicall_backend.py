@@ -0,0 +1,89 @@
+from .call import Call
+
+from eth_typing.evm import ChecksumAddress
+
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+from typing_extensions import Self
+
+
+# (target, call data, allow failure, value)
+EncodedCall = Tuple[ChecksumAddress, bytes, bool, int]
+
+
+class MulticallBackend(ABC):
+    '''
+    Packs a chunk of encoded calls into one call to a multicall contract. Every
+    backend's function returns one (success, return data) pair per call.
+    '''
+    ADDRESS: ChecksumAddress
+    ABI_NAME: str
+    OUTPUT_TYPES: List[str] = ["(bool,bytes)[]"]
+
+    def __init__(self: Self, address: ChecksumAddress = None) -> None:
+        self.address: ChecksumAddress = address if address is not None else self.ADDRESS
+
+
+    @abstractmethod
+    def build_call(self: Self, encoded_call_chunk: List[EncodedCall]) -> Tuple[Call, int]:
+        '''
+        Returns the multicall contract call and the value to send with it
+        '''
+        pass
+
+
+class Multicall2Backend(MulticallBackend):
+    '''
+    Multicall2 tryAggregate. Its single requireSuccess flag is only set when no call
+    in the chunk may fail, so required calls in a mixed chunk must be checked by the
+    caller. Calls cannot carry value.
+    '''
+    ADDRESS: ChecksumAddress = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+    ABI_NAME: str = "multicall2"
+
+    def build_call(self: Self, encoded_call_chunk: List[EncodedCall]) -> Tuple[Call, int]:
+        assert all(value == 0 for _, _, _, value in encoded_call_chunk), (
+            "Multicall2 does not support calls with value. Use Multicall3Backend."
+        )
+        return Call(
+            contract_address = self.address,
+            function_name = "tryAggregate",
+            args = [
+                not any(allow_failure for _, _, allow_failure, _ in encoded_call_chunk),
+                [(target, call_data) for target, call_data, _, _ in encoded_call_chunk]
+            ],
+            output_types = self.OUTPUT_TYPES
+        ), 0
+
+
+class Multicall3Backend(MulticallBackend):
+    '''
+    Multicall3 aggregate3 with a per-call allowFailure flag, or aggregate3Value
+    when a call in the chunk carries value.
+    '''
+    ADDRESS: ChecksumAddress = "0xcA11bde05977b3631167028862bE2a173976CA11"
+    ABI_NAME: str = "multicall3"
+
+    def build_call(self: Self, encoded_call_chunk: List[EncodedCall]) -> Tuple[Call, int]:
+        total_value: int = sum(value for _, _, _, value in encoded_call_chunk)
+
+        if total_value == 0:
+            return Call(
+                contract_address = self.address,
+                function_name = "aggregate3",
+                args = [[
+                    (target, allow_failure, call_data)
+                    for target, call_data, allow_failure, _ in encoded_call_chunk
+                ]],
+                output_types = self.OUTPUT_TYPES
+            ), 0
+
+        return Call(
+            contract_address = self.address,
+            function_name = "aggregate3Value",
+            args = [[
+                (target, allow_failure, value, call_data)
+                for target, call_data, allow_failure, value in encoded_call_chunk
+            ]],
+            output_types = self.OUTPUT_TYPES
+        ), total_value
@@ -0,0 +1,159 @@
+from .exchange_graph import ExchangeEdge, ExchangeGraph
+from .arbitrage import Hop, Path
+
+from eth_typing.evm import ChecksumAddress, BlockNumber
+import numpy
+
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+from typing_extensions import Self
+
+
+@dataclass
+class HopLevel():
+    '''
+    Hops quoted at one level of the search: hop i extends the open path
+    parents[i] of the previous level with edges[edge_indices[i]]
+    '''
+    edge_indices: numpy.ndarray
+    parents: numpy.ndarray
+    amounts_in: numpy.ndarray # object arrays, amounts exceed int64
+    amounts_out: numpy.ndarray
+    open_indices: numpy.ndarray # Hop of each path left open after the level
+
+
+class PathFrontier():
+    '''
+    Breadth first search of the cycles of 2 to max_hops hops through distinct
+    tokens, starting at every token with amounts_in. All open paths are extended
+    by one hop at a time, so every quote of a hop level can go in one batch:
+    next_hops() gives the hops to quote and advance() takes their amounts out.
+
+    Open paths are rows of token indices and link to the hop they end with, and
+    only closed profitable ones are built into Paths.
+    '''
+    def __init__(
+        self: Self, exchange_graph: ExchangeGraph, amounts_in: Dict[ChecksumAddress, int],
+        block_number: BlockNumber, max_hops: int = 3
+    ) -> None:
+        self.max_hops: int = max_hops
+        self.block_number: BlockNumber = block_number
+
+        tokens: List[ChecksumAddress] = exchange_graph.tokens
+        token_indices: Dict[ChecksumAddress, int] = {token: i for i, token in enumerate(tokens)}
+
+        # Edges grouped by token in, those of token i at edge_offsets[i]:edge_offsets[i + 1]
+        self.edges: List[ExchangeEdge] = list(
+            chain.from_iterable(
+                exchange_graph.get_edges(
+                    token_in = token_in,
+                    token_out = token_out
+                )
+                for token_in in tokens
+                for token_out in tokens
+                if token_in != token_out
+            )
+        )
+        self.edge_tokens_out: numpy.ndarray = numpy.array(
+            [token_indices[edge.token_out] for edge in self.edges], dtype = numpy.int64
+        )
+        self.edge_offsets: numpy.ndarray = numpy.searchsorted(
+            numpy.array([token_indices[edge.token_in] for edge in self.edges], dtype = numpy.int64),
+            numpy.arange(len(tokens) + 1)
+        )
+
+        start_tokens: List[int] = [
+            i for i, token in enumerate(tokens) if amounts_in.get(token) is not None and amounts_in[token] > 0
+        ]
+        self.start_amounts: numpy.ndarray = numpy.array([amounts_in.get(token) for token in tokens], dtype = object)
+
+        # Open paths: their tokens from the start token on, amount out and last hop
+        self.token_paths: numpy.ndarray = numpy.array(start_tokens, dtype = numpy.int64)[:, None]
+        self.amounts: numpy.ndarray = self.start_amounts[start_tokens]
+        self.levels: List[HopLevel] = []
+
+        # Hops handed out by next_hops(), waiting for their amounts out
+        self.candidates: Optional[Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]] = None
+
+
+    @property
+    def done(self: Self) -> bool:
+        return len(self.levels) >= self.max_hops or len(self.token_paths) == 0
+
+
+    def next_hops(self: Self) -> List[Tuple[ExchangeEdge, int]]:
+        '''
+        Edges extending the open paths by one hop, with their amounts in. Only
+        edges back to the start token are taken at the last level.
+        '''
+        level: int = len(self.levels) + 1
+        last_tokens: numpy.ndarray = self.token_paths[:, -1]
+        degrees: numpy.ndarray = self.edge_offsets[last_tokens + 1] - self.edge_offsets[last_tokens]
+
+        # One candidate per edge out of each open path's last token
+        parents: numpy.ndarray = numpy.repeat(numpy.arange(len(self.token_paths)), degrees)
+        edge_indices: numpy.ndarray = (
+            self.edge_offsets[last_tokens][parents]
+            + numpy.arange(len(parents))
+            - numpy.repeat(numpy.cumsum(degrees) - degrees, degrees)
+        )
+        next_tokens: numpy.ndarray = self.edge_tokens_out[edge_indices]
+
+        closing: numpy.ndarray = next_tokens == self.token_paths[parents, 0]
+        visited: numpy.ndarray = (self.token_paths[parents] == next_tokens[:, None]).any(axis = 1)
+        keep: numpy.ndarray = (closing & (level >= 2)) | (~visited & (level < self.max_hops))
+
+        self.candidates = (parents[keep], edge_indices[keep], closing[keep])
+        return [
+            (self.edges[edge_index], amount_in)
+            for edge_index, amount_in in zip(edge_indices[keep].tolist(), self.amounts[parents[keep]])
+        ]
+
+
+    def advance(self: Self, amounts_out: List[Optional[int]]) -> List[Path]:
+        '''
+        Take the amounts out of the hops from next_hops(). Returns the paths
+        that closed with more than they started with.
+        '''
+        assert self.candidates is not None, "next_hops() must be called before advance()."
+        parents, edge_indices, closing = self.candidates
+        self.candidates = None
+
+        amounts_out: numpy.ndarray = numpy.array(
+            [amount_out if amount_out is not None else 0 for amount_out in amounts_out], dtype = object
+        )
+        start_amounts: numpy.ndarray = self.start_amounts[self.token_paths[parents, 0]]
+        profitable: numpy.ndarray = closing & (amounts_out > start_amounts).astype(bool)
+        open_indices: numpy.ndarray = numpy.flatnonzero(~closing & (amounts_out > 0).astype(bool))
+
+        self.levels.append(HopLevel(
+            edge_indices = edge_indices,
+            parents = parents,
+            amounts_in = self.amounts[parents],
+            amounts_out = amounts_out,
+            open_indices = open_indices
+        ))
+
+        self.token_paths = numpy.hstack((
+            self.token_paths[parents[open_indices]],
+            self.edge_tokens_out[edge_indices[open_indices]][:, None]
+        ))
+        self.amounts = amounts_out[open_indices]
+
+        return [self.__get_path(hop_index = hop_index) for hop_index in numpy.flatnonzero(profitable).tolist()]
+
+
+    def __get_path(self: Self, hop_index: int) -> Path:
+        hops: List[Hop] = []
+        for depth in range(len(self.levels) - 1, -1, -1):
+            level: HopLevel = self.levels[depth]
+            hops.append(Hop(
+                exchange_edge = self.edges[level.edge_indices[hop_index]],
+                amount_in = level.amounts_in[hop_index],
+                amount_out = level.amounts_out[hop_index],
+                block_number = self.block_number
+            ))
+            if depth > 0:
+                hop_index = self.levels[depth - 1].open_indices[level.parents[hop_index]]
+        return Path(hops[::-1])
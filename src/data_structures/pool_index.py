@@ -0,0 +1,109 @@
+from ..utils.uniswapv2_math import sort_tokens
+
+from eth_typing.evm import ChecksumAddress, BlockNumber
+
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from typing_extensions import Self
+import json
+import os
+
+
+# (token0, token1, fee), fee is 0 for pools without fee tiers
+PoolKey = Tuple[ChecksumAddress, ChecksumAddress, int]
+
+
+class PoolIndex():
+    '''
+    Which pools a factory has deployed, as answered by its getPair/getPool.
+    Deployed pools never go away so they are kept for good, while pools seen
+    missing are looked up again once the answer is older than max_missing_age
+    blocks. Persisted to path (as JSON) on save().
+    '''
+    NULL_ADDRESS: ChecksumAddress = "0x0000000000000000000000000000000000000000"
+
+    def __init__(self: Self, path: Optional[str] = None, max_missing_age: int = 7200) -> None:
+        self.path: Optional[str] = path
+        self.max_missing_age: int = max_missing_age
+
+        self.pools: Dict[PoolKey, ChecksumAddress] = dict()
+        # Pool key -> block number at which the pool did not exist
+        self.missing_pools: Dict[PoolKey, BlockNumber] = dict()
+        self.lock: Lock = Lock()
+        self.dirty: bool = False
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                data: Dict[str, List[list]] = json.load(f)
+            for token0, token1, fee, pool_address in data.get("pools", []):
+                self.pools[(token0, token1, fee)] = pool_address
+            for token0, token1, fee, block_number in data.get("missing_pools", []):
+                self.missing_pools[(token0, token1, fee)] = block_number
+
+
+    @staticmethod
+    def get_key(token_a: ChecksumAddress, token_b: ChecksumAddress, fee: int = 0) -> PoolKey:
+        return (*sort_tokens(token_a, token_b), fee)
+
+
+    def get(self: Self, key: PoolKey) -> Optional[ChecksumAddress]:
+        with self.lock:
+            return self.pools.get(key)
+
+
+    def exists(self: Self, key: PoolKey, block_number: Optional[BlockNumber] = None) -> Optional[bool]:
+        '''
+        Whether the pool exists, or None if it was never looked up or (given
+        block_number) the last lookup is too old to trust a missing pool
+        '''
+        with self.lock:
+            if key in self.pools:
+                return True
+            missing_block_number: Optional[BlockNumber] = self.missing_pools.get(key)
+        if missing_block_number is None:
+            return None
+        if block_number is not None and block_number - missing_block_number > self.max_missing_age:
+            return None
+        return False
+
+
+    def unknown(self: Self, keys: Iterable[PoolKey], block_number: Optional[BlockNumber] = None) -> List[PoolKey]:
+        return list(dict.fromkeys(
+            key for key in keys
+            if self.exists(key, block_number = block_number) is None
+        ))
+
+
+    def put_many(self: Self, items: Dict[PoolKey, ChecksumAddress], block_number: BlockNumber) -> None:
+        '''
+        Store lookup results made at block_number, the null address meaning no pool
+        '''
+        with self.lock:
+            for key, pool_address in items.items():
+                if pool_address != PoolIndex.NULL_ADDRESS:
+                    self.pools[key] = pool_address
+                    self.missing_pools.pop(key, None)
+                else:
+                    self.missing_pools[key] = max(block_number, self.missing_pools.get(key, 0))
+            self.dirty = True
+
+
+    def __len__(self: Self) -> int:
+        return len(self.pools)
+
+
+    def save(self: Self) -> None:
+        if self.path is None or not self.dirty:
+            return None
+
+        with self.lock:
+            with open(f"{self.path}.tmp", "w") as f:
+                json.dump(
+                    {
+                        "pools": [[*key, pool_address] for key, pool_address in self.pools.items()],
+                        "missing_pools": [[*key, block_number] for key, block_number in self.missing_pools.items()]
+                    },
+                    f
+                )
+            os.replace(f"{self.path}.tmp", self.path)
+            self.dirty = False
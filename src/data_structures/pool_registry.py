@@ -0,0 +1,151 @@
+from ..utils.uniswapv2_math import sort_tokens
+
+from eth_typing.evm import ChecksumAddress, BlockNumber
+
+import sqlite3
+from dataclasses import dataclass
+from itertools import combinations
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from typing_extensions import Self
+
+
+@dataclass(frozen = True)
+class PoolRecord():
+    address: ChecksumAddress
+    factory_address: ChecksumAddress
+    token0: ChecksumAddress
+    token1: ChecksumAddress
+    fee: int # 0 for pools without fee tiers
+    tick_spacing: int # 0 for pools without ticks
+    block_number: BlockNumber # Deployment block
+
+
+class PoolRegistry():
+    '''
+    Every pool deployed by the registered factories, in a sqlite file (or in
+    memory without a path) indexed by token and by token pair. The last block
+    synced from each factory's creation logs is kept alongside so syncs resume
+    where they stopped.
+    '''
+    def __init__(self: Self, path: Optional[str] = None) -> None:
+        self.path: Optional[str] = path
+        self.lock: Lock = Lock()
+
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path if path is not None else ":memory:",
+            check_same_thread = False
+        )
+        self.connection.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS pools (
+                address TEXT PRIMARY KEY,
+                factory_address TEXT NOT NULL,
+                token0 TEXT NOT NULL,
+                token1 TEXT NOT NULL,
+                fee INTEGER NOT NULL,
+                tick_spacing INTEGER NOT NULL,
+                block_number INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS pools_by_pair ON pools (token0, token1, block_number);
+            CREATE INDEX IF NOT EXISTS pools_by_token1 ON pools (token1, block_number);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                factory_address TEXT PRIMARY KEY,
+                synced_block INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            '''
+        )
+        self.connection.commit()
+
+
+    def put_many(self: Self, pools: Iterable[PoolRecord], factory_address: ChecksumAddress, synced_block: BlockNumber) -> None:
+        '''
+        Store pools found in factory_address's logs up to synced_block, in one transaction
+        '''
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pools VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        pool.address, pool.factory_address, pool.token0, pool.token1,
+                        pool.fee, pool.tick_spacing, pool.block_number
+                    )
+                    for pool in pools
+                )
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                (factory_address, synced_block)
+            )
+            self.connection.commit()
+
+
+    def get_synced_block(self: Self, factory_address: ChecksumAddress) -> Optional[BlockNumber]:
+        with self.lock:
+            row: Optional[Tuple[int]] = self.connection.execute(
+                "SELECT synced_block FROM sync_state WHERE factory_address = ?",
+                (factory_address, )
+            ).fetchone()
+        return row[0] if row is not None else None
+
+
+    def get_pools(
+        self: Self, token_a: ChecksumAddress, token_b: ChecksumAddress,
+        block_number: Optional[BlockNumber] = None
+    ) -> List[PoolRecord]:
+        '''
+        Pools of the pair deployed at or before block_number, if given
+        '''
+        token0, token1 = sort_tokens(token_a, token_b)
+        return self.__select(
+            "WHERE token0 = ? AND token1 = ?",
+            (token0, token1),
+            block_number = block_number
+        )
+
+
+    def get_pools_by_token(self: Self, token: ChecksumAddress, block_number: Optional[BlockNumber] = None) -> List[PoolRecord]:
+        return (
+            self.__select("WHERE token0 = ?", (token, ), block_number = block_number)
+            + self.__select("WHERE token1 = ?", (token, ), block_number = block_number)
+        )
+
+
+    def get_pools_between(
+        self: Self, tokens: Iterable[ChecksumAddress], block_number: Optional[BlockNumber] = None
+    ) -> Dict[Tuple[ChecksumAddress, ChecksumAddress], List[PoolRecord]]:
+        '''
+        Pools of every pair of tokens, keyed by sorted token pair, e.g. to build
+        an exchange graph at a historical block
+        '''
+        return {
+            sort_tokens(token_a, token_b): self.get_pools(
+                token_a = token_a,
+                token_b = token_b,
+                block_number = block_number
+            )
+            for token_a, token_b in combinations(dict.fromkeys(tokens), 2)
+        }
+
+
+    def __len__(self: Self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM pools").fetchone()[0]
+
+
+    def __select(self: Self, where: str, parameters: Tuple, block_number: Optional[BlockNumber] = None) -> List[PoolRecord]:
+        if block_number is not None:
+            where += " AND block_number <= ?"
+            parameters += (block_number, )
+
+        with self.lock:
+            rows: List[Tuple] = self.connection.execute(
+                f"SELECT * FROM pools {where} ORDER BY block_number",
+                parameters
+            ).fetchall()
+        return [PoolRecord(*row) for row in rows]
+
+
+    def close(self: Self) -> None:
+        with self.lock:
+            self.connection.close()
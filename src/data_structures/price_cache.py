@@ -0,0 +1,119 @@
+from eth_typing.evm import ChecksumAddress, BlockNumber
+
+from bisect import bisect_right, insort
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+from typing_extensions import Self
+import json
+import os
+
+
+class PriceCache():
+    '''
+    Token prices keyed by block number. A price fetched at block b also serves
+    blocks b + 1 to b + max_staleness, never earlier blocks, so backtests do not
+    see prices from their future. Every token keeps its max_blocks latest prices.
+    '''
+    def __init__(self: Self, max_staleness: int = 0, max_blocks: int = 65536) -> None:
+        self.max_staleness: int = max_staleness
+        self.max_blocks: int = max_blocks
+
+        # Token -> sorted block numbers and the prices at them
+        self.block_numbers: Dict[ChecksumAddress, List[BlockNumber]] = dict()
+        self.prices: Dict[ChecksumAddress, Dict[BlockNumber, Optional[float]]] = dict()
+        self.lock: Lock = Lock()
+
+
+    def get(self: Self, token: ChecksumAddress, block_number: BlockNumber) -> Optional[float]:
+        '''
+        Freshest price at or before block_number within max_staleness blocks, None if not cached
+        '''
+        with self.lock:
+            block_numbers: List[BlockNumber] = self.block_numbers.get(token, [])
+            i: int = bisect_right(block_numbers, block_number)
+            if i == 0 or block_number - block_numbers[i - 1] > self.max_staleness:
+                return None
+            return self.prices[token][block_numbers[i - 1]]
+
+
+    def get_many(self: Self, tokens: Iterable[ChecksumAddress], block_number: BlockNumber) -> Dict[ChecksumAddress, float]:
+        return {
+            token: price
+            for token in tokens
+            for price in [self.get(token, block_number)]
+            if price is not None
+        }
+
+
+    def put_many(self: Self, prices: Dict[ChecksumAddress, float], block_number: BlockNumber) -> None:
+        with self.lock:
+            for token, price in prices.items():
+                if price is None:
+                    continue
+                if token not in self.prices:
+                    self.block_numbers[token] = []
+                    self.prices[token] = dict()
+                if block_number not in self.prices[token]:
+                    insort(self.block_numbers[token], block_number)
+                self.prices[token][block_number] = price
+
+                while len(self.block_numbers[token]) > self.max_blocks:
+                    del self.prices[token][self.block_numbers[token].pop(0)]
+
+
+    def plan_blocks(self: Self, tokens: List[ChecksumAddress], block_numbers: Iterable[BlockNumber]) -> List[BlockNumber]:
+        '''
+        Fewest blocks to fetch so that every token has a price for every block
+        of block_numbers, given the staleness tolerance
+        '''
+        planned_blocks: List[BlockNumber] = []
+        for block_number in sorted(set(block_numbers)):
+            if planned_blocks and block_number - planned_blocks[-1] <= self.max_staleness:
+                continue
+            if all(self.get(token, block_number) is not None for token in tokens):
+                continue
+            planned_blocks.append(block_number)
+        return planned_blocks
+
+
+class TokenDecimalsCache():
+    '''
+    decimals() of tokens, which never change, persisted to path (as JSON) on save()
+    '''
+    def __init__(self: Self, path: Optional[str] = None) -> None:
+        self.path: Optional[str] = path
+        self.decimals: Dict[ChecksumAddress, int] = dict()
+        self.lock: Lock = Lock()
+        self.dirty: bool = False
+
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                self.decimals.update(json.load(f))
+
+
+    def get_many(self: Self, tokens: Iterable[ChecksumAddress]) -> Dict[ChecksumAddress, int]:
+        with self.lock:
+            return {
+                token: self.decimals[token]
+                for token in tokens
+                if token in self.decimals
+            }
+
+
+    def put_many(self: Self, decimals: Dict[ChecksumAddress, int]) -> None:
+        with self.lock:
+            for token, token_decimals in decimals.items():
+                if token_decimals is not None and self.decimals.get(token) != token_decimals:
+                    self.decimals[token] = token_decimals
+                    self.dirty = True
+
+
+    def save(self: Self) -> None:
+        if self.path is None or not self.dirty:
+            return None
+
+        with self.lock:
+            with open(f"{self.path}.tmp", "w") as f:
+                json.dump(self.decimals, f)
+            os.replace(f"{self.path}.tmp", self.path)
+            self.dirty = False
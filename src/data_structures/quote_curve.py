@@ -0,0 +1,43 @@
+import numpy
+
+from dataclasses import dataclass, field
+from typing import List, Union
+
+
+def geometric_grid(center: float, size: int, ratio: float = 2.0) -> List[float]:
+    '''
+    size values spaced by ratio around center, e.g. (1, 5, 2) -> [0.25, 0.5, 1, 2, 4]
+    '''
+    return [center * ratio ** (i - (size - 1) / 2) for i in range(size)]
+
+
+@dataclass
+class QuoteCurve():
+    '''
+    Amounts out of an edge quoted at several amounts in. Interpolates linearly
+    between the quoted points and through the origin below the first one, and
+    holds the last amount out beyond the last one. Amounts out are made
+    non-decreasing so the curve stays monotone even when a quote failed.
+    '''
+    amounts_in: numpy.ndarray
+    amounts_out: numpy.ndarray
+
+    def __post_init__(self) -> None:
+        order: numpy.ndarray = numpy.argsort(self.amounts_in, kind = "stable")
+        self.amounts_in = numpy.concatenate(([0.0], numpy.asarray(self.amounts_in, dtype = numpy.float64)[order]))
+        self.amounts_out = numpy.maximum.accumulate(
+            numpy.concatenate(([0.0], numpy.asarray(self.amounts_out, dtype = numpy.float64)[order]))
+        )
+
+
+    def get_amount_out(self, amount_in: Union[float, numpy.ndarray]) -> Union[float, numpy.ndarray]:
+        return numpy.interp(amount_in, self.amounts_in, self.amounts_out)
+
+
+    def get_exchange_rate(self, amount_in: Union[float, numpy.ndarray]) -> Union[float, numpy.ndarray]:
+        return numpy.divide(
+            self.get_amount_out(amount_in),
+            amount_in,
+            out = numpy.zeros_like(amount_in, dtype = numpy.float64),
+            where = numpy.asarray(amount_in) > 0
+        )
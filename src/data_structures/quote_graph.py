@@ -1,18 +1,32 @@
 from .exchange_graph import ExchangeEdge
+from .quote_curve import QuoteCurve
 
 from networkx import MultiDiGraph, find_negative_cycle, NetworkXError
 from eth_typing.evm import ChecksumAddress
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from math import log2
 from typing import (
     Any,
     Dict,
     List,
-    Generator
+    Generator,
+    Optional,
+    Sequence,
+    Set,
+    Tuple
 )
 
 
+def canonical_rotation(cycle: Sequence[Any]) -> Tuple[Any, ...]:
+    '''
+    Rotation of a cycle (given without repeating its first node) starting at its
+    smallest node, the same for every rotation of the cycle
+    '''
+    start: int = min(range(len(cycle)), key = lambda i: cycle[i])
+    return tuple(cycle[start:]) + tuple(cycle[:start])
+
+
 @dataclass
 class Quote():
     token_in: ChecksumAddress
@@ -44,10 +58,51 @@ class QuoteGraph(MultiDiGraph):
             amount_out = edge_data.get("amount_out")
         )
 
+    def get_quote_curve(self, exchange_edge: ExchangeEdge) -> Optional[QuoteCurve]:
+        return self.get_edge_data(
+            u = exchange_edge.token_in,
+            v = exchange_edge.token_out,
+            key = exchange_edge
+        ).get("quote_curve")
+
+
+    def rescale(self, scale: float) -> "QuoteGraph":
+        '''
+        Copy of the graph with every edge requoted at scale times its amount in,
+        interpolated on the edge's quote curve. Edges without a curve keep their quote.
+        '''
+        quote_graph: QuoteGraph = QuoteGraph(**self.graph)
+        for token_in, token_out, exchange_edge, edge_data in self.edges(keys = True, data = True):
+            quote_curve: Optional[QuoteCurve] = edge_data.get("quote_curve")
+            if quote_curve is None:
+                quote_graph.add_edge(token_in, token_out, exchange_edge, **edge_data)
+                continue
+
+            amount_in: int = round(edge_data.get("amount_in") * scale)
+            quote_graph.add_edge(
+                token_in, token_out, exchange_edge, quote_curve = quote_curve, **asdict(Quote(
+                    token_in = token_in,
+                    token_out = token_out,
+                    amount_in = amount_in,
+                    amount_out = int(quote_curve.get_amount_out(amount_in))
+                ))
+            )
+        return quote_graph
+
+
     def find_potential_arbitrage_path_meta(self) -> Generator[List[ExchangeEdge], None, None]:
+        '''
+        Negative cycle found from every source token, each cycle yielded once
+        whichever token it was found from
+        '''
+        seen_cycles: Set[Tuple[ChecksumAddress, ...]] = set()
         for source_token in self.nodes:
             try:
                 negative_cycle: List[ChecksumAddress] = find_negative_cycle(self, source_token, "negative_log_exchange_rate")
+                cycle_key: Tuple[ChecksumAddress, ...] = canonical_rotation(negative_cycle[:-1])
+                if cycle_key in seen_cycles:
+                    continue
+                seen_cycles.add(cycle_key)
                 path_meta: List[ExchangeEdge] = []
                 for i in range(len(negative_cycle) - 1):
                     token_in: ChecksumAddress = negative_cycle[i]
@@ -0,0 +1,164 @@
+from requests import Response
+
+import asyncio
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Dict, Optional
+from typing_extensions import Self
+
+
+RETRIABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+RATE_LIMIT_ERROR_CODES = (429, -32005, -32029)
+
+
+class RetriableError(ValueError):
+    '''
+    A failure worth retrying later: throttling, an overloaded or unreachable server
+    '''
+    def __init__(self: Self, message: Any, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after: Optional[float] = retry_after
+
+
+class RateLimitError(RetriableError):
+    pass
+
+
+class TokenBucket():
+    '''
+    Refills rate tokens per second up to burst. Takers reserve tokens up front and
+    wait out the debt, so requests larger than burst (big batches) still go through
+    and waiters are served in arrival order.
+    '''
+    def __init__(self: Self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate: float = rate
+        self.burst: float = burst if burst is not None else max(1, rate)
+        self.tokens: float = self.burst
+        self.updated: float = monotonic()
+        self.paused_until: float = 0
+        self.lock: Lock = Lock()
+
+
+    def reserve(self: Self, tokens: float = 1) -> float:
+        '''
+        Take tokens and return how long to wait before using them
+        '''
+        with self.lock:
+            now: float = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return max(
+                -self.tokens / self.rate if self.tokens < 0 else 0,
+                self.paused_until - now
+            )
+
+
+    def acquire(self: Self, tokens: float = 1) -> None:
+        delay: float = self.reserve(tokens = tokens)
+        if delay > 0:
+            sleep(delay)
+
+
+    async def acquire_async(self: Self, tokens: float = 1) -> None:
+        delay: float = self.reserve(tokens = tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+    def pause(self: Self, delay: float) -> None:
+        '''
+        Hold every taker back for delay seconds, e.g. after a 429
+        '''
+        with self.lock:
+            self.paused_until = max(self.paused_until, monotonic() + delay)
+
+
+class RateLimiter():
+    '''
+    One token bucket per endpoint, refilled at requests_per_second unless the
+    endpoint has its own budget in endpoint_requests_per_second
+    '''
+    def __init__(
+        self: Self, requests_per_second: float,
+        endpoint_requests_per_second: Optional[Dict[str, float]] = None,
+        burst: Optional[float] = None
+    ) -> None:
+        self.requests_per_second: float = requests_per_second
+        self.endpoint_requests_per_second: Dict[str, float] = (
+            endpoint_requests_per_second if endpoint_requests_per_second is not None else dict()
+        )
+        self.burst: Optional[float] = burst
+
+        self.buckets: Dict[str, TokenBucket] = dict()
+        self.lock: Lock = Lock()
+
+
+    def get_bucket(self: Self, endpoint_uri: str) -> TokenBucket:
+        with self.lock:
+            if endpoint_uri not in self.buckets:
+                self.buckets[endpoint_uri] = TokenBucket(
+                    rate = self.endpoint_requests_per_second.get(endpoint_uri, self.requests_per_second),
+                    burst = self.burst
+                )
+            return self.buckets[endpoint_uri]
+
+
+    def acquire(self: Self, endpoint_uri: str, tokens: float = 1) -> None:
+        self.get_bucket(endpoint_uri).acquire(tokens = tokens)
+
+
+    async def acquire_async(self: Self, endpoint_uri: str, tokens: float = 1) -> None:
+        await self.get_bucket(endpoint_uri).acquire_async(tokens = tokens)
+
+
+    def pause(self: Self, endpoint_uri: str, delay: float) -> None:
+        self.get_bucket(endpoint_uri).pause(delay = delay)
+
+
+class RetryPolicy():
+    '''
+    Exponential backoff with full jitter. A Retry-After given by the server is
+    honoured instead, plus a little jitter so waiters do not retry in lockstep.
+    '''
+    def __init__(self: Self, max_retries: int = 5, base_delay: float = 0.25, max_delay: float = 30) -> None:
+        self.max_retries: int = max_retries
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+
+
+    def get_delay(self: Self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + uniform(0, self.base_delay)
+        return uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+    @staticmethod
+    def get_retry_after(response: Response) -> Optional[float]:
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+
+    @staticmethod
+    def is_rate_limit_error(error: Any) -> bool:
+        if not isinstance(error, dict):
+            return False
+        return (
+            error.get("code") in RATE_LIMIT_ERROR_CODES
+            or "rate limit" in str(error.get("message", "")).lower()
+        )
+
+
+    @staticmethod
+    def get_rate_limit_error(response_body: Any) -> Optional[Any]:
+        '''
+        First rate limit error of a JSON-RPC response or batch of responses. Many
+        providers throttle with an HTTP 200 carrying the error in the body.
+        '''
+        for item in response_body if isinstance(response_body, list) else [response_body]:
+            if isinstance(item, dict) and RetryPolicy.is_rate_limit_error(item.get("error")):
+                return item["error"]
+        return None
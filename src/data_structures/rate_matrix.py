@@ -0,0 +1,380 @@
+from .exchange_graph import ExchangeEdge, ExchangeEdgeId
+from .quote_graph import Quote, QuoteGraph, canonical_rotation
+
+from eth_typing.evm import ChecksumAddress
+import numpy
+
+from itertools import chain
+from typing import Dict, Generator, List, Optional, Set, Tuple
+from typing_extensions import Self
+
+
+class RateMatrix():
+    '''
+    Dense form of a QuoteGraph: weights[i, j] is the best negative log exchange
+    rate from tokens[i] to tokens[j] (inf without an edge), and edge_indices[i, j]
+    points at the ExchangeEdge achieving it in edges (-1 without an edge).
+    Relaxations run on whole rows of the matrix with numpy, so cycle detection
+    costs a few vectorized passes instead of a Python loop per edge.
+
+    Edges are known by their id, so the quotes of the same edges built at a
+    later block can be looked up and passed to update_quotes().
+    '''
+    # Relaxations improving a distance by less are ignored, so rounding does not make cycles
+    EPSILON: float = 1e-12
+    # Most elements of a min-plus product's candidates held in memory at once
+    MIN_PLUS_CHUNK_SIZE: int = 1 << 18
+
+    def __init__(
+        self: Self, tokens: List[ChecksumAddress], weights: numpy.ndarray,
+        edge_indices: numpy.ndarray, edges: List[ExchangeEdge], quotes: List[Quote]
+    ) -> None:
+        self.tokens: List[ChecksumAddress] = tokens
+        self.token_indices: Dict[ChecksumAddress, int] = {token: i for i, token in enumerate(tokens)}
+        self.weights: numpy.ndarray = weights
+        self.edge_indices: numpy.ndarray = edge_indices
+        self.edges: List[ExchangeEdge] = edges
+        self.edge_ids: Dict[ExchangeEdgeId, int] = {edge.id: i for i, edge in enumerate(edges)}
+        self.quotes: Dict[ExchangeEdgeId, Quote] = {edge.id: quote for edge, quote in zip(edges, quotes)}
+
+        # Edges of every cell, built by index_edges()
+        self.cell_edges: Optional[Dict[Tuple[int, int], List[int]]] = None
+
+
+    @classmethod
+    def from_quote_graph(cls, quote_graph: QuoteGraph) -> Self:
+        tokens: List[ChecksumAddress] = list(quote_graph.nodes)
+        token_indices: Dict[ChecksumAddress, int] = {token: i for i, token in enumerate(tokens)}
+
+        edges: List[ExchangeEdge] = []
+        quotes: List[Quote] = []
+        for token_in, token_out, exchange_edge, edge_data in quote_graph.edges(keys = True, data = True):
+            edges.append(exchange_edge)
+            quotes.append(Quote(
+                token_in = token_in,
+                token_out = token_out,
+                amount_in = edge_data.get("amount_in"),
+                amount_out = edge_data.get("amount_out")
+            ))
+
+        return cls.from_quotes(tokens = tokens, edges = edges, quotes = quotes, token_indices = token_indices)
+
+
+    @classmethod
+    def from_quotes(
+        cls, tokens: List[ChecksumAddress], edges: List[ExchangeEdge], quotes: List[Quote],
+        token_indices: Optional[Dict[ChecksumAddress, int]] = None
+    ) -> Self:
+        if token_indices is None:
+            token_indices = {token: i for i, token in enumerate(tokens)}
+        n: int = len(tokens)
+
+        weights: numpy.ndarray = numpy.full((n, n), numpy.inf)
+        edge_indices: numpy.ndarray = numpy.full((n, n), -1, dtype = numpy.int64)
+        if len(quotes) > 0:
+            rows: numpy.ndarray = numpy.array([token_indices[quote.token_in] for quote in quotes])
+            columns: numpy.ndarray = numpy.array([token_indices[quote.token_out] for quote in quotes])
+            edge_weights: numpy.ndarray = numpy.array([quote.negative_log_exchange_rate for quote in quotes])
+
+            # Best edge of every cell: first of the cell once sorted by cell then weight
+            cells: numpy.ndarray = rows * n + columns
+            order: numpy.ndarray = numpy.lexsort((edge_weights, cells))
+            best: numpy.ndarray = order[numpy.unique(cells[order], return_index = True)[1]]
+
+            weights[rows[best], columns[best]] = edge_weights[best]
+            edge_indices[rows[best], columns[best]] = best
+
+        return cls(tokens = tokens, weights = weights, edge_indices = edge_indices, edges = edges, quotes = quotes)
+
+
+    def get_quote(self: Self, exchange_edge: ExchangeEdge) -> Quote:
+        return self.quotes[exchange_edge.id]
+
+
+    def index_edges(self: Self) -> None:
+        '''
+        Build the edges of the cells, which update_quotes() needs
+        '''
+        if self.cell_edges is not None:
+            return None
+
+        self.cell_edges = dict()
+        for edge_index, edge in enumerate(self.edges):
+            cell: Tuple[int, int] = (self.token_indices[edge.token_in], self.token_indices[edge.token_out])
+            self.cell_edges.setdefault(cell, []).append(edge_index)
+
+
+    def update_quotes(
+        self: Self, quotes: Dict[ExchangeEdge, Quote], tolerance: float = 0.0
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        '''
+        Replace the quotes of known edges, given by edges with the same ids which
+        then replace them, and pick the best edge again in their cells. Only the
+        cells of the given edges are visited. Cells whose best weight moves by at
+        most tolerance keep their weight. Returns the rows, columns and previous
+        weights of the cells that changed.
+        '''
+        self.index_edges()
+
+        cells: Set[Tuple[int, int]] = set()
+        for edge, quote in quotes.items():
+            self.edges[self.edge_ids[edge.id]] = edge
+            self.quotes[edge.id] = quote
+            cells.add((self.token_indices[edge.token_in], self.token_indices[edge.token_out]))
+
+        changed_cells: List[Tuple[int, int, float]] = []
+        for cell in cells:
+            best_edge_index: int = min(
+                self.cell_edges[cell],
+                key = lambda edge_index: self.quotes[self.edges[edge_index].id].negative_log_exchange_rate
+            )
+            best_weight: float = self.quotes[self.edges[best_edge_index].id].negative_log_exchange_rate
+            previous_weight: float = self.weights[cell]
+            # The best edge can change at the same weight, e.g. when it was tied
+            self.edge_indices[cell] = best_edge_index
+            if previous_weight == best_weight or abs(best_weight - previous_weight) <= tolerance:
+                continue
+            self.weights[cell] = best_weight
+            changed_cells.append(cell + (previous_weight, ))
+
+        rows, columns, previous_weights = zip(*changed_cells) if changed_cells else ((), (), ())
+        return (
+            numpy.array(rows, dtype = numpy.int64),
+            numpy.array(columns, dtype = numpy.int64),
+            numpy.array(previous_weights, dtype = numpy.float64)
+        )
+
+
+    def get_cycle_weight(self: Self, cycle: List[int], weights: Optional[numpy.ndarray] = None) -> float:
+        if weights is None:
+            weights = self.weights
+        return float(weights[cycle, cycle[1:] + cycle[:1]].sum())
+
+
+    def get_path_meta(self: Self, cycle: List[int]) -> List[ExchangeEdge]:
+        '''
+        Best edges along a cycle of token indices, given without repeating its first token
+        '''
+        return [
+            self.edges[self.edge_indices[token_in, token_out]]
+            for token_in, token_out in zip(cycle, cycle[1:] + cycle[:1])
+        ]
+
+
+    def relax(
+        self: Self, distances: numpy.ndarray, predecessors: numpy.ndarray,
+        max_iterations: int, stop_at_cycle: bool = False,
+        weights: Optional[numpy.ndarray] = None
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        '''
+        Bellman-Ford from the given distances, relaxing every edge at once per
+        iteration, on weights if given instead of the matrix's. Returns the
+        distances, the predecessors and which tokens improved at the last
+        iteration, none of them if it converged.
+        With stop_at_cycle, stops as soon as the predecessors form a cycle,
+        which is then negative, instead of running all iterations.
+        '''
+        if weights is None:
+            weights = self.weights
+        columns: numpy.ndarray = numpy.arange(len(distances))
+        improved: numpy.ndarray = numpy.zeros(len(distances), dtype = bool)
+        for _ in range(max_iterations):
+            candidates: numpy.ndarray = distances[:, None] + weights
+            best_predecessors: numpy.ndarray = numpy.argmin(candidates, axis = 0)
+            best_distances: numpy.ndarray = candidates[best_predecessors, columns]
+
+            improved = best_distances < distances - self.EPSILON
+            if not improved.any():
+                break
+            distances = numpy.where(improved, best_distances, distances)
+            predecessors = numpy.where(improved, best_predecessors, predecessors)
+
+            if stop_at_cycle and (self.walk_back(predecessors = predecessors) >= 0).any():
+                break
+
+        return distances, predecessors, improved
+
+
+    def find_negative_cycle(self: Self, source_token: ChecksumAddress) -> Optional[List[int]]:
+        '''
+        A negative cycle reachable from source_token as token indices, None if there is none
+        '''
+        n: int = len(self.tokens)
+        distances: numpy.ndarray = numpy.full(n, numpy.inf)
+        distances[self.token_indices[source_token]] = 0.0
+
+        _, predecessors, improved = self.relax(
+            distances = distances,
+            predecessors = numpy.full(n, -1, dtype = numpy.int64),
+            max_iterations = n,
+            stop_at_cycle = True
+        )
+        if not improved.any():
+            return None
+
+        cycles: List[List[int]] = self.get_cycles(predecessors = predecessors)
+        return cycles[0] if cycles else None
+
+
+    def find_negative_cycles(self: Self, weights: Optional[numpy.ndarray] = None) -> List[List[int]]:
+        '''
+        Negative cycles through distinct tokens, as token indices starting at the
+        smallest one so each cycle comes once whatever its rotation. Bellman-Ford
+        runs from a virtual source linked to all tokens until it converges, and
+        every cycle of the predecessors is taken as soon as it forms, its tokens
+        then being left out of the relaxation. So a cycle cannot keep taking over
+        the best paths of the tokens of another one, and every negative cycle
+        shares a token with a returned one.
+
+        Tokens left out can leave their descendants too low, which may delay
+        the next cycle: after n + 1 iterations without one, the pass restarts
+        from the virtual source, from which it finds one within n + 1 iterations.
+
+        Searches weights instead of the matrix's if given, e.g. those of a subset
+        of the tokens, returning indices into them.
+        '''
+        weights = (self.weights if weights is None else weights).copy()
+        n: int = len(weights)
+        cycles: List[List[int]] = []
+
+        distances: numpy.ndarray = numpy.zeros(n)
+        predecessors: numpy.ndarray = numpy.full(n, -1, dtype = numpy.int64)
+        iterations_without_cycle: int = 0
+        while True:
+            distances, predecessors, improved = self.relax(
+                distances = distances,
+                predecessors = predecessors,
+                max_iterations = 1,
+                weights = weights
+            )
+            if not improved.any():
+                return cycles
+
+            found_cycles: List[List[int]] = self.get_cycles(predecessors = predecessors, weights = weights)
+            if found_cycles:
+                cycles.extend(found_cycles)
+                cycle_tokens: List[int] = list(chain.from_iterable(found_cycles))
+                weights[cycle_tokens, :] = numpy.inf
+                weights[:, cycle_tokens] = numpy.inf
+                predecessors[numpy.isin(predecessors, cycle_tokens)] = -1
+                predecessors[cycle_tokens] = -1
+                iterations_without_cycle = 0
+            elif (iterations_without_cycle := iterations_without_cycle + 1) > n:
+                distances = numpy.zeros(n)
+                predecessors = numpy.full(n, -1, dtype = numpy.int64)
+                iterations_without_cycle = 0
+
+
+    def find_bounded_cycles(self: Self, max_hops: int) -> List[List[int]]:
+        '''
+        Every negative cycle of 2 to max_hops hops through distinct tokens, as
+        token indices starting at the smallest one. Paths are extended one hop at
+        a time from every token, all together, through larger tokens only so each
+        cycle is found once from its smallest token. A path is dropped as soon as
+        even the best walk back to its start (from min-plus products of the
+        matrix) cannot make it negative within max_hops.
+        '''
+        n: int = len(self.tokens)
+        cycles: List[List[int]] = []
+
+        # return_bounds[r][i, j]: best walk of 1 to r hops from i to j
+        return_bounds: List[numpy.ndarray] = [numpy.full((n, n), numpy.inf), self.weights]
+        for _ in range(2, max_hops):
+            return_bounds.append(numpy.minimum(return_bounds[-1], self.__min_plus(return_bounds[-1])))
+
+        # Open paths: their tokens from the start token on and their weights
+        token_paths: numpy.ndarray = numpy.arange(n)[:, None]
+        path_weights: numpy.ndarray = numpy.zeros(n)
+        chunk_size: int = max(1, self.MIN_PLUS_CHUNK_SIZE // max(n, 1))
+        for hops in range(1, max_hops + 1):
+            next_token_paths: List[numpy.ndarray] = []
+            next_path_weights: List[numpy.ndarray] = []
+            for begin in range(0, len(token_paths), chunk_size):
+                chunk_paths: numpy.ndarray = token_paths[begin: begin + chunk_size]
+                starts: numpy.ndarray = chunk_paths[:, 0]
+                # candidates[p, j]: weight of path p extended to token j
+                candidates: numpy.ndarray = path_weights[begin: begin + chunk_size, None] + self.weights[chunk_paths[:, -1]]
+
+                if hops >= 2:
+                    closing_weights: numpy.ndarray = candidates[numpy.arange(len(chunk_paths)), starts]
+                    cycles.extend(chunk_paths[closing_weights < -self.EPSILON].tolist())
+                if hops == max_hops:
+                    continue
+
+                bounds: numpy.ndarray = candidates + return_bounds[max_hops - hops].T[starts]
+                path_indices, next_tokens = numpy.nonzero((bounds < 0) & (numpy.arange(n)[None, :] > starts[:, None]))
+                unvisited: numpy.ndarray = ~(chunk_paths[path_indices] == next_tokens[:, None]).any(axis = 1)
+                path_indices, next_tokens = path_indices[unvisited], next_tokens[unvisited]
+
+                next_token_paths.append(numpy.hstack((chunk_paths[path_indices], next_tokens[:, None])))
+                next_path_weights.append(candidates[path_indices, next_tokens])
+
+            if not next_token_paths:
+                break
+            token_paths = numpy.concatenate(next_token_paths)
+            path_weights = numpy.concatenate(next_path_weights)
+
+        return cycles
+
+
+    def find_potential_arbitrage_path_meta(self: Self, max_hops: Optional[int] = None) -> Generator[List[ExchangeEdge], None, None]:
+        '''
+        Edges of the negative cycles, of at most max_hops hops if given
+        '''
+        for cycle in (
+            self.find_negative_cycles() if max_hops is None
+            else self.find_bounded_cycles(max_hops = max_hops)
+        ):
+            yield self.get_path_meta(cycle = cycle)
+
+
+    def __min_plus(self: Self, distances: numpy.ndarray) -> numpy.ndarray:
+        '''
+        Min-plus product of distances and the matrix, reducing along contiguous
+        memory in chunks of rows of at most MIN_PLUS_CHUNK_SIZE candidates,
+        which stay in cache
+        '''
+        n: int = len(self.tokens)
+        weights_transposed: numpy.ndarray = numpy.ascontiguousarray(self.weights.T)
+        product: numpy.ndarray = numpy.empty((n, n))
+        chunk_size: int = max(1, self.MIN_PLUS_CHUNK_SIZE // max(n * n, 1))
+        for begin in range(0, n, chunk_size):
+            # candidates[i, j, m]: distances[i, m] + weights[m, j]
+            candidates: numpy.ndarray = distances[begin: begin + chunk_size, None, :] + weights_transposed[None, :, :]
+            product[begin: begin + chunk_size] = numpy.min(candidates, axis = 2)
+        return product
+
+
+    def walk_back(self: Self, predecessors: numpy.ndarray) -> numpy.ndarray:
+        '''
+        Token reached walking back at least n steps from every token, which is on
+        a cycle of the predecessors, or -1 if the walk ends at the source.
+        Squares the predecessor map log2(n) times instead of walking n steps.
+        '''
+        n: int = len(predecessors)
+        # Index n stands for the source and maps to itself
+        jumps: numpy.ndarray = numpy.append(numpy.where(predecessors >= 0, predecessors, n), n)
+        for _ in range(n.bit_length()):
+            jumps = jumps[jumps]
+        return numpy.where(jumps[:n] < n, jumps[:n], -1)
+
+
+    def get_cycles(self: Self, predecessors: numpy.ndarray, weights: Optional[numpy.ndarray] = None) -> List[List[int]]:
+        '''
+        Distinct negative cycles of the predecessors, rotated to start at their smallest token
+        '''
+        cycle_tokens: numpy.ndarray = self.walk_back(predecessors = predecessors)
+
+        cycles: List[List[int]] = []
+        seen_tokens: Set[int] = set()
+        for token in numpy.unique(cycle_tokens[cycle_tokens >= 0]).tolist():
+            if token in seen_tokens:
+                continue
+            cycle: List[int] = [token]
+            while (token := int(predecessors[token])) != cycle[0]:
+                cycle.append(token)
+            cycle.reverse()
+            seen_tokens.update(cycle)
+            if self.get_cycle_weight(cycle = cycle, weights = weights) < 0:
+                cycles.append(list(canonical_rotation(cycle)))
+        return cycles
@@ -0,0 +1,188 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bisect import bisect_left
+from threading import Lock, Thread
+from time import time
+from typing import Dict, List, Optional, Tuple
+from typing_extensions import Self
+import json
+
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass
+class RpcMetric():
+    '''
+    One RPC, or one multicall made of several (method = "multicall").
+    calls is the number of sub-calls it carried and chunks the number of RPCs.
+    '''
+    method: str
+    latency: float
+    calls: int = 1
+    chunks: int = 1
+    request_bytes: int = 0
+    response_bytes: int = 0
+    reverted_calls: int = 0
+    retries: int = 0
+    failed: bool = False
+    endpoint_uri: str = ""
+    timestamp: float = field(default_factory = time)
+
+
+class MetricsSink(ABC):
+    @abstractmethod
+    def record(self: Self, metric: RpcMetric) -> None:
+        pass
+
+
+@dataclass
+class MetricsSummary():
+    requests: int = 0
+    failures: int = 0
+    calls: int = 0
+    chunks: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    reverted_calls: int = 0
+    retries: int = 0
+    latency_sum: float = 0
+    latency_buckets: List[int] = field(default_factory = lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+
+class InMemoryMetricsSink(MetricsSink):
+    '''
+    Counters and a latency histogram per (method, endpoint)
+    '''
+    def __init__(self: Self) -> None:
+        self.summaries: Dict[Tuple[str, str], MetricsSummary] = dict()
+        self.lock: Lock = Lock()
+
+
+    def record(self: Self, metric: RpcMetric) -> None:
+        with self.lock:
+            key: Tuple[str, str] = (metric.method, metric.endpoint_uri)
+            if key not in self.summaries:
+                self.summaries[key] = MetricsSummary()
+            summary: MetricsSummary = self.summaries[key]
+
+            summary.requests += 1
+            summary.failures += metric.failed
+            summary.calls += metric.calls
+            summary.chunks += metric.chunks
+            summary.request_bytes += metric.request_bytes
+            summary.response_bytes += metric.response_bytes
+            summary.reverted_calls += metric.reverted_calls
+            summary.retries += metric.retries
+            summary.latency_sum += metric.latency
+            summary.latency_buckets[bisect_left(LATENCY_BUCKETS, metric.latency)] += 1
+
+
+    def snapshot(self: Self) -> Dict[Tuple[str, str], MetricsSummary]:
+        with self.lock:
+            return {
+                key: MetricsSummary(**asdict(summary))
+                for key, summary in self.summaries.items()
+            }
+
+
+    def reset(self: Self) -> None:
+        with self.lock:
+            self.summaries.clear()
+
+
+class PrometheusMetricsSink(InMemoryMetricsSink):
+    '''
+    In-memory counters rendered in the Prometheus text format, optionally served
+    over HTTP with serve()
+    '''
+    COUNTERS: Tuple[str, ...] = (
+        "requests", "failures", "calls", "chunks", "request_bytes",
+        "response_bytes", "reverted_calls", "retries"
+    )
+
+    def __init__(self: Self, prefix: str = "rpc") -> None:
+        super().__init__()
+        self.prefix: str = prefix
+        self.server: Optional[ThreadingHTTPServer] = None
+
+
+    def render(self: Self) -> str:
+        summaries: Dict[Tuple[str, str], MetricsSummary] = self.snapshot()
+        lines: List[str] = []
+
+        for counter in PrometheusMetricsSink.COUNTERS:
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            for (method, endpoint_uri), summary in summaries.items():
+                lines.append(
+                    f'{self.prefix}_{counter}_total{{method="{method}",endpoint="{endpoint_uri}"}} {getattr(summary, counter)}'
+                )
+
+        lines.append(f"# TYPE {self.prefix}_latency_seconds histogram")
+        for (method, endpoint_uri), summary in summaries.items():
+            labels: str = f'method="{method}",endpoint="{endpoint_uri}"'
+            cumulative: int = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf", ), summary.latency_buckets):
+                cumulative += bucket_count
+                lines.append(f'{self.prefix}_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.prefix}_latency_seconds_sum{{{labels}}} {summary.latency_sum}")
+            lines.append(f"{self.prefix}_latency_seconds_count{{{labels}}} {summary.requests}")
+
+        return "\n".join(lines) + "\n"
+
+
+    def serve(self: Self, port: int = 9100, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        '''
+        Serve the metrics from a daemon thread, on the loopback interface unless
+        another host is given
+        '''
+        sink: PrometheusMetricsSink = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body: bytes = sink.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                return None
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(target = self.server.serve_forever, daemon = True).start()
+        return self.server
+
+
+class JsonlMetricsSink(MetricsSink):
+    '''
+    Appends every metric as one JSON line to path
+    '''
+    def __init__(self: Self, path: str) -> None:
+        self.path: str = path
+        self.file = open(path, "a")
+        self.lock: Lock = Lock()
+
+
+    def record(self: Self, metric: RpcMetric) -> None:
+        line: str = json.dumps(asdict(metric))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+
+    def close(self: Self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+class MultiMetricsSink(MetricsSink):
+    def __init__(self: Self, sinks: List[MetricsSink]) -> None:
+        self.sinks: List[MetricsSink] = sinks
+
+
+    def record(self: Self, metric: RpcMetric) -> None:
+        for sink in self.sinks:
+            sink.record(metric)
@@ -0,0 +1,134 @@
+from ..utils.uniswapv3_math import (
+    MIN_TICK,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MAX_SQRT_RATIO,
+    compute_swap_step,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio,
+    next_initialized_tick_within_one_word
+)
+
+from eth_typing.evm import ChecksumAddress, BlockNumber
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from typing_extensions import Self
+
+
+class TickRangeError(ValueError):
+    '''
+    A swap walked past the tick bitmap words that were loaded
+    '''
+    pass
+
+
+@dataclass
+class UniswapV3PoolState():
+    '''
+    Snapshot of the swap-relevant state of a pool: slot0, liquidity, the tick
+    bitmap words from min_word to max_word and liquidityNet of the initialized
+    ticks they contain
+    '''
+    address: ChecksumAddress
+    token0: ChecksumAddress
+    token1: ChecksumAddress
+    fee: int
+    tick_spacing: int
+    block_number: BlockNumber
+    sqrt_price_x96: int
+    tick: int
+    liquidity: int
+    min_word: int
+    max_word: int
+    tick_bitmap: Dict[int, int] = field(default_factory = dict)
+    liquidity_net: Dict[int, int] = field(default_factory = dict)
+
+
+    def get_word(self: Self, word_position: int) -> int:
+        if not self.min_word <= word_position <= self.max_word:
+            raise TickRangeError(f"Word {word_position} of pool {self.address} is not loaded")
+        return self.tick_bitmap.get(word_position, 0)
+
+
+    def swap(
+        self: Self, zero_for_one: bool, amount_specified: int,
+        sqrt_price_limit_x96: Optional[int] = None
+    ) -> Tuple[int, int, int, int]:
+        '''
+        UniswapV3Pool.swap without transfers: (amount0, amount1, sqrt_price_x96, tick)
+        after the swap, from the pool's point of view. A positive amount_specified
+        is an exact input, a negative one an exact output. The state is left untouched.
+        '''
+        if sqrt_price_limit_x96 is None:
+            sqrt_price_limit_x96 = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+
+        exact_input: bool = amount_specified > 0
+        amount_specified_remaining: int = amount_specified
+        amount_calculated: int = 0
+        sqrt_price_x96: int = self.sqrt_price_x96
+        tick: int = self.tick
+        liquidity: int = self.liquidity
+
+        while amount_specified_remaining != 0 and sqrt_price_x96 != sqrt_price_limit_x96:
+            sqrt_price_start_x96: int = sqrt_price_x96
+
+            tick_next, initialized = next_initialized_tick_within_one_word(
+                get_word = self.get_word,
+                tick = tick,
+                tick_spacing = self.tick_spacing,
+                lte = zero_for_one
+            )
+            tick_next = max(MIN_TICK, min(MAX_TICK, tick_next))
+            sqrt_price_next_x96: int = get_sqrt_ratio_at_tick(tick_next)
+
+            sqrt_price_x96, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_ratio_current_x96 = sqrt_price_x96,
+                sqrt_ratio_target_x96 = (
+                    sqrt_price_limit_x96
+                    if (sqrt_price_next_x96 < sqrt_price_limit_x96 if zero_for_one else sqrt_price_next_x96 > sqrt_price_limit_x96)
+                    else sqrt_price_next_x96
+                ),
+                liquidity = liquidity,
+                amount_remaining = amount_specified_remaining,
+                fee_pips = self.fee
+            )
+
+            if exact_input:
+                amount_specified_remaining -= amount_in + fee_amount
+                amount_calculated -= amount_out
+            else:
+                amount_specified_remaining += amount_out
+                amount_calculated += amount_in + fee_amount
+
+            if sqrt_price_x96 == sqrt_price_next_x96:
+                if initialized:
+                    liquidity_net: int = self.liquidity_net.get(tick_next, 0)
+                    liquidity += -liquidity_net if zero_for_one else liquidity_net
+                    if liquidity < 0:
+                        raise ValueError(f"Negative liquidity in pool {self.address}")
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price_x96 != sqrt_price_start_x96:
+                tick = get_tick_at_sqrt_ratio(sqrt_price_x96)
+
+        amount_specified_used: int = amount_specified - amount_specified_remaining
+        amount0, amount1 = (
+            (amount_specified_used, amount_calculated) if zero_for_one == exact_input
+            else (amount_calculated, amount_specified_used)
+        )
+        return amount0, amount1, sqrt_price_x96, tick
+
+
+    def quote_exact_input(self: Self, token_in: ChecksumAddress, amount_in: int) -> int:
+        '''
+        What quoteExactInputSingle returns as amountOut without a price limit
+        '''
+        if amount_in <= 0:
+            return 0
+
+        zero_for_one: bool = token_in == self.token0
+        amount0, amount1, _, _ = self.swap(
+            zero_for_one = zero_for_one,
+            amount_specified = amount_in
+        )
+        return -(amount1 if zero_for_one else amount0)
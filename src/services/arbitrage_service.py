@@ -1,9 +1,14 @@
 from .contract_service import ContractService
 from .price_feed_service import PriceFeedService
+from .service_runtime import ServiceRuntime
 
-from ..data_structures.exchange_graph import QuoteFunctionMeta, ExchangeEdge, ExchangeGraph
+from ..data_structures.exchange_graph import QuoteFunctionMeta, ExchangeEdge, ExchangeEdgeId, ExchangeGraph
 from ..data_structures.quote_graph import Quote, QuoteGraph
-from ..data_structures.arbitrage import Hop, Path, Arbitrage
+from ..data_structures.quote_curve import QuoteCurve
+from ..data_structures.rate_matrix import RateMatrix
+from ..data_structures.incremental_cycle_detector import IncrementalCycleDetector
+from ..data_structures.arbitrage import Hop, Path, Arbitrage, CycleEvaluation
+from ..data_structures.path_frontier import PathFrontier
 from ..utils.web3_utils import block_identifier_to_number
 
 from web3 import Web3
@@ -11,12 +16,14 @@ from eth_typing.evm import ChecksumAddress, BlockNumber, BlockIdentifier
 import numpy
 
 from multiprocessing.pool import ThreadPool
-from copy import deepcopy
 from typing import (
     Dict,
     List,
     Generator,
-    Optional
+    Iterable,
+    Optional,
+    Set,
+    Tuple
 )
 from typing_extensions import Self
 from dataclasses import asdict
@@ -24,15 +31,15 @@ from itertools import chain
 
 
 class ArbitrageService():
-    def __init__(self: Self, w3: Web3) -> None:
+    def __init__(self: Self, w3: Web3, runtime: Optional[ServiceRuntime] = None) -> None:
         self.w3: Web3 = w3
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
 
-        self.contract_service: ContractService = ContractService(
-            w3 = self.w3
-        )
-        self.price_feed_service: PriceFeedService = PriceFeedService(
-            w3 = self.w3
-        )
+        self.contract_service: ContractService = self.runtime.contract_service
+        self.price_feed_service: PriceFeedService = self.runtime.price_feed_service
+        # Cycles of the last incremental search, see find_arbitrages_bellman_ford
+        self.cycle_detector: Optional[IncrementalCycleDetector] = None
+        self.cycle_evaluations: Dict[Tuple[int, ...], CycleEvaluation] = dict()
 
     
     def get_recommended_u_eth(self: Self, block_number: BlockNumber) -> float:
@@ -46,6 +53,11 @@ class ArbitrageService():
         self: Self, exchange_graph: ExchangeGraph, u_eth: Optional[float] = None,
         max_hops: int = 3, block_identifier: BlockIdentifier = "latest"
     ) -> Generator[Arbitrage, None, None]:
+        '''
+        Every cycle of 2 to max_hops hops through distinct tokens, starting with
+        u_eth worth of its first token. Paths advance one hop at a time all
+        together, quoting each hop level in one batch.
+        '''
         block_number: BlockNumber = block_identifier_to_number(
             w3 = self.w3,
             block_identifier = block_identifier
@@ -59,32 +71,53 @@ class ArbitrageService():
             block_identifier = block_number
         )
 
-        with ThreadPool() as pool:
-            yield from chain.from_iterable(
-                pool.map(
-                    func = lambda tup: list(self.__find_arbitrages_naive(
-                        exchange_graph = exchange_graph,
-                        hops = tup[1],
-                        token_in = tup[0],
-                        amount_in = round(
-                            u_eth * token_prices_eth.get(tup[0]) * 1e18
-                        ),
-                        curr_path = Path(),
-                        block_number = block_number
-                    )),
-                    iterable = (
-                        (token_in, hops)
-                        for hops in range(2, max_hops + 1)
-                        for token_in in exchange_graph.tokens
-                    )
-                )
+        path_frontier: PathFrontier = PathFrontier(
+            exchange_graph = exchange_graph,
+            amounts_in = {
+                token_in: round(u_eth * price_eth * 1e18)
+                for token_in, price_eth in token_prices_eth.items()
+                if price_eth is not None
+            },
+            block_number = block_number,
+            max_hops = max_hops
+        )
+        while not path_frontier.done:
+            next_hops: List[Tuple[ExchangeEdge, int]] = path_frontier.next_hops()
+            amount_out_list: List[int] = self.__quote(
+                quote_function_meta_list = ExchangeEdge.get_quote_function_meta_list(
+                    edge_amounts = next_hops,
+                    block_identifier = block_number
+                ),
+                block_number = block_number
             )
+            for path in path_frontier.advance(amounts_out = amount_out_list):
+                yield Arbitrage(
+                    path = path,
+                    expected_gas = 0, # TODO implement expected gas
+                    block_number = block_number
+                )
 
 
     def find_arbitrages_bellman_ford(
         self: Self, exchange_graph: ExchangeGraph, u_eth: Optional[float] = None,
-        max_hops: int = 3, block_identifier: BlockIdentifier = "latest"
+        max_hops: int = 3, block_identifier: BlockIdentifier = "latest",
+        u_eth_levels: Optional[List[float]] = None, incremental: bool = False,
+        changed_pools: Optional[Set[ChecksumAddress]] = None
     ) -> Generator[Arbitrage, None, None]:
+        '''
+        Only cycles of at most max_hops hops are searched and evaluated.
+        With u_eth_levels, every edge is quoted at each level in the same batch and
+        cycles are searched at every level, interpolating on the edges' quote curves.
+        With incremental (and no u_eth_levels), cycles are kept by the service's
+        cycle detector from one call to the next, which only re-relaxes around
+        the edges whose rates changed since the last call. It tracks disjoint
+        cycles like those of RateMatrix.find_negative_cycles, which are fewer
+        than those the bounded search enumerates. Given changed_pools, the pools whose state
+        changed since the last call, only the quotes of their edges are passed
+        to the detector, the other edges keeping their last quotes. Only the
+        cycles that appeared, or whose cells or amount in changed, are evaluated
+        again; the others give their last evaluation at this block.
+        '''
         assert max_hops > 1, f"At least 2 hops are needed for an arbitrage. Given max_hops = {max_hops}."
         
         block_number: BlockNumber = block_identifier_to_number(
@@ -98,31 +131,114 @@ class ArbitrageService():
         quote_graph: QuoteGraph = self.__construct_quote_graph(
             exchange_graph = exchange_graph,
             u_eth = u_eth,
-            block_number = block_number
+            block_number = block_number,
+            u_eth_grid = u_eth_levels
         )
 
-        path_meta_list: Generator[List[ExchangeEdge], None, None] = quote_graph.find_potential_arbitrage_path_meta()
-
-        with ThreadPool() as pool:
-            yield from filter(
-                lambda arbitrage: arbitrage is not None,
-                pool.map(
-                    func = lambda path_meta: self.evaluate_arbitrage(
-                        path_meta = path_meta,
-                        amount_in = quote_graph.get_quote(
-                            path_meta[0]
-                        ).amount_in,
-                        block_number = block_number
-                    ),
-                    iterable = path_meta_list
-                )
+        if incremental and u_eth_levels is None:
+            yield from self.__find_incremental_arbitrages(
+                quote_graph = quote_graph,
+                max_hops = max_hops,
+                block_number = block_number,
+                changed_pools = changed_pools
+            )
+            return
+
+        quote_graphs: List[QuoteGraph] = (
+            [quote_graph] if u_eth_levels is None
+            else [quote_graph.rescale(u_eth_level / u_eth) for u_eth_level in u_eth_levels]
+        )
+
+        path_meta_list: Iterable[Tuple[List[ExchangeEdge], int]] = (
+            (path_meta, rate_matrix.get_quote(path_meta[0]).amount_in)
+            for rate_matrix in map(RateMatrix.from_quote_graph, quote_graphs)
+            for path_meta in rate_matrix.find_potential_arbitrage_path_meta(max_hops = max_hops)
+        )
+
+        yield from filter(
+            lambda arbitrage: arbitrage is not None,
+            self.runtime.task_pool.map(
+                func = lambda tup: self.evaluate_arbitrage(
+                    path_meta = tup[0],
+                    amount_in = tup[1],
+                    block_number = block_number
+                ),
+                iterable = path_meta_list
             )
+        )
+
+
+    def __find_incremental_arbitrages(
+        self: Self, quote_graph: QuoteGraph, max_hops: int, block_number: BlockNumber,
+        changed_pools: Optional[Set[ChecksumAddress]] = None
+    ) -> Generator[Arbitrage, None, None]:
+        '''
+        Arbitrages of the cycles of at most max_hops hops of the cycle detector
+        updated with the quotes of quote_graph (of the edges of changed_pools
+        only if given), starting a new detector if the tokens or edges changed.
+        Cycles start with the amount in of quote_graph, of this block.
+        '''
+        edges: Dict[ExchangeEdgeId, ExchangeEdge] = {
+            exchange_edge.id: exchange_edge for _, _, exchange_edge in quote_graph.edges(keys = True)
+        }
+        appeared_cycles: Set[Tuple[int, ...]] = set()
+        if self.cycle_detector is None or not self.cycle_detector.covers(tokens = list(quote_graph.nodes), edge_ids = edges):
+            self.cycle_detector = IncrementalCycleDetector(rate_matrix = RateMatrix.from_quote_graph(quote_graph))
+            self.cycle_evaluations = dict()
+        else:
+            new_cycles, vanished_cycles = self.cycle_detector.update(quotes = {
+                exchange_edge: quote_graph.get_quote(exchange_edge)
+                for exchange_edge in edges.values()
+                if changed_pools is None or exchange_edge.pool_address in changed_pools
+            })
+            appeared_cycles = set(map(tuple, new_cycles))
+            for cycle in vanished_cycles:
+                self.cycle_evaluations.pop(tuple(cycle), None)
+
+        stale_cycles: List[Tuple[Tuple[int, ...], List[ExchangeEdge], int]] = []
+        for cycle in map(tuple, self.cycle_detector.get_cycles()):
+            if len(cycle) > max_hops:
+                continue
+            path_meta: List[ExchangeEdge] = [
+                edges[exchange_edge.id] for exchange_edge in self.cycle_detector.rate_matrix.get_path_meta(cycle = list(cycle))
+            ]
+            amount_in: int = quote_graph.get_quote(path_meta[0]).amount_in
+            evaluation: Optional[CycleEvaluation] = self.cycle_evaluations.get(cycle)
+            if (
+                cycle in appeared_cycles
+                or evaluation is None
+                or evaluation[:2] != (tuple(exchange_edge.id for exchange_edge in path_meta), amount_in)
+                or self.cycle_detector.is_changed(cycle = list(cycle))
+            ):
+                stale_cycles.append((cycle, path_meta, amount_in))
+            elif evaluation[2] is not None:
+                yield evaluation[2].at_block(path_meta = path_meta, block_number = block_number)
+
+        for (cycle, path_meta, amount_in), arbitrage in zip(stale_cycles, self.runtime.task_pool.map(
+            func = lambda tup: self.evaluate_arbitrage(
+                path_meta = tup[1],
+                amount_in = tup[2],
+                block_number = block_number
+            ),
+            iterable = stale_cycles
+        )):
+            self.cycle_evaluations[cycle] = (
+                tuple(exchange_edge.id for exchange_edge in path_meta), amount_in, arbitrage
+            )
+            if arbitrage is not None:
+                yield arbitrage
 
 
     def __construct_quote_graph(
         self: Self, exchange_graph: ExchangeGraph,
-        u_eth: float, block_number: BlockNumber
+        u_eth: float, block_number: BlockNumber,
+        u_eth_grid: Optional[List[float]] = None
     ) -> QuoteGraph:
+        '''
+        Quote every edge at u_eth. With u_eth_grid, every edge is also quoted at
+        each u of the grid (see geometric_grid) within the same batch, and gets a
+        quote curve over those amounts.
+        '''
         token_prices_eth: Dict[ChecksumAddress, int] = self.price_feed_service.fetch_price_eth(
             tokens = exchange_graph.tokens,
             block_identifier = block_number
@@ -149,135 +265,76 @@ class ArbitrageService():
             )
         )
 
-        quote_function_meta_list: List[QuoteFunctionMeta] = [
-            edge.get_quote_function_meta(
-                amount_in = amount_in_dict.get(edge.token_in),
-                block_identifier = block_number
-            )
-            for edge in edges
+        # Scales of u_eth quoted per edge, u_eth itself first
+        scales: List[float] = [1.0] + [
+            u / u_eth for u in (u_eth_grid if u_eth_grid is not None else []) if u != u_eth
         ]
-        
-        amount_out_list: List[int] = self.contract_service.multicall(
-            calls = [
-                meta.call for meta in quote_function_meta_list
+
+        quote_function_meta_list: List[QuoteFunctionMeta] = ExchangeEdge.get_quote_function_meta_list(
+            edge_amounts = [
+                (edge, round(amount_in_dict.get(edge.token_in) * scale))
+                for edge in edges
+                for scale in scales
             ],
-            require_success = False,
-            block_identifier = block_number,
-            callbacks = [
-                meta.callback for meta in quote_function_meta_list
-            ]
+            block_identifier = block_number
+        )
+        
+        amount_out_list: List[int] = self.__quote(
+            quote_function_meta_list = quote_function_meta_list,
+            block_number = block_number,
+            hedge = True
         )
 
-        for edge, amount_out in zip(edges, amount_out_list):
+        for i, edge in enumerate(edges):
+            edge_amount_out_list: List[int] = amount_out_list[i * len(scales): (i + 1) * len(scales)]
             quote_graph.add_edge(
                 edge.token_in, edge.token_out, edge, **asdict(Quote(
                     token_in = edge.token_in,
                     token_out = edge.token_out,
                     amount_in = amount_in_dict.get(edge.token_in),
-                    amount_out = amount_out
+                    amount_out = edge_amount_out_list[0]
                 ))
             )
+            if u_eth_grid is not None:
+                quote_graph[edge.token_in][edge.token_out][edge]["quote_curve"] = QuoteCurve(
+                    amounts_in = numpy.array([amount_in_dict.get(edge.token_in) * scale for scale in scales]),
+                    amounts_out = numpy.array(edge_amount_out_list, dtype = numpy.float64)
+                )
         
         return quote_graph
 
 
-    def __find_arbitrages_naive(
-        self, exchange_graph: ExchangeGraph, hops: int,
-        token_in: ChecksumAddress, amount_in: int,
-        curr_path: Path, block_number: BlockNumber
-    ) -> Generator[Arbitrage, None, None]:  
-        curr_token_in: ChecksumAddress = curr_path[-1].exchange_edge.token_out if curr_path else token_in
-        curr_amount_in: int = curr_path[-1].amount_out if curr_path else amount_in
-
-        if hops == 1:
-            edges: List[ExchangeEdge] = exchange_graph.get_edges(
-                token_in = curr_token_in,
-                token_out = token_in
-            )
-            amount_out_list: List[int] = self.contract_service.multicall(
-                calls = [ 
-                    edge.get_quote_function_meta(
-                        amount_in = curr_amount_in,
-                        block_identifier = block_number
-                    ).call
-                    for edge in edges
-                ],
-                require_success = False,
-                block_identifier = block_number,
-                callbacks = [ 
-                    edge.get_quote_function_meta(
-                        amount_in = curr_amount_in,
-                        block_identifier = block_number
-                    ).callback
-                    for edge in edges
-                ]
-            )
-            for edge, amount_out in zip(edges, amount_out_list):
-                curr_path.append(
-                    Hop(
-                        exchange_edge = edge,
-                        amount_in = curr_amount_in,
-                        amount_out = amount_out,
-                        block_number = block_number
-                    )
-                )
-                if curr_path[-1].amount_out > amount_in:
-                    yield Arbitrage(
-                        path = deepcopy(curr_path),
-                        expected_gas = 0, # TODO implement expected gas
-                        block_number = block_number
-                    )
-                curr_path.pop()
-        else:
-            edges: List[ExchangeEdge] = list(
-                chain.from_iterable(
-                    exchange_graph.get_edges(
-                        token_in = curr_token_in,
-                        token_out = next_token
-                    )
-                    for next_token in exchange_graph.tokens
-                    if next_token not in curr_path and curr_token_in != next_token
-                )
-            )
+    def __quote(
+        self: Self, quote_function_meta_list: List[QuoteFunctionMeta],
+        block_number: BlockNumber, hedge: bool = False
+    ) -> List[int]:
+        '''
+        Amounts out of the quotes, multicalling only those that are not computed locally
+        '''
+        amount_out_list: List[Optional[int]] = [
+            meta.callback(None) if meta.call is None else None
+            for meta in quote_function_meta_list
+        ]
 
-            amount_out_list: List[int] = self.contract_service.multicall(
+        on_chain_indices: List[int] = [
+            i for i, meta in enumerate(quote_function_meta_list) if meta.call is not None
+        ]
+        if on_chain_indices:
+            for i, amount_out in zip(on_chain_indices, self.contract_service.multicall(
                 calls = [
-                    edge.get_quote_function_meta(
-                        amount_in = curr_amount_in,
-                        block_identifier = block_number
-                    ).call
-                    for edge in edges
+                    quote_function_meta_list[i].call for i in on_chain_indices
                 ],
                 require_success = False,
                 block_identifier = block_number,
-                callbacks = [ 
-                    edge.get_quote_function_meta(
-                        amount_in = curr_amount_in,
-                        block_identifier = block_number
-                    ).callback
-                    for edge in edges
-                ]
-            )
+                callbacks = [
+                    quote_function_meta_list[i].callback for i in on_chain_indices
+                ],
+                hedge = hedge
+            )):
+                amount_out_list[i] = amount_out
+
+        return amount_out_list
 
-            for edge, amount_out in zip(edges, amount_out_list):
-                curr_path.append(
-                    Hop(
-                        exchange_edge = edge,
-                        amount_in = curr_amount_in,
-                        amount_out = amount_out,
-                        block_number = block_number
-                    )
-                )
-                yield from self.__find_arbitrages_naive(
-                    exchange_graph = exchange_graph,
-                    hops = hops - 1,
-                    token_in = token_in,
-                    amount_in = amount_in,
-                    curr_path = deepcopy(curr_path),
-                    block_number = block_number
-                )
-                curr_path.pop()
-    
 
     def evaluate_arbitrage(
         self: Self, path_meta: List[ExchangeEdge], amount_in: int,
@@ -293,15 +350,9 @@ class ArbitrageService():
                 block_identifier = block_number
             )
 
-            next_amount: int = self.contract_service.multicall(
-                calls = [
-                    quote_function_meta.call
-                ],
-                require_success = False,
-                block_identifier = block_number,
-                callbacks = [
-                    quote_function_meta.callback
-                ]
+            next_amount: int = self.__quote(
+                quote_function_meta_list = [quote_function_meta],
+                block_number = block_number
             )[0]
 
             path.append(
@@ -0,0 +1,396 @@
+from .async_contract_service import AsyncContractService
+from .async_price_feed_service import AsyncPriceFeedService
+
+from ..data_structures.exchange_graph import QuoteFunctionMeta, ExchangeEdge, ExchangeEdgeId, ExchangeGraph
+from ..data_structures.quote_graph import Quote, QuoteGraph
+from ..data_structures.quote_curve import QuoteCurve
+from ..data_structures.rate_matrix import RateMatrix
+from ..data_structures.incremental_cycle_detector import IncrementalCycleDetector
+from ..data_structures.arbitrage import Hop, Path, Arbitrage, CycleEvaluation
+from ..data_structures.path_frontier import PathFrontier
+from ..data_structures.price_cache import PriceCache
+from ..utils.web3_utils import async_block_identifier_to_number
+
+from web3 import AsyncWeb3
+from eth_typing.evm import ChecksumAddress, BlockNumber, BlockIdentifier
+import numpy
+
+import asyncio
+from typing import (
+    AsyncGenerator,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple
+)
+from typing_extensions import Self
+from dataclasses import asdict
+from itertools import chain
+
+
+class AsyncArbitrageService():
+    '''
+    asyncio counterpart of ArbitrageService. All fan-outs are coroutines sharing the
+    concurrency limit of a single AsyncContractService instead of nested thread pools.
+    Token prices go through price_cache if given.
+    '''
+    def __init__(
+        self: Self, w3: AsyncWeb3, contract_service: Optional[AsyncContractService] = None,
+        price_cache: Optional[PriceCache] = None
+    ) -> None:
+        self.w3: AsyncWeb3 = w3
+
+        self.contract_service: AsyncContractService = (
+            contract_service if contract_service is not None
+            else AsyncContractService(w3 = self.w3)
+        )
+        self.price_feed_service: AsyncPriceFeedService = AsyncPriceFeedService(
+            w3 = self.w3,
+            contract_service = self.contract_service,
+            price_cache = price_cache
+        )
+        # Cycles of the last incremental search, see find_arbitrages_bellman_ford
+        self.cycle_detector: Optional[IncrementalCycleDetector] = None
+        self.cycle_evaluations: Dict[Tuple[int, ...], CycleEvaluation] = dict()
+
+
+    async def get_recommended_u_eth(self: Self, block_number: BlockNumber) -> float:
+        base_fee_per_gas: int = await self.contract_service.get_base_fee_per_gas(
+            block_identifier = block_number
+        )
+        return base_fee_per_gas * 1e7
+
+
+    async def find_arbitrages_naive(
+        self: Self, exchange_graph: ExchangeGraph, u_eth: Optional[float] = None,
+        max_hops: int = 3, block_identifier: BlockIdentifier = "latest"
+    ) -> AsyncGenerator[Arbitrage, None]:
+        '''
+        Every cycle of 2 to max_hops hops through distinct tokens, starting with
+        u_eth worth of its first token. Paths advance one hop at a time all
+        together, quoting each hop level in one batch.
+        '''
+        block_number: BlockNumber = await async_block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        if u_eth is None:
+            u_eth: float = await self.get_recommended_u_eth(block_number = block_number)
+
+        token_prices_eth: Dict[ChecksumAddress, float] = await self.price_feed_service.fetch_price_eth(
+            tokens = exchange_graph.tokens,
+            block_identifier = block_number
+        )
+
+        path_frontier: PathFrontier = PathFrontier(
+            exchange_graph = exchange_graph,
+            amounts_in = {
+                token_in: round(u_eth * price_eth * 1e18)
+                for token_in, price_eth in token_prices_eth.items()
+                if price_eth is not None
+            },
+            block_number = block_number,
+            max_hops = max_hops
+        )
+        while not path_frontier.done:
+            next_hops: List[Tuple[ExchangeEdge, int]] = path_frontier.next_hops()
+            amount_out_list: List[int] = await self.__quote(
+                quote_function_meta_list = ExchangeEdge.get_quote_function_meta_list(
+                    edge_amounts = next_hops,
+                    block_identifier = block_number
+                ),
+                block_number = block_number
+            )
+            for path in path_frontier.advance(amounts_out = amount_out_list):
+                yield Arbitrage(
+                    path = path,
+                    expected_gas = 0, # TODO implement expected gas
+                    block_number = block_number
+                )
+
+
+    async def find_arbitrages_bellman_ford(
+        self: Self, exchange_graph: ExchangeGraph, u_eth: Optional[float] = None,
+        max_hops: int = 3, block_identifier: BlockIdentifier = "latest",
+        u_eth_levels: Optional[List[float]] = None, incremental: bool = False,
+        changed_pools: Optional[Set[ChecksumAddress]] = None
+    ) -> AsyncGenerator[Arbitrage, None]:
+        '''
+        Only cycles of at most max_hops hops are searched and evaluated.
+        With u_eth_levels, every edge is quoted at each level in the same batch and
+        cycles are searched at every level, interpolating on the edges' quote curves.
+        With incremental (and no u_eth_levels), cycles are kept by the service's
+        cycle detector from one call to the next, which only re-relaxes around
+        the edges whose rates changed since the last call. It tracks disjoint
+        cycles like those of RateMatrix.find_negative_cycles, which are fewer
+        than those the bounded search enumerates. Given changed_pools, the pools whose state
+        changed since the last call, only the quotes of their edges are passed
+        to the detector, the other edges keeping their last quotes. Only the
+        cycles that appeared, or whose cells or amount in changed, are evaluated
+        again; the others give their last evaluation at this block.
+        '''
+        assert max_hops > 1, f"At least 2 hops are needed for an arbitrage. Given max_hops = {max_hops}."
+
+        block_number: BlockNumber = await async_block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        if u_eth is None:
+            u_eth: float = await self.get_recommended_u_eth(block_number = block_number)
+
+        quote_graph: QuoteGraph = await self.__construct_quote_graph(
+            exchange_graph = exchange_graph,
+            u_eth = u_eth,
+            block_number = block_number,
+            u_eth_grid = u_eth_levels
+        )
+
+        if incremental and u_eth_levels is None:
+            async for arbitrage in self.__find_incremental_arbitrages(
+                quote_graph = quote_graph,
+                max_hops = max_hops,
+                block_number = block_number,
+                changed_pools = changed_pools
+            ):
+                yield arbitrage
+            return
+
+        quote_graphs: List[QuoteGraph] = (
+            [quote_graph] if u_eth_levels is None
+            else [quote_graph.rescale(u_eth_level / u_eth) for u_eth_level in u_eth_levels]
+        )
+
+        for arbitrage in asyncio.as_completed([
+            self.evaluate_arbitrage(
+                path_meta = path_meta,
+                amount_in = rate_matrix.get_quote(
+                    path_meta[0]
+                ).amount_in,
+                block_number = block_number
+            )
+            for rate_matrix in map(RateMatrix.from_quote_graph, quote_graphs)
+            for path_meta in rate_matrix.find_potential_arbitrage_path_meta(max_hops = max_hops)
+        ]):
+            arbitrage: Optional[Arbitrage] = await arbitrage
+            if arbitrage is not None:
+                yield arbitrage
+
+
+    async def evaluate_arbitrage(
+        self: Self, path_meta: List[ExchangeEdge], amount_in: int,
+        block_number: BlockNumber, only_profitable: bool = True
+    ) -> Optional[Arbitrage]:
+        path: Path = Path()
+
+        curr_amount: int = amount_in
+        for edge in path_meta:
+            next_amount: int = (await self.__quote_edges(
+                edges = [edge],
+                amount_in = curr_amount,
+                block_number = block_number
+            ))[0]
+
+            path.append(
+                Hop(
+                    exchange_edge = edge,
+                    amount_in = curr_amount,
+                    amount_out = next_amount,
+                    block_number = block_number
+                )
+            )
+            curr_amount = next_amount
+
+        if (
+            not only_profitable
+            or curr_amount > amount_in # Profitable
+        ):
+            return Arbitrage(
+                path = path,
+                block_number = block_number,
+                expected_gas = 0 # TODO implement expected gas
+            )
+
+        return None
+
+
+    async def __find_incremental_arbitrages(
+        self: Self, quote_graph: QuoteGraph, max_hops: int, block_number: BlockNumber,
+        changed_pools: Optional[Set[ChecksumAddress]] = None
+    ) -> AsyncGenerator[Arbitrage, None]:
+        '''
+        Arbitrages of the cycles of at most max_hops hops of the cycle detector
+        updated with the quotes of quote_graph (of the edges of changed_pools
+        only if given), starting a new detector if the tokens or edges changed.
+        Cycles start with the amount in of quote_graph, of this block.
+        '''
+        edges: Dict[ExchangeEdgeId, ExchangeEdge] = {
+            exchange_edge.id: exchange_edge for _, _, exchange_edge in quote_graph.edges(keys = True)
+        }
+        appeared_cycles: Set[Tuple[int, ...]] = set()
+        if self.cycle_detector is None or not self.cycle_detector.covers(tokens = list(quote_graph.nodes), edge_ids = edges):
+            self.cycle_detector = IncrementalCycleDetector(rate_matrix = RateMatrix.from_quote_graph(quote_graph))
+            self.cycle_evaluations = dict()
+        else:
+            new_cycles, vanished_cycles = self.cycle_detector.update(quotes = {
+                exchange_edge: quote_graph.get_quote(exchange_edge)
+                for exchange_edge in edges.values()
+                if changed_pools is None or exchange_edge.pool_address in changed_pools
+            })
+            appeared_cycles = set(map(tuple, new_cycles))
+            for cycle in vanished_cycles:
+                self.cycle_evaluations.pop(tuple(cycle), None)
+
+        stale_cycles: List[Tuple[Tuple[int, ...], List[ExchangeEdge], int]] = []
+        for cycle in map(tuple, self.cycle_detector.get_cycles()):
+            if len(cycle) > max_hops:
+                continue
+            path_meta: List[ExchangeEdge] = [
+                edges[exchange_edge.id] for exchange_edge in self.cycle_detector.rate_matrix.get_path_meta(cycle = list(cycle))
+            ]
+            amount_in: int = quote_graph.get_quote(path_meta[0]).amount_in
+            evaluation: Optional[CycleEvaluation] = self.cycle_evaluations.get(cycle)
+            if (
+                cycle in appeared_cycles
+                or evaluation is None
+                or evaluation[:2] != (tuple(exchange_edge.id for exchange_edge in path_meta), amount_in)
+                or self.cycle_detector.is_changed(cycle = list(cycle))
+            ):
+                stale_cycles.append((cycle, path_meta, amount_in))
+            elif evaluation[2] is not None:
+                yield evaluation[2].at_block(path_meta = path_meta, block_number = block_number)
+
+        arbitrages: List[Optional[Arbitrage]] = await asyncio.gather(*(
+            self.evaluate_arbitrage(
+                path_meta = path_meta,
+                amount_in = amount_in,
+                block_number = block_number
+            )
+            for _, path_meta, amount_in in stale_cycles
+        ))
+        for (cycle, path_meta, amount_in), arbitrage in zip(stale_cycles, arbitrages):
+            self.cycle_evaluations[cycle] = (
+                tuple(exchange_edge.id for exchange_edge in path_meta), amount_in, arbitrage
+            )
+            if arbitrage is not None:
+                yield arbitrage
+
+
+    async def __construct_quote_graph(
+        self: Self, exchange_graph: ExchangeGraph,
+        u_eth: float, block_number: BlockNumber,
+        u_eth_grid: Optional[List[float]] = None
+    ) -> QuoteGraph:
+        '''
+        Quote every edge at u_eth. With u_eth_grid, every edge is also quoted at
+        each u of the grid (see geometric_grid) within the same batch, and gets a
+        quote curve over those amounts.
+        '''
+        token_prices_eth: Dict[ChecksumAddress, float] = await self.price_feed_service.fetch_price_eth(
+            tokens = exchange_graph.tokens,
+            block_identifier = block_number
+        )
+
+        amount_in_dict: Dict[ChecksumAddress, int] = {
+            token_in: round(
+                u_eth * token_prices_eth.get(token_in) * 1e18
+            )
+            for token_in in exchange_graph.tokens
+        }
+
+        quote_graph: QuoteGraph = QuoteGraph(block_number = block_number)
+
+        edges: List[ExchangeEdge] = list(
+            chain.from_iterable(
+                exchange_graph.get_edges(
+                    token_in = token_in,
+                    token_out = token_out
+                )
+                for token_in in exchange_graph.tokens
+                for token_out in exchange_graph.tokens
+                if token_in != token_out
+            )
+        )
+
+        # Scales of u_eth quoted per edge, u_eth itself first
+        scales: List[float] = [1.0] + [
+            u / u_eth for u in (u_eth_grid if u_eth_grid is not None else []) if u != u_eth
+        ]
+
+        quote_function_meta_list: List[QuoteFunctionMeta] = ExchangeEdge.get_quote_function_meta_list(
+            edge_amounts = [
+                (edge, round(amount_in_dict.get(edge.token_in) * scale))
+                for edge in edges
+                for scale in scales
+            ],
+            block_identifier = block_number
+        )
+
+        amount_out_list: List[int] = await self.__quote(
+            quote_function_meta_list = quote_function_meta_list,
+            block_number = block_number
+        )
+
+        for i, edge in enumerate(edges):
+            edge_amount_out_list: List[int] = amount_out_list[i * len(scales): (i + 1) * len(scales)]
+            quote_graph.add_edge(
+                edge.token_in, edge.token_out, edge, **asdict(Quote(
+                    token_in = edge.token_in,
+                    token_out = edge.token_out,
+                    amount_in = amount_in_dict.get(edge.token_in),
+                    amount_out = edge_amount_out_list[0]
+                ))
+            )
+            if u_eth_grid is not None:
+                quote_graph[edge.token_in][edge.token_out][edge]["quote_curve"] = QuoteCurve(
+                    amounts_in = numpy.array([amount_in_dict.get(edge.token_in) * scale for scale in scales]),
+                    amounts_out = numpy.array(edge_amount_out_list, dtype = numpy.float64)
+                )
+
+        return quote_graph
+
+
+    async def __quote(
+        self: Self, quote_function_meta_list: List[QuoteFunctionMeta], block_number: BlockNumber
+    ) -> List[int]:
+        '''
+        Amounts out of the quotes, multicalling only those that are not computed locally
+        '''
+        amount_out_list: List[Optional[int]] = [
+            meta.callback(None) if meta.call is None else None
+            for meta in quote_function_meta_list
+        ]
+
+        on_chain_indices: List[int] = [
+            i for i, meta in enumerate(quote_function_meta_list) if meta.call is not None
+        ]
+        if on_chain_indices:
+            for i, amount_out in zip(on_chain_indices, await self.contract_service.multicall(
+                calls = [
+                    quote_function_meta_list[i].call for i in on_chain_indices
+                ],
+                require_success = False,
+                block_identifier = block_number,
+                callbacks = [
+                    quote_function_meta_list[i].callback for i in on_chain_indices
+                ]
+            )):
+                amount_out_list[i] = amount_out
+
+        return amount_out_list
+
+
+    async def __quote_edges(
+        self: Self, edges: List[ExchangeEdge], amount_in: int, block_number: BlockNumber
+    ) -> List[int]:
+        quote_function_meta_list: List[QuoteFunctionMeta] = ExchangeEdge.get_quote_function_meta_list(
+            edge_amounts = [(edge, amount_in) for edge in edges],
+            block_identifier = block_number
+        )
+
+        return await self.__quote(
+            quote_function_meta_list = quote_function_meta_list,
+            block_number = block_number
+        )
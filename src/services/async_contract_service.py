@@ -0,0 +1,362 @@
+from ..data_structures.adaptive_chunk_sizer import AdaptiveChunkSizer, CallType
+from ..data_structures.base_fee_history import BaseFeeHistory
+from ..data_structures.call import Call, CallReturn
+from ..data_structures.call_codec import CallCodecCache
+from ..data_structures.chunk_bisector import ChunkBisector, ChunkResult
+from ..data_structures.multicall_backend import EncodedCall, MulticallBackend, Multicall3Backend
+from ..data_structures.rate_limiter import RateLimiter
+from ..utils.abi import get_abi
+from ..utils.web3_utils import async_block_identifier_to_number
+
+from web3 import AsyncWeb3
+from web3.contract import AsyncContract
+from web3.types import TxParams, Wei
+from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
+
+import asyncio
+from time import perf_counter
+from typing import Dict, Any, Iterable, List, Tuple, Optional, Union, Callable
+
+
+class AsyncContractService:
+    '''
+    asyncio counterpart of ContractService. Every RPC goes through a single semaphore
+    so that fan-outs of any size never have more than max_concurrent_requests in flight,
+    and through rate_limiter if given.
+
+    Multicall chunks are planned and bisected on failure as in ContractService,
+    sized by chunk_sizer unless a fixed chunk_size is given.
+    '''
+    def __init__(
+        self, w3: AsyncWeb3, max_concurrent_requests: int = 32,
+        multicall_backend: Optional[MulticallBackend] = None,
+        base_fee_history: Optional[BaseFeeHistory] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        chunk_sizer: Optional[AdaptiveChunkSizer] = None
+    ) -> None:
+        self.w3: AsyncWeb3 = w3
+        self.chunk_sizer: AdaptiveChunkSizer = (
+            chunk_sizer if chunk_sizer is not None else AdaptiveChunkSizer()
+        )
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+
+        self.contract_cache: Dict[ChecksumAddress, AsyncContract] = dict()
+        self.codec_cache: CallCodecCache = CallCodecCache()
+        self.multicall_backend: MulticallBackend = (
+            multicall_backend if multicall_backend is not None else Multicall3Backend()
+        )
+        self.multicall_contract: AsyncContract = self.__call_contract(
+            address = self.multicall_backend.address,
+            abi = get_abi(self.multicall_backend.ABI_NAME)
+        )
+
+        self.base_fee_history: BaseFeeHistory = (
+            base_fee_history if base_fee_history is not None else BaseFeeHistory()
+        )
+
+
+    def add_contract(self, address: ChecksumAddress, abi: Any) -> None:
+        if address not in self.contract_cache:
+            self.__call_contract(address = address, abi = abi)
+        return None
+
+
+    def get_contract(self, address: ChecksumAddress, abi: Any = None) -> AsyncContract:
+        if address in self.contract_cache:
+            return self.contract_cache[address]
+
+        if abi is None:
+            raise Exception(f"Contract {address} is not found in cache while ABI is not specified")
+
+        return self.__call_contract(address = address, abi = abi)
+
+
+    async def get_base_fee_per_gas(self, block_identifier: BlockIdentifier = "latest") -> int:
+        block_number: int = await async_block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        base_fee_per_gas: Optional[int] = self.base_fee_history.get(block_number)
+        if base_fee_per_gas is not None:
+            return base_fee_per_gas
+
+        async with self.semaphore:
+            await self.__acquire()
+            base_fee_per_gas_raw: List[int] = (await self.w3.eth.fee_history(
+                block_count = 1,
+                newest_block = block_number
+            ))["baseFeePerGas"]
+
+        self.base_fee_history.put_range(
+            oldest_block = block_number,
+            base_fees = base_fee_per_gas_raw
+        )
+
+        return base_fee_per_gas_raw[0]
+
+
+    async def prefetch_base_fees(self, block_numbers: Iterable[BlockNumber]) -> None:
+        '''
+        Fetch the base fees of all block_numbers not known yet, in concurrent
+        fee_history windows of up to 1024 blocks, and save the history if it has a path
+        '''
+        async def fetch_window(newest_block: BlockNumber, block_count: int) -> None:
+            async with self.semaphore:
+                await self.__acquire()
+                fee_history: Dict[str, Any] = await self.w3.eth.fee_history(
+                    block_count = block_count,
+                    newest_block = newest_block
+                )
+            self.base_fee_history.put_range(
+                oldest_block = fee_history["oldestBlock"],
+                base_fees = fee_history["baseFeePerGas"]
+            )
+
+        await asyncio.gather(*[
+            fetch_window(newest_block = newest_block, block_count = block_count)
+            for newest_block, block_count in BaseFeeHistory.plan_windows(
+                block_numbers = self.base_fee_history.missing(block_numbers)
+            )
+        ])
+        self.base_fee_history.save()
+
+
+    async def multicall(
+        self, calls: List[Union[Call, Dict[str, Any]]],
+        require_success: bool = True, block_identifier: BlockIdentifier = "latest",
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None,
+        chunk_size: Optional[int] = None
+    ) -> List[Any]:
+        '''
+        Aggregate the calls through the multicall backend. Without chunk_size the
+        chunk size is learned per call type by chunk_sizer. A chunk failing as a
+        whole on its content (out of gas, response too large) is bisected and
+        retried so only the failing calls are lost, see ChunkBisector.
+        '''
+        if callbacks is not None:
+            assert len(calls) == len(callbacks), (
+                f"Length mismatch between calls ({len(calls)}) and callbacks ({len(callbacks)})."
+            )
+
+        calls: List[Call] = self.__prepare_calls(calls = calls)
+
+        multicall_result: List[CallReturn] = await self.__multicall(
+            calls = calls,
+            require_success = require_success,
+            block_identifier = block_identifier,
+            chunk_size = chunk_size
+        )
+
+        if callbacks is None:
+            return multicall_result
+
+        return list(map(
+            lambda x: x[0](x[1]), zip(
+                callbacks, multicall_result
+            )
+        ))
+
+
+    async def batch_call(
+        self, calls: List[Union[Call, Dict[str, Any]]],
+        require_success: bool = True, block_identifier: BlockIdentifier = "latest",
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None
+    ) -> List[Any]:
+        if callbacks is not None:
+            assert len(calls) == len(callbacks), (
+                f"Length mismatch between calls ({len(calls)}) and callbacks ({len(callbacks)})."
+            )
+
+        calls: List[Call] = self.__prepare_calls(calls = calls)
+
+        results: List[CallReturn] = await asyncio.gather(*[
+            self.__try_call_helper(
+                call = call,
+                require_success = require_success,
+                block_identifier = block_identifier
+            )
+            for call in calls
+        ])
+
+        if callbacks is None:
+            return results
+
+        return list(map(
+            lambda x: x[0](x[1]), zip(
+                callbacks, results
+            )
+        ))
+
+
+    async def estimate_gas(self, transaction: TxParams, block_identifier: BlockIdentifier = "latest") -> Wei:
+        async with self.semaphore:
+            await self.__acquire()
+            return await self.w3.eth.estimate_gas(
+                transaction = transaction,
+                block_identifier = block_identifier
+            )
+
+
+    async def __acquire(self) -> None:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(
+                endpoint_uri = self.w3.provider.endpoint_uri
+            )
+
+
+    def __prepare_calls(self, calls: List[Union[Call, Dict[str, Any]]]) -> List[Call]:
+        calls: List[Call] = [call if isinstance(call, Call) else Call(**call) for call in calls]
+        for call in calls:
+            if call.contract_address not in self.contract_cache:
+                if call.contract_abi is None:
+                    raise Exception(
+                        f"Contract {call.contract_address} is never called. Use add_contract() to add the contract or specify the ABI to the Call object."
+                    )
+                self.add_contract(
+                    address = call.contract_address,
+                    abi = call.contract_abi
+                )
+        return calls
+
+
+    async def __try_call_helper(
+        self, call: Call, require_success: bool = True,
+        block_identifier: BlockIdentifier = "latest"
+    ) -> CallReturn:
+        try:
+            async with self.semaphore:
+                await self.__acquire()
+                call_return_data: Any = await self.get_contract(
+                    address = call.contract_address
+                ).get_function_by_name(
+                    call.function_name
+                )(
+                    *call.args
+                ).call(
+                    block_identifier = block_identifier
+                )
+
+            return CallReturn(
+                success = True,
+                return_data = (call_return_data, ) if len(call.output_types) == 1 else call_return_data
+            )
+        except Exception as e:
+            if not (call.allow_failure if call.allow_failure is not None else not require_success):
+                raise e
+
+            return CallReturn(
+                success = False,
+                return_data = None
+            )
+
+
+    async def __try_aggregate(
+        self, encoded_call_chunk: List[EncodedCall],
+        block_identifier: BlockIdentifier = "latest"
+    ) -> ChunkResult:
+        '''
+        The encoded results of the chunk, or the exception that failed it as a
+        whole, and the latency
+        '''
+        aggregate_call, value = self.multicall_backend.build_call(
+            encoded_call_chunk = encoded_call_chunk
+        )
+        transaction: TxParams = {
+            "to": self.multicall_backend.address,
+            "data": "0x" + self.codec_cache.encode(
+                contract = self.multicall_contract,
+                call = aggregate_call
+            ).hex()
+        }
+        if value:
+            transaction["value"] = value
+
+        async with self.semaphore:
+            await self.__acquire()
+            begin: float = perf_counter()
+            try:
+                raw_result: bytes = await self.w3.eth.call(
+                    transaction = transaction,
+                    block_identifier = block_identifier
+                )
+            except Exception as e:
+                return e, perf_counter() - begin
+            latency: float = perf_counter() - begin
+
+        return self.codec_cache.decode(self.multicall_backend.OUTPUT_TYPES, raw_result)[0], latency
+
+
+    async def __multicall(
+        self, calls: List[Call], require_success: bool = True,
+        block_identifier: BlockIdentifier = "latest",
+        chunk_size: Optional[int] = None
+    ) -> List[CallReturn]:
+        encoded_calls: List[EncodedCall] = [
+            (
+                call.contract_address,
+                self.codec_cache.encode(
+                    contract = self.get_contract(call.contract_address),
+                    call = call
+                ),
+                call.allow_failure if call.allow_failure is not None else not require_success,
+                call.value
+            )
+            for call in calls
+        ]
+
+        call_types: List[CallType] = [
+            (call.contract_address, call.function_name) for call in calls
+        ]
+
+        # Every chunk of a round is awaited before failed ones are bisected, so one
+        # failing chunk never cancels the others
+        encoded_results: List[Optional[Tuple[bool, bytes]]] = [None] * len(calls)
+        chunk_bisector: ChunkBisector = ChunkBisector(
+            encoded_calls = encoded_calls,
+            call_types = call_types,
+            indices = list(range(len(calls))),
+            chunk_sizer = self.chunk_sizer,
+            chunk_size = chunk_size
+        )
+        while chunk_bisector.index_chunks:
+            chunk_bisector.record(
+                chunk_results = await asyncio.gather(*[
+                    self.__try_aggregate(
+                        encoded_call_chunk = encoded_call_chunk,
+                        block_identifier = block_identifier
+                    )
+                    for encoded_call_chunk in chunk_bisector.get_encoded_call_chunks()
+                ]),
+                encoded_results = encoded_results
+            )
+
+        # A backend without per-call failure flags returns failed required calls
+        for call, (_, _, allow_failure, _), encoded_result in zip(calls, encoded_calls, encoded_results):
+            if not allow_failure and not encoded_result[0]:
+                raise Exception(f"Call {call.function_name} to {call.contract_address} failed")
+
+        # A call to an address without code succeeds with no return data, e.g. a pair
+        # that was not deployed yet, so it is reported as failed rather than undecodable
+        return [
+            CallReturn(
+                success = succeeded,
+                return_data = self.codec_cache.decode(call.output_types, encoded_result[1])
+                    if succeeded else None
+            )
+            for call, encoded_result in zip(calls, encoded_results)
+            for succeeded in [encoded_result[0] and (len(encoded_result[1]) > 0 or not call.output_types)]
+        ]
+
+
+    def __call_contract(self, address: ChecksumAddress, abi: Any, cache: bool = True) -> AsyncContract:
+        contract: AsyncContract = self.w3.eth.contract(
+            address = address,
+            abi = abi
+        )
+
+        if cache:
+            self.contract_cache[address] = contract
+
+        return contract
@@ -0,0 +1,90 @@
+from .async_contract_service import AsyncContractService
+from .price_feed_service import PriceFeedService
+
+from ..data_structures.price_cache import PriceCache
+
+from web3 import AsyncWeb3
+from eth_typing.evm import ChecksumAddress, BlockIdentifier
+
+from typing import Dict, List, Optional
+
+class AsyncPriceFeedService():
+    '''
+    asyncio counterpart of PriceFeedService using 1inch spot price aggregator
+    '''
+    SPOT_AGGREGATOR_1INCH_ADDRESS: ChecksumAddress = PriceFeedService.SPOT_AGGREGATOR_1INCH_ADDRESS
+    SPOT_AGGREGATOR_1INCH_ABI = PriceFeedService.SPOT_AGGREGATOR_1INCH_ABI
+
+    USD_PROXY_ADDRESS: ChecksumAddress = PriceFeedService.USD_PROXY_ADDRESS
+
+    def __init__(
+        self, w3: AsyncWeb3, contract_service: Optional[AsyncContractService] = None,
+        price_cache: Optional[PriceCache] = None
+    ) -> None:
+        self.w3: AsyncWeb3 = w3
+        self.price_cache: PriceCache = price_cache if price_cache is not None else PriceCache()
+
+        self.contract_service: AsyncContractService = (
+            contract_service if contract_service is not None
+            else AsyncContractService(w3 = self.w3)
+        )
+
+        self.contract_service.add_contract(
+            address = self.SPOT_AGGREGATOR_1INCH_ADDRESS,
+            abi = self.SPOT_AGGREGATOR_1INCH_ABI
+        )
+
+    async def fetch_eth_price_usd(self, block_identifier: BlockIdentifier) -> float:
+        return 1e-6 / (await self.fetch_price_eth(
+            tokens = [self.USD_PROXY_ADDRESS],
+            block_identifier = block_identifier
+        ))[self.USD_PROXY_ADDRESS]
+
+
+    async def fetch_price_eth(self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier) -> Dict[ChecksumAddress, float]:
+        if not isinstance(block_identifier, int):
+            return await self.__fetch_price_eth(tokens = tokens, block_identifier = block_identifier)
+
+        prices: Dict[ChecksumAddress, float] = self.price_cache.get_many(
+            tokens = tokens,
+            block_number = block_identifier
+        )
+        missing_tokens: List[ChecksumAddress] = [token_address for token_address in tokens if token_address not in prices]
+        if len(missing_tokens) > 0:
+            fetched_prices: Dict[ChecksumAddress, float] = await self.__fetch_price_eth(
+                tokens = missing_tokens,
+                block_identifier = block_identifier
+            )
+            self.price_cache.put_many(prices = fetched_prices, block_number = block_identifier)
+            prices.update(fetched_prices)
+
+        return {token_address: prices[token_address] for token_address in tokens}
+
+
+    async def __fetch_price_eth(self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier) -> Dict[ChecksumAddress, float]:
+        return {
+            token_address: price_to_eth
+            for token_address, price_to_eth in zip(
+                tokens, await self.contract_service.multicall(
+                    calls = [
+                        {
+                            "contract_address": self.SPOT_AGGREGATOR_1INCH_ADDRESS,
+                            "function_name": "getRateToEth",
+                            "args": [
+                                token_address,
+                                True
+                            ],
+                            "output_types": [
+                                "uint256"
+                            ]
+                        }
+                        for token_address in tokens
+                    ],
+                    require_success = True,
+                    block_identifier = block_identifier,
+                    callbacks = [
+                        lambda result: result.return_data[0] / 1e36 if result.success else None
+                    ] * len(tokens)
+                )
+            )
+        }
@@ -0,0 +1,91 @@
+from .async_arbitrage_service import AsyncArbitrageService
+from .arbitrage_service import ExchangeGraph, Arbitrage
+from .uniswapv2_service import UniswapV2Service
+from .uniswapv3_service import UniswapV3Service
+from .service_runtime import ServiceRuntime
+
+from ..data_structures.exchange_graph import ExchangeFunction
+from ..utils.web3_utils import async_block_identifier_to_number
+
+from web3 import Web3, AsyncWeb3
+from eth_account.account import Account
+from eth_account.signers.local import LocalAccount
+from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
+
+from hexbytes import HexBytes
+
+import asyncio
+from typing import List, AsyncGenerator, Optional
+
+class AsyncUniswapArbitrageService():
+    '''
+    Uniswap arbitrage search on top of AsyncArbitrageService. The synchronous w3 is
+    only used by the exchange services to index pools and build exchange functions.
+    The async contract service shares the runtime's caches and rate limiter.
+    '''
+    def __init__(
+        self, w3: Web3, async_w3: AsyncWeb3, executor_private_key: HexBytes,
+        runtime: Optional[ServiceRuntime] = None, max_concurrent_requests: int = 32
+    ) -> None:
+        print("Initializing Async Uniswap Arbitrage Service")
+
+        self.w3: Web3 = w3
+        self.async_w3: AsyncWeb3 = async_w3
+        self.executor: LocalAccount = Account.from_key(executor_private_key)
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
+
+        self.arbitrage_service: AsyncArbitrageService = AsyncArbitrageService(
+            w3 = self.async_w3,
+            contract_service = self.runtime.create_async_contract_service(
+                async_w3 = self.async_w3,
+                max_concurrent_requests = max_concurrent_requests
+            ),
+            price_cache = self.runtime.price_feed_service.price_cache
+        )
+
+        self.uniswapv2_service: UniswapV2Service = UniswapV2Service(
+            w3 = self.w3,
+            executor_private_key = executor_private_key,
+            runtime = self.runtime
+        )
+
+        self.uniswapv3_service: UniswapV3Service = UniswapV3Service(
+            w3 = self.w3,
+            executor_private_key = executor_private_key,
+            runtime = self.runtime
+        )
+
+    async def find_arbitrages(
+        self, tokens: List[ChecksumAddress], u_eth: float,
+        max_hops: int = 3, block_identifier: BlockIdentifier = "latest",
+        u_eth_levels: Optional[List[float]] = None, incremental: bool = False
+    ) -> AsyncGenerator[Arbitrage, None]:
+        block_number: BlockNumber = await async_block_identifier_to_number(
+            w3 = self.async_w3,
+            block_identifier = block_identifier
+        )
+
+        # Only deployed pools get edges in the exchange graph. Lookups go through
+        # the synchronous services, so they run off the event loop.
+        await asyncio.gather(
+            asyncio.to_thread(self.uniswapv2_service.index_pools, tokens = tokens, block_identifier = block_number),
+            asyncio.to_thread(self.uniswapv3_service.index_pools, tokens = tokens, block_identifier = block_number)
+        )
+
+        exchange_functions: List[ExchangeFunction] = (
+            self.uniswapv2_service.get_exchange_functions(block_identifier = block_number)
+            + self.uniswapv3_service.get_exchange_functions(block_identifier = block_number)
+        )
+
+        async for arbitrage in self.arbitrage_service.find_arbitrages_bellman_ford(
+            exchange_graph = ExchangeGraph(
+                tokens = tokens,
+                exchange_functions = exchange_functions
+            ),
+            u_eth = u_eth,
+            max_hops = max_hops,
+            block_identifier = block_number,
+            u_eth_levels = u_eth_levels,
+            incremental = incremental
+        ):
+            yield arbitrage
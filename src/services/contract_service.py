@@ -1,32 +1,112 @@
+from .rpc_service import RpcService
+
 from ..data_structures.call import Call, CallReturn
+from ..data_structures.adaptive_chunk_sizer import AdaptiveChunkSizer, CallType
+from ..data_structures.base_fee_history import BaseFeeHistory
+from ..data_structures.call_codec import CallCodecCache
+from ..data_structures.chunk_bisector import ChunkBisector, ChunkResult
+from ..data_structures.call_result_cache import CallResultCache, CallResultKey
+from ..data_structures.multicall_backend import EncodedCall, MulticallBackend, Multicall3Backend
+from ..data_structures.rpc_metrics import MetricsSink, RpcMetric
 from ..utils.abi import get_abi
 from ..utils.web3_utils import block_identifier_to_number
 
 from web3 import Web3
 from web3.contract import Contract
-from web3.types import TxParams, Wei
+from web3.types import LogReceipt, TxParams, Wei
 from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
-from eth_abi import decode
+from hexbytes import HexBytes
+from requests import Session
 
 from multiprocessing.pool import ThreadPool
-from itertools import chain
-from typing import Dict, Any, List, Tuple, Optional, Union, Callable
+from concurrent.futures import Future
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Any, Iterable, List, Set, Tuple, Optional, Union, Callable
 
 
-class ContractService:
-    MULTICALL_ADDRESS: ChecksumAddress = "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696"
+InFlightKey = Tuple[BlockIdentifier, ChecksumAddress, bytes, int]
 
-    def __init__(self, w3: Web3) -> None:
+
+class ContractService:
+    def __init__(
+        self, w3: Web3, use_batch_request: bool = False,
+        max_batch_size: int = 100, chunk_sizer: Optional[AdaptiveChunkSizer] = None,
+        call_result_cache: Optional[CallResultCache] = None,
+        session: Optional[Session] = None, pool: Optional[ThreadPool] = None,
+        rpc_service: Optional[RpcService] = None,
+        multicall_backend: Optional[MulticallBackend] = None,
+        metrics_sink: Optional[MetricsSink] = None,
+        base_fee_history: Optional[BaseFeeHistory] = None
+    ) -> None:
+        '''
+        If use_batch_request is True, the eth_call of every multicall chunk is packed
+        into JSON-RPC batch POSTs of at most max_batch_size requests instead of being
+        sent as one HTTP request per chunk.
+
+        Multicall sub-calls pinned to a block number are served from and stored in
+        call_result_cache. Pass a CallResultCache with a path to persist it.
+
+        pool is the long-lived thread pool chunks are sent from; one is created
+        for this service, and terminated by close(), if not given. See ServiceRuntime
+        to share it.
+
+        rpc_service carries the batch requests, e.g. one routing over several endpoints.
+
+        multicall_backend defaults to Multicall3. Pass a Multicall2Backend on chains
+        without Multicall3.
+
+        Every RPC issued, and every multicall as a whole, is recorded to metrics_sink.
+
+        Base fees are kept in base_fee_history. Pass one with a path to persist them.
+
+        Identical calls within a multicall are sent once, and a call already in flight
+        from another thread at the same block identifier is waited on instead of resent.
+        '''
         self.w3: Web3 = w3
+        self.pool: ThreadPool = pool if pool is not None else ThreadPool()
+        self.owns_pool: bool = pool is None
+        self.call_result_cache: CallResultCache = (
+            call_result_cache if call_result_cache is not None else CallResultCache()
+        )
+        self.chunk_sizer: AdaptiveChunkSizer = (
+            chunk_sizer if chunk_sizer is not None else AdaptiveChunkSizer()
+        )
+        self.use_batch_request: bool = use_batch_request
+        self.max_batch_size: int = max_batch_size
+        self.metrics_sink: Optional[MetricsSink] = metrics_sink
+        self.rpc_service: Optional[RpcService] = rpc_service
+        if use_batch_request and self.rpc_service is None:
+            self.rpc_service = RpcService(
+                endpoint_uri = self.w3.provider.endpoint_uri,
+                session = session,
+                pool = self.pool,
+                metrics_sink = metrics_sink
+            )
+
         self.contract_cache: Dict[ChecksumAddress, Contract] = dict()
+        self.codec_cache: CallCodecCache = CallCodecCache()
+        self.multicall_backend: MulticallBackend = (
+            multicall_backend if multicall_backend is not None else Multicall3Backend()
+        )
         self.multicall_contract: Contract = self.__call_contract(
-            address = ContractService.MULTICALL_ADDRESS,
-            abi = get_abi("multicall2")
+            address = self.multicall_backend.address,
+            abi = get_abi(self.multicall_backend.ABI_NAME)
+        )
+
+        self.base_fee_history: BaseFeeHistory = (
+            base_fee_history if base_fee_history is not None else BaseFeeHistory()
         )
 
-        self.base_fee_history: Dict[BlockNumber, int] = dict()
+        self.in_flight: Dict[InFlightKey, Future] = dict()
+        self.in_flight_lock: Lock = Lock()
     
 
+    def close(self) -> None:
+        if self.owns_pool:
+            self.pool.terminate()
+
+
     def add_contract(self, address: ChecksumAddress, abi: Any) -> None:
         if address not in self.contract_cache:
             self.__call_contract(address = address, abi = abi)
@@ -49,26 +129,98 @@ class ContractService:
             block_identifier = block_identifier
         )
 
-        if block_number in self.base_fee_history:
-            return self.base_fee_history.get(block_number)
+        base_fee_per_gas: Optional[int] = self.base_fee_history.get(block_number)
+        if base_fee_per_gas is not None:
+            return base_fee_per_gas
         
+        begin: float = perf_counter()
         base_fee_per_gas_raw: List[int] = self.w3.eth.fee_history(
             block_count = 1,
             newest_block = block_number
         )["baseFeePerGas"]
+        self.__record(method = "eth_feeHistory", latency = perf_counter() - begin)
 
-        self.base_fee_history[block_number] = base_fee_per_gas_raw[0]
-        self.base_fee_history[block_number + 1] = base_fee_per_gas_raw[1]
+        self.base_fee_history.put_range(
+            oldest_block = block_number,
+            base_fees = base_fee_per_gas_raw
+        )
 
-        return self.base_fee_history[block_number]
+        return base_fee_per_gas_raw[0]
+
+
+    def prefetch_base_fees(self, block_numbers: Iterable[BlockNumber]) -> None:
+        '''
+        Fetch the base fees of all block_numbers not known yet, in fee_history
+        windows of up to 1024 blocks, and save the history if it has a path.
+        A range such as range(19000000, 19410000, 10000) takes one window per
+        sampled block. If use_batch_request is True the windows are sent in
+        batch requests of at most max_batch_size, otherwise each window is one
+        eth_feeHistory call made from the thread pool.
+        '''
+        windows: List[Tuple[BlockNumber, int]] = BaseFeeHistory.plan_windows(
+            block_numbers = self.base_fee_history.missing(block_numbers)
+        )
+        if not windows:
+            return None
+
+        begin: float = perf_counter()
+        if self.use_batch_request:
+            fee_histories: List[Tuple[int, List[int]]] = [
+                (
+                    int(fee_history["oldestBlock"], 16),
+                    [int(base_fee, 16) for base_fee in fee_history["baseFeePerGas"]]
+                )
+                for fee_history in self.rpc_service.batch_request(
+                    requests = [
+                        ("eth_feeHistory", [hex(block_count), hex(newest_block), []])
+                        for newest_block, block_count in windows
+                    ],
+                    max_batch_size = self.max_batch_size
+                )
+            ]
+        else:
+            fee_histories: List[Tuple[int, List[int]]] = self.pool.map(
+                func = lambda window: (
+                    lambda fee_history: (fee_history["oldestBlock"], fee_history["baseFeePerGas"])
+                )(
+                    self.w3.eth.fee_history(
+                        block_count = window[1],
+                        newest_block = window[0]
+                    )
+                ),
+                iterable = windows
+            )
+        self.__record(
+            method = "eth_feeHistory",
+            latency = perf_counter() - begin,
+            calls = sum(block_count for _, block_count in windows),
+            chunks = len(windows)
+        )
+
+        for oldest_block, base_fees in fee_histories:
+            self.base_fee_history.put_range(
+                oldest_block = oldest_block,
+                base_fees = base_fees
+            )
+        self.base_fee_history.save()
       
     
     def multicall(
         self, calls: List[Union[Call, Dict[str, Any]]],
         require_success: bool = True, block_identifier: BlockIdentifier = "latest",
         callbacks: Optional[List[Callable[[CallReturn], Any]]] = None,
-        chunk_size: int = 10
+        chunk_size: Optional[int] = None, hedge: bool = False
     ) -> List[Any]:
+        '''
+        Aggregate the calls through the multicall backend. Calls may fail if their
+        allow_failure is set, or by default if require_success is False. Without
+        chunk_size the chunk size is learned per call type by chunk_sizer. A chunk
+        failing as a whole on its content (out of gas, response too large) is bisected
+        and retried so only the failing calls are lost, see ChunkBisector.
+
+        With use_batch_request, hedge fires a duplicate batch at a second endpoint when
+        the first is slow, for latency-critical calls such as per-block quotes.
+        '''
         if callbacks is not None:
             assert len(calls) == len(callbacks), (
                 f"Length mismatch between calls ({len(calls)}) and callbacks ({len(callbacks)})."
@@ -80,7 +232,8 @@ class ContractService:
             calls = calls,
             require_success = require_success,
             block_identifier = block_identifier,
-            chunk_size = chunk_size
+            chunk_size = chunk_size,
+            hedge = hedge
         )
 
         if callbacks is None:
@@ -150,12 +303,92 @@ class ContractService:
         
 
     def estimate_gas(self, transaction: TxParams, block_identifier: BlockIdentifier = "latest") -> Wei:
-        return self.w3.eth.estimate_gas(
-            transaction = transaction,
-            block_identifier = block_identifier
-        )
+        begin: float = perf_counter()
+        try:
+            gas: Wei = self.w3.eth.estimate_gas(
+                transaction = transaction,
+                block_identifier = block_identifier
+            )
+        except Exception as e:
+            self.__record(method = "eth_estimateGas", latency = perf_counter() - begin, failed = True)
+            raise e
+
+        self.__record(method = "eth_estimateGas", latency = perf_counter() - begin)
+        return gas
     
 
+    def get_logs(
+        self, address: Union[ChecksumAddress, List[ChecksumAddress]],
+        topics: List[Optional[Union[str, List[str]]]],
+        from_block: BlockNumber, to_block: BlockNumber, chunk_size: int = 2000
+    ) -> List[LogReceipt]:
+        '''
+        eth_getLogs over [from_block, to_block] in ranges of chunk_size blocks fetched
+        in parallel. Ranges the node refuses (too many results, range too wide or
+        timeouts) are split in half and retried, down to single blocks.
+        Logs are returned in chain order.
+        '''
+        ranges: List[Tuple[BlockNumber, BlockNumber]] = [
+            (begin_block, min(begin_block + chunk_size - 1, to_block))
+            for begin_block in range(from_block, to_block + 1, chunk_size)
+        ]
+        logs: List[LogReceipt] = []
+        chunks: int = 0
+        retries: int = 0
+
+        begin: float = perf_counter()
+        while ranges:
+            results: List[Union[List[LogReceipt], Exception]] = self.pool.map(
+                func = lambda block_range: self.__try_get_logs(
+                    address = address,
+                    topics = topics,
+                    from_block = block_range[0],
+                    to_block = block_range[1]
+                ),
+                iterable = ranges
+            )
+            chunks += len(ranges)
+
+            failed_ranges: List[Tuple[BlockNumber, BlockNumber]] = []
+            for (begin_block, end_block), result in zip(ranges, results):
+                if not isinstance(result, Exception):
+                    logs.extend(result)
+                elif begin_block == end_block:
+                    self.__record(method = "eth_getLogs", latency = perf_counter() - begin, chunks = chunks, failed = True)
+                    raise result
+                else:
+                    middle_block: BlockNumber = (begin_block + end_block) // 2
+                    failed_ranges.extend([(begin_block, middle_block), (middle_block + 1, end_block)])
+            retries += len(failed_ranges) // 2
+            ranges = failed_ranges
+
+        self.__record(
+            method = "eth_getLogs",
+            latency = perf_counter() - begin,
+            calls = len(logs),
+            chunks = chunks,
+            retries = retries
+        )
+
+        return sorted(logs, key = lambda log: (log["blockNumber"], log["logIndex"]))
+
+
+    def __try_get_logs(
+        self, address: Union[ChecksumAddress, List[ChecksumAddress]],
+        topics: List[Optional[Union[str, List[str]]]],
+        from_block: BlockNumber, to_block: BlockNumber
+    ) -> Union[List[LogReceipt], Exception]:
+        try:
+            return self.w3.eth.get_logs({
+                "address": address,
+                "topics": topics,
+                "fromBlock": from_block,
+                "toBlock": to_block
+            })
+        except Exception as e:
+            return e
+
+
     def __prepare_calls(self, calls: List[Union[Call, Dict[str, Any]]]) -> List[Call]:
         calls: List[Call] = [call if isinstance(call, Call) else Call(**call) for call in calls]
         for call in calls:
@@ -189,23 +422,21 @@ class ContractService:
         self, calls: List[Call], require_success: bool = True,
         block_identifier: BlockIdentifier = "latest"
     ) -> List[CallReturn]:
-        results: List[CallReturn] = []
-        with ThreadPool() as pool:
-            results = pool.map(
-                func = lambda call: self.__try_call_helper(
-                    call = call,
-                    require_success = require_success,
-                    block_identifier = block_identifier
-                ),
-                iterable = calls
-            )
-        return results
+        return self.pool.map(
+            func = lambda call: self.__try_call_helper(
+                call = call,
+                require_success = require_success,
+                block_identifier = block_identifier
+            ),
+            iterable = calls
+        )
         
 
     def __try_call_helper(
         self, call: Call, require_success: bool = True,
         block_identifier: BlockIdentifier = "latest"
     ) -> CallReturn:
+        begin: float = perf_counter()
         try:
             call_return_data: Any = self.get_contract(
                 address = call.contract_address,
@@ -217,13 +448,15 @@ class ContractService:
             ).call(
                 block_identifier = block_identifier
             )
+            self.__record(method = "eth_call", latency = perf_counter() - begin)
 
             return CallReturn(
                 success = True,
                 return_data = (call_return_data, ) if len(call.output_types) == 1 else call_return_data
             )
         except Exception as e:
-            if require_success:
+            self.__record(method = "eth_call", latency = perf_counter() - begin, failed = True)
+            if not (call.allow_failure if call.allow_failure is not None else not require_success):
                 raise e
             
             return CallReturn(
@@ -235,50 +468,333 @@ class ContractService:
     def __multicall(
         self, calls: List[Call], require_success: bool = True,
         block_identifier: BlockIdentifier = "latest",
-        chunk_size: int = 10
+        chunk_size: Optional[int] = None, hedge: bool = False
     ) -> List[CallReturn]:
-        encoded_calls: List[Tuple[ChecksumAddress, str]] = [
+        begin: float = perf_counter()
+        encoded_calls: List[EncodedCall] = [
             (
                 call.contract_address,
-                self.get_contract(call.contract_address).encodeABI(
-                    fn_name = call.function_name,
-                    args = call.args
-                )
+                self.codec_cache.encode(
+                    contract = self.get_contract(call.contract_address),
+                    call = call
+                ),
+                call.allow_failure if call.allow_failure is not None else not require_success,
+                call.value
             )
             for call in calls
         ]
 
-        encoded_call_chunks: List[List[Tuple[ChecksumAddress, str]]] = [
-            encoded_calls[i: i + chunk_size]
-            for i in range(0, len(encoded_calls), chunk_size)
+        call_types: List[CallType] = [
+            (call.contract_address, call.function_name) for call in calls
         ]
 
-        encoded_results: List[CallReturn] = []
-        with ThreadPool() as pool:
-            encoded_results = list(
-                chain.from_iterable(
-                    pool.map(
-                        func = lambda encoded_call_chunk: self.multicall_contract.functions.tryAggregate(
-                            require_success,
-                            encoded_call_chunk
-                        ).call(
-                            block_identifier = block_identifier
-                        ),
-                        iterable = encoded_call_chunks
-                    )
-                )
+        encoded_results: List[Optional[Tuple[bool, bytes]]] = [None] * len(calls)
+
+        in_flight_keys: List[InFlightKey] = [
+            (block_identifier, contract_address, bytes(calldata), value)
+            for contract_address, calldata, _, value in encoded_calls
+        ]
+
+        # Identical calls within the batch are sent once and copied back at the end
+        first_indices: Dict[InFlightKey, int] = dict()
+        duplicate_indices: Dict[int, int] = dict()
+        for i, in_flight_key in enumerate(in_flight_keys):
+            if in_flight_key in first_indices:
+                duplicate_indices[i] = first_indices[in_flight_key]
+            else:
+                first_indices[in_flight_key] = i
+
+        unique_indices: List[int] = list(first_indices.values())
+
+        # Results of calls sending value depend on the sender and are not cached
+        cache_keys: Dict[int, CallResultKey] = dict()
+        if isinstance(block_identifier, int):
+            cache_keys = {
+                i: in_flight_keys[i][:3] for i in unique_indices if encoded_calls[i][3] == 0
+            }
+            cached_results: Dict[CallResultKey, Tuple[bool, bytes]] = self.call_result_cache.get_many(
+                keys = cache_keys.values()
             )
-        
+            for i, cache_key in cache_keys.items():
+                if cache_key in cached_results:
+                    encoded_results[i] = cached_results[cache_key]
+
+        # Calls another thread is already sending are waited on instead of resent
+        owned_futures: Dict[int, Future] = dict()
+        waited_futures: Dict[int, Future] = dict()
+        with self.in_flight_lock:
+            for i in unique_indices:
+                if encoded_results[i] is not None:
+                    continue
+                if in_flight_keys[i] in self.in_flight:
+                    waited_futures[i] = self.in_flight[in_flight_keys[i]]
+                else:
+                    owned_futures[i] = self.in_flight[in_flight_keys[i]] = Future()
+
+        pending_indices: List[int] = list(owned_futures)
+        try:
+            unanswered_indices, chunks, retries = self.__aggregate_indices(
+                encoded_calls = encoded_calls,
+                call_types = call_types,
+                indices = pending_indices,
+                encoded_results = encoded_results,
+                block_identifier = block_identifier,
+                chunk_size = chunk_size,
+                hedge = hedge
+            )
+
+            self.call_result_cache.put_many(
+                items = {
+                    cache_keys[i]: encoded_results[i]
+                    for i in pending_indices
+                    if i in cache_keys and i not in unanswered_indices
+                }
+            )
+
+            for i, future in owned_futures.items():
+                future.set_result(encoded_results[i])
+        except BaseException as e:
+            for future in owned_futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise e
+        finally:
+            with self.in_flight_lock:
+                for i, future in owned_futures.items():
+                    if self.in_flight.get(in_flight_keys[i]) is future:
+                        del self.in_flight[in_flight_keys[i]]
+
+        # A call whose owner raised (e.g. it required success) is sent again from here
+        orphaned_indices: List[int] = []
+        for i, future in waited_futures.items():
+            if future.exception() is not None:
+                orphaned_indices.append(i)
+            else:
+                encoded_results[i] = future.result()
+
+        if orphaned_indices:
+            _, orphaned_chunks, orphaned_retries = self.__aggregate_indices(
+                encoded_calls = encoded_calls,
+                call_types = call_types,
+                indices = orphaned_indices,
+                encoded_results = encoded_results,
+                block_identifier = block_identifier,
+                chunk_size = chunk_size,
+                hedge = hedge
+            )
+
+        for i, first_index in duplicate_indices.items():
+            encoded_results[i] = encoded_results[first_index]
+
+        self.__record(
+            method = "multicall",
+            latency = perf_counter() - begin,
+            calls = len(calls),
+            chunks = chunks + (orphaned_chunks if orphaned_indices else 0),
+            reverted_calls = sum(not encoded_result[0] for encoded_result in encoded_results),
+            retries = retries + (orphaned_retries if orphaned_indices else 0)
+        )
+
+        # Required calls may come back failed from cache, from a shared in-flight call
+        # or from a backend without per-call failure flags
+        for call, (_, _, allow_failure, _), encoded_result in zip(calls, encoded_calls, encoded_results):
+            if not allow_failure and not encoded_result[0]:
+                raise Exception(f"Call {call.function_name} to {call.contract_address} failed")
+
+        # A call to an address without code succeeds with no return data, e.g. a pair
+        # that was not deployed yet, so it is reported as failed rather than undecodable
         return [
             CallReturn(
-                success = encoded_result[0],
-                return_data = decode(call.output_types, encoded_result[1])
-                    if encoded_result[0] else None
+                success = succeeded,
+                return_data = self.codec_cache.decode(call.output_types, encoded_result[1])
+                    if succeeded else None
             )
             for call, encoded_result in zip(calls, encoded_results)
+            for succeeded in [encoded_result[0] and (len(encoded_result[1]) > 0 or not call.output_types)]
         ]
 
 
+    def __aggregate_indices(
+        self, encoded_calls: List[EncodedCall],
+        call_types: List[CallType], indices: List[int],
+        encoded_results: List[Optional[Tuple[bool, bytes]]],
+        block_identifier: BlockIdentifier = "latest",
+        chunk_size: Optional[int] = None, hedge: bool = False
+    ) -> Tuple[Set[int], int, int]:
+        '''
+        Aggregate the calls at indices, writing into encoded_results. Returns the
+        indices of calls that failed a chunk on their own rather than reverted, the
+        number of chunks sent and how many of them were retries of bisected chunks.
+        '''
+        chunk_bisector: ChunkBisector = ChunkBisector(
+            encoded_calls = encoded_calls,
+            call_types = call_types,
+            indices = indices,
+            chunk_sizer = self.chunk_sizer,
+            chunk_size = chunk_size
+        )
+        while chunk_bisector.index_chunks:
+            chunk_bisector.record(
+                chunk_results = self.__try_aggregate_chunks(
+                    encoded_call_chunks = chunk_bisector.get_encoded_call_chunks(),
+                    block_identifier = block_identifier,
+                    hedge = hedge
+                ),
+                encoded_results = encoded_results
+            )
+
+        return chunk_bisector.unanswered_indices, chunk_bisector.chunks, chunk_bisector.retries
+
+
+    def __try_aggregate_chunks(
+        self, encoded_call_chunks: List[List[EncodedCall]],
+        block_identifier: BlockIdentifier = "latest", hedge: bool = False
+    ) -> List[ChunkResult]:
+        '''
+        Aggregate every chunk. Returns, per chunk, either the encoded results or
+        the exception that failed the whole chunk, and the latency.
+        '''
+        if self.use_batch_request:
+            return self.__try_aggregate_batch_request(
+                encoded_call_chunks = encoded_call_chunks,
+                block_identifier = block_identifier,
+                hedge = hedge
+            )
+
+        return self.pool.map(
+            func = lambda encoded_call_chunk: self.__try_aggregate(
+                encoded_call_chunk = encoded_call_chunk,
+                block_identifier = block_identifier
+            ),
+            iterable = encoded_call_chunks
+        )
+
+
+    def __try_aggregate(
+        self, encoded_call_chunk: List[EncodedCall],
+        block_identifier: BlockIdentifier = "latest"
+    ) -> ChunkResult:
+        function_name, transaction = self.__build_aggregate_transaction(
+            encoded_call_chunk = encoded_call_chunk
+        )
+
+        begin: float = perf_counter()
+        try:
+            raw_result: bytes = self.w3.eth.call(
+                transaction = transaction,
+                block_identifier = block_identifier
+            )
+        except Exception as e:
+            self.__record(
+                method = function_name,
+                latency = perf_counter() - begin,
+                calls = len(encoded_call_chunk),
+                request_bytes = len(transaction["data"]) // 2 - 1,
+                failed = True
+            )
+            return e, perf_counter() - begin
+        latency: float = perf_counter() - begin
+
+        results: List[Tuple[bool, bytes]] = self.codec_cache.decode(
+            self.multicall_backend.OUTPUT_TYPES, raw_result
+        )[0]
+        self.__record(
+            method = function_name,
+            latency = latency,
+            calls = len(encoded_call_chunk),
+            request_bytes = len(transaction["data"]) // 2 - 1,
+            response_bytes = len(raw_result),
+            reverted_calls = sum(not success for success, _ in results)
+        )
+        return results, latency
+
+
+    def __try_aggregate_batch_request(
+        self, encoded_call_chunks: List[List[EncodedCall]],
+        block_identifier: BlockIdentifier = "latest", hedge: bool = False
+    ) -> List[ChunkResult]:
+        block_parameter: Union[str, BlockIdentifier] = (
+            hex(block_identifier) if isinstance(block_identifier, int)
+            else block_identifier
+        )
+
+        aggregate_transactions: List[Tuple[str, TxParams]] = [
+            self.__build_aggregate_transaction(encoded_call_chunk = encoded_call_chunk)
+            for encoded_call_chunk in encoded_call_chunks
+        ]
+
+        begin: float = perf_counter()
+        raw_results: List[Union[str, ValueError]] = self.rpc_service.batch_request(
+            requests = [
+                (
+                    "eth_call",
+                    [
+                        {
+                            key: hex(value) if isinstance(value, int) else value
+                            for key, value in transaction.items()
+                        },
+                        block_parameter
+                    ]
+                )
+                for _, transaction in aggregate_transactions
+            ],
+            max_batch_size = self.max_batch_size,
+            raise_on_error = False,
+            hedge = hedge
+        )
+        latency: float = perf_counter() - begin
+
+        chunk_results: List[Union[List[Tuple[bool, bytes]], Exception]] = [
+            raw_result if isinstance(raw_result, ValueError)
+            else self.codec_cache.decode(
+                self.multicall_backend.OUTPUT_TYPES, HexBytes(raw_result)
+            )[0]
+            for raw_result in raw_results
+        ]
+
+        # Chunks of one batch share its latency; bytes per HTTP post are recorded by rpc_service
+        for encoded_call_chunk, (function_name, transaction), raw_result, chunk_result in zip(
+            encoded_call_chunks, aggregate_transactions, raw_results, chunk_results
+        ):
+            failed: bool = isinstance(chunk_result, Exception)
+            self.__record(
+                method = function_name,
+                latency = latency,
+                calls = len(encoded_call_chunk),
+                request_bytes = len(transaction["data"]) // 2 - 1,
+                response_bytes = 0 if failed else len(raw_result) // 2 - 1,
+                reverted_calls = 0 if failed else sum(not success for success, _ in chunk_result),
+                failed = failed
+            )
+
+        return [(chunk_result, latency) for chunk_result in chunk_results]
+
+
+    def __build_aggregate_transaction(self, encoded_call_chunk: List[EncodedCall]) -> Tuple[str, TxParams]:
+        aggregate_call, value = self.multicall_backend.build_call(
+            encoded_call_chunk = encoded_call_chunk
+        )
+        transaction: TxParams = {
+            "to": self.multicall_backend.address,
+            "data": "0x" + self.codec_cache.encode(
+                contract = self.multicall_contract,
+                call = aggregate_call
+            ).hex()
+        }
+        if value:
+            transaction["value"] = value
+        return aggregate_call.function_name, transaction
+
+
+    def __record(self, method: str, latency: float, **kwargs) -> None:
+        if self.metrics_sink is not None:
+            self.metrics_sink.record(RpcMetric(
+                method = method,
+                latency = latency,
+                **kwargs
+            ))
+
+
     def __call_contract(self, address: ChecksumAddress, abi: Any, cache: bool = True) -> Contract:
         contract: Contract = self.w3.eth.contract(
             address = address,
@@ -1,13 +1,87 @@
 from ..data_structures.exchange_graph import ExchangeFunction
+from ..data_structures.pool_index import PoolKey
+from ..data_structures.pool_registry import PoolRecord, PoolRegistry
+from ..utils.web3_utils import block_identifier_to_number
 
-from eth_typing.evm import BlockIdentifier
+from web3.types import LogReceipt
+from eth_typing.evm import BlockIdentifier, BlockNumber, ChecksumAddress
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, Iterable, List, Optional
 from typing_extensions import Self
 
 class ExchangeService(ABC):
+    # Set by exchanges whose pools can be registered from factory logs
+    FACTORY_ADDRESS: ChecksumAddress
+    FACTORY_DEPLOYMENT_BLOCK: BlockNumber
+    POOL_CREATED_TOPIC: str
 
     @abstractmethod
     def get_exchange_functions(self: Self, block_identifier: BlockIdentifier) -> List[ExchangeFunction]:
-        pass
\ No newline at end of file
+        pass
+
+
+    @abstractmethod
+    def parse_pool_created_log(self: Self, log: LogReceipt) -> PoolRecord:
+        pass
+
+
+    def sync_pool_registry(
+        self: Self, pool_registry: PoolRegistry, to_block: BlockIdentifier = "latest",
+        chunk_size: int = 10000, segment_size: int = 200000
+    ) -> int:
+        '''
+        Register the pools created by the factory since the registry's last synced
+        block (or since the factory deployment), reading the creation logs in
+        chunks of chunk_size blocks. Progress is committed every segment_size
+        blocks so an interrupted bootstrap resumes where it stopped.
+        Returns the number of pools registered.
+        '''
+        to_block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = to_block
+        )
+        synced_block: Optional[BlockNumber] = pool_registry.get_synced_block(self.FACTORY_ADDRESS)
+        from_block: BlockNumber = (
+            synced_block + 1 if synced_block is not None else self.FACTORY_DEPLOYMENT_BLOCK
+        )
+
+        num_of_pools: int = 0
+        for segment_begin in range(from_block, to_block_number + 1, segment_size):
+            segment_end: BlockNumber = min(segment_begin + segment_size - 1, to_block_number)
+            logs: List[LogReceipt] = self.contract_service.get_logs(
+                address = self.FACTORY_ADDRESS,
+                topics = [self.POOL_CREATED_TOPIC],
+                from_block = segment_begin,
+                to_block = segment_end,
+                chunk_size = chunk_size
+            )
+            pool_registry.put_many(
+                pools = [self.parse_pool_created_log(log) for log in logs],
+                factory_address = self.FACTORY_ADDRESS,
+                synced_block = segment_end
+            )
+            num_of_pools += len(logs)
+
+        return num_of_pools
+
+
+    def get_registered_pools(
+        self: Self, tokens: Iterable[ChecksumAddress], block_number: BlockNumber
+    ) -> Optional[Dict[PoolKey, ChecksumAddress]]:
+        '''
+        Addresses of the factory's pools between tokens deployed at or before
+        block_number, by pool key, from the runtime's pool registry. None if the
+        registry is not synced up to block_number for the factory.
+        '''
+        pool_registry: PoolRegistry = self.runtime.pool_registry
+        synced_block: Optional[BlockNumber] = pool_registry.get_synced_block(self.FACTORY_ADDRESS)
+        if synced_block is None or synced_block < block_number:
+            return None
+
+        return {
+            (pool.token0, pool.token1, pool.fee): pool.address
+            for pools in pool_registry.get_pools_between(tokens = tokens, block_number = block_number).values()
+            for pool in pools
+            if pool.factory_address == self.FACTORY_ADDRESS
+        }
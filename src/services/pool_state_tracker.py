@@ -0,0 +1,243 @@
+from .contract_service import ContractService
+from .uniswapv2_service import UniswapV2Service
+from .uniswapv3_service import UniswapV3Service
+
+from ..data_structures.pool_index import PoolIndex, PoolKey
+from ..data_structures.uniswapv3_pool_state import UniswapV3PoolState
+from ..utils.web3_utils import block_identifier_to_number
+
+from web3 import Web3
+from web3.types import LogReceipt
+from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
+from eth_abi import decode
+
+from dataclasses import replace
+from itertools import combinations
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+from typing_extensions import Self
+
+
+class PoolStateTracker():
+    '''
+    Keeps UniswapV2 reserves and UniswapV3 pool states current by replaying the
+    Sync (V2) and Swap/Mint/Burn (V3) logs of each new block instead of reloading
+    every pool. Updated states are published as the block's snapshots in the
+    exchange services, so offline quotes at that block need no RPC.
+
+    Burns can uninitialize ticks, which the logs do not tell, so a pool with a
+    Burn is reloaded at the block, as is a pool whose price left the loaded tick
+    bitmap words. Other Swaps and Mints are applied exactly.
+    '''
+    # Sync(uint112,uint112)
+    SYNC_TOPIC: str = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+    # Swap(address,address,int256,int256,uint160,uint128,int24)
+    SWAP_TOPIC: str = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
+    # Mint(address,address,int24,int24,uint128,uint256,uint256)
+    MINT_TOPIC: str = "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde"
+    # Burn(address,int24,int24,uint128,uint256,uint256)
+    BURN_TOPIC: str = "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c"
+
+    def __init__(
+        self: Self, w3: Web3, contract_service: ContractService,
+        uniswapv2_service: UniswapV2Service, uniswapv3_service: UniswapV3Service
+    ) -> None:
+        self.w3: Web3 = w3
+        self.contract_service: ContractService = contract_service
+        self.uniswapv2_service: UniswapV2Service = uniswapv2_service
+        self.uniswapv3_service: UniswapV3Service = uniswapv3_service
+
+        self.block_number: Optional[BlockNumber] = None
+        self.reserves: Dict[ChecksumAddress, Tuple[int, int]] = dict()
+        self.pool_states: Dict[ChecksumAddress, UniswapV3PoolState] = dict()
+        # Pool address -> last block its state changed at
+        self.changed_blocks: Dict[ChecksumAddress, BlockNumber] = dict()
+        self.lock: Lock = Lock()
+
+
+    def track(self: Self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier = "latest") -> None:
+        '''
+        Load the state of every deployed pool between tokens at block_identifier
+        and track them from there on. Tracking more tokens later reloads all
+        tracked pools at the new block.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+        tokens = list(dict.fromkeys(tokens))
+
+        self.uniswapv2_service.index_pools(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+        self.uniswapv3_service.index_pools(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+
+        reserves: Dict[ChecksumAddress, Tuple[int, int]] = self.uniswapv2_service.fetch_reserves(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+        pool_states: Dict[ChecksumAddress, Optional[UniswapV3PoolState]] = self.uniswapv3_service.fetch_pool_states(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+
+        with self.lock:
+            self.reserves.update(
+                (pair_address, reserves[pair_address])
+                for pair_address in self.__get_pair_addresses(tokens = tokens, block_number = block_number)
+            )
+            self.pool_states.update(
+                (pool_address, pool_state)
+                for pool_address, pool_state in pool_states.items()
+                if pool_state is not None
+            )
+            self.changed_blocks.update(
+                (pool_address, block_number)
+                for pool_address in list(self.reserves) + list(self.pool_states)
+            )
+            self.block_number = block_number
+
+
+    def update(self: Self, to_block: BlockIdentifier = "latest") -> Set[ChecksumAddress]:
+        '''
+        Replay the logs of the tracked pools up to to_block. Returns the pools
+        whose state changed.
+        '''
+        to_block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = to_block
+        )
+        if self.block_number is None or to_block_number <= self.block_number:
+            return set()
+
+        logs: List[LogReceipt] = self.contract_service.get_logs(
+            address = list(self.reserves) + list(self.pool_states),
+            topics = [[self.SYNC_TOPIC, self.SWAP_TOPIC, self.MINT_TOPIC, self.BURN_TOPIC]],
+            from_block = self.block_number + 1,
+            to_block = to_block_number
+        )
+
+        changed_pools: Set[ChecksumAddress] = set()
+        stale_pools: Set[ChecksumAddress] = set()
+        with self.lock:
+            for log in logs:
+                pool_address: ChecksumAddress = log["address"]
+                topic: str = log["topics"][0].hex()
+
+                if topic == self.SYNC_TOPIC and pool_address in self.reserves:
+                    self.reserves[pool_address] = tuple(decode(["uint112", "uint112"], log["data"]))
+                elif pool_address not in self.pool_states:
+                    continue
+                elif topic == self.SWAP_TOPIC:
+                    _, _, sqrt_price_x96, liquidity, tick = decode(
+                        ["int256", "int256", "uint160", "uint128", "int24"], log["data"]
+                    )
+                    self.pool_states[pool_address] = replace(
+                        self.pool_states[pool_address],
+                        sqrt_price_x96 = sqrt_price_x96,
+                        liquidity = liquidity,
+                        tick = tick
+                    )
+                    pool_state: UniswapV3PoolState = self.pool_states[pool_address]
+                    if not pool_state.min_word < (tick // pool_state.tick_spacing) >> 8 < pool_state.max_word:
+                        stale_pools.add(pool_address)
+                elif topic == self.MINT_TOPIC:
+                    _, amount, _, _ = decode(["address", "uint128", "uint256", "uint256"], log["data"])
+                    self.pool_states[pool_address] = self.__mint(
+                        pool_state = self.pool_states[pool_address],
+                        tick_lower = decode(["int24"], log["topics"][2])[0],
+                        tick_upper = decode(["int24"], log["topics"][3])[0],
+                        amount = amount
+                    )
+                elif topic == self.BURN_TOPIC:
+                    stale_pools.add(pool_address)
+                else:
+                    continue
+
+                changed_pools.add(pool_address)
+
+            stale_pool_keys: List[PoolKey] = [
+                (self.pool_states[pool_address].token0, self.pool_states[pool_address].token1, self.pool_states[pool_address].fee)
+                for pool_address in stale_pools
+            ]
+
+        # Stale pools are reloaded all together, and those that fail to reload are
+        # no longer tracked, as track() leaves them out
+        reloaded_pool_states: Dict[ChecksumAddress, Optional[UniswapV3PoolState]] = (
+            self.uniswapv3_service.fetch_pool_states_by_key(
+                pool_keys = stale_pool_keys,
+                block_identifier = to_block_number
+            ) if stale_pool_keys else dict()
+        )
+
+        with self.lock:
+            for pool_address in stale_pools:
+                pool_state: Optional[UniswapV3PoolState] = reloaded_pool_states.get(pool_address)
+                if pool_state is not None:
+                    self.pool_states[pool_address] = pool_state
+                else:
+                    del self.pool_states[pool_address]
+
+            for pool_address in self.pool_states:
+                self.pool_states[pool_address] = replace(
+                    self.pool_states[pool_address],
+                    block_number = to_block_number
+                )
+            self.changed_blocks.update((pool_address, to_block_number) for pool_address in changed_pools)
+            self.block_number = to_block_number
+
+            self.uniswapv2_service.put_reserve_snapshot(
+                block_number = to_block_number,
+                reserves = dict(self.reserves)
+            )
+            self.uniswapv3_service.put_pool_state_snapshot(
+                block_number = to_block_number,
+                pool_states = dict(self.pool_states)
+            )
+
+        return changed_pools
+
+
+    def get_dirty_pools(self: Self, since_block: BlockNumber) -> Set[ChecksumAddress]:
+        '''
+        Pools whose state changed after since_block
+        '''
+        with self.lock:
+            return set(
+                pool_address for pool_address, block_number in self.changed_blocks.items()
+                if block_number > since_block
+            )
+
+
+    def __get_pair_addresses(self: Self, tokens: List[ChecksumAddress], block_number: BlockNumber) -> List[ChecksumAddress]:
+        return [
+            self.uniswapv2_service.get_pair_address(token_a = token_a, token_b = token_b)
+            for token_a, token_b in combinations(tokens, 2)
+            if self.uniswapv2_service.pool_index.exists(PoolIndex.get_key(token_a, token_b), block_number = block_number) is not False
+        ]
+
+
+    def __mint(
+        self: Self, pool_state: UniswapV3PoolState,
+        tick_lower: int, tick_upper: int, amount: int
+    ) -> UniswapV3PoolState:
+        '''
+        Copy of pool_state with liquidity added to [tick_lower, tick_upper)
+        '''
+        liquidity_net: Dict[int, int] = dict(pool_state.liquidity_net)
+        tick_bitmap: Dict[int, int] = dict(pool_state.tick_bitmap)
+        for tick, liquidity_delta in ((tick_lower, amount), (tick_upper, -amount)):
+            liquidity_net[tick] = liquidity_net.get(tick, 0) + liquidity_delta
+            compressed: int = tick // pool_state.tick_spacing
+            tick_bitmap[compressed >> 8] = tick_bitmap.get(compressed >> 8, 0) | (1 << (compressed % 256))
+
+        return replace(
+            pool_state,
+            liquidity = pool_state.liquidity + (amount if tick_lower <= pool_state.tick < tick_upper else 0),
+            liquidity_net = liquidity_net,
+            tick_bitmap = tick_bitmap
+        )
@@ -1,14 +1,32 @@
 from ..services.contract_service import ContractService
+from ..data_structures.call import CallReturn
+from ..data_structures.call_batch import CallBatch
+from ..data_structures.price_cache import PriceCache, TokenDecimalsCache
 from ..utils.abi import get_abi
 
 from web3 import Web3
-from eth_typing.evm import ChecksumAddress, BlockIdentifier
+from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
 
-from typing import Any, Dict, List
+from multiprocessing.pool import ThreadPool
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 class PriceFeedService():
     '''
     Price feed service using 1inch spot price aggregator
+
+    Prices at block numbers go through price_cache, so a price is fetched once
+    per max_staleness + 1 blocks (fetches at "latest" and other tags bypass it).
+    Token decimals never change and are fetched once into token_decimals_cache.
+
+    fetch_price_usd needs a single multicall, which plan_price_usd lets other
+    services share through a CallBatch.
+
+    Without contract_service, the one of the runtime shared by services built on
+    w3 (see ServiceRuntime.get_default) is used.
+
+    prefetch_price_eth fans out over task_pool if given, sequentially otherwise.
+    Each block runs a multicall on the contract service's pool, so task_pool must
+    not be that pool or it can deadlock.
     '''
     SPOT_AGGREGATOR_1INCH_ADDRESS: ChecksumAddress = "0x0AdDd25a91563696D8567Df78D5A01C9a991F9B8"
     SPOT_AGGREGATOR_1INCH_ABI: Any = get_abi(abi_name = "spot_aggregator_1inch")
@@ -16,13 +34,26 @@ class PriceFeedService():
     USD_PROXY_ADDRESS: ChecksumAddress = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48" # USDC
     ERC20_ABI: Any = get_abi(abi_name = "erc20")
 
-    def __init__(self, w3: Web3) -> None:
+    def __init__(
+        self, w3: Web3, contract_service: Optional[ContractService] = None,
+        price_cache: Optional[PriceCache] = None,
+        token_decimals_cache: Optional[TokenDecimalsCache] = None,
+        task_pool: Optional[ThreadPool] = None
+    ) -> None:
         self.w3: Web3 = w3
-
-        self.contract_service: ContractService = ContractService(
-            w3 = self.w3
+        self.task_pool: Optional[ThreadPool] = task_pool
+        self.price_cache: PriceCache = price_cache if price_cache is not None else PriceCache()
+        self.token_decimals_cache: TokenDecimalsCache = (
+            token_decimals_cache if token_decimals_cache is not None
+            else TokenDecimalsCache()
         )
 
+        if contract_service is None:
+            # Imported here as the runtime builds a PriceFeedService itself
+            from .service_runtime import ServiceRuntime
+            contract_service = ServiceRuntime.get_default(w3 = self.w3).contract_service
+        self.contract_service: ContractService = contract_service
+
         self.contract_service.add_contract(
             address = self.SPOT_AGGREGATOR_1INCH_ADDRESS,
             abi = self.SPOT_AGGREGATOR_1INCH_ABI
@@ -41,85 +72,173 @@ class PriceFeedService():
 
 
     def fetch_price_eth(self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier) -> Dict[ChecksumAddress, float]:
-        return {
-            token_address: price_to_eth
-            for token_address, price_to_eth in zip(
-                tokens, self.contract_service.multicall(
-                    calls = [
-                        {
-                            "contract_address": self.SPOT_AGGREGATOR_1INCH_ADDRESS,
-                            "function_name": "getRateToEth",
-                            "args": [
-                                token_address,
-                                True
-                            ],
-                            "output_types": [
-                                "uint256"
-                            ]
-                        }
-                        for token_address in tokens
-                    ],
-                    require_success = True,
-                    block_identifier = block_identifier,
-                    callbacks = [
-                        lambda result: result.return_data[0] / 1e36 if result.success else None
-                    ] * len(tokens)
-                )
+        if not isinstance(block_identifier, int):
+            return self.__fetch_price_eth(tokens = tokens, block_identifier = block_identifier)
+
+        prices: Dict[ChecksumAddress, float] = self.price_cache.get_many(
+            tokens = tokens,
+            block_number = block_identifier
+        )
+        missing_tokens: List[ChecksumAddress] = [token_address for token_address in tokens if token_address not in prices]
+        if len(missing_tokens) > 0:
+            fetched_prices: Dict[ChecksumAddress, float] = self.__fetch_price_eth(
+                tokens = missing_tokens,
+                block_identifier = block_identifier
             )
-        }
+            self.price_cache.put_many(prices = fetched_prices, block_number = block_identifier)
+            prices.update(fetched_prices)
+
+        return {token_address: prices[token_address] for token_address in tokens}
+
+
+    def prefetch_price_eth(self, tokens: List[ChecksumAddress], block_numbers: Iterable[BlockNumber]) -> None:
+        '''
+        Fill the price cache for every block of block_numbers (e.g. a backtest's
+        range), fetching only as many blocks as the staleness tolerance requires,
+        in parallel on task_pool
+        '''
+        tokens = list(dict.fromkeys(tokens + [self.USD_PROXY_ADDRESS]))
+        assert self.task_pool is None or self.task_pool is not self.contract_service.pool, (
+            "task_pool must not be the contract service's pool."
+        )
+        list((self.task_pool.map if self.task_pool is not None else map)(
+            lambda block_number: self.fetch_price_eth(tokens = tokens, block_identifier = block_number),
+            self.price_cache.plan_blocks(tokens = tokens, block_numbers = block_numbers)
+        ))
+
+
+    def __fetch_price_eth(self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier) -> Dict[ChecksumAddress, float]:
+        return dict(zip(
+            tokens, self.contract_service.multicall(
+                calls = [self.__get_rate_to_eth_call(token_address) for token_address in tokens],
+                require_success = True,
+                block_identifier = block_identifier,
+                callbacks = [self.__parse_rate_to_eth] * len(tokens)
+            )
+        ))
     
 
     def fetch_price_usd(self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier) -> Dict[ChecksumAddress, float]:
-        eth_price_usd: float = self.fetch_eth_price_usd(
-            block_identifier = block_identifier
+        call_batch: CallBatch = CallBatch(block_identifier = block_identifier)
+        get_price_usd: Callable[[], Dict[ChecksumAddress, float]] = self.plan_price_usd(
+            tokens = tokens,
+            call_batch = call_batch
         )
+        call_batch.execute(contract_service = self.contract_service)
+        return get_price_usd()
 
-        token_decimals: Dict[ChecksumAddress, int] = self.fetch_token_decimals(
-            tokens = tokens,
-            block_identifier = block_identifier
+
+    def plan_price_usd(self, tokens: List[ChecksumAddress], call_batch: CallBatch) -> Callable[[], Dict[ChecksumAddress, float]]:
+        '''
+        Add the calls pricing tokens in USD to call_batch: the USDC rate, the rates
+        and the decimals of the tokens, less what the caches already have. Returns
+        a function giving the prices once the batch is executed.
+        '''
+        block_identifier: BlockIdentifier = call_batch.block_identifier
+        price_tokens: List[ChecksumAddress] = list(dict.fromkeys([self.USD_PROXY_ADDRESS] + tokens))
+
+        prices: Dict[ChecksumAddress, float] = (
+            self.price_cache.get_many(tokens = price_tokens, block_number = block_identifier)
+            if isinstance(block_identifier, int) else dict()
+        )
+        missing_price_tokens: List[ChecksumAddress] = [
+            token_address for token_address in price_tokens if token_address not in prices
+        ]
+        get_prices: Callable[[], List[Optional[float]]] = call_batch.add(
+            calls = [self.__get_rate_to_eth_call(token_address) for token_address in missing_price_tokens],
+            callbacks = [self.__parse_rate_to_eth] * len(missing_price_tokens)
         )
 
-        return {
-            token_address: (
-                price_eth
-                * eth_price_usd
-                * 10 ** token_decimals.get(token_address)
-            ) if price_eth is not None else None
-            for token_address, price_eth in self.fetch_price_eth(
-                tokens = tokens,
-                block_identifier = block_identifier
-            ).items()
-        }
+        token_decimals: Dict[ChecksumAddress, int] = self.token_decimals_cache.get_many(tokens = tokens)
+        missing_decimals_tokens: List[ChecksumAddress] = [
+            token_address for token_address in dict.fromkeys(tokens) if token_address not in token_decimals
+        ]
+        self.__initialize_token_contracts(tokens = missing_decimals_tokens)
+        get_decimals: Callable[[], List[Optional[int]]] = call_batch.add(
+            calls = [self.__get_decimals_call(token_address) for token_address in missing_decimals_tokens],
+            callbacks = [self.__parse_decimals] * len(missing_decimals_tokens)
+        )
+
+        def get_price_usd() -> Dict[ChecksumAddress, float]:
+            fetched_prices: Dict[ChecksumAddress, float] = dict(zip(missing_price_tokens, get_prices()))
+            if isinstance(block_identifier, int):
+                self.price_cache.put_many(prices = fetched_prices, block_number = block_identifier)
+            prices.update(fetched_prices)
+
+            fetched_decimals: Dict[ChecksumAddress, int] = dict(zip(missing_decimals_tokens, get_decimals()))
+            self.token_decimals_cache.put_many(decimals = fetched_decimals)
+            token_decimals.update(fetched_decimals)
+
+            eth_price_usd: float = 1e-6 / prices[self.USD_PROXY_ADDRESS]
+            return {
+                token_address: (
+                    prices[token_address]
+                    * eth_price_usd
+                    * 10 ** token_decimals[token_address]
+                ) if prices[token_address] is not None and token_decimals[token_address] is not None else None
+                for token_address in tokens
+            }
+        return get_price_usd
+
 
     def fetch_token_decimals(
         self, tokens: List[ChecksumAddress], block_identifier: BlockIdentifier = "latest"
     ) -> Dict[ChecksumAddress, float]:
-        self.__initialize_token_contracts(tokens = tokens)
-        return {
-            token_address: decimals
-            for token_address, decimals in zip(
-                tokens,
-                map(
-                    lambda result: result.return_data[0] if result.success else None,
-                    self.contract_service.multicall(
-                        calls = [
-                            {
-                                "contract_address": token_address,
-                                "function_name": "decimals",
-                                "args": [],
-                                "output_types": [
-                                    "uint256"
-                                ]
-                            }
-                            for token_address in tokens
-                        ],
-                        require_success = True,
-                        block_identifier = block_identifier
-                    )
+        token_decimals: Dict[ChecksumAddress, int] = self.token_decimals_cache.get_many(tokens = tokens)
+        missing_tokens: List[ChecksumAddress] = [
+            token_address for token_address in dict.fromkeys(tokens) if token_address not in token_decimals
+        ]
+        if len(missing_tokens) > 0:
+            self.__initialize_token_contracts(tokens = missing_tokens)
+            fetched_decimals: Dict[ChecksumAddress, int] = dict(zip(
+                missing_tokens, self.contract_service.multicall(
+                    calls = [self.__get_decimals_call(token_address) for token_address in missing_tokens],
+                    require_success = True,
+                    block_identifier = block_identifier,
+                    callbacks = [self.__parse_decimals] * len(missing_tokens)
                 )
-            )
+            ))
+            self.token_decimals_cache.put_many(decimals = fetched_decimals)
+            token_decimals.update(fetched_decimals)
+
+        return {token_address: token_decimals[token_address] for token_address in tokens}
+
+
+    def __get_rate_to_eth_call(self, token_address: ChecksumAddress) -> Dict[str, Any]:
+        return {
+            "contract_address": self.SPOT_AGGREGATOR_1INCH_ADDRESS,
+            "function_name": "getRateToEth",
+            "args": [
+                token_address,
+                True
+            ],
+            "output_types": [
+                "uint256"
+            ]
+        }
+
+
+    def __get_decimals_call(self, token_address: ChecksumAddress) -> Dict[str, Any]:
+        return {
+            "contract_address": token_address,
+            "function_name": "decimals",
+            "args": [],
+            "output_types": [
+                "uint256"
+            ]
         }
 
+
+    @staticmethod
+    def __parse_rate_to_eth(result: CallReturn) -> Optional[float]:
+        return result.return_data[0] / 1e36 if result.success else None
+
+
+    @staticmethod
+    def __parse_decimals(result: CallReturn) -> Optional[int]:
+        return result.return_data[0] if result.success else None
+
+
     def __initialize_token_contracts(
         self, tokens: List[ChecksumAddress]
     ) -> None:
@@ -127,4 +246,4 @@ class PriceFeedService():
             self.contract_service.add_contract(
                 address = token_address,
                 abi = self.ERC20_ABI
-            )
\ No newline at end of file
+            )
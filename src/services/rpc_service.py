@@ -0,0 +1,498 @@
+from ..data_structures.rate_limiter import (
+    RateLimiter,
+    RateLimitError,
+    RetriableError,
+    RetryPolicy,
+    RETRIABLE_STATUS_CODES
+)
+from ..data_structures.rpc_metrics import MetricsSink, RpcMetric
+
+from web3 import HTTPProvider
+from web3.providers import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+from requests import Session, Response
+from requests.exceptions import ConnectionError, HTTPError, RequestException, Timeout
+
+from multiprocessing.pool import ThreadPool
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import chain, count
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+from typing_extensions import Self
+
+
+RpcRequest = Tuple[str, List[Any]]
+
+
+def post_with_retry(
+    session: Session, url: str, retry_policy: RetryPolicy,
+    rate_limiter: Optional[RateLimiter] = None, tokens: float = 1,
+    is_rate_limited: Optional[Callable[[Response], bool]] = None, **kwargs
+) -> Response:
+    '''
+    POST through the rate limiter, retrying connection errors, timeouts and
+    retriable status codes with backoff. A 429, or a response is_rate_limited
+    flags, also pauses the endpoint's bucket so that other threads back off with
+    it and is retried the same way. The last response is returned as is.
+    '''
+    for attempt in range(retry_policy.max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire(endpoint_uri = url, tokens = tokens)
+
+        try:
+            response: Response = session.post(url = url, **kwargs)
+        except (ConnectionError, Timeout) as e:
+            if attempt == retry_policy.max_retries:
+                raise e
+            sleep(retry_policy.get_delay(attempt = attempt))
+            continue
+
+        rate_limited: bool = response.status_code == 429 or (
+            response.status_code == 200 and is_rate_limited is not None and is_rate_limited(response)
+        )
+        if (
+            (response.status_code not in RETRIABLE_STATUS_CODES and not rate_limited)
+            or attempt == retry_policy.max_retries
+        ):
+            return response
+
+        delay: float = retry_policy.get_delay(
+            attempt = attempt,
+            retry_after = RetryPolicy.get_retry_after(response)
+        )
+        if rate_limited and rate_limiter is not None:
+            rate_limiter.pause(endpoint_uri = url, delay = delay)
+        sleep(delay)
+
+
+class SessionHTTPProvider(HTTPProvider):
+    '''
+    HTTPProvider posting through one given session from every thread. web3 keeps
+    a session per thread, so short-lived pools keep opening new connections.
+    Requests go through rate_limiter, and throttled or failed ones are retried.
+    '''
+    def __init__(
+        self, endpoint_uri: str, session: Session, request_kwargs: Optional[Any] = None,
+        rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None
+    ) -> None:
+        super().__init__(endpoint_uri = endpoint_uri, request_kwargs = request_kwargs)
+        self.session: Session = session
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_kwargs: Dict[str, Any] = self.get_request_kwargs()
+        request_kwargs.setdefault("timeout", 10)
+
+        response: Response = post_with_retry(
+            session = self.session,
+            url = self.endpoint_uri,
+            retry_policy = self.retry_policy,
+            rate_limiter = self.rate_limiter,
+            is_rate_limited = self.__is_rate_limited,
+            data = self.encode_rpc_request(method, params),
+            **request_kwargs
+        )
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
+
+    @staticmethod
+    def __is_rate_limited(response: Response) -> bool:
+        if b'"error"' not in response.content:
+            return False
+        try:
+            return RetryPolicy.get_rate_limit_error(response.json()) is not None
+        except ValueError:
+            return False
+
+
+class RoutingHTTPProvider(JSONBaseProvider):
+    '''
+    web3 provider sending every request through an RpcService, so plain w3 calls
+    are routed across its endpoints as well
+    '''
+    def __init__(self, rpc_service: "RpcService") -> None:
+        super().__init__()
+        self.rpc_service: RpcService = rpc_service
+        self.endpoint_uri: str = rpc_service.endpoint_uri
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.rpc_service.raw_request(method = method, params = params)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+
+@dataclass
+class EndpointStats():
+    endpoint_uri: str
+    latencies: Deque[float] = field(default_factory = lambda: deque(maxlen = 200))
+    requests: int = 0
+    failures: int = 0
+    error_rate: float = 0 # Exponentially weighted failure rate
+    last_failure: float = -float("inf")
+
+    def record(self: Self, latency: float, failed: bool, smoothing: float = 0.2) -> None:
+        self.requests += 1
+        self.error_rate = smoothing * failed + (1 - smoothing) * self.error_rate
+        if failed:
+            self.failures += 1
+            self.last_failure = monotonic()
+        else:
+            self.latencies.append(latency)
+
+    def latency_percentile(self: Self, percentile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        latencies: List[float] = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+
+class RpcService():
+    '''
+    Minimal JSON-RPC client able to pack many requests into a single batch POST.
+
+    Given several endpoints, it tracks per-endpoint latency and error rate, routes
+    every batch to the fastest healthy endpoint and fails over to the next one on
+    transport errors. Hedged batches fire a duplicate at the runner-up endpoint once
+    the primary is slower than its hedge_percentile latency.
+
+    Posts take len(batch) tokens from the endpoint's bucket in rate_limiter. When every
+    endpoint failed with a throttling or transient error, the batch is retried after
+    a jittered backoff from retry_policy.
+
+    The batches of a batch_request are posted concurrently from pool, or if none
+    is given from a pool of max_concurrent_batches threads created on first use,
+    kept for later requests and terminated by close().
+    '''
+    def __init__(
+        self: Self, endpoint_uri: Union[str, List[str]], session: Optional[Session] = None,
+        pool: Optional[ThreadPool] = None, max_concurrent_batches: int = 16, timeout: float = 10,
+        hedge_percentile: float = 0.9, default_hedge_delay: float = 0.5,
+        max_error_rate: float = 0.5, unhealthy_cooldown: float = 30,
+        metrics_sink: Optional[MetricsSink] = None,
+        rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None
+    ) -> None:
+        self.endpoint_uris: List[str] = (
+            [endpoint_uri] if isinstance(endpoint_uri, str) else list(endpoint_uri)
+        )
+        self.endpoint_uri: str = self.endpoint_uris[0]
+        self.session: Session = session if session is not None else Session()
+        self.pool: Optional[ThreadPool] = pool
+        self.max_concurrent_batches: int = max_concurrent_batches
+        self.batch_pool: Optional[ThreadPool] = None
+        self.batch_pool_lock: Lock = Lock()
+        self.timeout: float = timeout
+
+        self.hedge_percentile: float = hedge_percentile
+        self.default_hedge_delay: float = default_hedge_delay
+        self.max_error_rate: float = max_error_rate
+        self.unhealthy_cooldown: float = unhealthy_cooldown
+
+        self.endpoint_stats: Dict[str, EndpointStats] = {
+            uri: EndpointStats(endpoint_uri = uri) for uri in self.endpoint_uris
+        }
+        self.stats_lock: Lock = Lock()
+        self.hedge_executor: Optional[ThreadPoolExecutor] = None
+        self.metrics_sink: Optional[MetricsSink] = metrics_sink
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
+
+        self.request_id_counter = count()
+
+
+    def request(self: Self, method: str, params: List[Any]) -> Any:
+        return self.batch_request(
+            requests = [(method, params)]
+        )[0]
+
+
+    def raw_request(self: Self, method: str, params: Any) -> Dict[str, Any]:
+        '''
+        Send a single request and return the raw JSON-RPC response object
+        '''
+        payload: Dict[str, Any] = {
+            "jsonrpc": "2.0",
+            "id": next(self.request_id_counter),
+            "method": method,
+            "params": params
+        }
+        return self.__post_routed(payload = payload)
+
+
+    def batch_request(
+        self: Self, requests: List[RpcRequest], max_batch_size: int = 100,
+        raise_on_error: bool = True, hedge: bool = False
+    ) -> List[Union[Any, ValueError]]:
+        '''
+        Send the requests as JSON-RPC batches of at most max_batch_size and return
+        the results in request order. If raise_on_error is False, failed requests
+        are returned as ValueError instances instead of being raised.
+        '''
+        request_batches: List[List[RpcRequest]] = [
+            requests[i: i + max_batch_size]
+            for i in range(0, len(requests), max_batch_size)
+        ]
+
+        post_batch = lambda request_batch: self.__post_batch(
+            requests = request_batch,
+            hedge = hedge
+        )
+
+        results: List[Union[Any, ValueError]] = list(chain.from_iterable(
+            map(post_batch, request_batches) if len(request_batches) <= 1
+            else self.__get_pool().map(post_batch, request_batches)
+        ))
+
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, ValueError):
+                    raise result
+
+        return results
+
+
+    def close(self: Self) -> None:
+        if self.batch_pool is not None:
+            self.batch_pool.terminate()
+            self.batch_pool = None
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait = False)
+            self.hedge_executor = None
+
+
+    def rank_endpoints(self: Self) -> List[str]:
+        '''
+        Healthy endpoints first, fastest (median latency) first. Endpoints without
+        samples are tried early so that every endpoint gets measured.
+        '''
+        now: float = monotonic()
+        with self.stats_lock:
+            return sorted(
+                self.endpoint_uris,
+                key = lambda uri: (
+                    self.endpoint_stats[uri].error_rate > self.max_error_rate
+                        and now - self.endpoint_stats[uri].last_failure < self.unhealthy_cooldown,
+                    self.endpoint_stats[uri].latency_percentile(0.5) or 0
+                )
+            )
+
+
+    def __get_pool(self: Self) -> ThreadPool:
+        if self.pool is not None:
+            return self.pool
+        with self.batch_pool_lock:
+            if self.batch_pool is None:
+                self.batch_pool = ThreadPool(self.max_concurrent_batches)
+            return self.batch_pool
+
+
+    def __post_batch(self: Self, requests: List[RpcRequest], hedge: bool = False) -> List[Union[Any, ValueError]]:
+        payload: List[Dict[str, Any]] = [
+            {
+                "jsonrpc": "2.0",
+                "id": next(self.request_id_counter),
+                "method": method,
+                "params": params
+            }
+            for method, params in requests
+        ]
+
+        try:
+            response_body: Any = self.__post_routed(
+                payload = payload,
+                hedge = hedge
+            )
+        except ValueError as e:
+            return [e] * len(payload)
+
+        responses_by_id: Dict[int, Dict[str, Any]] = {
+            item.get("id"): item for item in response_body
+        }
+
+        return [
+            self.__parse_response(responses_by_id.get(item.get("id")))
+            for item in payload
+        ]
+
+
+    def __post_routed(self: Self, payload: Any, hedge: bool = False) -> Any:
+        '''
+        Post to the best endpoint, failing over to the next ones on transport errors
+        '''
+        last_error: Optional[ValueError] = None
+        attempt: int = 0
+        for retry in range(self.retry_policy.max_retries + 1):
+            if retry > 0:
+                if not isinstance(last_error, RetriableError):
+                    break
+                sleep(self.retry_policy.get_delay(
+                    attempt = retry - 1,
+                    retry_after = last_error.retry_after
+                ))
+
+            endpoint_uris: List[str] = self.rank_endpoints()
+            while endpoint_uris:
+                try:
+                    if hedge and len(endpoint_uris) > 1:
+                        return self.__post_hedged(
+                            payload = payload,
+                            primary_uri = endpoint_uris[0],
+                            backup_uri = endpoint_uris[1],
+                            attempt = attempt
+                        )
+                    return self.__post(payload = payload, endpoint_uri = endpoint_uris[0], attempt = attempt)
+                except ValueError as e:
+                    last_error = e
+                    endpoint_uris = endpoint_uris[2:] if hedge else endpoint_uris[1:]
+                    attempt += 1
+
+        raise last_error
+
+
+    def __post_hedged(self: Self, payload: Any, primary_uri: str, backup_uri: str, attempt: int = 0) -> Any:
+        if self.hedge_executor is None:
+            self.hedge_executor = ThreadPoolExecutor(thread_name_prefix = "rpc-hedge")
+
+        with self.stats_lock:
+            hedge_delay: float = (
+                self.endpoint_stats[primary_uri].latency_percentile(self.hedge_percentile)
+                or self.default_hedge_delay
+            )
+
+        futures: List[Future] = [
+            self.hedge_executor.submit(self.__post, payload, primary_uri, attempt)
+        ]
+        done, _ = wait(futures, timeout = hedge_delay)
+        if not done or futures[0].exception() is not None:
+            futures.append(self.hedge_executor.submit(self.__post, payload, backup_uri, attempt + 1))
+
+        pending: List[Future] = futures
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, not_done = wait(pending, return_when = FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+            pending = list(not_done)
+
+        raise last_error
+
+
+    def __post(self: Self, payload: Any, endpoint_uri: str, attempt: int = 0) -> Any:
+        '''
+        attempt counts the failovers and hedges that led to this post
+        '''
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(
+                endpoint_uri = endpoint_uri,
+                tokens = len(payload) if isinstance(payload, list) else 1
+            )
+
+        begin: float = perf_counter()
+        response: Optional[Response] = None
+        try:
+            response = self.session.post(
+                url = endpoint_uri,
+                json = payload,
+                timeout = self.timeout
+            )
+            response.raise_for_status()
+            response_body: Any = response.json()
+
+            if isinstance(payload, list) and isinstance(response_body, dict):
+                # Some providers answer a rejected batch with a single error object
+                error: Any = response_body.get("error", response_body)
+                if RetryPolicy.is_rate_limit_error(error):
+                    raise RateLimitError(error, retry_after = RetryPolicy.get_retry_after(response))
+                raise ValueError(error)
+
+            # Throttled items make the whole post retried, like an HTTP 429
+            rate_limit_error: Optional[Any] = RetryPolicy.get_rate_limit_error(response_body)
+            if rate_limit_error is not None:
+                raise RateLimitError(rate_limit_error, retry_after = RetryPolicy.get_retry_after(response))
+        except (RequestException, ValueError) as e:
+            self.__record(
+                payload = payload,
+                endpoint_uri = endpoint_uri,
+                latency = perf_counter() - begin,
+                failed = True,
+                response = response,
+                attempt = attempt
+            )
+            raise self.__classify_error(error = e, endpoint_uri = endpoint_uri, response = response)
+
+        self.__record(
+            payload = payload,
+            endpoint_uri = endpoint_uri,
+            latency = perf_counter() - begin,
+            failed = False,
+            response = response,
+            attempt = attempt
+        )
+        return response_body
+
+
+    def __classify_error(
+        self: Self, error: Exception, endpoint_uri: str, response: Optional[Response] = None
+    ) -> ValueError:
+        '''
+        Turn a failed post into a ValueError, retriable if it was throttled or transient.
+        Throttling also pauses the endpoint in the rate limiter.
+        '''
+        if isinstance(error, RetriableError):
+            retriable_error: RetriableError = error
+        elif isinstance(error, HTTPError) and response is not None:
+            if response.status_code not in RETRIABLE_STATUS_CODES:
+                return ValueError(str(error))
+            retriable_error: RetriableError = (
+                RateLimitError if response.status_code == 429 else RetriableError
+            )(str(error), retry_after = RetryPolicy.get_retry_after(response))
+        elif isinstance(error, RequestException):
+            retriable_error: RetriableError = RetriableError(str(error))
+        else:
+            return ValueError(str(error))
+
+        if isinstance(retriable_error, RateLimitError) and self.rate_limiter is not None:
+            self.rate_limiter.pause(
+                endpoint_uri = endpoint_uri,
+                delay = retriable_error.retry_after or self.retry_policy.base_delay
+            )
+        return retriable_error
+
+
+    def __record(
+        self: Self, payload: Any, endpoint_uri: str, latency: float, failed: bool,
+        response: Optional[Response] = None, attempt: int = 0
+    ) -> None:
+        with self.stats_lock:
+            self.endpoint_stats[endpoint_uri].record(latency = latency, failed = failed)
+
+        if self.metrics_sink is not None:
+            self.metrics_sink.record(RpcMetric(
+                method = (
+                    payload["method"] if isinstance(payload, dict)
+                    else payload[0]["method"] if len(payload) == 1
+                    else "batch"
+                ),
+                latency = latency,
+                calls = len(payload) if isinstance(payload, list) else 1,
+                request_bytes = len(response.request.body or b"") if response is not None else 0,
+                response_bytes = len(response.content) if response is not None else 0,
+                retries = attempt,
+                failed = failed,
+                endpoint_uri = endpoint_uri
+            ))
+
+
+    @staticmethod
+    def __parse_response(response: Optional[Dict[str, Any]]) -> Union[Any, ValueError]:
+        if response is None:
+            return ValueError("Missing response in JSON-RPC batch")
+        if "error" in response:
+            return ValueError(response.get("error"))
+        return response.get("result")
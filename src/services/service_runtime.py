@@ -0,0 +1,267 @@
+from .async_contract_service import AsyncContractService
+from .contract_service import ContractService
+from .price_feed_service import PriceFeedService
+from .rpc_service import RpcService, RoutingHTTPProvider, SessionHTTPProvider
+from .thegraph_service import TheGraphService
+
+from ..data_structures.base_fee_history import BaseFeeHistory
+from ..data_structures.call_result_cache import CallResultCache
+from ..data_structures.pool_index import PoolIndex
+from ..data_structures.price_cache import PriceCache, TokenDecimalsCache
+from ..data_structures.pool_registry import PoolRegistry
+from ..data_structures.multicall_backend import MulticallBackend
+from ..data_structures.rate_limiter import RateLimiter, RetryPolicy
+from ..data_structures.rpc_metrics import MetricsSink
+
+from web3 import Web3, AsyncWeb3
+from eth_typing.evm import ChecksumAddress
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+from typing import Dict, List, Optional
+from typing_extensions import Self
+import os
+
+
+class ServiceRuntime():
+    '''
+    What all services share: one pooled HTTP session, long-lived thread pools and
+    a single ContractService (with its contract, codec, result and base fee caches)
+    and PriceFeedService.
+
+    RPC I/O runs on rpc_pool and search fan-outs on task_pool. Fan-out workers call
+    multicall, so the two must not be the same pool or it can deadlock.
+
+    If w3 uses a RoutingHTTPProvider, its RpcService (and so its endpoint routing)
+    is shared with the ContractService batch requests.
+
+    metrics_sink, if given, receives a metric for every RPC of both services.
+
+    Pool indices are persisted per factory under pool_index_directory if given.
+    pool_registry holds the pools synced from factory logs, in memory by default.
+    Once synced up to a block, it answers index_pools at that block instead of
+    getPair/getPool lookups.
+
+    price_cache and token_decimals_cache back the PriceFeedService, so prices and
+    decimals fetched for one block or service are reused by all.
+
+    rate_limiter and retry_policy are shared by the RpcService and TheGraphService.
+    Build the runtime with from_endpoint_uri(s) and requests_per_second to have the
+    web3 provider go through the same rate limiter.
+
+    Services built without a runtime share the one of get_default for their w3.
+    '''
+    # id(w3) -> runtime shared by the services built without one
+    default_runtimes: Dict[int, "ServiceRuntime"] = dict()
+    default_runtimes_lock: Lock = Lock()
+
+    def __init__(
+        self: Self, w3: Web3, session: Optional[Session] = None,
+        rpc_pool_size: int = 32, task_pool_size: int = 8,
+        use_batch_request: bool = False,
+        call_result_cache: Optional[CallResultCache] = None,
+        multicall_backend: Optional[MulticallBackend] = None,
+        metrics_sink: Optional[MetricsSink] = None,
+        base_fee_history: Optional[BaseFeeHistory] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        pool_index_directory: Optional[str] = None,
+        pool_registry: Optional[PoolRegistry] = None,
+        price_cache: Optional[PriceCache] = None,
+        token_decimals_cache: Optional[TokenDecimalsCache] = None
+    ) -> None:
+        self.w3: Web3 = w3
+        self.session: Session = (
+            session if session is not None
+            else ServiceRuntime.create_session(pool_size = rpc_pool_size)
+        )
+
+        self.rpc_pool: ThreadPool = ThreadPool(rpc_pool_size)
+        self.task_pool: ThreadPool = ThreadPool(task_pool_size)
+
+        if isinstance(self.w3.provider, RoutingHTTPProvider):
+            self.rpc_service: RpcService = self.w3.provider.rpc_service
+            if self.rpc_service.pool is None:
+                self.rpc_service.pool = self.rpc_pool
+            if self.rpc_service.metrics_sink is None:
+                self.rpc_service.metrics_sink = metrics_sink
+            if self.rpc_service.rate_limiter is None:
+                self.rpc_service.rate_limiter = rate_limiter
+        else:
+            self.rpc_service: RpcService = RpcService(
+                endpoint_uri = self.w3.provider.endpoint_uri,
+                session = self.session,
+                pool = self.rpc_pool,
+                metrics_sink = metrics_sink,
+                rate_limiter = rate_limiter,
+                retry_policy = retry_policy
+            )
+
+        self.contract_service: ContractService = ContractService(
+            w3 = self.w3,
+            use_batch_request = use_batch_request,
+            call_result_cache = call_result_cache,
+            session = self.session,
+            pool = self.rpc_pool,
+            rpc_service = self.rpc_service,
+            multicall_backend = multicall_backend,
+            metrics_sink = metrics_sink,
+            base_fee_history = base_fee_history
+        )
+        self.price_feed_service: PriceFeedService = PriceFeedService(
+            w3 = self.w3,
+            contract_service = self.contract_service,
+            price_cache = price_cache,
+            token_decimals_cache = token_decimals_cache,
+            task_pool = self.task_pool
+        )
+        self.thegraph_service: TheGraphService = TheGraphService(
+            session = self.session,
+            rate_limiter = rate_limiter,
+            retry_policy = retry_policy
+        )
+
+        self.pool_index_directory: Optional[str] = pool_index_directory
+        self.pool_indices: Dict[ChecksumAddress, PoolIndex] = dict()
+        self.pool_registry: PoolRegistry = pool_registry if pool_registry is not None else PoolRegistry()
+
+
+    def get_pool_index(self: Self, factory_address: ChecksumAddress) -> PoolIndex:
+        '''
+        The pool index of a factory, shared by every service using the factory
+        '''
+        if factory_address not in self.pool_indices:
+            self.pool_indices[factory_address] = PoolIndex(
+                path = os.path.join(self.pool_index_directory, f"{factory_address}.json")
+                    if self.pool_index_directory is not None else None
+            )
+        return self.pool_indices[factory_address]
+
+
+    def create_async_contract_service(
+        self: Self, async_w3: AsyncWeb3, max_concurrent_requests: int = 32
+    ) -> AsyncContractService:
+        '''
+        An AsyncContractService sharing the multicall backend, chunk sizes, base fee
+        history and rate limiter of the runtime's ContractService
+        '''
+        return AsyncContractService(
+            w3 = async_w3,
+            max_concurrent_requests = max_concurrent_requests,
+            multicall_backend = self.contract_service.multicall_backend,
+            base_fee_history = self.contract_service.base_fee_history,
+            rate_limiter = self.rpc_service.rate_limiter,
+            chunk_sizer = self.contract_service.chunk_sizer
+        )
+
+
+    @classmethod
+    def get_default(cls, w3: Web3) -> Self:
+        '''
+        The runtime shared by every service built on w3 without a runtime, created
+        on first use with default settings
+        '''
+        with cls.default_runtimes_lock:
+            runtime: Optional[ServiceRuntime] = cls.default_runtimes.get(id(w3))
+            if runtime is None or runtime.w3 is not w3:
+                runtime = cls(w3 = w3)
+                cls.default_runtimes[id(w3)] = runtime
+        return runtime
+
+
+    @classmethod
+    def from_endpoint_uri(
+        cls, endpoint_uri: str, rpc_pool_size: int = 32,
+        requests_per_second: Optional[float] = None, **kwargs
+    ) -> Self:
+        '''
+        Build the runtime together with a Web3 whose provider uses the pooled session,
+        keeping every request to the endpoint under requests_per_second if given
+        '''
+        session: Session = ServiceRuntime.create_session(pool_size = rpc_pool_size)
+        rate_limiter: Optional[RateLimiter] = kwargs.pop("rate_limiter", None)
+        if rate_limiter is None and requests_per_second is not None:
+            rate_limiter = RateLimiter(requests_per_second = requests_per_second)
+
+        return cls(
+            w3 = Web3(SessionHTTPProvider(
+                endpoint_uri = endpoint_uri,
+                session = session,
+                rate_limiter = rate_limiter,
+                retry_policy = kwargs.get("retry_policy")
+            )),
+            session = session,
+            rpc_pool_size = rpc_pool_size,
+            rate_limiter = rate_limiter,
+            **kwargs
+        )
+
+
+    @classmethod
+    def from_endpoint_uris(
+        cls, endpoint_uris: List[str], rpc_pool_size: int = 32,
+        hedge_percentile: float = 0.9, requests_per_second: Optional[float] = None,
+        **kwargs
+    ) -> Self:
+        '''
+        Build the runtime together with a Web3 routing every request across the
+        endpoints by latency and health, each endpoint kept under requests_per_second
+        if given
+        '''
+        session: Session = ServiceRuntime.create_session(pool_size = rpc_pool_size)
+        rate_limiter: Optional[RateLimiter] = kwargs.pop("rate_limiter", None)
+        if rate_limiter is None and requests_per_second is not None:
+            rate_limiter = RateLimiter(requests_per_second = requests_per_second)
+
+        rpc_service: RpcService = RpcService(
+            endpoint_uri = endpoint_uris,
+            session = session,
+            hedge_percentile = hedge_percentile,
+            rate_limiter = rate_limiter,
+            retry_policy = kwargs.get("retry_policy")
+        )
+        return cls(
+            w3 = Web3(RoutingHTTPProvider(rpc_service = rpc_service)),
+            session = session,
+            rpc_pool_size = rpc_pool_size,
+            rate_limiter = rate_limiter,
+            **kwargs
+        )
+
+
+    @staticmethod
+    def create_session(pool_size: int = 32) -> Session:
+        session: Session = Session()
+        adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections = 4,
+            pool_maxsize = pool_size
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+    def close(self: Self) -> None:
+        with ServiceRuntime.default_runtimes_lock:
+            if ServiceRuntime.default_runtimes.get(id(self.w3)) is self:
+                del ServiceRuntime.default_runtimes[id(self.w3)]
+
+        self.contract_service.base_fee_history.save()
+        self.price_feed_service.token_decimals_cache.save()
+        for pool_index in self.pool_indices.values():
+            pool_index.save()
+        self.pool_registry.close()
+        self.contract_service.close()
+        self.task_pool.close()
+        self.rpc_pool.close()
+        self.session.close()
+
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+
+    def __exit__(self: Self, *args) -> None:
+        self.close()
@@ -1,16 +1,27 @@
-from requests import request, Response
+from .rpc_service import post_with_retry
+
+from ..data_structures.rate_limiter import RateLimiter, RetryPolicy
+
+from requests import Response, Session
 
 from typing import Optional
 
 class TheGraphService():
-    def __init__(self) -> None:
-        pass
+    def __init__(
+        self, session: Optional[Session] = None, rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ) -> None:
+        self.session: Session = session if session is not None else Session()
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry_policy: RetryPolicy = retry_policy if retry_policy is not None else RetryPolicy()
 
     def query(self, url: str, query: str, api_key: Optional[str] = None):
         # TODO Handle pagination
-        response: Response = request(
-            method = "POST",
+        response: Response = post_with_retry(
+            session = self.session,
             url = url,
+            retry_policy = self.retry_policy,
+            rate_limiter = self.rate_limiter,
             json = {
                 "query": query
             },
@@ -23,4 +34,3 @@ class TheGraphService():
             raise Exception(f"{response.status_code}: {response.reason}")
 
         return response.json()
-        
\ No newline at end of file
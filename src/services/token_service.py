@@ -1,22 +1,26 @@
 from .contract_service import ContractService
 from .thegraph_service import TheGraphService
+from .service_runtime import ServiceRuntime
 
 from web3 import Web3
 from eth_typing.evm import ChecksumAddress, BlockIdentifier
 
 from datetime import datetime
 from functools import cache
-from typing import List
+from typing import List, Optional
 
 class TokenService():
     BITQUERY_THEGRAPH_URL: str = "https://streaming.bitquery.io/graphql"
 
-    def __init__(self, w3: Web3, bitquery_api_key: str) -> None:
+    def __init__(
+        self, w3: Web3, bitquery_api_key: str, runtime: Optional[ServiceRuntime] = None
+    ) -> None:
         self.w3: Web3 = w3
         self.bitquery_api_key: str = bitquery_api_key
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
 
-        self.contract_service: ContractService = ContractService(w3 = self.w3)
-        self.thegraph_service: TheGraphService = TheGraphService()
+        self.contract_service: ContractService = self.runtime.contract_service
+        self.thegraph_service: TheGraphService = self.runtime.thegraph_service
 
     
     @cache
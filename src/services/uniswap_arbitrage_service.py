@@ -1,6 +1,8 @@
 from .arbitrage_service import ArbitrageService, ExchangeGraph, Arbitrage
 from .uniswapv2_service import UniswapV2Service
 from .uniswapv3_service import UniswapV3Service
+from .pool_state_tracker import PoolStateTracker
+from .service_runtime import ServiceRuntime
 
 from ..data_structures.exchange_graph import ExchangeFunction
 from ..utils.web3_utils import block_identifier_to_number
@@ -11,41 +13,126 @@ from eth_account.signers.local import LocalAccount
 from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
 
 from hexbytes import HexBytes
-from typing import List, Generator
+from typing import List, Generator, Optional, Set
 
 class UniswapArbitrageService():
-    def __init__(self, w3: Web3, executor_private_key: HexBytes) -> None:
+    def __init__(
+        self, w3: Web3, executor_private_key: HexBytes,
+        runtime: Optional[ServiceRuntime] = None,
+        offline_v2: bool = False, offline_v3: bool = False
+    ) -> None:
         print("Initializing Uniswap Arbitrage Service")
 
         self.w3: Web3 = w3
         self.executor: LocalAccount = Account.from_key(executor_private_key)
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
+        # Quote UniswapV2 locally from one reserve snapshot per block
+        self.offline_v2: bool = offline_v2
+        # Simulate UniswapV3 swaps locally from one pool state snapshot per block
+        self.offline_v3: bool = offline_v3
         
         self.arbitrage_service: ArbitrageService = ArbitrageService(
-            w3 = self.w3
+            w3 = self.w3,
+            runtime = self.runtime
         )
 
         self.uniswapv2_service: UniswapV2Service = UniswapV2Service(
             w3 = self.w3,
-            executor_private_key = executor_private_key
+            executor_private_key = executor_private_key,
+            runtime = self.runtime
         )
 
         self.uniswapv3_service: UniswapV3Service = UniswapV3Service(
             w3 = self.w3,
-            executor_private_key = executor_private_key
+            executor_private_key = executor_private_key,
+            runtime = self.runtime
+        )
+
+        self.pool_state_tracker: PoolStateTracker = PoolStateTracker(
+            w3 = self.w3,
+            contract_service = self.runtime.contract_service,
+            uniswapv2_service = self.uniswapv2_service,
+            uniswapv3_service = self.uniswapv3_service
+        )
+        self.tracked_tokens: Set[ChecksumAddress] = set()
+        # Block of the last incremental search, see find_arbitrages
+        self.incremental_block_number: Optional[BlockNumber] = None
+
+
+    def sync_pool_registry(self, to_block: BlockIdentifier = "latest") -> int:
+        '''
+        Bring the runtime's pool registry up to to_block with the pools of both factories
+        '''
+        to_block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = to_block
         )
+        return sum(
+            exchange_service.sync_pool_registry(
+                pool_registry = self.runtime.pool_registry,
+                to_block = to_block_number
+            )
+            for exchange_service in (self.uniswapv2_service, self.uniswapv3_service)
+        )
+
 
     def find_arbitrages(
         self, tokens: List[ChecksumAddress], u_eth: float,
-        max_hops: int = 3, block_identifier: BlockIdentifier = "latest"
+        max_hops: int = 3, block_identifier: BlockIdentifier = "latest",
+        u_eth_levels: Optional[List[float]] = None, incremental: bool = False
     ) -> Generator[Arbitrage, None, None]:
         block_number: BlockNumber = block_identifier_to_number(
             w3 = self.w3,
             block_identifier = block_identifier
         )
 
+        # Only deployed pools get edges in the exchange graph
+        self.uniswapv2_service.index_pools(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+        self.uniswapv3_service.index_pools(
+            tokens = tokens,
+            block_identifier = block_number
+        )
+
+        # Offline quotes read the block's snapshots, which the tracker replays
+        # from logs once the tokens' pools are loaded
+        if self.offline_v2 or self.offline_v3:
+            if (
+                self.pool_state_tracker.block_number is None
+                or block_number < self.pool_state_tracker.block_number
+                or not self.tracked_tokens.issuperset(tokens)
+            ):
+                self.tracked_tokens.update(tokens)
+                self.pool_state_tracker.track(
+                    tokens = list(self.tracked_tokens),
+                    block_identifier = block_number
+                )
+            else:
+                self.pool_state_tracker.update(to_block = block_number)
+
+        # With every edge quoted from the tracker's snapshots, the cycle detector
+        # only needs the edges of the pools that changed since its last search
+        changed_pools: Optional[Set[ChecksumAddress]] = None
+        if incremental and u_eth_levels is None:
+            if (
+                self.offline_v2 and self.offline_v3
+                and self.incremental_block_number is not None
+                and block_number >= self.incremental_block_number
+            ):
+                changed_pools = self.pool_state_tracker.get_dirty_pools(since_block = self.incremental_block_number)
+            self.incremental_block_number = block_number
+
         exchange_functions: List[ExchangeFunction] = (
-            self.uniswapv2_service.get_exchange_functions(block_identifier = block_number)
-            + self.uniswapv3_service.get_exchange_functions(block_identifier = block_number)
+            self.uniswapv2_service.get_exchange_functions(
+                block_identifier = block_number,
+                offline = self.offline_v2
+            )
+            + self.uniswapv3_service.get_exchange_functions(
+                block_identifier = block_number,
+                offline = self.offline_v3
+            )
         )
 
         yield from self.arbitrage_service.find_arbitrages_bellman_ford(
@@ -55,5 +142,8 @@ class UniswapArbitrageService():
             ),
             u_eth = u_eth,
             max_hops = max_hops,
-            block_identifier = block_identifier
+            block_identifier = block_identifier,
+            u_eth_levels = u_eth_levels,
+            incremental = incremental,
+            changed_pools = changed_pools
         )
\ No newline at end of file
@@ -2,21 +2,32 @@ from .exchange_service import ExchangeService
 from .contract_service import ContractService
 from .price_feed_service import PriceFeedService
 from .thegraph_service import TheGraphService
+from .service_runtime import ServiceRuntime
 
 from ..data_structures.call import Call, CallReturn
-from ..data_structures.exchange_graph import QuoteFunctionMeta, ExchangeFunction
+from ..data_structures.exchange_graph import QuoteFunctionMeta, QuoteBatchFunctionType, ExchangeFunction
+from ..data_structures.pool_index import PoolIndex, PoolKey
+from ..data_structures.pool_registry import PoolRecord
 from ..utils.web3_utils import block_identifier_to_number
+from ..utils.uniswapv2_math import compute_pair_address, get_amount_out, sort_tokens
 from ..utils.abi import get_abi
 
 from web3 import Web3
 from web3.contract.contract import Contract, ContractFunction
-from web3.types import TxParams
+from web3.types import LogReceipt, TxParams
 from eth_account.account import Account
 from eth_account.signers.local import LocalAccount
+from eth_abi import decode
+from eth_utils import to_checksum_address
 from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
 
+import numpy
+
+from collections import OrderedDict
 from hexbytes import HexBytes
-from typing import Any, List, Callable
+from itertools import combinations
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Callable, Optional, Tuple
 from typing_extensions import Self
 
 
@@ -28,19 +39,34 @@ class UniswapV2Service(ExchangeService):
     # Factory
     FACTORY_ADDRESS: ChecksumAddress = "0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f"
     FACTORY_ABI: Any = get_abi("uniswapv2_factory")
+    INIT_CODE_HASH: str = "0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f"
+    FACTORY_DEPLOYMENT_BLOCK: BlockNumber = 10000835
+    # PairCreated(address,address,address,uint256)
+    POOL_CREATED_TOPIC: str = "0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9"
+
+    # Pair
+    PAIR_ABI: Any = get_abi("uniswapv2_pair")
+
+    # Number of blocks whose reserve snapshots are kept
+    MAX_RESERVE_SNAPSHOTS: int = 16
 
     # ERC20
     ERC20_ABI: Any = get_abi("erc20")
 
-    def __init__(self: Self, w3: Web3, executor_private_key: HexBytes) -> None:
+    def __init__(
+        self: Self, w3: Web3, executor_private_key: HexBytes,
+        runtime: Optional[ServiceRuntime] = None
+    ) -> None:
         print("Initializing UniswapV2 Service")
 
         self.w3: Web3 = w3
         self.executor: LocalAccount = Account.from_key(executor_private_key)
 
-        self.contract_service: ContractService = ContractService(w3 = self.w3)
-        self.price_feed_service: PriceFeedService = PriceFeedService(w3 = self.w3)
-        self.thegraph_service: TheGraphService = TheGraphService()
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
+
+        self.contract_service: ContractService = self.runtime.contract_service
+        self.price_feed_service: PriceFeedService = self.runtime.price_feed_service
+        self.thegraph_service: TheGraphService = self.runtime.thegraph_service
 
         self.router: Contract = self.contract_service.get_contract(
             address = self.ROUTER_ADDRESS,
@@ -52,8 +78,231 @@ class UniswapV2Service(ExchangeService):
             abi = self.FACTORY_ABI
         )
 
+        self.pool_index: PoolIndex = self.runtime.get_pool_index(factory_address = self.FACTORY_ADDRESS)
+
+        # Block number -> pair address -> (reserve0, reserve1), oldest block first
+        self.reserve_snapshots: OrderedDict[BlockNumber, Dict[ChecksumAddress, Tuple[int, int]]] = OrderedDict()
+        self.reserve_snapshots_lock: Lock = Lock()
+
+
+    def get_pair_address(self: Self, token_a: ChecksumAddress, token_b: ChecksumAddress) -> ChecksumAddress:
+        return compute_pair_address(
+            factory_address = self.FACTORY_ADDRESS,
+            init_code_hash = self.INIT_CODE_HASH,
+            token_a = token_a,
+            token_b = token_b
+        )
+
+
+    def parse_pool_created_log(self: Self, log: LogReceipt) -> PoolRecord:
+        pair_address, _ = decode(["address", "uint256"], log["data"])
+        return PoolRecord(
+            address = to_checksum_address(pair_address),
+            factory_address = self.FACTORY_ADDRESS,
+            token0 = to_checksum_address(log["topics"][1][-20:]),
+            token1 = to_checksum_address(log["topics"][2][-20:]),
+            fee = 0,
+            tick_spacing = 0,
+            block_number = log["blockNumber"]
+        )
+
+
+    def index_pools(self: Self, tokens: Iterable[ChecksumAddress], block_identifier: BlockIdentifier = "latest") -> int:
+        '''
+        Look up with getPair, in one multicall, every pair between tokens not in
+        the pool index yet. Pairs are taken from the pool registry instead when it
+        is synced up to block_identifier. Returns the number of lookups made.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+        tokens = list(dict.fromkeys(tokens))
+
+        keys: List[PoolKey] = self.pool_index.unknown(
+            keys = (
+                PoolIndex.get_key(token_a = token_a, token_b = token_b)
+                for token_a, token_b in combinations(tokens, 2)
+            ),
+            block_number = block_number
+        )
+        if not keys:
+            return 0
+
+        registered_pools: Optional[Dict[PoolKey, ChecksumAddress]] = self.get_registered_pools(
+            tokens = tokens,
+            block_number = block_number
+        )
+        if registered_pools is not None:
+            self.pool_index.put_many(
+                items = {
+                    key: registered_pools.get(key, PoolIndex.NULL_ADDRESS)
+                    for key in keys
+                },
+                block_number = block_number
+            )
+            return 0
+
+        pool_addresses: List[ChecksumAddress] = self.contract_service.multicall(
+            calls = [
+                Call(
+                    contract_address = self.FACTORY_ADDRESS,
+                    function_name = "getPair",
+                    args = [token0, token1],
+                    output_types = [
+                        "address"
+                    ],
+                    contract_abi = self.FACTORY_ABI
+                )
+                for token0, token1, _ in keys
+            ],
+            require_success = True,
+            block_identifier = block_number,
+            callbacks = [lambda result: result.return_data[0]] * len(keys)
+        )
+        self.pool_index.put_many(
+            items = dict(zip(keys, pool_addresses)),
+            block_number = block_number
+        )
+        return len(keys)
+
+
+    def fetch_reserves(
+        self: Self, tokens: Iterable[ChecksumAddress],
+        block_identifier: BlockIdentifier = "latest"
+    ) -> Dict[ChecksumAddress, Tuple[int, int]]:
+        '''
+        Snapshot the reserves of every pair between tokens at block_identifier,
+        see fetch_pair_reserves
+        '''
+        return self.fetch_pair_reserves(
+            pairs = combinations(dict.fromkeys(tokens), 2),
+            block_identifier = block_identifier
+        )
+
+
+    def fetch_pair_reserves(
+        self: Self, pairs: Iterable[Tuple[ChecksumAddress, ChecksumAddress]],
+        block_identifier: BlockIdentifier = "latest"
+    ) -> Dict[ChecksumAddress, Tuple[int, int]]:
+        '''
+        Snapshot the reserves of the pairs of tokens at block_identifier with a
+        single multicall. Pairs that were not deployed get (0, 0) reserves, and
+        are not called when the pool index knows them to be missing.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        pair_addresses: List[ChecksumAddress] = []
+        missing_pair_addresses: List[ChecksumAddress] = []
+        for token_a, token_b in pairs:
+            (
+                missing_pair_addresses
+                if self.pool_index.exists(PoolIndex.get_key(token_a, token_b), block_number = block_number) is False
+                else pair_addresses
+            ).append(self.get_pair_address(token_a = token_a, token_b = token_b))
+        pair_addresses = list(dict.fromkeys(pair_addresses))
+
+        reserves_list: List[Tuple[int, int]] = self.contract_service.multicall(
+            calls = [
+                Call(
+                    contract_address = pair_address,
+                    function_name = "getReserves",
+                    args = [],
+                    output_types = [
+                        "uint112", "uint112", "uint32"
+                    ],
+                    contract_abi = self.PAIR_ABI,
+                    allow_failure = True
+                )
+                for pair_address in pair_addresses
+            ],
+            require_success = False,
+            block_identifier = block_number,
+            callbacks = [
+                lambda result: (
+                    (result.return_data[0], result.return_data[1]) if result.success else (0, 0)
+                )
+            ] * len(pair_addresses)
+        )
+
+        reserves: Dict[ChecksumAddress, Tuple[int, int]] = {
+            **dict(zip(pair_addresses, reserves_list)),
+            **{pair_address: (0, 0) for pair_address in missing_pair_addresses}
+        }
+        self.put_reserve_snapshot(
+            block_number = block_number,
+            reserves = reserves
+        )
+        return reserves
+
+
+    def put_reserve_snapshot(self: Self, block_number: BlockNumber, reserves: Dict[ChecksumAddress, Tuple[int, int]]) -> None:
+        '''
+        Add reserves (pair address -> (reserve0, reserve1)) to the snapshot of block_number
+        '''
+        with self.reserve_snapshots_lock:
+            self.reserve_snapshots.setdefault(block_number, dict()).update(reserves)
+            self.reserve_snapshots.move_to_end(block_number)
+            while len(self.reserve_snapshots) > self.MAX_RESERVE_SNAPSHOTS:
+                self.reserve_snapshots.popitem(last = False)
+
+
+    def quote_offline(
+        self: Self, tokens_in: List[ChecksumAddress], tokens_out: List[ChecksumAddress],
+        amounts_in: numpy.ndarray, block_identifier: BlockIdentifier = "latest"
+    ) -> numpy.ndarray:
+        '''
+        getAmountsOut of every (tokens_in[i], tokens_out[i]) edge computed from the
+        reserve snapshot, into which the pairs missing from it are fetched first in
+        one multicall. amounts_in has one row per edge, either a single amount or a
+        grid of amounts (shape (n, k)), and all rows are quoted in one pass.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        pair_addresses: List[ChecksumAddress] = [
+            self.get_pair_address(token_a = token_in, token_b = token_out)
+            for token_in, token_out in zip(tokens_in, tokens_out)
+        ]
+        with self.reserve_snapshots_lock:
+            snapshot: Dict[ChecksumAddress, Tuple[int, int]] = self.reserve_snapshots.get(block_number, dict())
+            reserves_list: List[Optional[Tuple[int, int]]] = [snapshot.get(pair_address) for pair_address in pair_addresses]
+
+        missing_indices: List[int] = [i for i, reserves in enumerate(reserves_list) if reserves is None]
+        if missing_indices:
+            fetched_reserves: Dict[ChecksumAddress, Tuple[int, int]] = self.fetch_pair_reserves(
+                pairs = [(tokens_in[i], tokens_out[i]) for i in missing_indices],
+                block_identifier = block_number
+            )
+            for i in missing_indices:
+                reserves_list[i] = fetched_reserves[pair_addresses[i]]
+
+        reserves: numpy.ndarray = numpy.empty((len(tokens_in), 2), dtype = object)
+        for i, (token_in, token_out) in enumerate(zip(tokens_in, tokens_out)):
+            reserves[i] = reserves_list[i] if sort_tokens(token_in, token_out)[0] == token_in else reserves_list[i][::-1]
+
+        amounts_in = numpy.asarray(amounts_in, dtype = object)
+        reserve_shape: Tuple[int, ...] = (len(tokens_in), ) + (1, ) * (amounts_in.ndim - 1)
+        return get_amount_out(
+            amount_in = amounts_in,
+            reserve_in = reserves[:, 0].reshape(reserve_shape),
+            reserve_out = reserves[:, 1].reshape(reserve_shape)
+        )
+
     
-    def get_exchange_functions(self: Self, block_identifier: BlockIdentifier = "latest") -> List[ExchangeFunction]:
+    def get_exchange_functions(
+        self: Self, block_identifier: BlockIdentifier = "latest",
+        offline: bool = False
+    ) -> List[ExchangeFunction]:
+        '''
+        With offline set, quotes are computed locally from reserve snapshots
+        (see quote_offline) instead of calling the router
+        '''
         quote_callback: Callable[[CallReturn], int] = lambda result: (
             result.return_data[0][1] if result.success else 0
         )
@@ -67,23 +316,46 @@ class UniswapV2Service(ExchangeService):
             block_identifier = block_number + 1
         ).get("timestamp")
 
+        quote_batch_function: Optional[QuoteBatchFunctionType] = None
+        if offline:
+            quote_batch_function = lambda tokens_in, tokens_out, amounts_in, block_identifier: [
+                QuoteFunctionMeta(
+                    call = None,
+                    callback = lambda _, amount_out = amount_out: amount_out
+                )
+                for amount_out in self.quote_offline(
+                    tokens_in = tokens_in,
+                    tokens_out = tokens_out,
+                    amounts_in = numpy.array(amounts_in, dtype = object),
+                    block_identifier = block_identifier
+                ).tolist()
+            ]
+            quote_function = lambda token_in, token_out, amount_in, block_identifier: quote_batch_function(
+                tokens_in = [token_in],
+                tokens_out = [token_out],
+                amounts_in = [amount_in],
+                block_identifier = block_identifier
+            )[0]
+        else:
+            quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
+                call = Call(
+                    contract_address = self.ROUTER_ADDRESS,
+                    function_name = "getAmountsOut",
+                    args = [
+                        amount_in,
+                        [token_in, token_out]
+                    ],
+                    output_types = [
+                        "uint256[]"
+                    ],
+                    contract_abi = self.ROUTER_ABI
+                ),
+                callback = quote_callback
+            )
+
         return [
             ExchangeFunction(
-                quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
-                    call = Call(
-                        contract_address = self.ROUTER_ADDRESS,
-                        function_name = "getAmountsOut",
-                        args = [
-                            amount_in,
-                            [token_in, token_out]
-                        ],
-                        output_types = [
-                            "uint256[]"
-                        ],
-                        contract_abi = self.ROUTER_ABI
-                    ),
-                    callback = quote_callback
-                ),
+                quote_function = quote_function,
                 swap_function = lambda token_in, token_out, amount_in, wallet_address, block_identifier: (
                     self.swap_exact_input(
                         amount_in = amount_in,
@@ -93,7 +365,16 @@ class UniswapV2Service(ExchangeService):
                         deadline = next_block_time,
                         block_identifier = block_number
                     )
-                )
+                ),
+                pool_exists_function = lambda token_in, token_out: (
+                    self.pool_index.exists(PoolIndex.get_key(token_in, token_out), block_number = block_number) is not False
+                ),
+                exchange_id = "uniswapv2",
+                pool_address_function = lambda token_in, token_out: self.get_pair_address(
+                    token_a = token_in,
+                    token_b = token_out
+                ),
+                quote_batch_function = quote_batch_function
             )
         ]
 
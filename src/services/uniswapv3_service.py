@@ -2,22 +2,33 @@ from .exchange_service import ExchangeService
 from .contract_service import ContractService
 from .price_feed_service import PriceFeedService
 from .thegraph_service import TheGraphService
+from .service_runtime import ServiceRuntime
 
 from ..data_structures.call import Call, CallReturn
-from ..data_structures.exchange_graph import QuoteFunctionMeta, ExchangeFunction
+from ..data_structures.exchange_graph import QuoteFunctionMeta, QuoteFunctionType, QuoteBatchFunctionType, ExchangeFunction
+from ..data_structures.uniswapv3_pool_state import UniswapV3PoolState, TickRangeError
+from ..data_structures.pool_index import PoolIndex, PoolKey
+from ..data_structures.pool_registry import PoolRecord
+from ..utils.web3_utils import block_identifier_to_number
+from ..utils.uniswapv3_math import compute_pool_address
 from ..utils.abi import get_abi
 
 from web3 import Web3
 from web3.contract.contract import Contract, ContractFunction
-from web3.types import TxParams
+from web3.types import LogReceipt, TxParams
 from eth_account.account import Account
 from eth_account.signers.local import LocalAccount
+from eth_abi import decode
 from eth_abi.packed import encode_packed
-from eth_typing.evm import ChecksumAddress, BlockIdentifier
+from eth_utils import to_checksum_address
+from eth_typing.evm import ChecksumAddress, BlockIdentifier, BlockNumber
 
+from collections import OrderedDict
 from enum import Enum
 from hexbytes import HexBytes
-from typing import Any, Dict, List, Callable, Union
+from itertools import combinations
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Callable, Optional, Tuple, Union
 from typing_extensions import Self
 
 
@@ -44,6 +55,22 @@ class UniswapV3Service(ExchangeService):
     # Factory
     FACTORY_ADDRESS: ChecksumAddress = "0x1F98431c8aD98523631AE4a59f267346ea31F984"
     FACTORY_ABI: Any = get_abi("uniswapv3_factory")
+    POOL_INIT_CODE_HASH: str = "0xe34f199b19b2b4f47f68442619d555527d244f78a3297ea89325f843f87b8b54"
+    FACTORY_DEPLOYMENT_BLOCK: BlockNumber = 12369621
+    # PoolCreated(address,address,uint24,int24,address)
+    POOL_CREATED_TOPIC: str = "0x783cca1c0412dd0d695e784568c96da2e9c22ff989357a2e8b1d9b2b4e6b7118"
+
+    # Pool
+    POOL_ABI: Any = get_abi("uniswapv3_pool")
+    TICK_SPACINGS: Dict[int, int] = {
+        100: 1,
+        500: 10,
+        3000: 60,
+        10000: 200
+    }
+
+    # Number of blocks whose pool state snapshots are kept
+    MAX_POOL_STATE_SNAPSHOTS: int = 16
 
     # ERC20
     ERC20_ABI: Any = get_abi("erc20")
@@ -52,15 +79,20 @@ class UniswapV3Service(ExchangeService):
     GRAPHQL_ENDPOINT: str = "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3"
 
 
-    def __init__(self: Self, w3: Web3, executor_private_key: HexBytes) -> None:
+    def __init__(
+        self: Self, w3: Web3, executor_private_key: HexBytes,
+        runtime: Optional[ServiceRuntime] = None
+    ) -> None:
         print("Initializing UniswapV3 Service")
 
         self.w3: Web3 = w3
         self.executor: LocalAccount = Account.from_key(executor_private_key)
 
-        self.contract_service: ContractService = ContractService(w3 = self.w3)
-        self.price_feed_service: PriceFeedService = PriceFeedService(w3 = self.w3)
-        self.thegraph_service: TheGraphService = TheGraphService()
+        self.runtime: ServiceRuntime = runtime if runtime is not None else ServiceRuntime.get_default(w3 = self.w3)
+
+        self.contract_service: ContractService = self.runtime.contract_service
+        self.price_feed_service: PriceFeedService = self.runtime.price_feed_service
+        self.thegraph_service: TheGraphService = self.runtime.thegraph_service
 
         self.quoter: Contract = self.contract_service.get_contract(
             address = self.QUOTER_ADDRESS,
@@ -77,34 +109,436 @@ class UniswapV3Service(ExchangeService):
             abi = self.FACTORY_ABI
         )
 
+        self.pool_index: PoolIndex = self.runtime.get_pool_index(factory_address = self.FACTORY_ADDRESS)
+
+        # Block number -> pool address -> pool state (None if not deployed), oldest block first
+        self.pool_states: OrderedDict[BlockNumber, Dict[ChecksumAddress, Optional[UniswapV3PoolState]]] = OrderedDict()
+        self.pool_states_lock: Lock = Lock()
+
     
-    def get_exchange_functions(self, block_identifier: BlockIdentifier = "latest") -> List[ExchangeFunction]:
+    def get_pool_address(self: Self, token_a: ChecksumAddress, token_b: ChecksumAddress, fee: int) -> ChecksumAddress:
+        return compute_pool_address(
+            factory_address = self.FACTORY_ADDRESS,
+            init_code_hash = self.POOL_INIT_CODE_HASH,
+            token_a = token_a,
+            token_b = token_b,
+            fee = fee
+        )
+
+
+    def parse_pool_created_log(self: Self, log: LogReceipt) -> PoolRecord:
+        tick_spacing, pool_address = decode(["int24", "address"], log["data"])
+        return PoolRecord(
+            address = to_checksum_address(pool_address),
+            factory_address = self.FACTORY_ADDRESS,
+            token0 = to_checksum_address(log["topics"][1][-20:]),
+            token1 = to_checksum_address(log["topics"][2][-20:]),
+            fee = int.from_bytes(log["topics"][3], "big"),
+            tick_spacing = tick_spacing,
+            block_number = log["blockNumber"]
+        )
+
+
+    def index_pools(
+        self: Self, tokens: Iterable[ChecksumAddress], block_identifier: BlockIdentifier = "latest",
+        fees: Optional[List[int]] = None
+    ) -> int:
+        '''
+        Look up with getPool, in one multicall, every pool between tokens (for each
+        fee tier in fees) not in the pool index yet. Pools are taken from the pool
+        registry instead when it is synced up to block_identifier. Returns the
+        number of lookups made.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+        tokens = list(dict.fromkeys(tokens))
+
+        keys: List[PoolKey] = self.pool_index.unknown(
+            keys = (
+                PoolIndex.get_key(token_a = token_a, token_b = token_b, fee = fee)
+                for token_a, token_b in combinations(tokens, 2)
+                for fee in (fees if fees is not None else [fee_amount.value for fee_amount in FeeAmount])
+            ),
+            block_number = block_number
+        )
+        if not keys:
+            return 0
+
+        registered_pools: Optional[Dict[PoolKey, ChecksumAddress]] = self.get_registered_pools(
+            tokens = tokens,
+            block_number = block_number
+        )
+        if registered_pools is not None:
+            self.pool_index.put_many(
+                items = {
+                    key: registered_pools.get(key, PoolIndex.NULL_ADDRESS)
+                    for key in keys
+                },
+                block_number = block_number
+            )
+            return 0
+
+        pool_addresses: List[ChecksumAddress] = self.contract_service.multicall(
+            calls = [
+                Call(
+                    contract_address = self.FACTORY_ADDRESS,
+                    function_name = "getPool",
+                    args = [token0, token1, fee],
+                    output_types = [
+                        "address"
+                    ],
+                    contract_abi = self.FACTORY_ABI
+                )
+                for token0, token1, fee in keys
+            ],
+            require_success = True,
+            block_identifier = block_number,
+            callbacks = [lambda result: result.return_data[0]] * len(keys)
+        )
+        self.pool_index.put_many(
+            items = dict(zip(keys, pool_addresses)),
+            block_number = block_number
+        )
+        return len(keys)
+
+
+    def get_pool_exists_function(
+        self: Self, fee: int, block_number: Optional[BlockNumber] = None
+    ) -> Callable[[ChecksumAddress, ChecksumAddress], bool]:
+        '''
+        Whether the pool may exist, i.e. was not found missing (as of block_number if given)
+        '''
+        return lambda token_in, token_out: (
+            self.pool_index.exists(PoolIndex.get_key(token_in, token_out, fee), block_number = block_number) is not False
+        )
+
+
+    def get_pool_address_function(self: Self, fee: int) -> Callable[[ChecksumAddress, ChecksumAddress], ChecksumAddress]:
+        return lambda token_in, token_out: self.get_pool_address(
+            token_a = token_in,
+            token_b = token_out,
+            fee = fee
+        )
+
+
+    def fetch_pool_states(
+        self: Self, tokens: Iterable[ChecksumAddress], block_identifier: BlockIdentifier = "latest",
+        fees: Optional[List[int]] = None, word_radius: int = 1
+    ) -> Dict[ChecksumAddress, Optional[UniswapV3PoolState]]:
+        '''
+        Snapshot every pool between tokens (for each fee tier in fees) at
+        block_identifier, see fetch_pool_states_by_key
+        '''
+        return self.fetch_pool_states_by_key(
+            pool_keys = [
+                PoolIndex.get_key(token_a = token_a, token_b = token_b, fee = fee)
+                for token_a, token_b in combinations(dict.fromkeys(tokens), 2)
+                for fee in (fees if fees is not None else [fee_amount.value for fee_amount in FeeAmount])
+            ],
+            block_identifier = block_identifier,
+            word_radius = word_radius
+        )
+
+
+    def fetch_pool_states_by_key(
+        self: Self, pool_keys: Iterable[PoolKey], block_identifier: BlockIdentifier = "latest",
+        word_radius: int = 1
+    ) -> Dict[ChecksumAddress, Optional[UniswapV3PoolState]]:
+        '''
+        Snapshot the pools of pool_keys ((token0, token1, fee)) at block_identifier
+        in three multicalls: slot0 and liquidity, then the tick bitmap words within
+        word_radius of the current tick, then the initialized ticks in those words.
+        Pools that were not deployed map to None, and are not called when the pool
+        index knows them to be missing.
+        '''
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
+
+        pools: Dict[ChecksumAddress, PoolKey] = {
+            self.get_pool_address(token_a = token0, token_b = token1, fee = fee): (token0, token1, fee)
+            for token0, token1, fee in pool_keys
+        }
+        pool_states: Dict[ChecksumAddress, Optional[UniswapV3PoolState]] = {
+            pool_address: None
+            for pool_address, pool_key in pools.items()
+            if self.pool_index.exists(pool_key, block_number = block_number) is False
+        }
+        pool_addresses: List[ChecksumAddress] = [
+            pool_address for pool_address in pools if pool_address not in pool_states
+        ]
+
+        slot0_calls: List[Call] = [
+            call
+            for pool_address in pool_addresses
+            for call in (
+                self.__pool_call(pool_address, "slot0", [], [
+                    "uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"
+                ]),
+                self.__pool_call(pool_address, "liquidity", [], ["uint128"])
+            )
+        ]
+        slot0_results: List[CallReturn] = self.contract_service.multicall(
+            calls = slot0_calls,
+            require_success = False,
+            block_identifier = block_number
+        )
+
+        for i, pool_address in enumerate(pool_addresses):
+            slot0, liquidity = slot0_results[2 * i], slot0_results[2 * i + 1]
+            if not slot0.success or not liquidity.success or slot0.return_data[0] == 0:
+                pool_states[pool_address] = None
+                continue
+
+            token0, token1, fee = pools[pool_address]
+            tick_spacing: int = self.TICK_SPACINGS[fee]
+            word: int = (slot0.return_data[1] // tick_spacing) >> 8
+            pool_states[pool_address] = UniswapV3PoolState(
+                address = pool_address,
+                token0 = token0,
+                token1 = token1,
+                fee = fee,
+                tick_spacing = tick_spacing,
+                block_number = block_number,
+                sqrt_price_x96 = slot0.return_data[0],
+                tick = slot0.return_data[1],
+                liquidity = liquidity.return_data[0],
+                min_word = word - word_radius,
+                max_word = word + word_radius
+            )
+
+        loaded_pool_states: List[UniswapV3PoolState] = [
+            pool_state for pool_state in pool_states.values() if pool_state is not None
+        ]
+
+        bitmap_keys: List[Tuple[UniswapV3PoolState, int]] = [
+            (pool_state, word_position)
+            for pool_state in loaded_pool_states
+            for word_position in range(pool_state.min_word, pool_state.max_word + 1)
+        ]
+        bitmap_words: List[int] = self.contract_service.multicall(
+            calls = [
+                self.__pool_call(pool_state.address, "tickBitmap", [word_position], ["uint256"])
+                for pool_state, word_position in bitmap_keys
+            ],
+            require_success = True,
+            block_identifier = block_number,
+            callbacks = [lambda result: result.return_data[0]] * len(bitmap_keys)
+        )
+
+        tick_keys: List[Tuple[UniswapV3PoolState, int]] = []
+        for (pool_state, word_position), bitmap_word in zip(bitmap_keys, bitmap_words):
+            if bitmap_word != 0:
+                pool_state.tick_bitmap[word_position] = bitmap_word
+            while bitmap_word != 0:
+                bit_position: int = (bitmap_word & -bitmap_word).bit_length() - 1
+                tick_keys.append((pool_state, ((word_position << 8) + bit_position) * pool_state.tick_spacing))
+                bitmap_word &= bitmap_word - 1
+
+        liquidity_nets: List[int] = self.contract_service.multicall(
+            calls = [
+                self.__pool_call(pool_state.address, "ticks", [tick], [
+                    "uint128", "int128", "uint256", "uint256", "int56", "uint160", "uint32", "bool"
+                ])
+                for pool_state, tick in tick_keys
+            ],
+            require_success = True,
+            block_identifier = block_number,
+            callbacks = [lambda result: result.return_data[1]] * len(tick_keys)
+        )
+        for (pool_state, tick), liquidity_net in zip(tick_keys, liquidity_nets):
+            pool_state.liquidity_net[tick] = liquidity_net
+
+        self.put_pool_state_snapshot(
+            block_number = block_number,
+            pool_states = pool_states
+        )
+        return pool_states
+
+
+    def put_pool_state_snapshot(
+        self: Self, block_number: BlockNumber,
+        pool_states: Dict[ChecksumAddress, Optional[UniswapV3PoolState]]
+    ) -> None:
+        '''
+        Add pool states (None for pools not deployed) to the snapshot of block_number
+        '''
+        with self.pool_states_lock:
+            self.pool_states.setdefault(block_number, dict()).update(pool_states)
+            self.pool_states.move_to_end(block_number)
+            while len(self.pool_states) > self.MAX_POOL_STATE_SNAPSHOTS:
+                self.pool_states.popitem(last = False)
+
+
+    def get_pool_states(
+        self: Self, pool_keys: List[PoolKey], block_number: BlockNumber
+    ) -> List[Optional[UniswapV3PoolState]]:
+        '''
+        States of the pools of pool_keys from the snapshot of block_number. Pools
+        missing from it are loaded first with one fetch_pool_states_by_key, along
+        with the missing pools of every other fee tier of their tokens, so that
+        quoting the edges of all tiers loads their pools at once.
+        '''
+        pool_addresses: List[ChecksumAddress] = [
+            self.get_pool_address(token_a = token0, token_b = token1, fee = fee)
+            for token0, token1, fee in pool_keys
+        ]
+
+        with self.pool_states_lock:
+            snapshot: Dict[ChecksumAddress, Optional[UniswapV3PoolState]] = self.pool_states.get(block_number, dict())
+            pool_states: Dict[ChecksumAddress, Optional[UniswapV3PoolState]] = {
+                pool_address: snapshot[pool_address] for pool_address in pool_addresses if pool_address in snapshot
+            }
+            missing_keys: List[PoolKey] = [
+                (token0, token1, fee)
+                for token0, token1 in dict.fromkeys(
+                    (token0, token1)
+                    for (token0, token1, _), pool_address in zip(pool_keys, pool_addresses)
+                    if pool_address not in pool_states
+                )
+                for fee in (fee_amount.value for fee_amount in FeeAmount)
+                if self.get_pool_address(token_a = token0, token_b = token1, fee = fee) not in snapshot
+            ]
+
+        if missing_keys:
+            pool_states.update(self.fetch_pool_states_by_key(
+                pool_keys = missing_keys,
+                block_identifier = block_number
+            ))
+
+        return [pool_states.get(pool_address) for pool_address in pool_addresses]
+
+
+    def __pool_call(self: Self, pool_address: ChecksumAddress, function_name: str, args: List[Any], output_types: List[str]) -> Call:
+        return Call(
+            contract_address = pool_address,
+            function_name = function_name,
+            args = args,
+            output_types = output_types,
+            contract_abi = self.POOL_ABI
+        )
+
+
+    def __quote_call(self: Self, token_in: ChecksumAddress, token_out: ChecksumAddress, amount_in: int, fee: int) -> Call:
+        return Call(
+            contract_address = self.QUOTER_ADDRESS,
+            function_name = "quoteExactInputSingle",
+            args = [
+                (
+                    token_in,
+                    token_out,
+                    amount_in,
+                    fee,
+                    0
+                )
+            ],
+            output_types = [
+                "uint256", "uint160", "uint32", "uint256"
+            ],
+            contract_abi = self.QUOTER_ABI
+        )
+
+
+    def get_quote_batch_function(self: Self, fee: int) -> QuoteBatchFunctionType:
+        '''
+        Offline quotes simulated on pool state snapshots, loading the pools of
+        all the edges quoted at once (see get_pool_states). Quotes that move the
+        price past the loaded ticks fall back to the Quoter, and those the
+        simulation rejects otherwise (e.g. for a lack of liquidity) give 0, as a
+        failed Quoter call does.
+        '''
         quote_callback: Callable[[CallReturn], int] = lambda result: (
             result.return_data[0] if result.success else 0
         )
 
+        def quote_batch_function(
+            tokens_in: List[ChecksumAddress], tokens_out: List[ChecksumAddress],
+            amounts_in: List[int], block_identifier: BlockIdentifier = "latest"
+        ) -> List[QuoteFunctionMeta]:
+            pool_states: List[Optional[UniswapV3PoolState]] = self.get_pool_states(
+                pool_keys = [
+                    PoolIndex.get_key(token_a = token_in, token_b = token_out, fee = fee)
+                    for token_in, token_out in zip(tokens_in, tokens_out)
+                ],
+                block_number = block_identifier_to_number(
+                    w3 = self.w3,
+                    block_identifier = block_identifier
+                )
+            )
+
+            quote_function_meta_list: List[QuoteFunctionMeta] = []
+            for token_in, token_out, amount_in, pool_state in zip(tokens_in, tokens_out, amounts_in, pool_states):
+                try:
+                    amount_out: int = (
+                        pool_state.quote_exact_input(token_in = token_in, amount_in = amount_in)
+                        if pool_state is not None else 0
+                    )
+                    quote_function_meta_list.append(QuoteFunctionMeta(
+                        call = None,
+                        callback = lambda _, amount_out = amount_out: amount_out
+                    ))
+                except TickRangeError:
+                    quote_function_meta_list.append(QuoteFunctionMeta(
+                        call = self.__quote_call(
+                            token_in = token_in,
+                            token_out = token_out,
+                            amount_in = amount_in,
+                            fee = fee
+                        ),
+                        callback = quote_callback
+                    ))
+                except (ValueError, ArithmeticError):
+                    quote_function_meta_list.append(QuoteFunctionMeta(
+                        call = None,
+                        callback = lambda _: 0
+                    ))
+            return quote_function_meta_list
+
+        return quote_batch_function
+
+
+    def get_quote_function(self: Self, fee: int, offline: bool = False) -> QuoteFunctionType:
+        '''
+        Quotes through the Quoter, or with offline set simulated on pool state
+        snapshots as a batch of one (see get_quote_batch_function)
+        '''
+        if offline:
+            quote_batch_function: QuoteBatchFunctionType = self.get_quote_batch_function(fee = fee)
+            return lambda token_in, token_out, amount_in, block_identifier = "latest": quote_batch_function(
+                tokens_in = [token_in],
+                tokens_out = [token_out],
+                amounts_in = [amount_in],
+                block_identifier = block_identifier
+            )[0]
+
+        quote_callback: Callable[[CallReturn], int] = lambda result: (
+            result.return_data[0] if result.success else 0
+        )
+        return lambda token_in, token_out, amount_in, block_identifier = "latest": QuoteFunctionMeta(
+            call = self.__quote_call(
+                token_in = token_in,
+                token_out = token_out,
+                amount_in = amount_in,
+                fee = fee
+            ),
+            callback = quote_callback
+        )
+
+    
+    def get_exchange_functions(
+        self: Self, block_identifier: BlockIdentifier = "latest",
+        offline: bool = False
+    ) -> List[ExchangeFunction]:
+        block_number: BlockNumber = block_identifier_to_number(
+            w3 = self.w3,
+            block_identifier = block_identifier
+        )
         return [
             ExchangeFunction(
-                quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
-                    call = Call(
-                        contract_address = self.QUOTER_ADDRESS,
-                        function_name = "quoteExactInputSingle",
-                        args = [
-                            (
-                                token_in,
-                                token_out,
-                                amount_in,
-                                100,
-                                0
-                            )
-                        ],
-                        output_types = [
-                            "uint256", "uint160", "uint32", "uint256"
-                        ],
-                        contract_abi = self.QUOTER_ABI
-                    ),
-                    callback = quote_callback
-                ),
+                quote_function = self.get_quote_function(fee = 100, offline = offline),
                 swap_function = lambda token_in, token_out, amount_in, wallet_address, block_identifier: (
                     self.swap_exact_input_single(
                         token_in = token_in,
@@ -116,29 +550,14 @@ class UniswapV3Service(ExchangeService):
                         sqrt_price_limit_x96 = 0,
                         block_identifier = block_identifier
                     )
-                )
+                ),
+                pool_exists_function = self.get_pool_exists_function(fee = 100, block_number = block_number),
+                exchange_id = "uniswapv3_100",
+                pool_address_function = self.get_pool_address_function(fee = 100),
+                quote_batch_function = self.get_quote_batch_function(fee = 100) if offline else None
             ),
             ExchangeFunction(
-                quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
-                    call = Call(
-                        contract_address = self.QUOTER_ADDRESS,
-                        function_name = "quoteExactInputSingle",
-                        args = [
-                            (
-                                token_in,
-                                token_out,
-                                amount_in,
-                                500,
-                                0
-                            )
-                        ],
-                        output_types = [
-                            "uint256", "uint160", "uint32", "uint256"
-                        ],
-                        contract_abi = self.QUOTER_ABI
-                    ),
-                    callback = quote_callback
-                ),
+                quote_function = self.get_quote_function(fee = 500, offline = offline),
                 swap_function = lambda token_in, token_out, amount_in, wallet_address, block_identifier: (
                     self.swap_exact_input_single(
                         token_in = token_in,
@@ -150,29 +569,14 @@ class UniswapV3Service(ExchangeService):
                         sqrt_price_limit_x96 = 0,
                         block_identifier = block_identifier
                     )
-                )
+                ),
+                pool_exists_function = self.get_pool_exists_function(fee = 500, block_number = block_number),
+                exchange_id = "uniswapv3_500",
+                pool_address_function = self.get_pool_address_function(fee = 500),
+                quote_batch_function = self.get_quote_batch_function(fee = 500) if offline else None
             ),
             ExchangeFunction(
-                quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
-                    call = Call(
-                        contract_address = self.QUOTER_ADDRESS,
-                        function_name = "quoteExactInputSingle",
-                        args = [
-                            (
-                                token_in,
-                                token_out,
-                                amount_in,
-                                3000,
-                                0
-                            )
-                        ],
-                        output_types = [
-                            "uint256", "uint160", "uint32", "uint256"
-                        ],
-                        contract_abi = self.QUOTER_ABI
-                    ),
-                    callback = quote_callback
-                ),
+                quote_function = self.get_quote_function(fee = 3000, offline = offline),
                 swap_function = lambda token_in, token_out, amount_in, wallet_address, block_identifier: (
                     self.swap_exact_input_single(
                         token_in = token_in,
@@ -184,29 +588,14 @@ class UniswapV3Service(ExchangeService):
                         sqrt_price_limit_x96 = 0,
                         block_identifier = block_identifier
                     )
-                )
+                ),
+                pool_exists_function = self.get_pool_exists_function(fee = 3000, block_number = block_number),
+                exchange_id = "uniswapv3_3000",
+                pool_address_function = self.get_pool_address_function(fee = 3000),
+                quote_batch_function = self.get_quote_batch_function(fee = 3000) if offline else None
             ),
             ExchangeFunction(
-                quote_function = lambda token_in, token_out, amount_in, block_identifier: QuoteFunctionMeta(
-                    call = Call(
-                        contract_address = self.QUOTER_ADDRESS,
-                        function_name = "quoteExactInputSingle",
-                        args = [
-                            (
-                                token_in,
-                                token_out,
-                                amount_in,
-                                10000,
-                                0
-                            )
-                        ],
-                        output_types = [
-                            "uint256", "uint160", "uint32", "uint256"
-                        ],
-                        contract_abi = self.QUOTER_ABI
-                    ),
-                    callback = quote_callback
-                ),
+                quote_function = self.get_quote_function(fee = 10000, offline = offline),
                 swap_function = lambda token_in, token_out, amount_in, wallet_address, block_identifier: (
                     self.swap_exact_input_single(
                         token_in = token_in,
@@ -218,11 +607,15 @@ class UniswapV3Service(ExchangeService):
                         sqrt_price_limit_x96 = 0,
                         block_identifier = block_identifier
                     )
-                )
+                ),
+                pool_exists_function = self.get_pool_exists_function(fee = 10000, block_number = block_number),
+                exchange_id = "uniswapv3_10000",
+                pool_address_function = self.get_pool_address_function(fee = 10000),
+                quote_batch_function = self.get_quote_batch_function(fee = 10000) if offline else None
             )
         ]
 
-    
+
     def swap_exact_input_single(
         self, token_in: ChecksumAddress, token_out: ChecksumAddress, fee: int,
         recipient: ChecksumAddress, amount_in: int, amount_out_minimum: int,
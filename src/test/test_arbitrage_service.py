@@ -0,0 +1,193 @@
+from src.data_structures.arbitrage import Arbitrage
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction, ExchangeGraph, QuoteFunctionMeta
+from src.data_structures.incremental_cycle_detector import IncrementalCycleDetector
+from src.data_structures.quote_graph import Quote
+from src.services.arbitrage_service import ArbitrageService
+
+from multiprocessing.pool import ThreadPool
+from typing import Dict, List, Tuple
+
+
+TOKENS: List[str] = ["0xA", "0xB", "0xC"]
+
+
+class FakePriceFeedService():
+    def fetch_price_eth(self, tokens: List[str], block_identifier: int) -> Dict[str, float]:
+        return {token: 1.0 for token in tokens}
+
+
+class FakeRuntime():
+    def __init__(self) -> None:
+        self.contract_service: None = None
+        self.price_feed_service: FakePriceFeedService = FakePriceFeedService()
+        self.task_pool: ThreadPool = ThreadPool(2)
+
+
+def get_pool_address(exchange_id: str, token_in: str, token_out: str) -> str:
+    return f"{exchange_id}:{min(token_in, token_out)}-{max(token_in, token_out)}"
+
+
+def build_exchange_graph(
+    rates: Dict[Tuple[str, str, str], float], max_amounts_in: Dict[Tuple[str, str, str], int] = dict()
+) -> ExchangeGraph:
+    '''
+    Graph of two exchanges quoting with rates[exchange id, token in, token out],
+    with new exchange functions as every block builds them. An edge with a max
+    amount in gives nothing for the amount in beyond it.
+    '''
+    return ExchangeGraph(
+        tokens = TOKENS,
+        exchange_functions = [
+            ExchangeFunction(
+                quote_function = lambda token_in, token_out, amount_in, block_identifier, exchange_id = exchange_id: (
+                    QuoteFunctionMeta(
+                        call = None,
+                        callback = lambda _: int(
+                            min(amount_in, max_amounts_in.get((exchange_id, token_in, token_out), amount_in))
+                            * rates[exchange_id, token_in, token_out]
+                        )
+                    )
+                ),
+                swap_function = lambda **kwargs: None,
+                exchange_id = exchange_id,
+                pool_address_function = lambda token_in, token_out, exchange_id = exchange_id: (
+                    get_pool_address(exchange_id, token_in, token_out)
+                )
+            )
+            for exchange_id in ("a", "b")
+        ]
+    )
+
+
+def test_incremental_search_reuses_cycle_detector_across_blocks() -> None:
+    arbitrage_service: ArbitrageService = ArbitrageService(w3 = None, runtime = FakeRuntime())
+    rates: Dict[Tuple[str, str, str], float] = {
+        (exchange_id, token_in, token_out): 0.997
+        for exchange_id in ("a", "b")
+        for token_in in TOKENS
+        for token_out in TOKENS
+        if token_in != token_out
+    }
+
+    arbitrages: List[Arbitrage] = list(arbitrage_service.find_arbitrages_bellman_ford(
+        exchange_graph = build_exchange_graph(rates = dict(rates)),
+        u_eth = 1.0,
+        block_identifier = 1,
+        incremental = True
+    ))
+    cycle_detector: IncrementalCycleDetector = arbitrage_service.cycle_detector
+    assert arbitrages == []
+
+    updates: List[Dict[ExchangeEdge, Quote]] = []
+    update = cycle_detector.update
+    cycle_detector.update = lambda quotes: (updates.append(quotes), update(quotes = quotes))[1]
+
+    # The A-B pool of a moves, making an arbitrage with b. The C pools of b
+    # move too, but are not said to have changed
+    rates["a", "0xA", "0xB"] = 1.01
+    rates["a", "0xB", "0xA"] = 0.98
+    rates["b", "0xA", "0xC"] = 2.0
+    arbitrages = list(arbitrage_service.find_arbitrages_bellman_ford(
+        exchange_graph = build_exchange_graph(rates = dict(rates)),
+        u_eth = 1.0,
+        block_identifier = 2,
+        incremental = True,
+        changed_pools = {get_pool_address("a", "0xA", "0xB")}
+    ))
+
+    assert arbitrage_service.cycle_detector is cycle_detector
+    assert len(updates) == 1
+    assert sorted((edge.token_in, edge.token_out, edge.id[2]) for edge in updates[0]) == [
+        ("0xA", "0xB", "a"), ("0xB", "0xA", "a")
+    ]
+    assert [
+        [(hop.exchange_edge.token_in, hop.exchange_edge.id[2]) for hop in arbitrage.path] for arbitrage in arbitrages
+    ] == [[("0xA", "a"), ("0xB", "b")]]
+    assert all(hop.block_number == 2 for hop in arbitrages[0].path)
+
+
+def test_incremental_search_only_evaluates_changed_cycles() -> None:
+    arbitrage_service: ArbitrageService = ArbitrageService(w3 = None, runtime = FakeRuntime())
+    rates: Dict[Tuple[str, str, str], float] = {
+        (exchange_id, token_in, token_out): 0.997
+        for exchange_id in ("a", "b")
+        for token_in in TOKENS
+        for token_out in TOKENS
+        if token_in != token_out
+    }
+    rates["a", "0xA", "0xB"] = 1.01
+    rates["a", "0xB", "0xA"] = 0.98
+
+    evaluations: List[Tuple[str, int, int]] = []
+    evaluate_arbitrage = arbitrage_service.evaluate_arbitrage
+    arbitrage_service.evaluate_arbitrage = lambda path_meta, amount_in, block_number: (
+        evaluations.append((path_meta[0].token_in, amount_in, block_number)),
+        evaluate_arbitrage(path_meta = path_meta, amount_in = amount_in, block_number = block_number)
+    )[1]
+
+    def find_arbitrages(u_eth: float, block_number: int, changed_pool: str) -> List[Arbitrage]:
+        return list(arbitrage_service.find_arbitrages_bellman_ford(
+            exchange_graph = build_exchange_graph(rates = dict(rates)),
+            u_eth = u_eth,
+            block_identifier = block_number,
+            incremental = True,
+            changed_pools = {changed_pool}
+        ))
+
+    assert len(find_arbitrages(u_eth = 1.0, block_number = 1, changed_pool = "")) == 1
+    assert evaluations == [("0xA", 10 ** 18, 1)]
+
+    # A pool off the cycle moves while u_eth doubles: the cycle is sized from
+    # this block's quotes, not the detector's first ones
+    rates["b", "0xB", "0xC"] = 0.99
+    arbitrages: List[Arbitrage] = find_arbitrages(u_eth = 2.0, block_number = 2, changed_pool = get_pool_address("b", "0xB", "0xC"))
+    assert evaluations[1:] == [("0xA", 2 * 10 ** 18, 2)]
+    assert [arbitrage.amount_in for arbitrage in arbitrages] == [2 * 10 ** 18]
+
+    # Nothing on the cycle changed, so its last evaluation is given at this block
+    rates["b", "0xA", "0xC"] = 0.995
+    reused_arbitrages: List[Arbitrage] = find_arbitrages(u_eth = 2.0, block_number = 3, changed_pool = get_pool_address("b", "0xA", "0xC"))
+    assert evaluations[2:] == []
+    assert [
+        [(hop.amount_in, hop.amount_out, hop.block_number) for hop in arbitrage.path] for arbitrage in reused_arbitrages
+    ] == [[(hop.amount_in, hop.amount_out, 3) for hop in arbitrages[0].path]]
+    assert reused_arbitrages[0].block_number == 3
+
+    # The cycle's own pool moves and it is evaluated again
+    rates["a", "0xA", "0xB"] = 1.02
+    assert len(find_arbitrages(u_eth = 2.0, block_number = 4, changed_pool = get_pool_address("a", "0xA", "0xB"))) == 1
+    assert evaluations[2:] == [("0xA", 2 * 10 ** 18, 4)]
+
+
+def test_multi_level_search_finds_arbitrages_below_u_eth() -> None:
+    arbitrage_service: ArbitrageService = ArbitrageService(w3 = None, runtime = FakeRuntime())
+    rates: Dict[Tuple[str, str, str], float] = {
+        (exchange_id, token_in, token_out): 0.997
+        for exchange_id in ("a", "b")
+        for token_in in TOKENS
+        for token_out in TOKENS
+        if token_in != token_out
+    }
+    rates["a", "0xA", "0xB"] = 1.02
+    # The A-B pool of a runs out of depth past 1 ETH
+    max_amounts_in: Dict[Tuple[str, str, str], int] = {("a", "0xA", "0xB"): 10 ** 18}
+
+    assert list(arbitrage_service.find_arbitrages_bellman_ford(
+        exchange_graph = build_exchange_graph(rates = rates, max_amounts_in = max_amounts_in),
+        u_eth = 4.0,
+        block_identifier = 1
+    )) == []
+
+    arbitrages: List[Arbitrage] = list(arbitrage_service.find_arbitrages_bellman_ford(
+        exchange_graph = build_exchange_graph(rates = rates, max_amounts_in = max_amounts_in),
+        u_eth = 4.0,
+        block_identifier = 1,
+        u_eth_levels = [0.5, 1.0, 4.0]
+    ))
+
+    assert sorted(set(arbitrage.amount_in for arbitrage in arbitrages)) == [5 * 10 ** 17, 10 ** 18]
+    assert all(
+        (arbitrage.path[0].exchange_edge.token_in, arbitrage.path[0].exchange_edge.id[2]) == ("0xA", "a")
+        and arbitrage.is_profitable()
+        for arbitrage in arbitrages
+    )
@@ -0,0 +1,175 @@
+from src.data_structures.call import Call, CallReturn
+from src.services.async_contract_service import AsyncContractService
+from src.services.async_uniswap_arbitrage_service import AsyncUniswapArbitrageService
+from src.utils.abi import get_abi
+
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from eth_abi import decode, encode
+from eth_utils import to_checksum_address
+
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+
+TOKEN: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+def get_calls(num_of_calls: int) -> List[Call]:
+    return [
+        Call(
+            contract_address = TOKEN,
+            function_name = "balanceOf",
+            args = [to_checksum_address(f"0x{i + 1:040x}")],
+            output_types = ["uint256"],
+            contract_abi = get_abi("erc20")
+        )
+        for i in range(num_of_calls)
+    ]
+
+
+class FakeEth():
+    '''
+    Answers Multicall3 aggregate3 calls with the index of each balanceOf account,
+    failing chunks of more than max_chunk_size calls as out of gas
+    '''
+    def __init__(self, max_chunk_size: int = 1000) -> None:
+        self.max_chunk_size: int = max_chunk_size
+        self.chunk_sizes: List[int] = []
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+
+    async def call(self, transaction: Dict[str, Any], block_identifier: Any) -> bytes:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            (calls, ) = decode(["(address,bool,bytes)[]"], bytes.fromhex(transaction["data"][10:]))
+            self.chunk_sizes.append(len(calls))
+            if len(calls) > self.max_chunk_size:
+                raise ValueError("out of gas")
+            return encode(
+                ["(bool,bytes)[]"],
+                [[(True, encode(["uint256"], [int.from_bytes(calldata[-20:], "big")])) for _, _, calldata in calls]]
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def get_async_contract_service(
+    max_concurrent_requests: int = 32, max_chunk_size: int = 1000
+) -> Tuple[AsyncContractService, FakeEth]:
+    fake_eth: FakeEth = FakeEth(max_chunk_size = max_chunk_size)
+    w3: AsyncWeb3 = AsyncWeb3(AsyncHTTPProvider("http://localhost:8545"))
+    w3.eth.call = fake_eth.call
+    return AsyncContractService(w3 = w3, max_concurrent_requests = max_concurrent_requests), fake_eth
+
+
+def test_semaphore_caps_requests_in_flight() -> None:
+    contract_service, fake_eth = get_async_contract_service(max_concurrent_requests = 2)
+
+    results: List[int] = asyncio.run(contract_service.multicall(
+        calls = get_calls(10),
+        block_identifier = 1,
+        callbacks = [lambda result: result.return_data[0]] * 10,
+        chunk_size = 1
+    ))
+
+    assert results == list(range(1, 11))
+    assert len(fake_eth.chunk_sizes) == 10
+    assert fake_eth.max_in_flight == 2
+
+
+def test_multicall_bisects_chunks_failing_on_their_content() -> None:
+    contract_service, fake_eth = get_async_contract_service(max_chunk_size = 3)
+
+    results: List[int] = asyncio.run(contract_service.multicall(
+        calls = get_calls(10),
+        block_identifier = 1,
+        callbacks = [lambda result: result.return_data[0]] * 10,
+        chunk_size = 10
+    ))
+
+    assert results == list(range(1, 11))
+    assert fake_eth.chunk_sizes[0] == 10
+    assert max(fake_eth.chunk_sizes[1:]) <= 5
+
+
+class FakeFunction():
+    def __init__(self, fails: bool) -> None:
+        self.fails: bool = fails
+
+
+    async def call(self, block_identifier: Any) -> int:
+        if self.fails:
+            raise ValueError("execution reverted")
+        return 7
+
+
+class FakeContract():
+    def __init__(self, failing_accounts: List[str]) -> None:
+        self.failing_accounts: List[str] = failing_accounts
+
+
+    def get_function_by_name(self, function_name: str) -> Any:
+        return lambda account: FakeFunction(fails = account in self.failing_accounts)
+
+
+def test_batch_call_reports_failed_calls_unless_required() -> None:
+    contract_service, _ = get_async_contract_service()
+    calls: List[Call] = get_calls(3)
+    contract_service.contract_cache[TOKEN] = FakeContract(failing_accounts = [calls[1].args[0]])
+
+    results: List[CallReturn] = asyncio.run(contract_service.batch_call(calls = calls, require_success = False))
+
+    assert results == [
+        CallReturn(success = True, return_data = (7, )),
+        CallReturn(success = False, return_data = None),
+        CallReturn(success = True, return_data = (7, ))
+    ]
+    with pytest.raises(ValueError):
+        asyncio.run(contract_service.batch_call(calls = calls, require_success = True))
+
+
+class FakeExchangeService():
+    def __init__(self, events: List[str], name: str) -> None:
+        self.events: List[str] = events
+        self.name: str = name
+
+
+    def index_pools(self, tokens: List[str], block_identifier: int) -> int:
+        self.events.append(f"{self.name}.index_pools({block_identifier})")
+        return 0
+
+
+    def get_exchange_functions(self, block_identifier: int) -> List[Any]:
+        self.events.append(f"{self.name}.get_exchange_functions({block_identifier})")
+        return []
+
+
+class FakeAsyncArbitrageService():
+    async def find_arbitrages_bellman_ford(self, **kwargs) -> Any:
+        return
+        yield
+
+
+def test_find_arbitrages_indexes_pools_before_building_the_graph() -> None:
+    events: List[str] = []
+    arbitrage_service: AsyncUniswapArbitrageService = AsyncUniswapArbitrageService.__new__(AsyncUniswapArbitrageService)
+    arbitrage_service.async_w3 = None
+    arbitrage_service.uniswapv2_service = FakeExchangeService(events = events, name = "v2")
+    arbitrage_service.uniswapv3_service = FakeExchangeService(events = events, name = "v3")
+    arbitrage_service.arbitrage_service = FakeAsyncArbitrageService()
+
+    async def find_arbitrages() -> List[Any]:
+        return [
+            arbitrage async for arbitrage in arbitrage_service.find_arbitrages(
+                tokens = [TOKEN], u_eth = 1, block_identifier = 5
+            )
+        ]
+
+    assert asyncio.run(find_arbitrages()) == []
+    assert sorted(events[:2]) == ["v2.index_pools(5)", "v3.index_pools(5)"]
+    assert events[2:] == ["v2.get_exchange_functions(5)", "v3.get_exchange_functions(5)"]
@@ -0,0 +1,42 @@
+from src.data_structures.base_fee_history import BaseFeeHistory
+
+from typing import List
+
+
+def test_plan_windows_covers_blocks_with_fewest_windows() -> None:
+    assert BaseFeeHistory.plan_windows(block_numbers = []) == []
+    assert BaseFeeHistory.plan_windows(block_numbers = [5]) == [(5, 1)]
+    assert BaseFeeHistory.plan_windows(block_numbers = [10, 12, 19, 20, 29], max_window = 10) == [
+        (19, 10), (29, 10)
+    ]
+    assert BaseFeeHistory.plan_windows(
+        block_numbers = list(range(19000000, 19010000, 2500))
+    ) == [(block_number, 1) for block_number in range(19000000, 19010000, 2500)]
+
+
+def test_put_range_across_a_page_boundary() -> None:
+    base_fee_history: BaseFeeHistory = BaseFeeHistory()
+    oldest_block: int = 3 * BaseFeeHistory.PAGE_SIZE - 2
+    base_fees: List[int] = [10, 11, 12, 13, 14]
+
+    base_fee_history.put_range(oldest_block = oldest_block, base_fees = base_fees)
+
+    assert sorted(base_fee_history.pages) == [2, 3]
+    assert [base_fee_history.get(oldest_block + i) for i in range(-1, 6)] == [None] + base_fees + [None]
+    assert base_fee_history.missing([oldest_block - 1, oldest_block, oldest_block + 5]) == [oldest_block - 1, oldest_block + 5]
+
+
+def test_save_and_load_round_trip(tmp_path) -> None:
+    path: str = str(tmp_path / "base_fees.npz")
+    base_fee_history: BaseFeeHistory = BaseFeeHistory(path = path)
+    base_fee_history.put_range(oldest_block = 100, base_fees = [7, 8])
+    base_fee_history.put_range(oldest_block = 10 ** 7, base_fees = [2 ** 63])
+    base_fee_history.save()
+
+    loaded_base_fee_history: BaseFeeHistory = BaseFeeHistory(path = path)
+
+    assert sorted(loaded_base_fee_history.pages) == sorted(base_fee_history.pages)
+    assert [loaded_base_fee_history.get(block_number) for block_number in (99, 100, 101, 102, 10 ** 7)] == [
+        None, 7, 8, None, 2 ** 63
+    ]
+    assert not loaded_base_fee_history.dirty
@@ -0,0 +1,122 @@
+from src.data_structures.call import Call
+from src.data_structures.call_codec import CallCodecCache
+from src.utils.abi import PATH_TO_ABI_FOLDER, get_abi
+
+from web3 import Web3, HTTPProvider
+from web3.contract import Contract
+from web3._utils.abi import get_abi_output_types
+from eth_abi import decode, encode
+from eth_abi.exceptions import EncodingError
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+
+from collections import Counter
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+
+ABI_NAMES: List[str] = sorted(
+    file_name[:-len(".json")] for file_name in os.listdir(PATH_TO_ABI_FOLDER) if file_name.endswith(".json")
+)
+CONTRACT_ADDRESS: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+
+
+def get_value(abi_parameter: Dict[str, Any], seed: int) -> Any:
+    '''
+    Sample value of an ABI parameter, varying with seed
+    '''
+    abi_type: str = abi_parameter["type"]
+    array_match = re.fullmatch(r"(.*)\[(\d*)\]", abi_type)
+    if array_match is not None:
+        item_parameter: Dict[str, Any] = dict(abi_parameter, type = array_match.group(1))
+        length: int = int(array_match.group(2)) if array_match.group(2) else 2
+        return [get_value(item_parameter, seed = seed + i) for i in range(length)]
+    if abi_type == "tuple":
+        return tuple(get_value(component, seed = seed + i) for i, component in enumerate(abi_parameter["components"]))
+    if abi_type == "address":
+        return to_checksum_address(f"0x{seed + 1:040x}")
+    if abi_type == "bool":
+        return seed % 2 == 0
+    if abi_type == "string":
+        return f"value {seed}"
+    if abi_type == "bytes":
+        return bytes(range(seed % 7 + 40))
+    if abi_type.startswith("bytes"):
+        return bytes([seed % 256]) * int(abi_type[len("bytes"):])
+    if abi_type.startswith("uint"):
+        return (seed + 1) * 10 ** 6 % 2 ** int(abi_type[len("uint"):] or 256)
+    if abi_type.startswith("int"):
+        return -((seed + 1) * 10 ** 3 % 2 ** (int(abi_type[len("int"):] or 256) - 1))
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+
+def get_functions(abi_name: str) -> Tuple[Contract, List[Dict[str, Any]]]:
+    '''
+    Contract of the ABI and its functions, leaving out the overloaded ones
+    '''
+    abi: List[Dict[str, Any]] = get_abi(abi_name)
+    functions: List[Dict[str, Any]] = [item for item in abi if item.get("type") == "function"]
+    name_counts: Counter = Counter(function_abi["name"] for function_abi in functions)
+    return (
+        w3.eth.contract(address = CONTRACT_ADDRESS, abi = abi),
+        [function_abi for function_abi in functions if name_counts[function_abi["name"]] == 1]
+    )
+
+
+def test_encode_matches_web3_for_every_function_of_the_repo_abis() -> None:
+    codec_cache: CallCodecCache = CallCodecCache()
+    functions_checked: int = 0
+    for abi_name in ABI_NAMES:
+        contract, functions = get_functions(abi_name)
+        for seed, function_abi in enumerate(functions):
+            args: List[Any] = [get_value(abi_input, seed = seed + i) for i, abi_input in enumerate(function_abi["inputs"])]
+
+            assert codec_cache.encode(
+                contract = contract,
+                call = Call(contract_address = CONTRACT_ADDRESS, function_name = function_abi["name"], args = args, output_types = [])
+            ) == HexBytes(contract.encodeABI(fn_name = function_abi["name"], args = args)), f"{abi_name}.{function_abi['name']}"
+            functions_checked += 1
+
+    assert functions_checked > 50
+
+
+def test_decode_matches_eth_abi_for_every_function_of_the_repo_abis() -> None:
+    codec_cache: CallCodecCache = CallCodecCache()
+    for abi_name in ABI_NAMES:
+        _, functions = get_functions(abi_name)
+        for seed, function_abi in enumerate(functions):
+            output_types: List[str] = get_abi_output_types(function_abi)
+            data: bytes = encode(output_types, [
+                get_value(abi_output, seed = seed + i) for i, abi_output in enumerate(function_abi["outputs"])
+            ])
+
+            assert codec_cache.decode(output_types, data) == decode(output_types, data), f"{abi_name}.{function_abi['name']}"
+
+
+def test_arguments_web3_normalizes_fall_back_to_web3() -> None:
+    codec_cache: CallCodecCache = CallCodecCache()
+    contract: Contract = w3.eth.contract(address = CONTRACT_ADDRESS, abi = get_abi("uniswapv3_quoter"))
+    path: bytes = bytes(range(43))
+
+    def get_call(path: Any) -> Call:
+        return Call(
+            contract_address = CONTRACT_ADDRESS,
+            function_name = "quoteExactInput",
+            args = [path, 10 ** 18],
+            output_types = ["uint256"]
+        )
+
+    # A hex string for bytes fails the cached encoder and is normalized by web3
+    with pytest.raises(EncodingError):
+        codec_cache.get_codec(contract = contract, function_name = "quoteExactInput").encode(get_call("0x" + path.hex()).args)
+    assert codec_cache.encode(contract = contract, call = get_call("0x" + path.hex())) == HexBytes(
+        contract.encodeABI(fn_name = "quoteExactInput", args = ["0x" + path.hex(), 10 ** 18])
+    )
+    assert codec_cache.encode(contract = contract, call = get_call("0x" + path.hex())) == codec_cache.encode(
+        contract = contract, call = get_call(path)
+    )
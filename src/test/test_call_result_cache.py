@@ -0,0 +1,23 @@
+from src.data_structures.call_result_cache import CallResultCache, CallResult, CallResultKey
+
+from multiprocessing.pool import ThreadPool
+from typing import Dict, List
+
+
+def test_results_are_read_back_from_disk_in_chunks(tmp_path) -> None:
+    path: str = str(tmp_path / "call_results.sqlite")
+    items: Dict[CallResultKey, CallResult] = {
+        (block_number, f"0x{i:040x}", bytes([i % 256, i // 256])): (i % 3 != 0, i.to_bytes(32, "big"))
+        for block_number in (1, 2)
+        for i in range(500)
+    }
+    CallResultCache(path = path).put_many(items = items)
+
+    call_result_cache: CallResultCache = CallResultCache(max_size = 100, path = path)
+    keys: List[CallResultKey] = list(items) + [(3, "0x" + "0" * 40, b"\x00\x00")]
+    found_per_thread: List[Dict[CallResultKey, CallResult]] = ThreadPool(4).map(
+        lambda _: call_result_cache.get_many(keys = keys), range(4)
+    )
+
+    assert all(found == items for found in found_per_thread)
+    assert len(call_result_cache) == 100
@@ -0,0 +1,91 @@
+from src.data_structures.adaptive_chunk_sizer import AdaptiveChunkSizer
+from src.data_structures.chunk_bisector import ChunkBisector, ChunkResult
+from src.data_structures.multicall_backend import EncodedCall
+from src.data_structures.rate_limiter import RetriableError
+
+from typing import List, Optional, Set, Tuple
+
+import pytest
+
+
+CONTRACT_ADDRESS: str = "0x0000000000000000000000000000000000000001"
+
+
+def get_encoded_calls(num_of_calls: int, allow_failure: bool) -> List[EncodedCall]:
+    return [(CONTRACT_ADDRESS, bytes([i]), allow_failure, 0) for i in range(num_of_calls)]
+
+
+def aggregate(
+    index_chunks: List[List[int]], failing_indices: Set[int],
+    error: Exception = ValueError("out of gas")
+) -> List[ChunkResult]:
+    return [
+        (error, 0.1) if failing_indices.intersection(index_chunk)
+        else ([(True, bytes([i])) for i in index_chunk], 0.1)
+        for index_chunk in index_chunks
+    ]
+
+
+def test_failed_chunks_are_bisected_down_to_the_failing_call() -> None:
+    encoded_calls: List[EncodedCall] = get_encoded_calls(num_of_calls = 8, allow_failure = True)
+    chunk_sizer: AdaptiveChunkSizer = AdaptiveChunkSizer(initial_chunk_size = 4)
+    chunk_bisector: ChunkBisector = ChunkBisector(
+        encoded_calls = encoded_calls,
+        call_types = [(CONTRACT_ADDRESS, "f")] * len(encoded_calls),
+        indices = list(range(len(encoded_calls))),
+        chunk_sizer = chunk_sizer
+    )
+    assert chunk_bisector.index_chunks == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    encoded_results: List[Optional[Tuple[bool, bytes]]] = [None] * len(encoded_calls)
+    while chunk_bisector.index_chunks:
+        chunk_bisector.record(
+            chunk_results = aggregate(chunk_bisector.index_chunks, failing_indices = {5}),
+            encoded_results = encoded_results
+        )
+
+    assert encoded_results == [(i != 5, bytes([i]) if i != 5 else b"") for i in range(8)]
+    assert chunk_bisector.unanswered_indices == {5}
+    assert (chunk_bisector.chunks, chunk_bisector.retries) == (6, 4)
+    # A single bad call does not make the chunk size shrink
+    assert chunk_sizer.stats[(CONTRACT_ADDRESS, "f")].failures == 0
+
+
+def test_a_failing_required_call_raises() -> None:
+    encoded_calls: List[EncodedCall] = get_encoded_calls(num_of_calls = 4, allow_failure = False)
+    chunk_bisector: ChunkBisector = ChunkBisector(
+        encoded_calls = encoded_calls,
+        call_types = [(CONTRACT_ADDRESS, "f")] * len(encoded_calls),
+        indices = list(range(len(encoded_calls))),
+        chunk_sizer = AdaptiveChunkSizer(),
+        chunk_size = 2
+    )
+
+    encoded_results: List[Optional[Tuple[bool, bytes]]] = [None] * len(encoded_calls)
+    with pytest.raises(ValueError):
+        while chunk_bisector.index_chunks:
+            chunk_bisector.record(
+                chunk_results = aggregate(chunk_bisector.index_chunks, failing_indices = {2}),
+                encoded_results = encoded_results
+            )
+    assert encoded_results[:2] == [(True, b"\x00"), (True, b"\x01")]
+
+
+def test_transport_errors_are_raised_without_bisecting() -> None:
+    for error in (RetriableError("503 Service Unavailable"), ConnectionError("Connection refused"), TimeoutError()):
+        encoded_calls: List[EncodedCall] = get_encoded_calls(num_of_calls = 8, allow_failure = True)
+        chunk_sizer: AdaptiveChunkSizer = AdaptiveChunkSizer(initial_chunk_size = 4)
+        chunk_bisector: ChunkBisector = ChunkBisector(
+            encoded_calls = encoded_calls,
+            call_types = [(CONTRACT_ADDRESS, "f")] * len(encoded_calls),
+            indices = list(range(len(encoded_calls))),
+            chunk_sizer = chunk_sizer
+        )
+
+        with pytest.raises(type(error)):
+            chunk_bisector.record(
+                chunk_results = aggregate(chunk_bisector.index_chunks, failing_indices = set(range(8)), error = error),
+                encoded_results = [None] * len(encoded_calls)
+            )
+        assert chunk_bisector.chunks == 2
+        assert chunk_sizer.get_chunk_size(call_type = (CONTRACT_ADDRESS, "f")) == 4
@@ -0,0 +1,235 @@
+from src.data_structures.call import Call, CallReturn
+from src.data_structures.rpc_metrics import InMemoryMetricsSink, MetricsSink, MetricsSummary
+from src.services.contract_service import ContractService
+from src.utils.abi import get_abi
+
+from web3 import Web3, HTTPProvider
+from eth_abi import decode, encode
+from eth_utils import to_checksum_address
+
+from threading import Event, Thread
+from typing import Any, Dict, List, Optional, Set, Tuple
+import time
+
+import pytest
+
+
+TOKEN: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+def get_call(account: int, allow_failure: Optional[bool] = None) -> Call:
+    return Call(
+        contract_address = TOKEN,
+        function_name = "balanceOf",
+        args = [to_checksum_address(f"0x{account:040x}")],
+        output_types = ["uint256"],
+        contract_abi = get_abi("erc20"),
+        allow_failure = allow_failure
+    )
+
+
+class FakeEth():
+    '''
+    Answers Multicall3 aggregate3 calls with the balanceOf account as balance.
+    Calls to failing_accounts revert, and so does the whole aggregate if they
+    were not allowed to fail. The first request waits for release if given.
+    '''
+    def __init__(self, failing_accounts: Set[int] = set(), release: Optional[Event] = None) -> None:
+        self.failing_accounts: Set[int] = failing_accounts
+        self.release: Optional[Event] = release
+        self.requests: List[List[int]] = []
+        self.entered: Event = Event()
+
+
+    def call(self, transaction: Dict[str, Any], block_identifier: Any) -> bytes:
+        (calls, ) = decode(["(address,bool,bytes)[]"], bytes.fromhex(transaction["data"][10:]))
+        accounts: List[int] = [int.from_bytes(calldata[-20:], "big") for _, _, calldata in calls]
+        self.requests.append(accounts)
+
+        if len(self.requests) == 1 and self.release is not None:
+            self.entered.set()
+            self.release.wait(timeout = 10)
+
+        results: List[Tuple[bool, bytes]] = []
+        for (_, allow_failure, _), account in zip(calls, accounts):
+            if account in self.failing_accounts:
+                if not allow_failure:
+                    raise ValueError("execution reverted: Multicall3: call failed")
+                results.append((False, b""))
+            else:
+                results.append((True, encode(["uint256"], [account])))
+        return encode(["(bool,bytes)[]"], [results])
+
+
+def get_contract_service(fake_eth: FakeEth, metrics_sink: Optional[MetricsSink] = None) -> ContractService:
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    w3.eth.call = fake_eth.call
+    return ContractService(w3 = w3, metrics_sink = metrics_sink)
+
+
+def test_identical_calls_in_a_multicall_are_sent_once() -> None:
+    fake_eth: FakeEth = FakeEth()
+    contract_service: ContractService = get_contract_service(fake_eth = fake_eth)
+
+    results: List[CallReturn] = contract_service.multicall(
+        calls = [get_call(1), get_call(2), get_call(1)],
+        block_identifier = "latest"
+    )
+
+    assert fake_eth.requests == [[1, 2]]
+    assert [result.return_data for result in results] == [(1, ), (2, ), (1, )]
+
+
+def test_threads_share_a_call_in_flight() -> None:
+    release: Event = Event()
+    fake_eth: FakeEth = FakeEth(release = release)
+    contract_service: ContractService = get_contract_service(fake_eth = fake_eth)
+
+    results: Dict[str, List[CallReturn]] = dict()
+    threads: List[Thread] = [
+        Thread(target = lambda name = name: results.update({
+            name: contract_service.multicall(calls = [get_call(1)], block_identifier = "latest")
+        }))
+        for name in ("owner", "waiter")
+    ]
+    threads[0].start()
+    assert fake_eth.entered.wait(timeout = 10)
+    threads[1].start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(timeout = 10)
+
+    assert fake_eth.requests == [[1]]
+    assert results["owner"] == results["waiter"] == [CallReturn(success = True, return_data = (1, ))]
+
+
+def test_waiter_resends_a_call_whose_owner_raised() -> None:
+    release: Event = Event()
+    fake_eth: FakeEth = FakeEth(failing_accounts = {1}, release = release)
+    contract_service: ContractService = get_contract_service(fake_eth = fake_eth)
+
+    errors: List[Exception] = []
+    results: List[CallReturn] = []
+
+    def owner() -> None:
+        try:
+            contract_service.multicall(calls = [get_call(1)], require_success = True, block_identifier = "latest")
+        except Exception as e:
+            errors.append(e)
+
+    owner_thread: Thread = Thread(target = owner)
+    waiter_thread: Thread = Thread(target = lambda: results.extend(
+        contract_service.multicall(calls = [get_call(1)], require_success = False, block_identifier = "latest")
+    ))
+    owner_thread.start()
+    assert fake_eth.entered.wait(timeout = 10)
+    waiter_thread.start()
+    time.sleep(0.1)
+    release.set()
+    owner_thread.join(timeout = 10)
+    waiter_thread.join(timeout = 10)
+
+    assert len(errors) == 1
+    assert fake_eth.requests == [[1], [1]]
+    assert results == [CallReturn(success = False, return_data = None)]
+
+
+def test_required_duplicate_of_a_call_allowed_to_fail_raises() -> None:
+    fake_eth: FakeEth = FakeEth(failing_accounts = {1})
+    contract_service: ContractService = get_contract_service(fake_eth = fake_eth)
+
+    with pytest.raises(Exception, match = "Call balanceOf to .* failed"):
+        contract_service.multicall(
+            calls = [get_call(1, allow_failure = True), get_call(1, allow_failure = False)],
+            block_identifier = "latest"
+        )
+    assert fake_eth.requests == [[1]]
+
+
+def test_multicall_records_its_chunks_and_itself() -> None:
+    metrics_sink: InMemoryMetricsSink = InMemoryMetricsSink()
+    contract_service: ContractService = get_contract_service(
+        fake_eth = FakeEth(failing_accounts = {2}),
+        metrics_sink = metrics_sink
+    )
+
+    contract_service.multicall(
+        calls = [get_call(1), get_call(2), get_call(3)],
+        require_success = False,
+        block_identifier = "latest",
+        chunk_size = 2
+    )
+
+    summaries: Dict[Tuple[str, str], MetricsSummary] = metrics_sink.snapshot()
+    assert set(summaries) == {("aggregate3", ""), ("multicall", "")}
+    aggregate_summary: MetricsSummary = summaries["aggregate3", ""]
+    assert (aggregate_summary.requests, aggregate_summary.calls, aggregate_summary.reverted_calls) == (2, 3, 1)
+    assert aggregate_summary.request_bytes > 0 and aggregate_summary.response_bytes > 0
+    multicall_summary: MetricsSummary = summaries["multicall", ""]
+    assert (
+        multicall_summary.requests, multicall_summary.calls, multicall_summary.chunks,
+        multicall_summary.reverted_calls, multicall_summary.retries
+    ) == (1, 3, 2, 1, 0)
+
+
+def get_fee_history(block_count: int, newest_block: int) -> Dict[str, Any]:
+    '''
+    fee_history with block * 10 as base fee, including that of the block after newest_block
+    '''
+    return {
+        "oldestBlock": newest_block - block_count + 1,
+        "baseFeePerGas": [block_number * 10 for block_number in range(newest_block - block_count + 1, newest_block + 2)]
+    }
+
+
+class FakeFeeHistoryRpcService():
+    def __init__(self) -> None:
+        self.batches: List[List[Tuple[str, List[Any]]]] = []
+
+
+    def batch_request(self, requests: List[Tuple[str, List[Any]]], max_batch_size: int = 100, **kwargs) -> List[Any]:
+        self.batches.append(requests)
+        return [
+            {
+                key: hex(value) if isinstance(value, int) else [hex(base_fee) for base_fee in value]
+                for key, value in get_fee_history(block_count = int(params[0], 16), newest_block = int(params[1], 16)).items()
+            }
+            for _, params in requests
+        ]
+
+
+def assert_base_fees_prefetched(contract_service: ContractService) -> None:
+    assert [contract_service.base_fee_history.get(block_number) for block_number in (100, 150, 151, 5000, 5001, 9000)] == [
+        1000, 1500, 1510, 50000, 50010, 7
+    ]
+
+
+def test_prefetch_base_fees_in_batch_requests() -> None:
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    rpc_service: FakeFeeHistoryRpcService = FakeFeeHistoryRpcService()
+    contract_service: ContractService = ContractService(w3 = w3, use_batch_request = True, rpc_service = rpc_service)
+    contract_service.base_fee_history.put_range(oldest_block = 9000, base_fees = [7])
+
+    contract_service.prefetch_base_fees(block_numbers = [5000, 100, 9000, 150, 100])
+
+    assert rpc_service.batches == [[
+        ("eth_feeHistory", [hex(51), hex(150), []]),
+        ("eth_feeHistory", [hex(1), hex(5000), []])
+    ]]
+    assert_base_fees_prefetched(contract_service = contract_service)
+
+
+def test_prefetch_base_fees_from_the_pool() -> None:
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    windows: List[Tuple[int, int]] = []
+    w3.eth.fee_history = lambda block_count, newest_block: (
+        windows.append((newest_block, block_count)), get_fee_history(block_count = block_count, newest_block = newest_block)
+    )[1]
+    contract_service: ContractService = ContractService(w3 = w3)
+    contract_service.base_fee_history.put_range(oldest_block = 9000, base_fees = [7])
+
+    contract_service.prefetch_base_fees(block_numbers = [5000, 100, 9000, 150, 100])
+
+    assert sorted(windows) == [(150, 51), (5000, 1)]
+    assert_base_fees_prefetched(contract_service = contract_service)
@@ -0,0 +1,124 @@
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction
+from src.data_structures.incremental_cycle_detector import IncrementalCycleDetector
+from src.data_structures.quote_graph import Quote
+from src.data_structures.rate_matrix import RateMatrix
+
+import numpy
+
+from typing import Dict, List, Tuple
+
+
+AMOUNT_IN: int = 10 ** 18
+
+
+def build_edges(n: int, exchange_ids: List[str]) -> List[ExchangeEdge]:
+    '''
+    Edges between every pair of n tokens on each exchange, with new exchange
+    functions as every block builds them
+    '''
+    exchange_functions: List[ExchangeFunction] = [
+        ExchangeFunction(quote_function = lambda **kwargs: None, swap_function = lambda **kwargs: None, exchange_id = exchange_id)
+        for exchange_id in exchange_ids
+    ]
+    return [
+        ExchangeEdge(token_in = f"0x{i:040x}", token_out = f"0x{j:040x}", exchange_function = exchange_function)
+        for i in range(n)
+        for j in range(n)
+        if i != j
+        for exchange_function in exchange_functions
+    ]
+
+
+def quote(exchange_edge: ExchangeEdge, prices: numpy.ndarray, noise: float) -> Quote:
+    rate: float = prices[int(exchange_edge.token_out, 16)] / prices[int(exchange_edge.token_in, 16)]
+    return Quote(
+        token_in = exchange_edge.token_in,
+        token_out = exchange_edge.token_out,
+        amount_in = AMOUNT_IN,
+        amount_out = int(AMOUNT_IN * rate * (1 + noise))
+    )
+
+
+def test_update_keeps_cycles_covering_find_negative_cycles() -> None:
+    for seed in range(20):
+        random: numpy.random.Generator = numpy.random.default_rng(seed)
+        n: int = 8
+        tokens: List[str] = [f"0x{i:040x}" for i in range(n)]
+        prices: numpy.ndarray = random.uniform(0.5, 2.0, n)
+        exchange_prices: Dict[str, numpy.ndarray] = {"a": prices.copy(), "b": prices.copy()}
+        edges: List[ExchangeEdge] = build_edges(n = n, exchange_ids = ["a", "b"])
+        quotes: Dict[Tuple, Quote] = {
+            exchange_edge.id: quote(exchange_edge, prices = prices, noise = random.uniform(-0.004, -0.003))
+            for exchange_edge in edges
+        }
+
+        cycle_detector: IncrementalCycleDetector = IncrementalCycleDetector(
+            rate_matrix = RateMatrix.from_quotes(
+                tokens = tokens,
+                edges = edges,
+                quotes = [quotes[exchange_edge.id] for exchange_edge in edges]
+            ),
+            tolerance = 0.0
+        )
+
+        for _ in range(30):
+            edges = build_edges(n = n, exchange_ids = ["a", "b"])
+            assert cycle_detector.covers(tokens = tokens, edge_ids = [exchange_edge.id for exchange_edge in edges])
+
+            # The price of a token on one exchange moves around its price, its pools
+            # there are requoted, making and closing arbitrages with the other exchange
+            token: int = random.integers(n)
+            exchange_id: str = random.choice(["a", "b"])
+            exchange_prices[exchange_id][token] = prices[token] * (1 + random.uniform(-0.004, 0.004))
+            changed_quotes: Dict[ExchangeEdge, Quote] = {
+                exchange_edge: quote(
+                    exchange_edge, prices = exchange_prices[exchange_id], noise = random.uniform(-0.004, -0.003)
+                )
+                for exchange_edge in edges
+                if exchange_edge.id[2] == exchange_id and tokens[token] in (exchange_edge.token_in, exchange_edge.token_out)
+            }
+            quotes.update((exchange_edge.id, quote) for exchange_edge, quote in changed_quotes.items())
+            previous_cycles: List[List[int]] = cycle_detector.get_cycles()
+            new_cycles, vanished_cycles = cycle_detector.update(quotes = changed_quotes)
+
+            rate_matrix: RateMatrix = RateMatrix.from_quotes(
+                tokens = tokens,
+                edges = edges,
+                quotes = [quotes[exchange_edge.id] for exchange_edge in edges]
+            )
+            cycles: List[List[int]] = cycle_detector.get_cycles()
+            cycle_tokens: List[int] = [token for cycle in cycles for token in cycle]
+
+            # Disjoint negative cycles, starting at their smallest token
+            assert len(cycle_tokens) == len(set(cycle_tokens))
+            assert all(cycle[0] == min(cycle) and rate_matrix.get_cycle_weight(cycle = cycle) < 0 for cycle in cycles)
+            # sharing a token with every cycle of a search from scratch
+            assert all(set(cycle) & set(cycle_tokens) for cycle in rate_matrix.find_negative_cycles())
+            # keeping the previous cycles that are still negative
+            assert all(
+                cycle in cycles for cycle in previous_cycles
+                if rate_matrix.get_cycle_weight(cycle = cycle) < 0
+            )
+            assert sorted(new_cycles) == sorted(cycle for cycle in cycles if cycle not in previous_cycles)
+            assert sorted(vanished_cycles) == sorted(cycle for cycle in previous_cycles if cycle not in cycles)
+            assert all(cycle_detector.is_changed(cycle = cycle) for cycle in vanished_cycles)
+
+
+def test_covers_edges_of_other_exchanges() -> None:
+    edges: List[ExchangeEdge] = build_edges(n = 3, exchange_ids = ["a"])
+    cycle_detector: IncrementalCycleDetector = IncrementalCycleDetector(
+        rate_matrix = RateMatrix.from_quotes(
+            tokens = [f"0x{i:040x}" for i in range(3)],
+            edges = edges,
+            quotes = [quote(exchange_edge, prices = numpy.ones(3), noise = 0.0) for exchange_edge in edges]
+        )
+    )
+
+    assert cycle_detector.covers(
+        tokens = [f"0x{i:040x}" for i in range(3)],
+        edge_ids = [exchange_edge.id for exchange_edge in build_edges(n = 3, exchange_ids = ["a"])]
+    )
+    assert not cycle_detector.covers(
+        tokens = [f"0x{i:040x}" for i in range(3)],
+        edge_ids = [exchange_edge.id for exchange_edge in build_edges(n = 3, exchange_ids = ["b"])]
+    )
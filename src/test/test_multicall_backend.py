@@ -0,0 +1,75 @@
+from src.data_structures.call import Call
+from src.data_structures.multicall_backend import EncodedCall, MulticallBackend, Multicall2Backend, Multicall3Backend
+from src.utils.abi import get_abi
+
+from web3 import Web3, HTTPProvider
+
+from typing import List
+
+import pytest
+
+
+TARGETS: List[str] = [f"0x{i:040x}" for i in range(1, 4)]
+
+
+def get_encoded_calls(allow_failures: List[bool], values: List[int]) -> List[EncodedCall]:
+    return [
+        (Web3.to_checksum_address(target), bytes([i]) * 4, allow_failure, value)
+        for i, (target, allow_failure, value) in enumerate(zip(TARGETS, allow_failures, values))
+    ]
+
+
+def assert_encodable(multicall_backend: MulticallBackend, call: Call) -> None:
+    '''
+    The call matches the function of the backend's ABI
+    '''
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    w3.eth.contract(address = multicall_backend.address, abi = get_abi(multicall_backend.ABI_NAME)).encodeABI(
+        fn_name = call.function_name,
+        args = call.args
+    )
+
+
+def test_multicall3_uses_aggregate3_without_value() -> None:
+    multicall_backend: Multicall3Backend = Multicall3Backend()
+    encoded_calls: List[EncodedCall] = get_encoded_calls(allow_failures = [True, False, True], values = [0, 0, 0])
+
+    call, value = multicall_backend.build_call(encoded_call_chunk = encoded_calls)
+
+    assert (call.function_name, value) == ("aggregate3", 0)
+    assert call.args == [[(target, allow_failure, call_data) for target, call_data, allow_failure, _ in encoded_calls]]
+    assert_encodable(multicall_backend = multicall_backend, call = call)
+
+
+def test_multicall3_switches_to_aggregate3_value_when_a_call_carries_value() -> None:
+    multicall_backend: Multicall3Backend = Multicall3Backend()
+    encoded_calls: List[EncodedCall] = get_encoded_calls(allow_failures = [True, False, False], values = [0, 5, 7])
+
+    call, value = multicall_backend.build_call(encoded_call_chunk = encoded_calls)
+
+    assert (call.function_name, value) == ("aggregate3Value", 12)
+    assert call.args == [[
+        (target, allow_failure, value, call_data) for target, call_data, allow_failure, value in encoded_calls
+    ]]
+    assert_encodable(multicall_backend = multicall_backend, call = call)
+
+
+def test_multicall2_requires_success_only_when_every_call_is_required() -> None:
+    multicall_backend: Multicall2Backend = Multicall2Backend()
+
+    for allow_failures, require_success in (
+        ([False, False, False], True),
+        ([False, True, False], False),
+        ([True, True, True], False)
+    ):
+        encoded_calls: List[EncodedCall] = get_encoded_calls(allow_failures = allow_failures, values = [0, 0, 0])
+        call, value = multicall_backend.build_call(encoded_call_chunk = encoded_calls)
+
+        assert (call.function_name, value) == ("tryAggregate", 0)
+        assert call.args == [require_success, [(target, call_data) for target, call_data, _, _ in encoded_calls]]
+        assert_encodable(multicall_backend = multicall_backend, call = call)
+
+
+def test_multicall2_rejects_calls_with_value() -> None:
+    with pytest.raises(AssertionError):
+        Multicall2Backend().build_call(encoded_call_chunk = get_encoded_calls(allow_failures = [False] * 3, values = [0, 1, 0]))
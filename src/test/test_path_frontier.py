@@ -0,0 +1,100 @@
+from src.data_structures.arbitrage import Path
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction, ExchangeGraph, QuoteFunctionMeta
+from src.data_structures.path_frontier import PathFrontier
+
+import numpy
+
+from itertools import permutations
+from typing import Dict, List, Optional, Set, Tuple
+
+
+AMOUNT_IN: int = 10 ** 18
+
+
+def build_exchange_graph(n: int, seed: int) -> ExchangeGraph:
+    '''
+    Two exchanges around random prices, each missing some pools and failing
+    some quotes (quoting 0)
+    '''
+    random: numpy.random.Generator = numpy.random.default_rng(seed)
+    tokens: List[str] = [f"0x{i:040x}" for i in range(n)]
+    prices: numpy.ndarray = random.uniform(0.5, 2.0, n)
+
+    exchange_functions: List[ExchangeFunction] = []
+    for exchange_id in ("a", "b"):
+        rates: Dict[Tuple[str, str], float] = {
+            (token_in, token_out): (
+                prices[j] / prices[i] * (1 + random.uniform(-0.02, 0.015))
+                if random.random() > 0.1 else 0.0
+            )
+            for i, token_in in enumerate(tokens)
+            for j, token_out in enumerate(tokens)
+            if i != j
+        }
+        missing_pools: Set[Tuple[str, str]] = set(pair for pair in rates if random.random() < 0.2)
+        exchange_functions.append(ExchangeFunction(
+            quote_function = lambda token_in, token_out, amount_in, block_identifier = "latest", rates = rates: (
+                QuoteFunctionMeta(call = None, callback = lambda _: int(amount_in * rates[token_in, token_out]))
+            ),
+            swap_function = lambda **kwargs: None,
+            pool_exists_function = lambda token_in, token_out, missing_pools = missing_pools: (
+                (token_in, token_out) not in missing_pools
+            ),
+            exchange_id = exchange_id
+        ))
+    return ExchangeGraph(tokens = tokens, exchange_functions = exchange_functions)
+
+
+def quote(exchange_edge: ExchangeEdge, amount_in: int) -> int:
+    return exchange_edge.get_quote_function_meta(amount_in = amount_in).callback(None)
+
+
+def search_recursively(exchange_graph: ExchangeGraph, max_hops: int) -> Set[Tuple[Tuple[ExchangeEdge, int, int], ...]]:
+    '''
+    Profitable cycles of 2 to max_hops hops through distinct tokens, quoting
+    every path hop by hop as the search did before PathFrontier
+    '''
+    paths: Set[Tuple[Tuple[ExchangeEdge, int, int], ...]] = set()
+
+    def extend(tokens: List[str], hops: List[Tuple[ExchangeEdge, int, int]], amount: int) -> None:
+        if len(hops) == len(tokens):
+            if amount > AMOUNT_IN:
+                paths.add(tuple(hops))
+            return
+        for exchange_edge in exchange_graph.get_edges(token_in = tokens[len(hops)], token_out = tokens[(len(hops) + 1) % len(tokens)]):
+            amount_out: int = quote(exchange_edge, amount_in = amount)
+            if amount_out > 0:
+                extend(tokens, hops + [(exchange_edge, amount, amount_out)], amount_out)
+
+    for hops in range(2, max_hops + 1):
+        for tokens in permutations(exchange_graph.tokens, hops):
+            extend(list(tokens), [], AMOUNT_IN)
+    return paths
+
+
+def test_path_frontier_matches_recursive_search() -> None:
+    for seed in range(10):
+        exchange_graph: ExchangeGraph = build_exchange_graph(n = 6, seed = seed)
+        for max_hops in (2, 3, 4):
+            path_frontier: PathFrontier = PathFrontier(
+                exchange_graph = exchange_graph,
+                amounts_in = {token: AMOUNT_IN for token in exchange_graph.tokens},
+                block_number = 1,
+                max_hops = max_hops
+            )
+
+            paths: List[Path] = []
+            levels: int = 0
+            while not path_frontier.done:
+                next_hops: List[Tuple[ExchangeEdge, int]] = path_frontier.next_hops()
+                amounts_out: List[Optional[int]] = [
+                    quote(exchange_edge, amount_in = amount_in) for exchange_edge, amount_in in next_hops
+                ]
+                paths.extend(path_frontier.advance(amounts_out = amounts_out))
+                levels += 1
+
+            assert levels <= max_hops
+            assert len(paths) == len(set(tuple(hop.exchange_edge for hop in path) for path in paths))
+            assert set(
+                tuple((hop.exchange_edge, hop.amount_in, hop.amount_out) for hop in path) for path in paths
+            ) == search_recursively(exchange_graph, max_hops = max_hops), (seed, max_hops)
@@ -0,0 +1,46 @@
+from src.data_structures.pool_registry import PoolRecord, PoolRegistry
+
+from typing import List
+
+
+FACTORY_ADDRESS: str = "0x0000000000000000000000000000000000000F00"
+TOKENS: List[str] = [f"0x{i:040x}" for i in range(1, 4)]
+
+
+def get_pool_record(i: int, token0: str, token1: str, block_number: int) -> PoolRecord:
+    return PoolRecord(
+        address = f"0x{0x100 + i:040x}",
+        factory_address = FACTORY_ADDRESS,
+        token0 = token0,
+        token1 = token1,
+        fee = 0,
+        tick_spacing = 0,
+        block_number = block_number
+    )
+
+
+def test_incremental_sync_resumes_from_the_synced_block(tmp_path) -> None:
+    path: str = str(tmp_path / "pools.sqlite")
+    first_pool: PoolRecord = get_pool_record(0, TOKENS[0], TOKENS[1], block_number = 50)
+    second_pool: PoolRecord = get_pool_record(1, TOKENS[1], TOKENS[2], block_number = 150)
+
+    pool_registry: PoolRegistry = PoolRegistry(path = path)
+    assert pool_registry.get_synced_block(FACTORY_ADDRESS) is None
+    pool_registry.put_many(pools = [first_pool], factory_address = FACTORY_ADDRESS, synced_block = 100)
+    pool_registry.close()
+
+    pool_registry = PoolRegistry(path = path)
+    assert pool_registry.get_synced_block(FACTORY_ADDRESS) == 100
+    pool_registry.put_many(pools = [second_pool], factory_address = FACTORY_ADDRESS, synced_block = 200)
+
+    assert pool_registry.get_synced_block(FACTORY_ADDRESS) == 200
+    assert len(pool_registry) == 2
+    assert pool_registry.get_pools(TOKENS[1], TOKENS[0]) == [first_pool]
+    assert pool_registry.get_pools_by_token(TOKENS[1]) == [second_pool, first_pool]
+    # Pools deployed after the block are left out
+    assert pool_registry.get_pools_between(tokens = TOKENS, block_number = 100) == {
+        (TOKENS[0], TOKENS[1]): [first_pool],
+        (TOKENS[0], TOKENS[2]): [],
+        (TOKENS[1], TOKENS[2]): []
+    }
+    pool_registry.close()
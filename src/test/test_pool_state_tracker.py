@@ -0,0 +1,222 @@
+from src.data_structures.pool_index import PoolKey
+from src.data_structures.uniswapv3_pool_state import UniswapV3PoolState
+from src.services.pool_state_tracker import PoolStateTracker
+from src.utils.uniswapv3_math import get_sqrt_ratio_at_tick
+
+from eth_abi import encode
+from hexbytes import HexBytes
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+PAIR_ADDRESS: str = "0x0000000000000000000000000000000000000001"
+POOL_ADDRESS: str = "0x0000000000000000000000000000000000000002"
+OTHER_POOL_ADDRESS: str = "0x0000000000000000000000000000000000000003"
+TOKEN0: str = "0x000000000000000000000000000000000000000A"
+TOKEN1: str = "0x000000000000000000000000000000000000000b"
+TICK_SPACING: int = 10
+
+
+@dataclass
+class Pool():
+    '''
+    On-chain state of a pool, from which UniswapV3PoolState is loaded as
+    UniswapV3Service.fetch_pool_states does
+    '''
+    address: str
+    tick: int
+    positions: List[Tuple[int, int, int]] = field(default_factory = list) # (tick lower, tick upper, liquidity)
+
+    def load(self, block_number: int, word_radius: int = 1) -> UniswapV3PoolState:
+        word: int = (self.tick // TICK_SPACING) >> 8
+        pool_state: UniswapV3PoolState = UniswapV3PoolState(
+            address = self.address,
+            token0 = TOKEN0,
+            token1 = TOKEN1,
+            fee = 500,
+            tick_spacing = TICK_SPACING,
+            block_number = block_number,
+            sqrt_price_x96 = get_sqrt_ratio_at_tick(self.tick),
+            tick = self.tick,
+            liquidity = sum(
+                liquidity for tick_lower, tick_upper, liquidity in self.positions
+                if tick_lower <= self.tick < tick_upper
+            ),
+            min_word = word - word_radius,
+            max_word = word + word_radius
+        )
+        for tick_lower, tick_upper, liquidity in self.positions:
+            for tick, liquidity_net in ((tick_lower, liquidity), (tick_upper, -liquidity)):
+                if pool_state.min_word <= (tick // TICK_SPACING) >> 8 <= pool_state.max_word:
+                    pool_state.liquidity_net[tick] = pool_state.liquidity_net.get(tick, 0) + liquidity_net
+                    pool_state.tick_bitmap[(tick // TICK_SPACING) >> 8] = (
+                        pool_state.tick_bitmap.get((tick // TICK_SPACING) >> 8, 0) | 1 << (tick // TICK_SPACING) % 256
+                    )
+        return pool_state
+
+
+class FakeContractService():
+    def __init__(self) -> None:
+        self.logs: List[Dict[str, Any]] = []
+
+
+    def get_logs(self, **kwargs) -> List[Dict[str, Any]]:
+        return self.logs
+
+
+class FakeUniswapV2Service():
+    def __init__(self) -> None:
+        self.snapshots: Dict[int, Dict[str, Tuple[int, int]]] = dict()
+
+
+    def put_reserve_snapshot(self, block_number: int, reserves: Dict[str, Tuple[int, int]]) -> None:
+        self.snapshots[block_number] = reserves
+
+
+class FakeUniswapV3Service():
+    def __init__(self, pools: Dict[str, Pool]) -> None:
+        self.pools: Dict[str, Pool] = pools
+        self.fetched_pool_keys: List[List[PoolKey]] = []
+        self.snapshots: Dict[int, Dict[str, UniswapV3PoolState]] = dict()
+
+
+    def fetch_pool_states_by_key(self, pool_keys: List[PoolKey], block_identifier: int) -> Dict[str, Optional[UniswapV3PoolState]]:
+        self.fetched_pool_keys.append(pool_keys)
+        return {
+            pool_address: pool.load(block_number = block_identifier) if pool.positions else None
+            for pool_address, pool in self.pools.items()
+        }
+
+
+    def put_pool_state_snapshot(self, block_number: int, pool_states: Dict[str, UniswapV3PoolState]) -> None:
+        self.snapshots[block_number] = pool_states
+
+
+def get_pool_state_tracker(pools: List[Pool]) -> PoolStateTracker:
+    pool_state_tracker: PoolStateTracker = PoolStateTracker(
+        w3 = None,
+        contract_service = FakeContractService(),
+        uniswapv2_service = FakeUniswapV2Service(),
+        uniswapv3_service = FakeUniswapV3Service(pools = {pool.address: pool for pool in pools})
+    )
+    pool_state_tracker.block_number = 10
+    pool_state_tracker.reserves[PAIR_ADDRESS] = (10 ** 18, 2 * 10 ** 18)
+    for pool in pools:
+        pool_state_tracker.pool_states[pool.address] = pool.load(block_number = 10)
+        pool_state_tracker.changed_blocks[pool.address] = 10
+    pool_state_tracker.changed_blocks[PAIR_ADDRESS] = 10
+    return pool_state_tracker
+
+
+def get_log(address: str, topic: str, data: bytes, topics: List[bytes] = []) -> Dict[str, Any]:
+    return {"address": address, "topics": [HexBytes(topic)] + [HexBytes(topic) for topic in topics], "data": data}
+
+
+def get_sync_log(reserve0: int, reserve1: int) -> Dict[str, Any]:
+    return get_log(PAIR_ADDRESS, PoolStateTracker.SYNC_TOPIC, encode(["uint112", "uint112"], [reserve0, reserve1]))
+
+
+def get_swap_log(pool: Pool, tick: int) -> Dict[str, Any]:
+    pool.tick = tick
+    liquidity: int = pool.load(block_number = 0).liquidity
+    return get_log(
+        pool.address,
+        PoolStateTracker.SWAP_TOPIC,
+        encode(["int256", "int256", "uint160", "uint128", "int24"], [1, -1, get_sqrt_ratio_at_tick(tick), liquidity, tick]),
+        [encode(["address"], [TOKEN0]), encode(["address"], [TOKEN1])]
+    )
+
+
+def get_mint_log(pool: Pool, tick_lower: int, tick_upper: int, amount: int) -> Dict[str, Any]:
+    pool.positions.append((tick_lower, tick_upper, amount))
+    return get_log(
+        pool.address,
+        PoolStateTracker.MINT_TOPIC,
+        encode(["address", "uint128", "uint256", "uint256"], [TOKEN0, amount, 1, 1]),
+        [encode(["address"], [TOKEN0]), encode(["int24"], [tick_lower]), encode(["int24"], [tick_upper])]
+    )
+
+
+def get_burn_log(pool: Pool, tick_lower: int, tick_upper: int, amount: int) -> Dict[str, Any]:
+    pool.positions.remove((tick_lower, tick_upper, amount))
+    return get_log(
+        pool.address,
+        PoolStateTracker.BURN_TOPIC,
+        encode(["uint128", "uint256", "uint256"], [amount, 1, 1]),
+        [encode(["address"], [TOKEN0]), encode(["int24"], [tick_lower]), encode(["int24"], [tick_upper])]
+    )
+
+
+def test_sync_logs_replace_reserves() -> None:
+    pool_state_tracker: PoolStateTracker = get_pool_state_tracker(pools = [])
+    pool_state_tracker.contract_service.logs = [get_sync_log(3, 4), get_sync_log(5, 6)]
+
+    assert pool_state_tracker.update(to_block = 11) == {PAIR_ADDRESS}
+    assert pool_state_tracker.reserves == {PAIR_ADDRESS: (5, 6)}
+    assert pool_state_tracker.uniswapv2_service.snapshots == {11: {PAIR_ADDRESS: (5, 6)}}
+    assert pool_state_tracker.get_dirty_pools(since_block = 10) == {PAIR_ADDRESS}
+    assert pool_state_tracker.get_dirty_pools(since_block = 11) == set()
+
+
+def test_swap_and_mint_logs_match_a_fresh_load() -> None:
+    pool: Pool = Pool(address = POOL_ADDRESS, tick = 105, positions = [(-600, 600, 10 ** 18), (100, 200, 10 ** 17)])
+    pool_state_tracker: PoolStateTracker = get_pool_state_tracker(pools = [pool])
+    pool_state_tracker.contract_service.logs = [
+        get_mint_log(pool, tick_lower = 0, tick_upper = 300, amount = 5 * 10 ** 17), # In range
+        get_swap_log(pool, tick = 45),
+        get_mint_log(pool, tick_lower = -2560, tick_upper = -600, amount = 10 ** 16), # Below in the word before, sharing tick -600
+        get_mint_log(pool, tick_lower = 600, tick_upper = 2550, amount = 2 * 10 ** 16), # Above, sharing tick 600
+        get_swap_log(pool, tick = 35),
+        get_mint_log(pool, tick_lower = 30, tick_upper = 40, amount = 3 * 10 ** 16) # In range
+    ]
+
+    assert pool_state_tracker.update(to_block = 11) == {POOL_ADDRESS}
+    assert pool_state_tracker.uniswapv3_service.fetched_pool_keys == []
+    assert pool_state_tracker.pool_states[POOL_ADDRESS] == pool.load(block_number = 11)
+    assert pool_state_tracker.uniswapv3_service.snapshots[11][POOL_ADDRESS] == pool.load(block_number = 11)
+    assert pool_state_tracker.get_dirty_pools(since_block = 10) == {POOL_ADDRESS}
+
+    for token_in in (TOKEN0, TOKEN1):
+        assert pool_state_tracker.pool_states[POOL_ADDRESS].quote_exact_input(token_in = token_in, amount_in = 10 ** 15) == (
+            pool.load(block_number = 11).quote_exact_input(token_in = token_in, amount_in = 10 ** 15)
+        )
+
+
+def test_pools_swapping_to_the_edge_of_their_words_or_burning_are_reloaded_together() -> None:
+    pool: Pool = Pool(address = POOL_ADDRESS, tick = 105, positions = [(-600, 600, 10 ** 18)])
+    other_pool: Pool = Pool(address = OTHER_POOL_ADDRESS, tick = 105, positions = [(-600, 600, 10 ** 18), (0, 300, 10 ** 17)])
+    pool_state_tracker: PoolStateTracker = get_pool_state_tracker(pools = [pool, other_pool])
+
+    # Within the middle word of the loaded ones
+    pool_state_tracker.contract_service.logs = [get_swap_log(pool, tick = 2555)]
+    assert pool_state_tracker.update(to_block = 11) == {POOL_ADDRESS}
+    assert pool_state_tracker.uniswapv3_service.fetched_pool_keys == []
+    assert pool_state_tracker.pool_states[POOL_ADDRESS] == pool.load(block_number = 11)
+
+    # Into the last loaded word, and a burn
+    pool_state_tracker.contract_service.logs = [
+        get_swap_log(pool, tick = 2565),
+        get_burn_log(other_pool, tick_lower = 0, tick_upper = 300, amount = 10 ** 17)
+    ]
+    assert pool_state_tracker.update(to_block = 12) == {POOL_ADDRESS, OTHER_POOL_ADDRESS}
+    assert [sorted(pool_keys) for pool_keys in pool_state_tracker.uniswapv3_service.fetched_pool_keys] == [
+        [(TOKEN0, TOKEN1, 500)] * 2
+    ]
+    assert pool_state_tracker.pool_states == {
+        POOL_ADDRESS: pool.load(block_number = 12),
+        OTHER_POOL_ADDRESS: other_pool.load(block_number = 12)
+    }
+
+
+def test_update_drops_pools_that_fail_to_reload() -> None:
+    pool: Pool = Pool(address = POOL_ADDRESS, tick = 0, positions = [(-600, 600, 10 ** 18)])
+    pool_state_tracker: PoolStateTracker = get_pool_state_tracker(pools = [pool])
+    pool_state_tracker.contract_service.logs = [get_burn_log(pool, tick_lower = -600, tick_upper = 600, amount = 10 ** 18)]
+
+    changed_pools = pool_state_tracker.update(to_block = 11)
+
+    assert changed_pools == {POOL_ADDRESS}
+    assert pool_state_tracker.pool_states == dict()
+    assert pool_state_tracker.uniswapv3_service.snapshots == {11: dict()}
+    assert pool_state_tracker.block_number == 11
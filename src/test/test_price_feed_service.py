@@ -0,0 +1,123 @@
+from src.data_structures.call import CallReturn
+from src.data_structures.price_cache import PriceCache
+from src.services.price_feed_service import PriceFeedService
+
+from multiprocessing.pool import ThreadPool
+from threading import Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class FakeContractService():
+    '''
+    Multicalls in chunks on its own pool, as ContractService does
+    '''
+    def __init__(self, pool_size: int) -> None:
+        self.pool: ThreadPool = ThreadPool(pool_size)
+        self.block_identifiers: List[Any] = []
+
+
+    def add_contract(self, **kwargs) -> None:
+        pass
+
+
+    def multicall(
+        self, calls: List[Dict[str, Any]], require_success: bool = True, block_identifier: Any = "latest",
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None, hedge: bool = False
+    ) -> List[Any]:
+        self.block_identifiers.append(block_identifier)
+        results: List[CallReturn] = self.pool.map(
+            lambda call: CallReturn(success = True, return_data = [block_identifier * 10 ** 36]),
+            calls
+        )
+        return [callback(result) for callback, result in zip(callbacks, results)] if callbacks else results
+
+
+def test_prefetch_price_eth_with_more_blocks_than_pool_workers() -> None:
+    contract_service: FakeContractService = FakeContractService(pool_size = 4)
+    price_feed_service: PriceFeedService = PriceFeedService(
+        w3 = None,
+        contract_service = contract_service,
+        price_cache = PriceCache(max_staleness = 0),
+        task_pool = ThreadPool(4)
+    )
+
+    thread: Thread = Thread(
+        target = price_feed_service.prefetch_price_eth,
+        kwargs = {"tokens": ["0xA"], "block_numbers": range(1, 101)},
+        daemon = True
+    )
+    thread.start()
+    thread.join(timeout = 10)
+    assert not thread.is_alive(), "prefetch_price_eth deadlocked"
+
+    assert sorted(contract_service.block_identifiers) == list(range(1, 101))
+    assert price_feed_service.fetch_price_eth(tokens = ["0xA"], block_identifier = 50) == {"0xA": 50}
+    assert len(contract_service.block_identifiers) == 100
+
+
+def test_prefetch_price_eth_without_task_pool_is_sequential() -> None:
+    contract_service: FakeContractService = FakeContractService(pool_size = 2)
+    price_feed_service: PriceFeedService = PriceFeedService(
+        w3 = None,
+        contract_service = contract_service,
+        price_cache = PriceCache(max_staleness = 4)
+    )
+
+    price_feed_service.prefetch_price_eth(tokens = ["0xA"], block_numbers = range(100, 120))
+
+    assert contract_service.block_identifiers == [100, 105, 110, 115]
+
+
+class FakeRateContractService():
+    '''
+    Answers getRateToEth with rates[token] and decimals with decimals[token]
+    '''
+    def __init__(self, rates: Dict[str, int], decimals: Dict[str, int]) -> None:
+        self.rates: Dict[str, int] = rates
+        self.decimals: Dict[str, int] = decimals
+        self.multicalls: List[List[Tuple[str, str]]] = []
+
+
+    def add_contract(self, **kwargs) -> None:
+        pass
+
+
+    def multicall(
+        self, calls: List[Dict[str, Any]], require_success: bool = True, block_identifier: Any = "latest",
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None, hedge: bool = False
+    ) -> List[Any]:
+        self.multicalls.append([
+            (call["function_name"], call["args"][0] if call["args"] else call["contract_address"]) for call in calls
+        ])
+        results: List[CallReturn] = [
+            CallReturn(success = True, return_data = [
+                self.rates[call["args"][0]] if call["function_name"] == "getRateToEth"
+                else self.decimals[call["contract_address"]]
+            ])
+            for call in calls
+        ]
+        return [callback(result) for callback, result in zip(callbacks, results)] if callbacks else results
+
+
+def test_fetch_price_usd_makes_one_multicall() -> None:
+    usdc: str = PriceFeedService.USD_PROXY_ADDRESS
+    rates: Dict[str, int] = {usdc: 5 * 10 ** 23, "0xA": 2 * 10 ** 35, "0xB": 3 * 10 ** 23}
+    decimals: Dict[str, int] = {"0xA": 18, "0xB": 6}
+    contract_service: FakeRateContractService = FakeRateContractService(rates = rates, decimals = decimals)
+    price_feed_service: PriceFeedService = PriceFeedService(
+        w3 = None,
+        contract_service = contract_service,
+        price_cache = PriceCache(max_staleness = 0)
+    )
+
+    prices_usd: Dict[str, float] = price_feed_service.fetch_price_usd(tokens = ["0xA", "0xB"], block_identifier = 1)
+
+    assert contract_service.multicalls == [[
+        ("getRateToEth", usdc), ("getRateToEth", "0xA"), ("getRateToEth", "0xB"),
+        ("decimals", "0xA"), ("decimals", "0xB")
+    ]]
+    # fetch_eth_price_usd * fetch_price_eth * 10 ** decimals, as priced in three round trips
+    eth_price_usd: float = 1e-6 / (rates[usdc] / 1e36)
+    assert prices_usd == {
+        token: rates[token] / 1e36 * eth_price_usd * 10 ** decimals[token] for token in ("0xA", "0xB")
+    }
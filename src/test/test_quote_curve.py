@@ -0,0 +1,61 @@
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction
+from src.data_structures.quote_curve import QuoteCurve, geometric_grid
+from src.data_structures.quote_graph import Quote, QuoteGraph
+
+import numpy
+
+from dataclasses import asdict
+
+
+def test_geometric_grid_is_centered() -> None:
+    assert geometric_grid(center = 1, size = 5, ratio = 2) == [0.25, 0.5, 1, 2, 4]
+
+
+def test_quote_curve_is_clamped_monotone() -> None:
+    # The quote at 3 failed and gave 0
+    quote_curve: QuoteCurve = QuoteCurve(
+        amounts_in = numpy.array([4.0, 1.0, 3.0, 2.0]),
+        amounts_out = numpy.array([7.0, 2.0, 0.0, 4.0])
+    )
+
+    assert quote_curve.amounts_in.tolist() == [0, 1, 2, 3, 4]
+    assert quote_curve.amounts_out.tolist() == [0, 2, 4, 4, 7]
+    assert quote_curve.get_amount_out(3) == 4
+
+
+def test_quote_curve_interpolates_through_the_origin_and_holds_past_the_last_point() -> None:
+    quote_curve: QuoteCurve = QuoteCurve(
+        amounts_in = numpy.array([2.0, 4.0]),
+        amounts_out = numpy.array([6.0, 8.0])
+    )
+
+    assert quote_curve.get_amount_out(1) == 3
+    assert quote_curve.get_amount_out(3) == 7
+    assert quote_curve.get_amount_out(10) == 8
+    assert quote_curve.get_exchange_rate(numpy.array([0.0, 1.0, 10.0])).tolist() == [0, 3, 0.8]
+
+
+def test_rescale_requotes_edges_on_their_curves() -> None:
+    exchange_function: ExchangeFunction = ExchangeFunction(
+        quote_function = lambda **kwargs: None, swap_function = lambda **kwargs: None, exchange_id = "a"
+    )
+    curved_edge: ExchangeEdge = ExchangeEdge(token_in = "0xA", token_out = "0xB", exchange_function = exchange_function)
+    flat_edge: ExchangeEdge = ExchangeEdge(token_in = "0xB", token_out = "0xA", exchange_function = exchange_function)
+
+    quote_graph: QuoteGraph = QuoteGraph(block_number = 1)
+    quote_graph.add_edge(
+        "0xA", "0xB", curved_edge,
+        quote_curve = QuoteCurve(amounts_in = numpy.array([100.0, 200.0, 400.0]), amounts_out = numpy.array([200.0, 300.0, 400.0])),
+        **asdict(Quote(token_in = "0xA", token_out = "0xB", amount_in = 200, amount_out = 300))
+    )
+    quote_graph.add_edge(
+        "0xB", "0xA", flat_edge,
+        **asdict(Quote(token_in = "0xB", token_out = "0xA", amount_in = 300, amount_out = 150))
+    )
+
+    rescaled_quote_graph: QuoteGraph = quote_graph.rescale(1.5)
+
+    assert rescaled_quote_graph.graph == {"block_number": 1}
+    assert rescaled_quote_graph.get_quote(curved_edge) == Quote(token_in = "0xA", token_out = "0xB", amount_in = 300, amount_out = 350)
+    assert rescaled_quote_graph.get_quote_curve(curved_edge) is quote_graph.get_quote_curve(curved_edge)
+    assert rescaled_quote_graph.get_quote(flat_edge) == quote_graph.get_quote(flat_edge)
@@ -0,0 +1,83 @@
+from src.data_structures.quote_graph import canonical_rotation
+from src.data_structures.rate_matrix import RateMatrix
+
+import numpy
+
+from itertools import permutations
+from typing import Dict, List, Set, Tuple
+
+
+def build_rate_matrix(weights: numpy.ndarray) -> RateMatrix:
+    n: int = len(weights)
+    return RateMatrix(
+        tokens = [f"0x{i:040x}" for i in range(n)],
+        weights = weights,
+        edge_indices = numpy.full((n, n), -1, dtype = numpy.int64),
+        edges = [],
+        quotes = []
+    )
+
+
+def random_weights(n: int, density: float, seed: int, noise: float = 0.02) -> numpy.ndarray:
+    '''
+    Weights of consistent rates (no negative cycle) with some noise on each edge
+    '''
+    random: numpy.random.Generator = numpy.random.default_rng(seed)
+    prices: numpy.ndarray = random.uniform(-3, 3, n)
+    weights: numpy.ndarray = prices[None, :] - prices[:, None] + random.uniform(-noise, 2 * noise, (n, n))
+    weights[random.random((n, n)) > density] = numpy.inf
+    numpy.fill_diagonal(weights, numpy.inf)
+    return weights
+
+
+def brute_force_cycles(rate_matrix: RateMatrix, max_hops: int) -> Set[Tuple[int, ...]]:
+    '''
+    Every negative cycle of 2 to max_hops hops through distinct tokens
+    '''
+    return set(
+        canonical_rotation(list(cycle))
+        for k in range(2, max_hops + 1)
+        for cycle in permutations(range(len(rate_matrix.tokens)), k)
+        if cycle[0] == min(cycle) and rate_matrix.get_cycle_weight(cycle = list(cycle)) < -RateMatrix.EPSILON
+    )
+
+
+def test_find_negative_cycles_finds_disjoint_cycles() -> None:
+    weights: numpy.ndarray = numpy.full((7, 7), 1.0)
+    numpy.fill_diagonal(weights, numpy.inf)
+    # The 2 hop cycle shows in the predecessors one iteration after the 5 hop one
+    cycle_edges: Dict[Tuple[int, int], float] = {
+        (0, 1): -1.0, (1, 0): 0.9,
+        (2, 3): -0.1, (3, 4): -0.1, (4, 5): -0.1, (5, 6): -0.1, (6, 2): -0.1
+    }
+    for cell, weight in cycle_edges.items():
+        weights[cell] = weight
+
+    cycles: List[List[int]] = build_rate_matrix(weights).find_negative_cycles()
+
+    assert sorted(cycles) == [[0, 1], [2, 3, 4, 5, 6]]
+
+
+def test_find_negative_cycles_covers_every_negative_cycle() -> None:
+    for seed in range(30):
+        rate_matrix: RateMatrix = build_rate_matrix(random_weights(n = 6, density = 0.7, seed = seed))
+        cycles: List[List[int]] = rate_matrix.find_negative_cycles()
+
+        assert len(set(map(tuple, cycles))) == len(cycles)
+        for cycle in cycles:
+            assert cycle[0] == min(cycle) and len(set(cycle)) == len(cycle)
+            assert rate_matrix.get_cycle_weight(cycle = cycle) < 0
+
+        cycle_tokens: Set[int] = set(token for cycle in cycles for token in cycle)
+        for cycle in brute_force_cycles(rate_matrix, max_hops = 6):
+            assert cycle_tokens.intersection(cycle), (seed, cycle)
+
+
+def test_find_bounded_cycles_matches_brute_force() -> None:
+    for seed in range(20):
+        rate_matrix: RateMatrix = build_rate_matrix(random_weights(n = 6, density = 0.8, seed = seed, noise = 0.1))
+        for max_hops in range(2, 7):
+            cycles: List[List[int]] = rate_matrix.find_bounded_cycles(max_hops = max_hops)
+
+            assert len(set(map(tuple, cycles))) == len(cycles)
+            assert set(map(tuple, cycles)) == brute_force_cycles(rate_matrix, max_hops = max_hops), (seed, max_hops)
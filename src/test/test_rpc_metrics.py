@@ -0,0 +1,64 @@
+from src.data_structures.rpc_metrics import JsonlMetricsSink, PrometheusMetricsSink, RpcMetric
+
+from http.server import ThreadingHTTPServer
+from urllib.request import urlopen
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+import json
+
+import pytest
+
+
+def test_prometheus_latency_buckets_are_cumulative() -> None:
+    metrics_sink: PrometheusMetricsSink = PrometheusMetricsSink()
+    for latency, failed in ((0.004, False), (0.1, False), (0.3, True), (20, False)):
+        metrics_sink.record(RpcMetric(method = "eth_call", latency = latency, calls = 2, failed = failed))
+
+    lines: List[str] = metrics_sink.render().splitlines()
+    labels: str = 'method="eth_call",endpoint=""'
+
+    assert f"rpc_requests_total{{{labels}}} 4" in lines
+    assert f"rpc_failures_total{{{labels}}} 1" in lines
+    assert f"rpc_calls_total{{{labels}}} 8" in lines
+    assert [line for line in lines if line.startswith("rpc_latency_seconds_bucket")] == [
+        f'rpc_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+        for bound, cumulative in (
+            (0.005, 1), (0.01, 1), (0.025, 1), (0.05, 1), (0.1, 2), (0.25, 2),
+            (0.5, 3), (1, 3), (2.5, 3), (5, 3), (10, 3), ("+Inf", 4)
+        )
+    ]
+    assert f"rpc_latency_seconds_count{{{labels}}} 4" in lines
+    assert float(next(line for line in lines if line.startswith("rpc_latency_seconds_sum")).split()[-1]) == pytest.approx(20.404)
+
+
+def test_prometheus_metrics_are_served_on_loopback_by_default() -> None:
+    metrics_sink: PrometheusMetricsSink = PrometheusMetricsSink()
+    metrics_sink.record(RpcMetric(method = "eth_call", latency = 0.1))
+
+    server: ThreadingHTTPServer = metrics_sink.serve(port = 0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.read().decode() == metrics_sink.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_jsonl_sink_appends_one_record_per_metric(tmp_path) -> None:
+    path: str = str(tmp_path / "metrics.jsonl")
+    metrics: List[RpcMetric] = [
+        RpcMetric(method = "eth_call", latency = 0.1, calls = 3, endpoint_uri = "http://rpc"),
+        RpcMetric(method = "multicall", latency = 0.2, chunks = 2, reverted_calls = 1)
+    ]
+
+    metrics_sink: JsonlMetricsSink = JsonlMetricsSink(path = path)
+    for metric in metrics:
+        metrics_sink.record(metric)
+    metrics_sink.close()
+
+    with open(path) as f:
+        records: List[Dict[str, Any]] = [json.loads(line) for line in f]
+    assert records == [asdict(metric) for metric in metrics]
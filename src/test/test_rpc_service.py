@@ -0,0 +1,256 @@
+from src.data_structures.rate_limiter import RateLimiter, RetryPolicy
+from src.services.rpc_service import RpcService, SessionHTTPProvider
+
+from requests import Response
+
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+
+ENDPOINT_URI: str = "http://rpc"
+RATE_LIMIT_ERROR: Dict[str, Any] = {"code": -32005, "message": "Too many requests"}
+
+
+class FakeRateLimiter(RateLimiter):
+    def __init__(self) -> None:
+        super().__init__(requests_per_second = 1e9)
+        self.pauses: List[Tuple[str, float]] = []
+
+
+    def pause(self, endpoint_uri: str, delay: float) -> None:
+        self.pauses.append((endpoint_uri, delay))
+
+
+class FakeSession():
+    '''
+    Answers the n-th post with respond(n, request body), always with HTTP 200
+    '''
+    def __init__(self, respond: Callable[[int, Any], Any]) -> None:
+        self.respond: Callable[[int, Any], Any] = respond
+        self.posts: int = 0
+
+
+    def post(self, url: str, **kwargs) -> Response:
+        request_body: Any = kwargs["json"] if "json" in kwargs else json.loads(kwargs["data"])
+        response: Response = Response()
+        response.status_code = 200
+        response._content = json.dumps(self.respond(self.posts, request_body)).encode()
+        self.posts += 1
+        return response
+
+
+def get_rpc_service(session: FakeSession, rate_limiter: RateLimiter) -> RpcService:
+    return RpcService(
+        endpoint_uri = ENDPOINT_URI,
+        session = session,
+        rate_limiter = rate_limiter,
+        retry_policy = RetryPolicy(base_delay = 0)
+    )
+
+
+def test_rate_limited_batch_items_are_retried_and_pause_the_endpoint() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: [
+        {"jsonrpc": "2.0", "id": item["id"], "error": RATE_LIMIT_ERROR} if n == 0 and i == 1
+        else {"jsonrpc": "2.0", "id": item["id"], "result": item["params"][0]}
+        for i, item in enumerate(body)
+    ])
+    rate_limiter: FakeRateLimiter = FakeRateLimiter()
+
+    results: List[Any] = get_rpc_service(session = session, rate_limiter = rate_limiter).batch_request(
+        requests = [("eth_call", [i]) for i in range(3)]
+    )
+
+    assert results == [0, 1, 2]
+    assert session.posts == 2
+    assert [endpoint_uri for endpoint_uri, _ in rate_limiter.pauses] == [ENDPOINT_URI]
+
+
+def test_rate_limited_single_request_is_retried() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: (
+        {"jsonrpc": "2.0", "id": body["id"], "error": RATE_LIMIT_ERROR} if n < 2
+        else {"jsonrpc": "2.0", "id": body["id"], "result": "0x1"}
+    ))
+    rate_limiter: FakeRateLimiter = FakeRateLimiter()
+
+    response: Dict[str, Any] = get_rpc_service(session = session, rate_limiter = rate_limiter).raw_request(
+        method = "eth_blockNumber",
+        params = []
+    )
+
+    assert response["result"] == "0x1"
+    assert session.posts == 3
+    assert len(rate_limiter.pauses) == 2
+
+
+def test_other_errors_are_returned_without_retrying() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: {
+        "jsonrpc": "2.0", "id": body["id"], "error": {"code": -32000, "message": "execution reverted"}
+    })
+
+    response: Dict[str, Any] = get_rpc_service(session = session, rate_limiter = FakeRateLimiter()).raw_request(
+        method = "eth_call",
+        params = []
+    )
+
+    assert response["error"]["code"] == -32000
+    assert session.posts == 1
+
+
+def test_session_provider_retries_rate_limited_responses() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: (
+        {"jsonrpc": "2.0", "id": body["id"], "error": {"code": 429, "message": "Rate limit exceeded"}} if n == 0
+        else {"jsonrpc": "2.0", "id": body["id"], "result": "0x1"}
+    ))
+    rate_limiter: FakeRateLimiter = FakeRateLimiter()
+    session_http_provider: SessionHTTPProvider = SessionHTTPProvider(
+        endpoint_uri = ENDPOINT_URI,
+        session = session,
+        rate_limiter = rate_limiter,
+        retry_policy = RetryPolicy(base_delay = 0)
+    )
+
+    assert session_http_provider.make_request(method = "eth_blockNumber", params = [])["result"] == "0x1"
+    assert session.posts == 2
+    assert len(rate_limiter.pauses) == 1
+
+
+class FakeEndpointSession():
+    '''
+    Answers every post to an endpoint with its name as the result of each item,
+    after delays[url] seconds, or with HTTP status_codes[url] if given
+    '''
+    def __init__(self, delays: Dict[str, float] = dict(), status_codes: Dict[str, int] = dict()) -> None:
+        self.delays: Dict[str, float] = delays
+        self.status_codes: Dict[str, int] = status_codes
+        self.posts: List[Tuple[str, float]] = []
+
+
+    def post(self, url: str, **kwargs) -> Response:
+        self.posts.append((url, time.monotonic()))
+        time.sleep(self.delays.get(url, 0))
+        response: Response = Response()
+        response.status_code = self.status_codes.get(url, 200)
+        response._content = json.dumps([
+            {"jsonrpc": "2.0", "id": item["id"], "result": url} for item in kwargs["json"]
+        ]).encode()
+        return response
+
+
+def get_routing_rpc_service(session: FakeEndpointSession, latencies: Dict[str, float]) -> RpcService:
+    rpc_service: RpcService = RpcService(
+        endpoint_uri = list(latencies),
+        session = session,
+        retry_policy = RetryPolicy(base_delay = 0)
+    )
+    for endpoint_uri, latency in latencies.items():
+        for _ in range(10):
+            rpc_service.endpoint_stats[endpoint_uri].record(latency = latency, failed = False)
+    return rpc_service
+
+
+def test_endpoints_are_ranked_by_health_then_latency() -> None:
+    rpc_service: RpcService = get_routing_rpc_service(
+        session = FakeEndpointSession(),
+        latencies = {"http://slow": 0.3, "http://fast": 0.1, "http://failing": 0.01}
+    )
+    for _ in range(5):
+        rpc_service.endpoint_stats["http://failing"].record(latency = 0, failed = True)
+
+    assert rpc_service.rank_endpoints() == ["http://fast", "http://slow", "http://failing"]
+
+
+def test_unhealthy_endpoint_is_skipped() -> None:
+    session: FakeEndpointSession = FakeEndpointSession()
+    rpc_service: RpcService = get_routing_rpc_service(
+        session = session,
+        latencies = {"http://unhealthy": 0.01, "http://healthy": 0.1}
+    )
+    for _ in range(5):
+        rpc_service.endpoint_stats["http://unhealthy"].record(latency = 0, failed = True)
+
+    assert rpc_service.request(method = "eth_blockNumber", params = []) == "http://healthy"
+    assert [url for url, _ in session.posts] == ["http://healthy"]
+
+
+def test_failed_endpoint_fails_over_to_the_next() -> None:
+    session: FakeEndpointSession = FakeEndpointSession(status_codes = {"http://first": 503})
+    rpc_service: RpcService = get_routing_rpc_service(
+        session = session,
+        latencies = {"http://first": 0.01, "http://second": 0.1}
+    )
+
+    assert rpc_service.request(method = "eth_blockNumber", params = []) == "http://second"
+    assert [url for url, _ in session.posts] == ["http://first", "http://second"]
+    assert rpc_service.endpoint_stats["http://first"].failures == 1
+
+
+def test_hedge_fires_after_the_percentile_deadline_and_first_answer_wins() -> None:
+    # The primary's 90th percentile latency of 0.1s is the hedge deadline
+    latencies: Dict[str, float] = {"http://primary": 0.1, "http://backup": 0.2}
+
+    session: FakeEndpointSession = FakeEndpointSession(delays = {"http://primary": 0.01})
+    rpc_service: RpcService = get_routing_rpc_service(session = session, latencies = latencies)
+    assert rpc_service.batch_request(requests = [("eth_call", [])], hedge = True) == ["http://primary"]
+    time.sleep(0.2)
+    assert [url for url, _ in session.posts] == ["http://primary"]
+
+    session = FakeEndpointSession(delays = {"http://primary": 0.5})
+    rpc_service = get_routing_rpc_service(session = session, latencies = latencies)
+    assert rpc_service.batch_request(requests = [("eth_call", [])], hedge = True) == ["http://backup"]
+    (primary_uri, primary_time), (backup_uri, backup_time) = session.posts
+    assert (primary_uri, backup_uri) == ("http://primary", "http://backup")
+    assert backup_time - primary_time >= 0.09
+
+
+def test_batch_results_keep_request_order_when_the_server_reorders() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: [
+        {"jsonrpc": "2.0", "id": item["id"], "result": item["params"][0]} for item in reversed(body)
+    ])
+
+    results: List[Any] = get_rpc_service(session = session, rate_limiter = FakeRateLimiter()).batch_request(
+        requests = [("eth_call", [i]) for i in range(5)]
+    )
+
+    assert results == list(range(5))
+
+
+def test_batch_request_is_split_by_max_batch_size_on_one_pool() -> None:
+    batch_sizes: List[int] = []
+    session: FakeSession = FakeSession(respond = lambda n, body: (batch_sizes.append(len(body)), [
+        {"jsonrpc": "2.0", "id": item["id"], "result": item["params"][0]} for item in body
+    ])[1])
+    rpc_service: RpcService = get_rpc_service(session = session, rate_limiter = FakeRateLimiter())
+
+    results: List[Any] = rpc_service.batch_request(
+        requests = [("eth_call", [i]) for i in range(7)],
+        max_batch_size = 3
+    )
+    batch_pool: Any = rpc_service.batch_pool
+    rpc_service.batch_request(requests = [("eth_call", [i]) for i in range(4)], max_batch_size = 3)
+
+    assert results == list(range(7))
+    assert sorted(batch_sizes) == [1, 1, 3, 3, 3]
+    assert batch_pool is not None and rpc_service.batch_pool is batch_pool
+    rpc_service.close()
+
+
+def test_batch_item_errors_are_returned_as_value_errors() -> None:
+    session: FakeSession = FakeSession(respond = lambda n, body: [
+        {"jsonrpc": "2.0", "id": item["id"], "error": {"code": -32000, "message": "execution reverted"}} if i == 1
+        else {"jsonrpc": "2.0", "id": item["id"], "result": item["params"][0]}
+        for i, item in enumerate(body)
+    ])
+    rpc_service: RpcService = get_rpc_service(session = session, rate_limiter = FakeRateLimiter())
+
+    results: List[Any] = rpc_service.batch_request(
+        requests = [("eth_call", [i]) for i in range(3)],
+        raise_on_error = False
+    )
+
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+    with pytest.raises(ValueError):
+        rpc_service.batch_request(requests = [("eth_call", [i]) for i in range(3)])
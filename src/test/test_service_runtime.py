@@ -0,0 +1,49 @@
+from src.services.async_contract_service import AsyncContractService
+from src.services.contract_service import ContractService
+from src.services.price_feed_service import PriceFeedService
+from src.services.service_runtime import ServiceRuntime
+
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3, HTTPProvider
+
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+
+def test_services_without_runtime_share_the_default_one() -> None:
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    runtime: ServiceRuntime = ServiceRuntime.get_default(w3 = w3)
+
+    assert ServiceRuntime.get_default(w3 = w3) is runtime
+    assert PriceFeedService(w3 = w3).contract_service is runtime.contract_service
+    other_runtime: ServiceRuntime = ServiceRuntime.get_default(w3 = Web3(HTTPProvider("http://localhost:8545")))
+    assert other_runtime is not runtime
+    other_runtime.close()
+
+    runtime.close()
+    assert ServiceRuntime.get_default(w3 = w3) is not runtime
+    ServiceRuntime.get_default(w3 = w3).close()
+
+
+def test_only_an_owned_pool_is_terminated_on_close() -> None:
+    w3: Web3 = Web3(HTTPProvider("http://localhost:8545"))
+    contract_service: ContractService = ContractService(w3 = w3)
+    contract_service.close()
+    with pytest.raises(ValueError):
+        contract_service.pool.map(abs, [-1])
+
+    with ThreadPool(1) as pool:
+        ContractService(w3 = w3, pool = pool).close()
+        assert pool.map(abs, [-1]) == [1]
+
+
+def test_async_contract_service_shares_the_runtime_caches() -> None:
+    runtime: ServiceRuntime = ServiceRuntime(w3 = Web3(HTTPProvider("http://localhost:8545")))
+    async_contract_service: AsyncContractService = runtime.create_async_contract_service(
+        async_w3 = AsyncWeb3(AsyncHTTPProvider("http://localhost:8545"))
+    )
+
+    assert async_contract_service.chunk_sizer is runtime.contract_service.chunk_sizer
+    assert async_contract_service.base_fee_history is runtime.contract_service.base_fee_history
+    assert async_contract_service.multicall_backend is runtime.contract_service.multicall_backend
+    runtime.close()
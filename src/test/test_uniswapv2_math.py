@@ -0,0 +1,72 @@
+from src.services.uniswapv2_service import UniswapV2Service
+from src.utils.uniswapv2_math import compute_pair_address, get_amount_out
+
+import numpy
+
+from typing import List
+
+
+WETH: str = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+USDC: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+DAI: str = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+USDT: str = "0xdAC17F958D2ee523a2206206994597C13D831ec7"
+
+
+def test_compute_pair_address() -> None:
+    for token, pair_address in (
+        (USDC, "0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc"),
+        (DAI, "0xA478c2975Ab1Ea89e8196811F51A7B7Ade33eB11"),
+        (USDT, "0x0d4a11d5EEaaC28EC3F61d100daF4d40471f1852")
+    ):
+        for token_a, token_b in ((token, WETH), (WETH, token)):
+            assert compute_pair_address(
+                factory_address = UniswapV2Service.FACTORY_ADDRESS,
+                init_code_hash = UniswapV2Service.INIT_CODE_HASH,
+                token_a = token_a,
+                token_b = token_b
+            ) == pair_address
+
+
+# Test vectors of Uniswap v2-periphery test/UniswapV2Router02.spec.ts and
+# v2-core test/UniswapV2Pair.spec.ts (swap test cases, in units of 10 ** 18)
+SWAP_TEST_CASES: List[List[int]] = [
+    [1, 5, 10, 1662497915624478906],
+    [1, 10, 5, 453305446940074565],
+    [2, 5, 10, 2851015155847869602],
+    [2, 10, 5, 831248957812239453],
+    [1, 10, 10, 906610893880149131],
+    [1, 100, 100, 987158034397061298],
+    [1, 1000, 1000, 996006981039903216]
+]
+
+
+def test_get_amount_out() -> None:
+    assert get_amount_out(2, 100, 100) == 1
+    for amount_in, reserve_in, reserve_out, amount_out in SWAP_TEST_CASES:
+        assert get_amount_out(amount_in * 10 ** 18, reserve_in * 10 ** 18, reserve_out * 10 ** 18) == amount_out
+
+
+def test_get_amount_out_gives_0_where_the_router_reverts() -> None:
+    assert get_amount_out(0, 100, 100) == 0
+    assert get_amount_out(2, 0, 100) == 0
+    assert get_amount_out(2, 100, 0) == 0
+
+
+def test_get_amount_out_over_edges_and_grids() -> None:
+    reserves_in: numpy.ndarray = numpy.array([case[1] * 10 ** 18 for case in SWAP_TEST_CASES] + [0], dtype = object)
+    reserves_out: numpy.ndarray = numpy.array([case[2] * 10 ** 18 for case in SWAP_TEST_CASES] + [100], dtype = object)
+
+    amounts_out: numpy.ndarray = get_amount_out(
+        numpy.array([case[0] * 10 ** 18 for case in SWAP_TEST_CASES] + [2], dtype = object),
+        reserves_in,
+        reserves_out
+    )
+    assert amounts_out.tolist() == [case[3] for case in SWAP_TEST_CASES] + [0]
+
+    grid: numpy.ndarray = numpy.array([[10 ** 18, 2 * 10 ** 18]] * len(reserves_in), dtype = object)
+    amounts_out = get_amount_out(grid, reserves_in[:, None], reserves_out[:, None])
+    assert amounts_out.shape == grid.shape
+    assert amounts_out.tolist() == [
+        [get_amount_out(int(amount_in), int(reserve_in), int(reserve_out)) for amount_in in row]
+        for row, reserve_in, reserve_out in zip(grid, reserves_in, reserves_out)
+    ]
@@ -0,0 +1,152 @@
+from src.data_structures.call import Call, CallReturn
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction, ExchangeGraph, QuoteFunctionMeta
+from src.data_structures.pool_index import PoolIndex
+from src.data_structures.pool_registry import PoolRecord, PoolRegistry
+from src.services.uniswapv2_service import UniswapV2Service
+from src.utils.uniswapv2_math import get_amount_out, sort_tokens
+
+from eth_abi import encode
+from hexbytes import HexBytes
+
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+TOKENS: List[str] = [f"0x{i:040x}" for i in range(1, 6)]
+
+
+def get_reserves(pair_address: str) -> Tuple[int, int]:
+    return (int(pair_address[-8:], 16) % 1000 * 10 ** 18 + 1, int(pair_address[-16:-8], 16) % 1000 * 10 ** 18 + 1)
+
+
+class FakeContractService():
+    def __init__(self) -> None:
+        self.multicalls: List[List[Call]] = []
+
+
+    def multicall(
+        self, calls: List[Call], require_success: bool = True, block_identifier: Any = "latest",
+        callbacks: Optional[List[Callable[[CallReturn], Any]]] = None
+    ) -> List[Any]:
+        self.multicalls.append(calls)
+        return [
+            callback(CallReturn(success = True, return_data = (*get_reserves(call.contract_address), 0)))
+            for call, callback in zip(calls, callbacks)
+        ]
+
+
+class FakeEth():
+    def get_block(self, block_identifier: int) -> Dict[str, int]:
+        return {"timestamp": 0}
+
+
+class FakeWeb3():
+    eth: FakeEth = FakeEth()
+
+
+class FakeRuntime():
+    def __init__(self) -> None:
+        self.pool_registry: PoolRegistry = PoolRegistry()
+
+
+def get_uniswapv2_service() -> UniswapV2Service:
+    uniswapv2_service: UniswapV2Service = UniswapV2Service.__new__(UniswapV2Service)
+    uniswapv2_service.w3 = FakeWeb3()
+    uniswapv2_service.runtime = FakeRuntime()
+    uniswapv2_service.contract_service = FakeContractService()
+    uniswapv2_service.pool_index = PoolIndex()
+    uniswapv2_service.reserve_snapshots = OrderedDict()
+    uniswapv2_service.reserve_snapshots_lock = Lock()
+    return uniswapv2_service
+
+
+def test_offline_quotes_load_every_pair_in_one_multicall() -> None:
+    uniswapv2_service: UniswapV2Service = get_uniswapv2_service()
+    exchange_functions: List[ExchangeFunction] = uniswapv2_service.get_exchange_functions(block_identifier = 1, offline = True)
+    exchange_graph: ExchangeGraph = ExchangeGraph(tokens = TOKENS, exchange_functions = exchange_functions)
+    edge_amounts: List[Tuple[ExchangeEdge, int]] = [
+        (edge, amount_in)
+        for edge in chain.from_iterable(
+            exchange_graph.get_edges(token_in = token_in, token_out = token_out)
+            for token_in in TOKENS for token_out in TOKENS if token_in != token_out
+        )
+        for amount_in in (10 ** 17, 10 ** 18, 10 ** 19)
+    ]
+
+    quote_function_meta_list: List[QuoteFunctionMeta] = ExchangeEdge.get_quote_function_meta_list(
+        edge_amounts = edge_amounts,
+        block_identifier = 1
+    )
+
+    assert len(uniswapv2_service.contract_service.multicalls) == 1
+    assert len(uniswapv2_service.contract_service.multicalls[0]) == len(TOKENS) * (len(TOKENS) - 1) // 2
+    for (edge, amount_in), quote_function_meta in zip(edge_amounts, quote_function_meta_list):
+        reserves: Tuple[int, int] = get_reserves(uniswapv2_service.get_pair_address(edge.token_in, edge.token_out))
+        if sort_tokens(edge.token_in, edge.token_out)[0] != edge.token_in:
+            reserves = reserves[::-1]
+        assert quote_function_meta.call is None
+        assert quote_function_meta.callback(None) == get_amount_out(amount_in, *reserves)
+
+    # Single quotes read the snapshot
+    assert edge_amounts[0][0].get_quote_function_meta(amount_in = 10 ** 18, block_identifier = 1).callback(None) == (
+        quote_function_meta_list[1].callback(None)
+    )
+    assert len(uniswapv2_service.contract_service.multicalls) == 1
+
+
+def test_pair_created_log_is_parsed_with_checksummed_addresses() -> None:
+    usdc: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    weth: str = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    pair_address: str = "0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc"
+    uniswapv2_service: UniswapV2Service = get_uniswapv2_service()
+
+    pool_record: PoolRecord = uniswapv2_service.parse_pool_created_log({
+        "topics": [
+            HexBytes(UniswapV2Service.POOL_CREATED_TOPIC),
+            HexBytes(encode(["address"], [usdc])),
+            HexBytes(encode(["address"], [weth]))
+        ],
+        "data": HexBytes(encode(["address", "uint256"], [pair_address, 1])),
+        "blockNumber": 10008355
+    })
+
+    assert pool_record == PoolRecord(
+        address = pair_address,
+        factory_address = UniswapV2Service.FACTORY_ADDRESS,
+        token0 = usdc,
+        token1 = weth,
+        fee = 0,
+        tick_spacing = 0,
+        block_number = 10008355
+    )
+
+
+def test_pools_are_indexed_from_the_synced_registry_without_lookups() -> None:
+    uniswapv2_service: UniswapV2Service = get_uniswapv2_service()
+    pair_address: str = uniswapv2_service.get_pair_address(TOKENS[0], TOKENS[1])
+    uniswapv2_service.runtime.pool_registry.put_many(
+        pools = [
+            PoolRecord(
+                address = pair_address,
+                factory_address = UniswapV2Service.FACTORY_ADDRESS,
+                token0 = TOKENS[0],
+                token1 = TOKENS[1],
+                fee = 0,
+                tick_spacing = 0,
+                block_number = 5
+            )
+        ],
+        factory_address = UniswapV2Service.FACTORY_ADDRESS,
+        synced_block = 10
+    )
+
+    # The registry is behind block 11 so getPair is called
+    assert uniswapv2_service.index_pools(tokens = TOKENS[:2], block_identifier = 11) == 1
+    uniswapv2_service.pool_index = PoolIndex()
+
+    assert uniswapv2_service.index_pools(tokens = TOKENS, block_identifier = 10) == 0
+    assert len(uniswapv2_service.contract_service.multicalls) == 1
+    assert uniswapv2_service.pool_index.get(PoolIndex.get_key(TOKENS[0], TOKENS[1])) == pair_address
+    assert uniswapv2_service.pool_index.exists(PoolIndex.get_key(TOKENS[0], TOKENS[2])) is False
@@ -0,0 +1,102 @@
+from src.utils.uniswapv3_math import (
+    MIN_TICK,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MAX_SQRT_RATIO,
+    compute_swap_step,
+    get_sqrt_ratio_at_tick,
+    get_tick_at_sqrt_ratio
+)
+
+from math import isqrt
+
+
+def encode_price_sqrt(reserve1: int, reserve0: int) -> int:
+    return isqrt(reserve1 * 2 ** 192 // reserve0)
+
+
+# Test vectors of Uniswap v3-core test/TickMath.spec.ts and test/SwapMath.spec.ts
+
+def test_get_sqrt_ratio_at_tick() -> None:
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO == 4295128739
+    assert get_sqrt_ratio_at_tick(MIN_TICK + 1) == 4295343490
+    assert get_sqrt_ratio_at_tick(MAX_TICK - 1) == 1461373636630004318706518188784493106690254656249
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO == 1461446703485210103287273052203988822378723970342
+
+
+def test_get_tick_at_sqrt_ratio() -> None:
+    assert get_tick_at_sqrt_ratio(MIN_SQRT_RATIO) == MIN_TICK
+    assert get_tick_at_sqrt_ratio(4295343490) == MIN_TICK + 1
+    assert get_tick_at_sqrt_ratio(1461373636630004318706518188784493106690254656248) == MAX_TICK - 2
+    assert get_tick_at_sqrt_ratio(MAX_SQRT_RATIO - 1) == MAX_TICK - 1
+
+
+def test_compute_swap_step_exact_input_capped_at_target() -> None:
+    price_target: int = encode_price_sqrt(101, 100)
+    sqrt_q, amount_in, amount_out, fee_amount = compute_swap_step(
+        encode_price_sqrt(1, 1), price_target, 2 * 10 ** 18, 10 ** 18, 600
+    )
+    assert (amount_in, fee_amount, amount_out) == (9975124224178055, 5988667735148, 9925619580021728)
+    assert amount_in + fee_amount < 10 ** 18
+    assert sqrt_q == price_target
+
+
+def test_compute_swap_step_exact_output_capped_at_target() -> None:
+    price_target: int = encode_price_sqrt(101, 100)
+    sqrt_q, amount_in, amount_out, fee_amount = compute_swap_step(
+        encode_price_sqrt(1, 1), price_target, 2 * 10 ** 18, -10 ** 18, 600
+    )
+    assert (amount_in, fee_amount, amount_out) == (9975124224178055, 5988667735148, 9925619580021728)
+    assert amount_out < 10 ** 18
+    assert sqrt_q == price_target
+
+
+def test_compute_swap_step_exact_input_fully_spent() -> None:
+    price_target: int = encode_price_sqrt(1000, 100)
+    sqrt_q, amount_in, amount_out, fee_amount = compute_swap_step(
+        encode_price_sqrt(1, 1), price_target, 2 * 10 ** 18, 10 ** 18, 600
+    )
+    assert (amount_in, fee_amount, amount_out) == (999400000000000000, 600000000000000, 666399946655997866)
+    assert amount_in + fee_amount == 10 ** 18
+    assert sqrt_q < price_target
+
+
+def test_compute_swap_step_exact_output_fully_received() -> None:
+    price_target: int = encode_price_sqrt(10000, 100)
+    sqrt_q, amount_in, amount_out, fee_amount = compute_swap_step(
+        encode_price_sqrt(1, 1), price_target, 2 * 10 ** 18, -10 ** 18, 600
+    )
+    assert (amount_in, fee_amount, amount_out) == (2000000000000000000, 1200720432259356, 10 ** 18)
+    assert sqrt_q < price_target
+
+
+def test_compute_swap_step_amount_out_capped_at_desired_amount() -> None:
+    assert compute_swap_step(
+        417332158212080721273783715441582, 1452870262520218020823638996,
+        159344665391607089467575320103, -1, 1
+    ) == (417332158212080721273783715441581, 1, 1, 1)
+
+
+def test_compute_swap_step_target_price_of_1_uses_partial_input() -> None:
+    sqrt_q, amount_in, amount_out, fee_amount = compute_swap_step(
+        2, 1, 1, 3915081100057732413702495386755767, 1
+    )
+    assert (amount_in, fee_amount, amount_out, sqrt_q) == (
+        39614081257132168796771975168, 39614120871253040049813, 0, 1
+    )
+    assert amount_in + fee_amount < 3915081100057732413702495386755767
+
+
+def test_compute_swap_step_entire_input_taken_as_fee() -> None:
+    assert compute_swap_step(
+        2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872
+    ) == (2413, 0, 0, 10)
+
+
+def test_compute_swap_step_intermediate_insufficient_liquidity() -> None:
+    sqrt_p: int = 20282409603651670423947251286016
+
+    # Zero for one exact output
+    assert compute_swap_step(sqrt_p, sqrt_p * 11 // 10, 1024, -4, 3000) == (sqrt_p * 11 // 10, 26215, 0, 79)
+    # One for zero exact output
+    assert compute_swap_step(sqrt_p, sqrt_p * 9 // 10, 1024, -263000, 3000) == (sqrt_p * 9 // 10, 1, 26214, 1)
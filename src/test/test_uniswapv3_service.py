@@ -0,0 +1,165 @@
+from src.data_structures.exchange_graph import ExchangeEdge, ExchangeFunction, ExchangeGraph, QuoteFunctionMeta
+from src.data_structures.pool_index import PoolIndex, PoolKey
+from src.data_structures.pool_registry import PoolRecord
+from src.data_structures.uniswapv3_pool_state import TickRangeError
+from src.services.uniswapv3_service import FeeAmount, UniswapV3Service
+
+from eth_abi import encode
+from hexbytes import HexBytes
+
+from collections import OrderedDict
+from itertools import chain
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+
+TOKENS: List[str] = [f"0x{i:040x}" for i in range(1, 5)]
+
+
+class FakePoolState():
+    def __init__(self, error: Optional[Exception] = None) -> None:
+        self.error: Optional[Exception] = error
+
+
+    def quote_exact_input(self, token_in: str, amount_in: int) -> int:
+        if self.error is not None:
+            raise self.error
+        return amount_in // 2
+
+
+def get_uniswapv3_service() -> UniswapV3Service:
+    uniswapv3_service: UniswapV3Service = UniswapV3Service.__new__(UniswapV3Service)
+    uniswapv3_service.w3 = None
+    uniswapv3_service.pool_index = PoolIndex()
+    uniswapv3_service.pool_states = OrderedDict()
+    uniswapv3_service.pool_states_lock = Lock()
+    return uniswapv3_service
+
+
+def get_offline_quote(error: Exception) -> QuoteFunctionMeta:
+    uniswapv3_service: UniswapV3Service = get_uniswapv3_service()
+    uniswapv3_service.get_pool_states = lambda pool_keys, block_number: [FakePoolState(error = error)] * len(pool_keys)
+    return uniswapv3_service.get_quote_function(fee = 500, offline = True)(
+        token_in = TOKENS[0],
+        token_out = TOKENS[1],
+        amount_in = 10 ** 18,
+        block_identifier = 1
+    )
+
+
+def test_offline_quote_out_of_loaded_ticks_falls_back_to_quoter() -> None:
+    quote_function_meta: QuoteFunctionMeta = get_offline_quote(error = TickRangeError("Word 3 is not loaded"))
+
+    assert quote_function_meta.call is not None
+
+
+def test_offline_quote_errors_give_zero_as_failed_quoter_calls() -> None:
+    for error in (ValueError("Not enough liquidity"), ZeroDivisionError(), OverflowError()):
+        quote_function_meta: QuoteFunctionMeta = get_offline_quote(error = error)
+
+        assert quote_function_meta.call is None
+        assert quote_function_meta.callback(None) == 0
+
+
+def test_offline_quotes_load_the_pools_of_every_tier_at_once() -> None:
+    uniswapv3_service: UniswapV3Service = get_uniswapv3_service()
+    # Only the 3000 tier of the first two tokens is missing
+    uniswapv3_service.pool_index.put_many(
+        items = {
+            PoolIndex.get_key(token_a, token_b, fee_amount.value): (
+                PoolIndex.NULL_ADDRESS if (token_a, token_b, fee_amount.value) == (TOKENS[0], TOKENS[1], 3000)
+                else uniswapv3_service.get_pool_address(token_a, token_b, fee_amount.value)
+            )
+            for i, token_a in enumerate(TOKENS)
+            for token_b in TOKENS[i + 1:]
+            for fee_amount in FeeAmount
+        },
+        block_number = 1
+    )
+    fetched_pool_keys: List[List[PoolKey]] = []
+
+    def fetch_pool_states_by_key(pool_keys: List[PoolKey], block_identifier: int) -> Dict[str, Optional[FakePoolState]]:
+        fetched_pool_keys.append(list(pool_keys))
+        pool_states: Dict[str, Optional[FakePoolState]] = {
+            uniswapv3_service.get_pool_address(token0, token1, fee): FakePoolState()
+            for token0, token1, fee in pool_keys
+        }
+        uniswapv3_service.put_pool_state_snapshot(block_number = block_identifier, pool_states = pool_states)
+        return pool_states
+
+    uniswapv3_service.fetch_pool_states_by_key = fetch_pool_states_by_key
+    exchange_functions: List[ExchangeFunction] = [
+        ExchangeFunction(
+            quote_function = uniswapv3_service.get_quote_function(fee = fee_amount.value, offline = True),
+            swap_function = lambda **kwargs: None,
+            pool_exists_function = uniswapv3_service.get_pool_exists_function(fee = fee_amount.value),
+            quote_batch_function = uniswapv3_service.get_quote_batch_function(fee = fee_amount.value)
+        )
+        for fee_amount in FeeAmount
+    ]
+    exchange_graph: ExchangeGraph = ExchangeGraph(tokens = TOKENS, exchange_functions = exchange_functions)
+    edge_amounts: List[Tuple[ExchangeEdge, int]] = [
+        (edge, 10 ** 18)
+        for edge in chain.from_iterable(
+            exchange_graph.get_edges(token_in = token_in, token_out = token_out)
+            for token_in in TOKENS for token_out in TOKENS if token_in != token_out
+        )
+    ]
+
+    quote_function_meta_list: List[QuoteFunctionMeta] = ExchangeEdge.get_quote_function_meta_list(
+        edge_amounts = edge_amounts,
+        block_identifier = 1
+    )
+
+    assert len(edge_amounts) == (len(TOKENS) * (len(TOKENS) - 1) * len(FeeAmount)) - 2
+    assert all(quote_function_meta.callback(None) == 10 ** 18 // 2 for quote_function_meta in quote_function_meta_list)
+    assert len(fetched_pool_keys) == 1
+    assert len(fetched_pool_keys[0]) == len(TOKENS) * (len(TOKENS) - 1) // 2 * len(FeeAmount)
+
+    # Later quotes of the block only read the snapshot
+    edge_amounts[0][0].get_quote_function_meta(amount_in = 10 ** 18, block_identifier = 1)
+    assert len(fetched_pool_keys) == 1
+
+
+def test_pool_created_log_is_parsed_with_checksummed_addresses() -> None:
+    usdc: str = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    weth: str = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    pool_address: str = "0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640"
+    uniswapv3_service: UniswapV3Service = get_uniswapv3_service()
+
+    pool_record: PoolRecord = uniswapv3_service.parse_pool_created_log({
+        "topics": [
+            HexBytes(UniswapV3Service.POOL_CREATED_TOPIC),
+            HexBytes(encode(["address"], [usdc])),
+            HexBytes(encode(["address"], [weth])),
+            HexBytes(encode(["uint24"], [500]))
+        ],
+        "data": HexBytes(encode(["int24", "address"], [10, pool_address])),
+        "blockNumber": 12376729
+    })
+
+    assert pool_record == PoolRecord(
+        address = pool_address,
+        factory_address = UniswapV3Service.FACTORY_ADDRESS,
+        token0 = usdc,
+        token1 = weth,
+        fee = 500,
+        tick_spacing = 10,
+        block_number = 12376729
+    )
+
+
+def test_pool_exists_function_trusts_missing_pools_until_max_missing_age() -> None:
+    uniswapv3_service: UniswapV3Service = get_uniswapv3_service()
+    uniswapv3_service.pool_index = PoolIndex(max_missing_age = 10)
+    uniswapv3_service.pool_index.put_many(
+        items = {PoolIndex.get_key(TOKENS[0], TOKENS[1], 500): PoolIndex.NULL_ADDRESS},
+        block_number = 100
+    )
+
+    assert not uniswapv3_service.get_pool_exists_function(fee = 500, block_number = 110)(TOKENS[0], TOKENS[1])
+    assert uniswapv3_service.get_pool_exists_function(fee = 500, block_number = 111)(TOKENS[0], TOKENS[1])
+    assert [
+        exchange_function.pool_exists_function(TOKENS[0], TOKENS[1])
+        for exchange_function in uniswapv3_service.get_exchange_functions(block_identifier = 111)
+    ] == [True] * 4
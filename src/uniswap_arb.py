@@ -1,25 +1,30 @@
 from .services.uniswap_arbitrage_service import UniswapArbitrageService
+from .services.service_runtime import ServiceRuntime
 
-from web3 import Web3, HTTPProvider
 from dotenv import dotenv_values
 
 from typing import Dict, Any
 from pprint import pprint
-from time import perf_counter, sleep
+from time import perf_counter
 import json
 
 # Load environment variables from .env
 env: Dict[str, Any] = dotenv_values(".env")
 
 def main() -> None:
-    # Create a web3 object with a standard json rpc provider, such as Infura, Alchemy, or your own node.
-    w3 = Web3(HTTPProvider(env.get("HTTP_PROVIDER_URL")))
+    # Create a runtime with a pooled json rpc session, such as Infura, Alchemy, or your own node.
+    # Requests are throttled to the provider's budget instead of sleeping between blocks.
+    runtime: ServiceRuntime = ServiceRuntime.from_endpoint_uri(
+        env.get("HTTP_PROVIDER_URL"),
+        requests_per_second = float(env.get("RPC_REQUESTS_PER_SECOND", 25))
+    )
 
     b = perf_counter()
 
     uniswap_arbitrage_service: UniswapArbitrageService = UniswapArbitrageService(
-        w3 = w3,
-        executor_private_key = env.get("WALLET_PRIVATE_KEY")
+        w3 = runtime.w3,
+        executor_private_key = env.get("WALLET_PRIVATE_KEY"),
+        runtime = runtime
     )
 
     print(perf_counter() - b)
@@ -53,9 +58,12 @@ def main() -> None:
     print(tokens)
     # tokens = ["0x0590cc9232eBF68D81F6707A119898219342ecB9", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2", "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"]
     
+    blocks = range(19000000, 19410000, 10000)
+    runtime.contract_service.prefetch_base_fees(block_numbers = blocks)
+
     for n in range(6, 7):
         data = []
-        for i in range(19000000, 19410000, 10000):
+        for i in blocks:
             print(i, end=" ", flush = True)
             sample_tokens = tokens[:n]
             b = perf_counter()
@@ -88,7 +96,5 @@ def main() -> None:
             with open(f"data/naive_test_{n}_64.json", "w+t") as f:
                 json.dump(data, f, default = lambda foo: str(foo))
 
-            sleep(10)
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
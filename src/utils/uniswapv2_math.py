@@ -0,0 +1,61 @@
+from eth_typing.evm import ChecksumAddress
+from eth_utils import keccak, to_bytes, to_checksum_address
+import numpy
+
+from functools import lru_cache
+from typing import Tuple, Union
+
+
+IntOrArray = Union[int, numpy.ndarray]
+
+
+def sort_tokens(token_a: ChecksumAddress, token_b: ChecksumAddress) -> Tuple[ChecksumAddress, ChecksumAddress]:
+    return (token_a, token_b) if int(token_a, 16) < int(token_b, 16) else (token_b, token_a)
+
+
+@lru_cache(maxsize = 65536)
+def compute_pair_address(
+    factory_address: ChecksumAddress, init_code_hash: str,
+    token_a: ChecksumAddress, token_b: ChecksumAddress
+) -> ChecksumAddress:
+    '''
+    CREATE2 address of the pair of token_a and token_b, whether it exists or not
+    '''
+    token0, token1 = sort_tokens(token_a, token_b)
+    return to_checksum_address(keccak(
+        b"\xff"
+        + to_bytes(hexstr = factory_address)
+        + keccak(to_bytes(hexstr = token0) + to_bytes(hexstr = token1))
+        + to_bytes(hexstr = init_code_hash)
+    )[12:])
+
+
+def get_amount_out(
+    amount_in: IntOrArray, reserve_in: IntOrArray, reserve_out: IntOrArray,
+    fee_numerator: int = 997, fee_denominator: int = 1000
+) -> IntOrArray:
+    '''
+    UniswapV2Library.getAmountOut with exact integer math. Arrays broadcast against
+    each other, so edges (1-d reserves) and grids of amounts (an extra axis on
+    amount_in) are evaluated in one pass. Arrays are kept as Python integers
+    (object dtype) because the products overflow 64 bits. Where the router would
+    revert (no liquidity or no input), 0 is returned.
+    '''
+    if not any(isinstance(x, numpy.ndarray) for x in (amount_in, reserve_in, reserve_out)):
+        if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+            return 0
+        amount_in_with_fee: int = amount_in * fee_numerator
+        return amount_in_with_fee * reserve_out // (reserve_in * fee_denominator + amount_in_with_fee)
+
+    amount_in = numpy.asarray(amount_in, dtype = object)
+    reserve_in = numpy.asarray(reserve_in, dtype = object)
+    reserve_out = numpy.asarray(reserve_out, dtype = object)
+
+    valid: numpy.ndarray = (amount_in > 0) & (reserve_in > 0) & (reserve_out > 0)
+    amount_in_with_fee: numpy.ndarray = numpy.where(valid, amount_in, 0) * fee_numerator
+    denominator: numpy.ndarray = reserve_in * fee_denominator + amount_in_with_fee
+    return numpy.where(
+        valid,
+        amount_in_with_fee * reserve_out // numpy.where(valid, denominator, 1),
+        0
+    )
@@ -0,0 +1,272 @@
+from eth_typing.evm import ChecksumAddress
+from eth_abi import encode
+from eth_utils import keccak, to_bytes, to_checksum_address
+
+from functools import lru_cache
+from math import log
+from typing import Callable, Tuple
+
+from .uniswapv2_math import sort_tokens
+
+
+# Ports of the v3-core libraries (TickMath, FullMath, SqrtPriceMath, SwapMath,
+# TickBitmap) on Python integers. Overflow checks are kept where they change the
+# result, so that outputs match the contracts bit for bit.
+
+MIN_TICK: int = -887272
+MAX_TICK: int = 887272
+MIN_SQRT_RATIO: int = 4295128739
+MAX_SQRT_RATIO: int = 1461446703485210103287273052203988822378723970342
+
+Q96: int = 1 << 96
+MAX_UINT160: int = (1 << 160) - 1
+MAX_UINT256: int = (1 << 256) - 1
+
+# ratio multipliers for each bit of |tick|, as Q128.128 values of 1.0001 ** (-2 ** i / 2)
+TICK_RATIOS: Tuple[int, ...] = (
+    0xfffcb933bd6fad37aa2d162d1a594001,
+    0xfff97272373d413259a46990580e213a,
+    0xfff2e50f5f656932ef12357cf3c7fdcc,
+    0xffe5caca7e10e4e61c3624eaa0941cd0,
+    0xffcb9843d60f6159c9db58835c926644,
+    0xff973b41fa98c081472e6896dfb254c0,
+    0xff2ea16466c96a3843ec78b326b52861,
+    0xfe5dee046a99a2a811c461f1969c3053,
+    0xfcbe86c7900a88aedcffc83b479aa3a4,
+    0xf987a7253ac413176f2b074cf7815e54,
+    0xf3392b0822b70005940c7a398e4b70f3,
+    0xe7159475a2c29b7443b29c7fa6e889d9,
+    0xd097f3bdfd2022b8845ad8f792aa5825,
+    0xa9f746462d870fdf8a65dc1f90e061e5,
+    0x70d869a156d2a1b890bb3df62baf32f7,
+    0x31be135f97d08fd981231505542fcfa6,
+    0x9aa508b5b7a84e1c677de54f3e99bc9,
+    0x5d6af8dedb81196699c329225ee604,
+    0x2216e584f5fa1ea926041bedfe98,
+    0x48a170391f7dc42444e8fa2
+)
+
+
+@lru_cache(maxsize = 65536)
+def compute_pool_address(
+    factory_address: ChecksumAddress, init_code_hash: str,
+    token_a: ChecksumAddress, token_b: ChecksumAddress, fee: int
+) -> ChecksumAddress:
+    '''
+    CREATE2 address of the pool of token_a and token_b with fee, whether it exists or not
+    '''
+    token0, token1 = sort_tokens(token_a, token_b)
+    return to_checksum_address(keccak(
+        b"\xff"
+        + to_bytes(hexstr = factory_address)
+        + keccak(encode(["address", "address", "uint24"], [token0, token1, fee]))
+        + to_bytes(hexstr = init_code_hash)
+    )[12:])
+
+
+def div_rounding_up(x: int, y: int) -> int:
+    return -(-x // y)
+
+
+def mul_div(a: int, b: int, denominator: int) -> int:
+    result: int = a * b // denominator
+    if result > MAX_UINT256:
+        raise ValueError("mul_div overflow")
+    return result
+
+
+def mul_div_rounding_up(a: int, b: int, denominator: int) -> int:
+    result: int = div_rounding_up(a * b, denominator)
+    if result > MAX_UINT256:
+        raise ValueError("mul_div_rounding_up overflow")
+    return result
+
+
+@lru_cache(maxsize = 65536)
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    '''
+    sqrt(1.0001 ** tick) as a Q64.96, rounded up
+    '''
+    abs_tick: int = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"Tick {tick} out of range")
+
+    ratio: int = TICK_RATIOS[0] if abs_tick & 1 else 1 << 128
+    for i in range(1, len(TICK_RATIOS)):
+        if abs_tick & (1 << i):
+            ratio = (ratio * TICK_RATIOS[i]) >> 128
+
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    '''
+    Greatest tick whose sqrt ratio is at most sqrt_price_x96. Found from a
+    floating point estimate corrected against get_sqrt_ratio_at_tick, which by
+    definition gives the same tick as the contract.
+    '''
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError(f"Sqrt price {sqrt_price_x96} out of range")
+
+    tick: int = max(MIN_TICK, min(MAX_TICK, int(2 * log(sqrt_price_x96 / Q96) / log(1.0001))))
+    while tick > MIN_TICK and get_sqrt_ratio_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while tick < MAX_TICK and get_sqrt_ratio_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+
+def get_next_sqrt_price_from_amount0_rounding_up(
+    sqrt_price_x96: int, liquidity: int, amount: int, add: bool
+) -> int:
+    if amount == 0:
+        return sqrt_price_x96
+
+    numerator1: int = liquidity << 96
+    product: int = amount * sqrt_price_x96
+    if add:
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 + product)
+        return div_rounding_up(numerator1, numerator1 // sqrt_price_x96 + amount)
+
+    if product > MAX_UINT256 or numerator1 <= product:
+        raise ValueError("Not enough liquidity")
+    result: int = mul_div_rounding_up(numerator1, sqrt_price_x96, numerator1 - product)
+    if result > MAX_UINT160:
+        raise ValueError("Sqrt price overflow")
+    return result
+
+
+def get_next_sqrt_price_from_amount1_rounding_down(
+    sqrt_price_x96: int, liquidity: int, amount: int, add: bool
+) -> int:
+    if add:
+        result: int = sqrt_price_x96 + (amount << 96) // liquidity
+        if result > MAX_UINT160:
+            raise ValueError("Sqrt price overflow")
+        return result
+
+    quotient: int = div_rounding_up(amount << 96, liquidity)
+    if sqrt_price_x96 <= quotient:
+        raise ValueError("Not enough liquidity")
+    return sqrt_price_x96 - quotient
+
+
+def get_next_sqrt_price_from_input(sqrt_price_x96: int, liquidity: int, amount_in: int, zero_for_one: bool) -> int:
+    return (
+        get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_in, True) if zero_for_one
+        else get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_in, True)
+    )
+
+
+def get_next_sqrt_price_from_output(sqrt_price_x96: int, liquidity: int, amount_out: int, zero_for_one: bool) -> int:
+    return (
+        get_next_sqrt_price_from_amount1_rounding_down(sqrt_price_x96, liquidity, amount_out, False) if zero_for_one
+        else get_next_sqrt_price_from_amount0_rounding_up(sqrt_price_x96, liquidity, amount_out, False)
+    )
+
+
+def get_amount0_delta(sqrt_ratio_a_x96: int, sqrt_ratio_b_x96: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+
+    numerator1: int = liquidity << 96
+    numerator2: int = sqrt_ratio_b_x96 - sqrt_ratio_a_x96
+    if round_up:
+        return div_rounding_up(mul_div_rounding_up(numerator1, numerator2, sqrt_ratio_b_x96), sqrt_ratio_a_x96)
+    return mul_div(numerator1, numerator2, sqrt_ratio_b_x96) // sqrt_ratio_a_x96
+
+
+def get_amount1_delta(sqrt_ratio_a_x96: int, sqrt_ratio_b_x96: int, liquidity: int, round_up: bool) -> int:
+    if sqrt_ratio_a_x96 > sqrt_ratio_b_x96:
+        sqrt_ratio_a_x96, sqrt_ratio_b_x96 = sqrt_ratio_b_x96, sqrt_ratio_a_x96
+
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_ratio_b_x96 - sqrt_ratio_a_x96, Q96)
+    return mul_div(liquidity, sqrt_ratio_b_x96 - sqrt_ratio_a_x96, Q96)
+
+
+def compute_swap_step(
+    sqrt_ratio_current_x96: int, sqrt_ratio_target_x96: int, liquidity: int,
+    amount_remaining: int, fee_pips: int
+) -> Tuple[int, int, int, int]:
+    '''
+    SwapMath.computeSwapStep: (sqrt_ratio_next_x96, amount_in, amount_out, fee_amount).
+    A non-negative amount_remaining is an exact input, a negative one an exact output.
+    '''
+    zero_for_one: bool = sqrt_ratio_current_x96 >= sqrt_ratio_target_x96
+    exact_in: bool = amount_remaining >= 0
+    amount_in: int = 0
+    amount_out: int = 0
+
+    if exact_in:
+        amount_remaining_less_fee: int = mul_div(amount_remaining, 10 ** 6 - fee_pips, 10 ** 6)
+        amount_in = (
+            get_amount0_delta(sqrt_ratio_target_x96, sqrt_ratio_current_x96, liquidity, True) if zero_for_one
+            else get_amount1_delta(sqrt_ratio_current_x96, sqrt_ratio_target_x96, liquidity, True)
+        )
+        sqrt_ratio_next_x96: int = (
+            sqrt_ratio_target_x96 if amount_remaining_less_fee >= amount_in
+            else get_next_sqrt_price_from_input(
+                sqrt_ratio_current_x96, liquidity, amount_remaining_less_fee, zero_for_one
+            )
+        )
+    else:
+        amount_out = (
+            get_amount1_delta(sqrt_ratio_target_x96, sqrt_ratio_current_x96, liquidity, False) if zero_for_one
+            else get_amount0_delta(sqrt_ratio_current_x96, sqrt_ratio_target_x96, liquidity, False)
+        )
+        sqrt_ratio_next_x96: int = (
+            sqrt_ratio_target_x96 if -amount_remaining >= amount_out
+            else get_next_sqrt_price_from_output(
+                sqrt_ratio_current_x96, liquidity, -amount_remaining, zero_for_one
+            )
+        )
+
+    reached_target: bool = sqrt_ratio_target_x96 == sqrt_ratio_next_x96
+
+    if zero_for_one:
+        if not (reached_target and exact_in):
+            amount_in = get_amount0_delta(sqrt_ratio_next_x96, sqrt_ratio_current_x96, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount1_delta(sqrt_ratio_next_x96, sqrt_ratio_current_x96, liquidity, False)
+    else:
+        if not (reached_target and exact_in):
+            amount_in = get_amount1_delta(sqrt_ratio_current_x96, sqrt_ratio_next_x96, liquidity, True)
+        if not (reached_target and not exact_in):
+            amount_out = get_amount0_delta(sqrt_ratio_current_x96, sqrt_ratio_next_x96, liquidity, False)
+
+    if not exact_in and amount_out > -amount_remaining:
+        amount_out = -amount_remaining
+
+    fee_amount: int = (
+        amount_remaining - amount_in if exact_in and sqrt_ratio_next_x96 != sqrt_ratio_target_x96
+        else mul_div_rounding_up(amount_in, fee_pips, 10 ** 6 - fee_pips)
+    )
+
+    return sqrt_ratio_next_x96, amount_in, amount_out, fee_amount
+
+
+def next_initialized_tick_within_one_word(
+    get_word: Callable[[int], int], tick: int, tick_spacing: int, lte: bool
+) -> Tuple[int, bool]:
+    '''
+    TickBitmap.nextInitializedTickWithinOneWord, reading bitmap words through get_word(word_position)
+    '''
+    compressed: int = tick // tick_spacing
+
+    if lte:
+        word_position, bit_position = compressed >> 8, compressed % 256
+        masked: int = get_word(word_position) & ((1 << (bit_position + 1)) - 1)
+        if masked != 0:
+            return (compressed - (bit_position - (masked.bit_length() - 1))) * tick_spacing, True
+        return (compressed - bit_position) * tick_spacing, False
+
+    word_position, bit_position = (compressed + 1) >> 8, (compressed + 1) % 256
+    masked: int = get_word(word_position) & ~((1 << bit_position) - 1) & MAX_UINT256
+    if masked != 0:
+        return (compressed + 1 + ((masked & -masked).bit_length() - 1 - bit_position)) * tick_spacing, True
+    return (compressed + 1 + (255 - bit_position)) * tick_spacing, False
@@ -1,8 +1,14 @@
-from web3 import Web3
+from web3 import Web3, AsyncWeb3
 from eth_typing.evm import ChecksumAddress, BlockNumber, BlockIdentifier
 
 def block_identifier_to_number(w3: Web3, block_identifier: BlockIdentifier) -> BlockNumber:
     return (
         block_identifier if isinstance(block_identifier, int)
         else w3.eth.get_block_number()
-    )
\ No newline at end of file
+    )
+
+async def async_block_identifier_to_number(w3: AsyncWeb3, block_identifier: BlockIdentifier) -> BlockNumber:
+    return (
+        block_identifier if isinstance(block_identifier, int)
+        else await w3.eth.get_block_number()
+    )